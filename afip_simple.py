@@ -7,18 +7,13 @@ import os
 import json
 import csv
 import base64
-import subprocess
-import tempfile
 import uuid
 import time
-import requests
 from datetime import datetime, timedelta
 from pathlib import Path
-import tempfile
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-import requests
 import xml.etree.ElementTree as ET
 
 
@@ -47,61 +42,13 @@ def build_simple_tra(service='wsfe'):
 
 
 def sign_tra_simple(tra_xml, cert_path, key_path):
-    """Firmar TRA usando OpenSSL"""
-    
-    # Detectar OpenSSL disponible
-    openssl_paths = [
-        'C:\\Program Files\\Git\\mingw64\\bin\\openssl.exe',  # Git mingw64
-        'C:\\Program Files\\Git\\usr\\bin\\openssl.exe',  # Git para Windows
-        'C:\\Program Files\\OpenSSL-Win64\\bin\\openssl.exe',  # Instalación estándar
-        'C:\\OpenSSL-Win64\\bin\\openssl.exe',  # Instalación alternativa
-        'openssl'  # Si está en PATH
-    ]
-    
-    openssl_cmd = None
-    for path in openssl_paths:
-        try:
-            result = subprocess.run([path, 'version'], 
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                openssl_cmd = path
-                break
-        except:
-            continue
-    
-    if not openssl_cmd:
-        raise Exception("OpenSSL no encontrado en el sistema")
-    
-    print(f"   🔧 Usando OpenSSL: {openssl_cmd}")
+    """Firmar TRA (CMS en proceso, ver src/cms_signer.py)"""
+    from src.cms_signer import firmar_cms
     
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.xml', delete=False) as tmp_xml:
-        tmp_xml.write(tra_xml)
-        tra_file = tmp_xml.name
-
-    cms_file = tempfile.mktemp(suffix='.cms')
-
-    try:
-        cmd = [
-            openssl_cmd, 'smime', '-sign',
-            '-in', tra_file,
-            '-out', cms_file,
-            '-outform', 'DER',
-            '-inkey', key_path,
-            '-signer', cert_path,
-            '-nodetach'
-        ]
-        
-        print(f"   🔐 Firmando TRA con OpenSSL...")
-        result = subprocess.run(cmd, capture_output=True, check=True)
-        print(f"   ✅ TRA firmado exitosamente")
-        
-        with open(cms_file, 'rb') as f:
-            return f.read()
-    finally:
-        if os.path.exists(tra_file):
-            os.unlink(tra_file)
-        if os.path.exists(cms_file):
-            os.unlink(cms_file)
+    print(f"   🔐 Firmando TRA...")
+    cms = firmar_cms(tra_xml, cert_path, key_path)
+    print(f"   ✅ TRA firmado exitosamente")
+    return cms
 def wsaa_auth_simple(cert_path, key_path):
     """Autenticación WSAA simplificada"""
     # URLs según entorno
@@ -135,7 +82,8 @@ def wsaa_auth_simple(cert_path, key_path):
     print(f"   📡 Enviando request WSAA a: {wsaa_urls[afip_env]}")
     
     try:
-        response = requests.post(wsaa_urls[afip_env], data=soap_request, headers=headers, timeout=30)
+        from src.afip_transport import sesion_afip, url_afip
+        response = sesion_afip().post(url_afip(wsaa_urls[afip_env]), data=soap_request, headers=headers, timeout=30)
         print(f"   📊 Respuesta HTTP: {response.status_code}")
         
         if response.status_code != 200:
@@ -270,25 +218,11 @@ def wsfe_request_simple(method, params, token, sign, cuit):
         'SOAPAction': f'"http://ar.gov.afip.dif.FEV1/{method}"'
     }
     
-    # Configuración SSL para AFIP
-    import ssl
-    import urllib3
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-    
-    # Crear sesión con configuración SSL relajada para AFIP
-    session = requests.Session()
-    
-    # Configurar adapter con SSL context personalizado
-    class AFIPHTTPSAdapter(requests.adapters.HTTPAdapter):
-        def init_poolmanager(self, *args, **kwargs):
-            context = ssl.create_default_context()
-            context.set_ciphers('DEFAULT:@SECLEVEL=1')  # Permite DH keys pequeñas
-            kwargs['ssl_context'] = context
-            return super().init_poolmanager(*args, **kwargs)
-    
-    session.mount('https://', AFIPHTTPSAdapter())
-    
-    response = session.post(wsfe_urls[afip_env], data=soap_request, headers=headers, timeout=30)
+    # Transporte compartido: keep-alive + SSL permisivo para AFIP
+    from src.afip_transport import sesion_afip, url_afip
+    session = sesion_afip()
+
+    response = session.post(url_afip(wsfe_urls[afip_env]), data=soap_request, headers=headers, timeout=30)
     
     if response.status_code != 200:
         return None
@@ -301,6 +235,29 @@ def wsfe_request_simple(method, params, token, sign, cuit):
         return None
 
 
+def _parametros_simple(tabla, token, sign, cuit):
+    """Tabla de parámetros WSFE cacheada (src/afip_parametros.py, misma cache que WSFEv1Client).
+
+    Filas como dicts de tags AFIP: {'Nro', 'Bloqueado', ...} / {'Id', 'Desc', ...}.
+    """
+    from src.afip_parametros import obtener_parametros
+    from src.afip_xml import nombre_local
+
+    metodo, grupo = {
+        'ptos_venta': ('FEParamGetPtosVenta', 'PtoVenta'),
+        'tipos_cbte': ('FEParamGetTiposCbte', 'CbteTipo'),
+    }[tabla]
+
+    def _cargar():
+        root = wsfe_request_simple(metodo, {}, token, sign, cuit)
+        if root is None:
+            raise Exception(f"{metodo} sin respuesta")
+        return [{nombre_local(h.tag): (h.text or '').strip() for h in elem}
+                for elem in root.iter() if nombre_local(elem.tag) == grupo]
+
+    return obtener_parametros(cuit, cuit, os.environ.get('AFIP_ENV', 'prod'), tabla, _cargar)
+
+
 def extraer_facturas_simple(cuit, desde=None, hasta=None, punto_venta=None, fecha_desde=None, fecha_hasta=None, cert_path=None, key_path=None, max_por_tipo=50, cuit_consultor=None):
     """Extracción simplificada de facturas con lógica FE completa
     
@@ -360,69 +317,52 @@ def extraer_facturas_simple(cuit, desde=None, hasta=None, punto_venta=None, fech
     cliente_cuit = cuit              # Para consultar facturas
     comprobantes = []
     
-    # PASO 1: Obtener puntos de venta → FEParamGetPtosVenta
+    # PASO 1: Obtener puntos de venta → FEParamGetPtosVenta (cacheado)
     print(f"📋 Consultando puntos de venta del cliente {cliente_cuit}...")
-    ptos_venta_resp = wsfe_request_simple('FEParamGetPtosVenta', {}, token, sign, consultor_cuit)
-    
     ptos_venta = [1, 2, 3, 4, 5]  # Probar múltiples PV por defecto
-    if ptos_venta_resp:
-        try:
-            # ptos_venta_resp ya es un ElementTree
-            pts = []
-            print("📋 Respuesta FEParamGetPtosVenta recibida:")
-            for pto in ptos_venta_resp.findall('.//PtoVenta'):
-                id_elem = pto.find('Id')
-                bloq_elem = pto.find('Bloqueado')
-                if id_elem is not None and bloq_elem is not None:
-                    pto_id = int(id_elem.text)
-                    bloqueado = bloq_elem.text == 'S'
-                    print(f"   PV {pto_id}: {'🔒 Bloqueado' if bloqueado else '✅ Disponible'}")
-                    if not bloqueado:  # No bloqueado
-                        pts.append(pto_id)
-            if pts:
-                ptos_venta = pts
-            else:
-                print("   ⚠️ No se encontraron puntos de venta disponibles, usando defaults")
-        except Exception as e:
-            print(f"⚠️ Error parseando puntos de venta: {e}")
-            print("   Usando puntos de venta por defecto")
-    else:
-        print("📋 No se pudo obtener lista de puntos de venta, usando defaults")
-    
+    try:
+        pts = []
+        for pto in _parametros_simple('ptos_venta', token, sign, consultor_cuit):
+            if not pto.get('Nro', '').isdigit():
+                continue
+            pto_id = int(pto['Nro'])
+            bloqueado = pto.get('Bloqueado') == 'S'
+            print(f"   PV {pto_id}: {'🔒 Bloqueado' if bloqueado else '✅ Disponible'}")
+            if not bloqueado:  # No bloqueado
+                pts.append(pto_id)
+        if pts:
+            ptos_venta = pts
+        else:
+            print("   ⚠️ No se encontraron puntos de venta disponibles, usando defaults")
+    except Exception as e:
+        print(f"⚠️ No se pudo obtener lista de puntos de venta: {e}")
+        print("   Usando puntos de venta por defecto")
+
     print(f"📋 Puntos de venta a consultar: {ptos_venta}")
-    
-    # PASO 2: Obtener tipos de comprobante → FEParamGetTiposCbte
+
+    # PASO 2: Obtener tipos de comprobante → FEParamGetTiposCbte (cacheado)
     print(f"📄 Consultando tipos de comprobante...")
-    tipos_cbte_resp = wsfe_request_simple('FEParamGetTiposCbte', {}, token, sign, consultor_cuit)
-    
+
     # Ampliar tipos para incluir más posibilidades (monotributo)
     tipos_cbte = [1, 6, 11, 51, 52, 53]  # Facturas A,B,C + Monotributo
-    if tipos_cbte_resp:
-        try:
-            # Parsear XML response para extraer tipos
-            root = ET.fromstring(tipos_cbte_resp)
-            tipos = []
-            print("📄 Respuesta FEParamGetTiposCbte recibida:")
-            for tipo in root.findall('.//CbteTipo'):
-                id_elem = tipo.find('Id')
-                desc_elem = tipo.find('Desc')
-                if id_elem is not None:
-                    tipo_id = int(id_elem.text)
-                    desc = desc_elem.text if desc_elem is not None else f'Tipo {tipo_id}'
-                    print(f"   Tipo {tipo_id}: {desc}")
-                    # Incluir más tipos, especialmente monotributo
-                    if tipo_id in [1, 2, 3, 6, 7, 8, 11, 12, 13, 51, 52, 53, 201, 202, 203, 206, 207, 208, 211, 212, 213]:
-                        tipos.append(tipo_id)
-            if tipos:
-                tipos_cbte = tipos
-            else:
-                print("   ⚠️ No se encontraron tipos válidos, usando defaults")
-        except Exception as e:
-            print(f"⚠️ Error parseando tipos de comprobante: {e}")
-            print("   Usando tipos por defecto")
-    else:
-        print("📄 No se pudo obtener lista de tipos, usando defaults")
-    
+    try:
+        tipos = []
+        for tipo in _parametros_simple('tipos_cbte', token, sign, consultor_cuit):
+            if not tipo.get('Id', '').isdigit():
+                continue
+            tipo_id = int(tipo['Id'])
+            print(f"   Tipo {tipo_id}: {tipo.get('Desc') or f'Tipo {tipo_id}'}")
+            # Incluir más tipos, especialmente monotributo
+            if tipo_id in [1, 2, 3, 6, 7, 8, 11, 12, 13, 51, 52, 53, 201, 202, 203, 206, 207, 208, 211, 212, 213]:
+                tipos.append(tipo_id)
+        if tipos:
+            tipos_cbte = tipos
+        else:
+            print("   ⚠️ No se encontraron tipos válidos, usando defaults")
+    except Exception as e:
+        print(f"⚠️ No se pudo obtener lista de tipos: {e}")
+        print("   Usando tipos por defecto")
+
     print(f"📄 Tipos de comprobante a consultar: {tipos_cbte}")
     
     total_encontrados = 0
@@ -0,0 +1,18 @@
+"""
+Benchmarks de los caminos calientes de InfoFiscal contra el simulador local de AFIP.
+
+Mide, a 100 / 10.000 / 100.000 comprobantes:
+  - enumeracion.consultar_wsfev1_interno   consulta WSFEv1 completa (HTTP contra el simulador)
+  - enumeracion.buscar_rango_por_fecha     llamadas SOAP por ventana de fechas
+  - parseo.consultar_comprobante           parseo de FECompConsultar (sin red)
+  - resumen.resumir_comprobantes           agregación por tipo + impositiva
+  - exportacion.guardar_facturas           export JSON + CSV
+
+Uso:
+    python -m benchmarks --salida bench_actual.json
+    python -m benchmarks --tamanios 100,10000 --solo parseo,resumen
+    python -m benchmarks --salida bench_nuevo.json --comparar bench_actual.json
+
+Los resultados salen en JSON (stdout o --salida); los logs de los clientes van a
+stderr. --comparar sale con código 1 si algún benchmark empeoró más que --umbral.
+"""
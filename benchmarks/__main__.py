@@ -0,0 +1,135 @@
+# benchmarks/__main__.py
+# python -m benchmarks [--tamanios 100,10000,100000] [--solo parseo,...] [--salida x.json] [--comparar base.json]
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from benchmarks import entorno
+
+TAMANIOS = [100, 10_000, 100_000]
+
+# Métricas comparadas con --comparar (más es peor en todas)
+METRICAS = ('segundos', 'llamadas_soap')
+
+
+def _registro() -> dict:
+    from benchmarks import bench_enumeracion, bench_exportacion, bench_parseo, bench_resumen
+    return {
+        **bench_enumeracion.BENCHMARKS,
+        **bench_parseo.BENCHMARKS,
+        **bench_resumen.BENCHMARKS,
+        **bench_exportacion.BENCHMARKS,
+    }
+
+
+def _commit() -> dict:
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=entorno.RAIZ,
+                             capture_output=True, text=True, timeout=10).stdout.strip()
+        sucio = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=entorno.RAIZ,
+                               capture_output=True, timeout=30).returncode != 0
+        return {'commit': sha or None, 'cambios_sin_commit': sucio}
+    except (OSError, subprocess.SubprocessError):
+        return {'commit': None, 'cambios_sin_commit': None}
+
+
+def correr(tamanios: list[int], solo: list[str], repeticiones: int | None) -> dict:
+    registro = _registro()
+    if solo:
+        registro = {nombre: fn for nombre, fn in registro.items()
+                    if nombre in solo or nombre.split('.', 1)[0] in solo}
+
+    resultados = []
+    for n in tamanios:
+        for nombre, fn in registro.items():
+            print(f"[BENCH] {nombre} n={n}", flush=True)
+            try:
+                r = fn(n, repeticiones or entorno.repeticiones_para(n))
+            except Exception as e:
+                r = {'error': f'{type(e).__name__}: {e}'}
+            resultados.append({'benchmark': nombre, 'tamanio': n, **r})
+            print(f"[BENCH] {nombre} n={n} -> {r.get('segundos', r.get('omitido', r.get('error')))}", flush=True)
+
+    from src.afip_xml import BACKEND
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        **_commit(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'xml_backend': BACKEND,
+        'tamanios': tamanios,
+        'resultados': resultados,
+    }
+
+
+def comparar(actual: dict, base: dict, umbral: float) -> list[str]:
+    """Regresiones de `actual` contra `base` (mismo benchmark y tamaño) por encima de umbral."""
+    previos = {(r['benchmark'], r['tamanio']): r for r in base.get('resultados', [])}
+    regresiones = []
+    for r in actual['resultados']:
+        anterior = previos.get((r['benchmark'], r['tamanio']))
+        if not anterior:
+            continue
+        for metrica in METRICAS:
+            nuevo, viejo = r.get(metrica), anterior.get(metrica)
+            if not isinstance(nuevo, (int, float)) or not isinstance(viejo, (int, float)) or viejo <= 0:
+                continue
+            cambio = nuevo / viejo - 1
+            linea = f"{r['benchmark']} n={r['tamanio']} {metrica}: {viejo:.4g} -> {nuevo:.4g} ({cambio:+.1%})"
+            print(linea, file=sys.stderr)
+            if cambio > umbral:
+                regresiones.append(linea)
+    return regresiones
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmarks de InfoFiscal contra el simulador AFIP')
+    parser.add_argument('--tamanios', default=','.join(map(str, TAMANIOS)),
+                        help='Cantidades de comprobantes separadas por coma')
+    parser.add_argument('--solo', default='', help='Benchmarks o grupos (parseo, resumen...) separados por coma')
+    parser.add_argument('--repeticiones', type=int, help='Fija las repeticiones (default: según tamaño)')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (default: stdout)')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--umbral', type=float, default=0.10, help='Regresión tolerada (0.10 = 10%%)')
+    args = parser.parse_args(argv)
+
+    entorno.preparar()
+    tamanios = [int(t) for t in args.tamanios.split(',') if t.strip()]
+    solo = [s.strip() for s in args.solo.split(',') if s.strip()]
+
+    # Los clientes loguean con print: a stderr, stdout queda para el JSON
+    with redirect_stdout(sys.stderr):
+        informe = correr(tamanios, solo, args.repeticiones)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False, default=str)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+        print(f"[BENCH] resultados en {args.salida}", file=sys.stderr)
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        regresiones = comparar(informe, base, args.umbral)
+        if regresiones:
+            print(f"[BENCH] {len(regresiones)} regresiones por encima de {args.umbral:.0%}:", file=sys.stderr)
+            for linea in regresiones:
+                print(f"  {linea}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
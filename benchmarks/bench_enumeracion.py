@@ -0,0 +1,85 @@
+# benchmarks/bench_enumeracion.py
+# Enumeración WSFEv1 contra el simulador: consulta completa y búsqueda de rango por fecha.
+
+from __future__ import annotations
+
+import math
+
+from benchmarks.entorno import (CUIT_CLIENTE, CUIT_SOLICITANTE, FECHA_DESDE, FECHA_HASTA,
+                                certificado_prueba, config_dataset, credenciales, medir, simulador)
+
+# Ventanas de fecha sobre un dataset que cubre todo 2025
+VENTANAS = {
+    'dia':   ('20250615', '20250615'),
+    'mes':   ('20250601', '20250630'),
+    'anio':  (FECHA_DESDE, FECHA_HASTA),
+    'fuera': ('20260101', '20260131'),
+}
+
+
+def bench_consultar_wsfev1_interno(n: int, repeticiones: int) -> dict:
+    """consultar_wsfev1_interno de punta a punta (sin estudio: sin store ni PostgreSQL)."""
+    import src.afip_credentials as afip_credentials
+    from src.consultas import consultar_wsfev1_interno
+
+    with simulador(config_dataset(n)) as sim:
+        original = afip_credentials.get_afip_credentials
+        afip_credentials.get_afip_credentials = lambda estudio_id=None: credenciales()
+        antes = sim.contadores.copy()
+        try:
+            m = medir(lambda: consultar_wsfev1_interno(CUIT_CLIENTE, FECHA_DESDE, FECHA_HASTA),
+                      repeticiones)
+        finally:
+            afip_credentials.get_afip_credentials = original
+        operaciones = sim.contadores - antes
+
+    resultado = m.pop('resultado')
+    corridas = m['corridas']
+    encontrados = len(resultado.get('facturas', []))
+    salida = {
+        'comprobantes': encontrados,
+        **m,
+        'us_por_comprobante': round(m['segundos'] * 1e6 / encontrados, 1) if encontrados else None,
+        'soap_por_consulta': {op.split(':', 1)[1]: cantidad // corridas
+                              for op, cantidad in sorted(operaciones.items()) if op.startswith('op:')},
+    }
+    if resultado.get('error'):
+        salida['error'] = resultado['error']
+    return salida
+
+
+def bench_buscar_rango_por_fecha(n: int, repeticiones: int) -> dict:
+    """Llamadas SOAP de buscar_rango_por_fecha sobre un único stream de n comprobantes."""
+    from wsfev1_client import WSFEv1Client
+
+    cert_path, key_path = certificado_prueba()
+    with simulador(config_dataset(n, tipos=[1], puntos_venta=[1])) as sim:
+        client = WSFEv1Client(cert_path, key_path, solicitante_cuit=CUIT_SOLICITANTE)
+        ultimo = client.obtener_ultimo_comprobante(CUIT_CLIENTE, 1, 1)
+
+        ventanas = {}
+        for nombre, (desde, hasta) in VENTANAS.items():
+            antes = sim.contadores['op:FECompConsultar']
+            m = medir(lambda: client.buscar_rango_por_fecha(CUIT_CLIENTE, 1, 1, ultimo, desde, hasta),
+                      repeticiones)
+            rango = m.pop('resultado')
+            ventanas[nombre] = {
+                'llamadas_soap': (sim.contadores['op:FECompConsultar'] - antes) // m['corridas'],
+                'rango': list(rango) if rango else None,
+                **m,
+            }
+
+    return {
+        'comprobantes': ultimo,
+        'segundos': sum(v['segundos'] for v in ventanas.values()),
+        'llamadas_soap': sum(v['llamadas_soap'] for v in ventanas.values()),
+        # referencia: dos búsquedas binarias por ventana
+        'llamadas_binaria': 2 * math.ceil(math.log2(ultimo + 1)) * len(VENTANAS) if ultimo else 0,
+        'ventanas': ventanas,
+    }
+
+
+BENCHMARKS = {
+    'enumeracion.consultar_wsfev1_interno': bench_consultar_wsfev1_interno,
+    'enumeracion.buscar_rango_por_fecha': bench_buscar_rango_por_fecha,
+}
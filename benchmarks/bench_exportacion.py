@@ -0,0 +1,35 @@
+# benchmarks/bench_exportacion.py
+# Export JSON + CSV de una consulta (src/exportacion.py).
+
+from __future__ import annotations
+
+import os
+
+from benchmarks.entorno import (CUIT_CLIENTE, FECHA_DESDE, FECHA_HASTA, directorio_temporal,
+                                facturas_sinteticas, medir)
+
+
+def bench_guardar_facturas(n: int, repeticiones: int) -> dict:
+    from src.exportacion import guardar_facturas
+
+    facturas = facturas_sinteticas(n)
+    destino = directorio_temporal('exportacion')
+    m = medir(lambda: guardar_facturas(CUIT_CLIENTE, facturas, 'WSFEv1 (benchmark)', sufijo='emitidos',
+                                       fecha_desde=FECHA_DESDE, fecha_hasta=FECHA_HASTA,
+                                       directorio=destino),
+              repeticiones)
+    archivos = m.pop('resultado')
+    if not archivos:
+        return {'comprobantes': len(facturas), **m, 'error': 'guardar_facturas devolvió None'}
+    return {
+        'comprobantes': len(facturas),
+        **m,
+        'us_por_comprobante': round(m['segundos'] * 1e6 / len(facturas), 2),
+        'bytes_json': os.path.getsize(archivos['json']),
+        'bytes_csv': os.path.getsize(archivos['csv']),
+    }
+
+
+BENCHMARKS = {
+    'exportacion.guardar_facturas': bench_guardar_facturas,
+}
@@ -0,0 +1,49 @@
+# benchmarks/bench_parseo.py
+# Parseo de FECompConsultar en WSFEv1Client.consultar_comprobante, sin red.
+
+from __future__ import annotations
+
+import itertools
+
+from benchmarks.entorno import CUIT_CLIENTE, claves_dataset, cliente_sin_red, config_dataset, medir, simulador
+
+# Respuestas distintas pre-armadas; se reciclan para tamaños mayores (el parseo
+# no cachea nada por contenido, así no se mide la generación del simulador)
+MAX_RESPUESTAS = 5_000
+
+
+def bench_consultar_comprobante(n: int, repeticiones: int) -> dict:
+    from src.afip_xml import BACKEND
+
+    with simulador(config_dataset(min(n, MAX_RESPUESTAS))) as sim:
+        client = cliente_sin_red(sim)
+        generar = client._wsfe_request
+        claves = claves_dataset(sim, MAX_RESPUESTAS)
+        respuestas = [generar('FECompConsultar', {'tipo_comprobante': t, 'punto_venta': pv, 'numero': num},
+                              'token', 'sign', CUIT_CLIENTE)
+                      for t, pv, num in claves]
+
+    consultas = list(itertools.islice(itertools.cycle(zip(claves, respuestas)), n))
+
+    def _correr():
+        encontrados = 0
+        for (tipo, pv, num), xml in consultas:
+            client._wsfe_request = lambda *args, _xml=xml: _xml
+            if client.consultar_comprobante(CUIT_CLIENTE, tipo, pv, num):
+                encontrados += 1
+        return encontrados
+
+    m = medir(_correr, repeticiones)
+    encontrados = m.pop('resultado')
+    return {
+        'comprobantes': encontrados,
+        **m,
+        'us_por_comprobante': round(m['segundos'] * 1e6 / n, 1),
+        'xml_backend': BACKEND,
+        'bytes_respuesta_prom': sum(map(len, respuestas)) // len(respuestas),
+    }
+
+
+BENCHMARKS = {
+    'parseo.consultar_comprobante': bench_consultar_comprobante,
+}
@@ -0,0 +1,26 @@
+# benchmarks/bench_resumen.py
+# Agregación por tipo + impositiva de la consulta unificada (src/resumen_fiscal.py).
+
+from __future__ import annotations
+
+from benchmarks.entorno import facturas_sinteticas, medir
+
+
+def bench_resumir_comprobantes(n: int, repeticiones: int) -> dict:
+    from src.resumen_fiscal import resumir_comprobantes
+
+    facturas = facturas_sinteticas(n)
+    m = medir(lambda: resumir_comprobantes(facturas), repeticiones)
+    resumen = m.pop('resultado')
+    return {
+        'comprobantes': len(facturas),
+        **m,
+        'us_por_comprobante': round(m['segundos'] * 1e6 / len(facturas), 2),
+        'total': round(resumen['resumen_impositivo']['total'], 2),
+        'tipos': len(resumen['resumen_por_tipo']),
+    }
+
+
+BENCHMARKS = {
+    'resumen.resumir_comprobantes': bench_resumir_comprobantes,
+}
@@ -0,0 +1,215 @@
+# benchmarks/entorno.py
+# Preparación común: variables de entorno, simulador AFIP, certificado de prueba,
+# comprobantes sintéticos y medición.
+
+from __future__ import annotations
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+CUIT_SOLICITANTE = '20111111112'
+CUIT_CLIENTE = '30222222223'
+FECHA_DESDE = '20250101'
+FECHA_HASTA = '20251231'
+
+# Streams del dataset de enumeración: 4 tipos × 2 PVs
+TIPOS_WSFE = [1, 3, 6, 11]
+PUNTOS_VENTA = [1, 2]
+
+_TMP = Path(tempfile.mkdtemp(prefix='infofiscal_bench_'))
+_facturas_cache: dict[int, list] = {}
+
+
+def preparar() -> None:
+    """Variables de entorno antes de importar cualquier módulo de src/.
+
+    - Sin limitar el ritmo contra el simulador (AFIP_RPS/AFIP_BURST): se mide el
+      cliente, no el token bucket.
+    - Cache de TA en un directorio temporal propio.
+    - DATABASE_URL/SECRET_KEY solo si faltan (src/config.py los exige; los
+      benchmarks que no usan DB no se conectan).
+    """
+    for ruta in (RAIZ, RAIZ / 'tests_y_pruebas'):
+        if str(ruta) not in sys.path:
+            sys.path.insert(0, str(ruta))
+    os.environ.setdefault('AFIP_RPS', '1000000')
+    os.environ.setdefault('AFIP_BURST', '1000000')
+    os.environ['WSAA_CACHE_DIR'] = str(_TMP / 'wsaa')
+    os.environ.setdefault('DATABASE_URL', 'postgresql://localhost/infofiscal_bench')
+    os.environ.setdefault('SECRET_KEY', 'benchmarks')
+
+
+def certificado_prueba() -> tuple[str, str]:
+    """(cert_path, key_path) autofirmados con SERIALNUMBER 'CUIT <solicitante>'."""
+    cert_path, key_path = _TMP / 'bench.crt', _TMP / 'bench.key'
+    if cert_path.exists():
+        return str(cert_path), str(key_path)
+
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    clave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    nombre = x509.Name([
+        x509.NameAttribute(NameOID.COMMON_NAME, 'infofiscal-bench'),
+        x509.NameAttribute(NameOID.SERIAL_NUMBER, f'CUIT {CUIT_SOLICITANTE}'),
+    ])
+    ahora = datetime.now(timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(nombre).issuer_name(nombre)
+            .public_key(clave.public_key()).serial_number(x509.random_serial_number())
+            .not_valid_before(ahora - timedelta(days=1)).not_valid_after(ahora + timedelta(days=30))
+            .sign(clave, hashes.SHA256()))
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(clave.private_bytes(serialization.Encoding.PEM,
+                                             serialization.PrivateFormat.TraditionalOpenSSL,
+                                             serialization.NoEncryption()))
+    return str(cert_path), str(key_path)
+
+
+def credenciales() -> dict:
+    """Mismo formato que src.afip_credentials.get_afip_credentials()."""
+    cert_path, key_path = certificado_prueba()
+    return {
+        'solicitante_cuit': CUIT_SOLICITANTE,
+        'cert_path': cert_path,
+        'key_path': key_path,
+        'ambiente': 'prod',
+        'portal_cuit': '',
+        'portal_password': '',
+    }
+
+
+def config_dataset(n: int, tipos=None, puntos_venta=None) -> dict:
+    """Config del simulador con ~n comprobantes repartidos en los streams pedidos."""
+    tipos = tipos or TIPOS_WSFE
+    puntos_venta = puntos_venta or PUNTOS_VENTA
+    por_stream = max(1, -(-n // (len(tipos) * len(puntos_venta))))
+    return {
+        'cuits': [CUIT_CLIENTE],
+        'puntos_venta': puntos_venta,
+        'tipos': {'wsfe': tipos},
+        'cantidad_min': por_stream,
+        'cantidad_max': por_stream,
+        'prob_stream_vacio': 0.0,
+        'fecha_desde': '2025-01-01',
+        'fecha_hasta': '2025-12-31',
+    }
+
+
+@contextmanager
+def simulador(config: dict):
+    """Simulador AFIP en proceso; AFIP_URL_BASE apunta a él mientras dura."""
+    from simulador_afip import SimuladorAFIP
+
+    sim = SimuladorAFIP(config).iniciar()
+    anterior = os.environ.get('AFIP_URL_BASE')
+    os.environ['AFIP_URL_BASE'] = sim.url
+    try:
+        yield sim
+    finally:
+        sim.detener()
+        if anterior is None:
+            os.environ.pop('AFIP_URL_BASE', None)
+        else:
+            os.environ['AFIP_URL_BASE'] = anterior
+
+
+def cliente_sin_red(sim):
+    """WSFEv1Client cuyas respuestas salen directo del simulador (sin HTTP ni WSAA).
+
+    Para medir solo parseo y armado de dicts de consultar_comprobante.
+    """
+    from wsfev1_client import WSFEv1Client
+
+    cert_path, key_path = certificado_prueba()
+    client = WSFEv1Client(cert_path, key_path, solicitante_cuit=CUIT_SOLICITANTE)
+    client.autenticar_wsaa = lambda cuit=None: ('token', 'sign')
+
+    def _wsfe_request(method, params, token, sign, cuit):
+        campos = {'Cuit': cuit, 'PtoVta': params['punto_venta'],
+                  'CbteTipo': params['tipo_comprobante'], 'CbteNro': params.get('numero', 0)}
+        return getattr(sim.operaciones, method)({k: str(v) for k, v in campos.items()}, None)
+
+    client._wsfe_request = _wsfe_request
+    return client
+
+
+def claves_dataset(sim, n: int) -> list[tuple[int, int, int]]:
+    """Primeras n claves (tipo, pv, numero) existentes en el dataset del simulador."""
+    claves = []
+    for tipo in sim.config['tipos']['wsfe']:
+        for pv in sim.config['puntos_venta']:
+            ultimo = sim.dataset.ultimo('wsfe', CUIT_CLIENTE, pv, tipo)
+            claves.extend((tipo, pv, num) for num in range(1, ultimo + 1))
+    return claves[:n]
+
+
+def facturas_sinteticas(n: int) -> list:
+    """n comprobantes con la forma que devuelve consultar_wsfev1_interno.
+
+    Parseados por WSFEv1Client desde XML del simulador y enriquecidos como en la
+    app; se generan una vez por tamaño y se reutilizan entre benchmarks.
+    """
+    if n in _facturas_cache:
+        return _facturas_cache[n]
+
+    from src.comprobantes_store import enriquecer_comprobante
+
+    with simulador(config_dataset(n)) as sim:
+        client = cliente_sin_red(sim)
+        facturas = []
+        for tipo, pv, num in claves_dataset(sim, n):
+            comp = client.consultar_comprobante(CUIT_CLIENTE, tipo, pv, num)
+            tipo_desc = client.tipos_comprobante.get(tipo, f'Tipo {tipo}')
+            facturas.append(enriquecer_comprobante(comp, CUIT_CLIENTE, tipo, pv, num, tipo_desc))
+
+    _facturas_cache.clear()   # un tamaño a la vez: 100k comprobantes pesan
+    _facturas_cache[n] = facturas
+    return facturas
+
+
+def directorio_temporal(nombre: str) -> Path:
+    ruta = _TMP / nombre
+    ruta.mkdir(parents=True, exist_ok=True)
+    return ruta
+
+
+def repeticiones_para(n: int) -> int:
+    """Más repeticiones en tamaños chicos, donde el ruido pesa más."""
+    if n <= 1_000:
+        return 5
+    if n <= 10_000:
+        return 3
+    return 1
+
+
+def medir(funcion, repeticiones: int) -> dict:
+    """Ejecutar `funcion` `repeticiones` veces. Retorna tiempos + el último resultado.
+
+    Con más de una repetición se hace antes una corrida sin medir (imports, caches).
+    """
+    if repeticiones > 1:
+        funcion()
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        'segundos': min(tiempos),
+        'mediana_s': statistics.median(tiempos),
+        'repeticiones': repeticiones,
+        'corridas': repeticiones + (repeticiones > 1),   # con el calentamiento
+        'resultado': resultado,
+    }
@@ -0,0 +1,81 @@
+-- migrations/005_comprobantes.sql
+-- Store persistente de comprobantes AFIP por estudio + estado de sincronización.
+--
+-- Cambios:
+--   1. comprobantes: un registro por (estudio_id, cuit, tipo, pv, numero).
+--      datos JSONB guarda el dict completo que arma WSFEv1Client.consultar_comprobante.
+--   2. comprobantes_sync: por cada stream (cuit, tipo, pv) el rango de números ya
+--      descargado. El sync incremental solo le pide a AFIP lo que está fuera del rango.
+--   3. RLS en ambas tablas (mismo esquema que 004_rls_policies.sql).
+--
+-- Un comprobante con CAE es inmutable en AFIP: una vez guardado no se vuelve a descargar.
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- COMPROBANTES
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS comprobantes (
+    estudio_id      INTEGER      NOT NULL REFERENCES estudios(id) ON DELETE RESTRICT,
+    -- CUIT del emisor consultado (cliente del estudio), solo dígitos
+    cuit            TEXT         NOT NULL,
+    tipo            INTEGER      NOT NULL,
+    pv              INTEGER      NOT NULL,
+    numero          BIGINT       NOT NULL,
+    -- Columnas desnormalizadas para filtrar sin tocar el JSONB
+    fecha           DATE,                       -- CbteFch
+    importe_total   NUMERIC(18, 2),             -- ImpTotal
+    cae             TEXT,
+    datos           JSONB        NOT NULL,
+    created_at      TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+    updated_at      TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (estudio_id, cuit, tipo, pv, numero)
+);
+
+-- Consulta por rango de fechas (path crítico de /consultar-facturas-unificada)
+CREATE INDEX IF NOT EXISTS idx_comprobantes_cuit_fecha
+    ON comprobantes (estudio_id, cuit, fecha);
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- COMPROBANTES_SYNC — estado del sync incremental por stream (cuit, tipo, pv)
+--
+-- Invariante: están guardados todos los números en [numero_desde, numero_hasta].
+-- cubierto_desde: todo comprobante con fecha >= cubierto_desde y número
+--   <= numero_hasta está guardado. NULL = sin garantía por fecha (solo
+--   se bajaron los últimos N). Si numero_desde = 1 la historia está completa.
+-- Stream vacío (FECompUltimoAutorizado = 0): numero_desde = 1, numero_hasta = 0.
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS comprobantes_sync (
+    estudio_id       INTEGER      NOT NULL REFERENCES estudios(id) ON DELETE RESTRICT,
+    cuit             TEXT         NOT NULL,
+    tipo             INTEGER      NOT NULL,
+    pv               INTEGER      NOT NULL,
+    numero_desde     BIGINT       NOT NULL,
+    numero_hasta     BIGINT       NOT NULL,
+    cubierto_desde   DATE,
+    sincronizado_at  TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (estudio_id, cuit, tipo, pv)
+);
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- RLS
+-- ══════════════════════════════════════════════════════════════════════════════
+ALTER TABLE comprobantes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE comprobantes FORCE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tenant_isolation_comprobantes ON comprobantes;
+CREATE POLICY tenant_isolation_comprobantes ON comprobantes
+    USING (
+        current_estudio_id() IS NULL
+        OR estudio_id = current_estudio_id()
+    );
+
+ALTER TABLE comprobantes_sync ENABLE ROW LEVEL SECURITY;
+ALTER TABLE comprobantes_sync FORCE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tenant_isolation_comprobantes_sync ON comprobantes_sync;
+CREATE POLICY tenant_isolation_comprobantes_sync ON comprobantes_sync
+    USING (
+        current_estudio_id() IS NULL
+        OR estudio_id = current_estudio_id()
+    );
@@ -0,0 +1,28 @@
+-- migrations/006_wsaa_tickets.sql
+-- Cache compartido de tickets de acceso WSAA (TA) entre workers y reinicios.
+--
+-- Cambios:
+--   1. wsaa_tickets: un TA vigente por (solicitante, service, ambiente).
+--      Lo usan WSFEv1Client, WSFEXv1Client, WSMTXCAClient y ARCAServiceSimple
+--      a través de src/wsaa_ticket_cache.py.
+--
+-- Un TA dura 12 h y AFIP rechaza un loginCms nuevo mientras haya uno vigente
+-- ("El CEE ya posee un TA valido para el acceso al WSN solicitado"): por eso el
+-- ticket tiene que sobrevivir al proceso que lo pidió.
+--
+-- Sin RLS: el TA pertenece al certificado (solicitante), no a un estudio.
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- WSAA_TICKETS
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS wsaa_tickets (
+    solicitante   TEXT         NOT NULL,   -- CUIT del certificado (solo dígitos)
+    service       TEXT         NOT NULL,   -- wsfe | wsfex | wsmtxca | ...
+    ambiente      TEXT         NOT NULL,   -- prod | homo
+    token         TEXT         NOT NULL,
+    sign          TEXT         NOT NULL,
+    expires_at    TIMESTAMPTZ  NOT NULL,
+    created_at    TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (solicitante, service, ambiente)
+);
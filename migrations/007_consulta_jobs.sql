@@ -0,0 +1,57 @@
+-- migrations/007_consulta_jobs.sql
+-- Cola de jobs para consultas largas (WS + RCEL + export) fuera del request HTTP.
+--
+-- Cambios:
+--   1. consulta_jobs: un registro por consulta encolada. La ruta web inserta
+--      el job y devuelve el id; scripts/worker_consultas.py lo procesa.
+--   2. RLS (mismo esquema que 004_rls_policies.sql).
+--
+-- Estados: pendiente → en_curso → ok | error
+-- Los workers toman jobs con SELECT ... FOR UPDATE SKIP LOCKED (sin doble toma).
+-- heartbeat_at se actualiza con cada avance: un job en_curso sin heartbeat
+-- reciente es de un worker caído y se vuelve a encolar (ver src/jobs.py).
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- CONSULTA_JOBS
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS consulta_jobs (
+    id            BIGSERIAL    PRIMARY KEY,
+    estudio_id    INTEGER      NOT NULL REFERENCES estudios(id) ON DELETE RESTRICT,
+    usuario_id    INTEGER      REFERENCES usuarios(id) ON DELETE SET NULL,
+    tipo          TEXT         NOT NULL,            -- handler del worker (p. ej. consulta_unificada)
+    parametros    JSONB        NOT NULL DEFAULT '{}',
+    estado        TEXT         NOT NULL DEFAULT 'pendiente'
+                  CHECK (estado IN ('pendiente', 'en_curso', 'ok', 'error')),
+    progreso      TEXT,                             -- último mensaje de avance (para la UI)
+    resultado     JSONB,
+    error         TEXT,
+    intentos      INTEGER      NOT NULL DEFAULT 0,
+    worker        TEXT,                             -- host:pid del worker que lo tomó
+    created_at    TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+    started_at    TIMESTAMPTZ,
+    heartbeat_at  TIMESTAMPTZ,
+    finished_at   TIMESTAMPTZ
+);
+
+-- Toma de jobs por los workers (solo pendientes, FIFO)
+CREATE INDEX IF NOT EXISTS idx_consulta_jobs_pendientes
+    ON consulta_jobs (created_at)
+    WHERE estado = 'pendiente';
+
+-- Detección de jobs huérfanos (worker caído)
+CREATE INDEX IF NOT EXISTS idx_consulta_jobs_en_curso
+    ON consulta_jobs (heartbeat_at)
+    WHERE estado = 'en_curso';
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- RLS
+-- ══════════════════════════════════════════════════════════════════════════════
+ALTER TABLE consulta_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE consulta_jobs FORCE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tenant_isolation_consulta_jobs ON consulta_jobs;
+CREATE POLICY tenant_isolation_consulta_jobs ON consulta_jobs
+    USING (
+        current_estudio_id() IS NULL
+        OR estudio_id = current_estudio_id()
+    );
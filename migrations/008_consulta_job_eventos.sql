@@ -0,0 +1,41 @@
+-- migrations/008_consulta_job_eventos.sql
+-- Eventos de avance de un job de consulta (resultados parciales en vivo).
+--
+-- Cambios:
+--   1. consulta_job_eventos: log append-only por job. El worker publica un
+--      evento por stream (tipo, PV) resuelto y por comprobante descargado;
+--      /consultas/<id>/eventos los transmite por Server-Sent Events.
+--   2. RLS (mismo esquema que 004_rls_policies.sql).
+--
+-- El id (BIGSERIAL) es el cursor del stream SSE: el navegador reconecta con
+-- Last-Event-ID y se retoma desde ahí sin perder ni repetir eventos.
+-- Los eventos se borran junto con el job (ON DELETE CASCADE).
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- CONSULTA_JOB_EVENTOS
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS consulta_job_eventos (
+    id          BIGSERIAL    PRIMARY KEY,
+    job_id      BIGINT       NOT NULL REFERENCES consulta_jobs(id) ON DELETE CASCADE,
+    estudio_id  INTEGER      NOT NULL REFERENCES estudios(id) ON DELETE RESTRICT,
+    tipo        TEXT         NOT NULL,            -- stream | comprobante
+    datos       JSONB        NOT NULL DEFAULT '{}',
+    created_at  TIMESTAMPTZ  NOT NULL DEFAULT NOW()
+);
+
+-- Lectura incremental del stream SSE: WHERE job_id = ? AND id > ? ORDER BY id
+CREATE INDEX IF NOT EXISTS idx_consulta_job_eventos_job
+    ON consulta_job_eventos (job_id, id);
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- RLS
+-- ══════════════════════════════════════════════════════════════════════════════
+ALTER TABLE consulta_job_eventos ENABLE ROW LEVEL SECURITY;
+ALTER TABLE consulta_job_eventos FORCE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tenant_isolation_consulta_job_eventos ON consulta_job_eventos;
+CREATE POLICY tenant_isolation_consulta_job_eventos ON consulta_job_eventos
+    USING (
+        current_estudio_id() IS NULL
+        OR estudio_id = current_estudio_id()
+    );
@@ -0,0 +1,35 @@
+-- migrations/009_afip_health.sql
+-- Historial de disponibilidad y latencia de los web services AFIP.
+--
+-- Cambios:
+--   1. afip_health_checks: un registro por sondeo y servicio (WSFEv1, WSMTXCA,
+--      WSFEXv1). Lo escribe el monitor en background de src/afip_monitor.py
+--      (una vez por intervalo aunque haya varios workers) y lo lee
+--      /admin/health para mostrar uptime y latencia por período.
+--
+-- Los registros más viejos que AFIP_MONITOR_RETENCION_DIAS los borra el mismo
+-- monitor.
+--
+-- Sin RLS: el estado de AFIP es global, no pertenece a un estudio.
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- AFIP_HEALTH_CHECKS
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS afip_health_checks (
+    id           BIGSERIAL    PRIMARY KEY,
+    servicio     TEXT         NOT NULL,            -- WSFEv1 | WSMTXCA | WSFEXv1
+    online       BOOLEAN      NOT NULL,
+    status_http  INTEGER,                          -- NULL si no hubo respuesta
+    latencia_ms  INTEGER,                          -- NULL si no hubo respuesta
+    error        TEXT,
+    checked_at   TIMESTAMPTZ  NOT NULL DEFAULT NOW()
+);
+
+-- Último estado por servicio y agregados por período:
+-- WHERE servicio = ? AND checked_at > ? ORDER BY checked_at DESC
+CREATE INDEX IF NOT EXISTS idx_afip_health_checks_servicio
+    ON afip_health_checks (servicio, checked_at DESC);
+
+-- Purga por antigüedad
+CREATE INDEX IF NOT EXISTS idx_afip_health_checks_checked_at
+    ON afip_health_checks (checked_at);
@@ -0,0 +1,32 @@
+-- migrations/010_afip_parametros.sql
+-- Cache compartido de tablas de parámetros AFIP por CUIT.
+--
+-- Cambios:
+--   1. afip_parametros: respuesta ya parseada de FEParamGetPtosVenta,
+--      FEParamGetTiposCbte, FEParamGetTiposMonedas y FEParamGetTiposIva por
+--      (solicitante, cuit, ambiente, tabla). La usa src/afip_parametros.py:
+--      todos los workers reutilizan la misma respuesta mientras no venza
+--      (AFIP_PARAMETROS_TTL_H) o no se invalide a mano.
+--
+-- Estas tablas cambian muy de vez en cuando (un PV nuevo, una moneda):
+-- pedirlas en cada consulta era un round-trip SOAP antes de empezar.
+--
+-- Sin RLS: como wsaa_tickets, la clave es el certificado (solicitante).
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- AFIP_PARAMETROS
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS afip_parametros (
+    solicitante     TEXT         NOT NULL,   -- CUIT del certificado (solo dígitos)
+    cuit            TEXT         NOT NULL,   -- CUIT consultado (Auth/Cuit)
+    ambiente        TEXT         NOT NULL,   -- prod | homo
+    tabla           TEXT         NOT NULL,   -- ptos_venta | tipos_cbte | monedas | alicuotas_iva
+    datos           JSONB        NOT NULL,
+    actualizado_at  TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (solicitante, cuit, ambiente, tabla)
+);
+
+-- Invalidación por CUIT consultado (un cliente habilitó un PV nuevo)
+CREATE INDEX IF NOT EXISTS idx_afip_parametros_cuit
+    ON afip_parametros (cuit);
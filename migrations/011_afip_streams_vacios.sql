@@ -0,0 +1,28 @@
+-- migrations/011_afip_streams_vacios.sql
+-- Cache negativa de streams (tipo, PV) sin comprobantes.
+--
+-- Cambios:
+--   1. afip_streams_vacios: un registro por (cuit, ambiente, tipo, pv) para el
+--      que FECompUltimoAutorizado devolvió 0. Lo usa src/afip_streams_vacios.py:
+--      mientras el registro sea reciente la enumeración no vuelve a preguntar
+--      a AFIP por ese stream (la mayoría de los CUITs usa 1-3 de las ~30
+--      combinaciones que se recorren).
+--
+-- Un stream sale de la tabla apenas AFIP informa un número > 0. Los registros
+-- más viejos que AFIP_VACIOS_TTL_MIN se ignoran y se vuelven a verificar.
+--
+-- Sin RLS: que un stream esté vacío es un dato de AFIP sobre el CUIT, no de
+-- un estudio.
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- AFIP_STREAMS_VACIOS
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS afip_streams_vacios (
+    cuit           TEXT         NOT NULL,   -- CUIT consultado (solo dígitos)
+    ambiente       TEXT         NOT NULL,   -- prod | homo
+    tipo           INTEGER      NOT NULL,
+    pv             INTEGER      NOT NULL,
+    verificado_at  TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (cuit, ambiente, tipo, pv)
+);
@@ -0,0 +1,72 @@
+-- migrations/012_sesiones_notify.sql
+-- Avisos de invalidación de sesiones (LISTEN/NOTIFY) para el cache de
+-- src/auth/session_cache.py.
+--
+-- Cambios:
+--   1. notificar_sesiones(): triggers que hacen NOTIFY en el canal
+--      'sesiones_invalidadas' cuando algo deja de habilitar una sesión:
+--        - sesiones.revocada pasa a TRUE (logout)      -> 'sesion:<sha256 del token>'
+--        - usuarios.activo cambia o el usuario se borra -> 'usuario:<id>'
+--        - estudios.activo cambia                      -> 'estudio:<id>'
+--      Cada proceso Flask escucha el canal y descarta del cache las sesiones
+--      afectadas apenas el cambio se confirma (NOTIFY se entrega al COMMIT).
+--
+-- El payload lleva el hash del token, nunca el token: cualquier conexión a la
+-- DB puede hacer LISTEN.
+--
+-- Los triggers cubren cualquier escritor (rutas de la app, scripts, psql).
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- FUNCIÓN DE AVISO
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE OR REPLACE FUNCTION notificar_sesiones() RETURNS TRIGGER AS $$
+DECLARE
+    fila RECORD;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        fila := OLD;
+    ELSE
+        fila := NEW;
+    END IF;
+
+    IF TG_TABLE_NAME = 'sesiones' THEN
+        PERFORM pg_notify('sesiones_invalidadas',
+                          'sesion:' || encode(sha256(convert_to(fila.id, 'UTF8')), 'hex'));
+    ELSIF TG_TABLE_NAME = 'usuarios' THEN
+        PERFORM pg_notify('sesiones_invalidadas', 'usuario:' || fila.id);
+    ELSIF TG_TABLE_NAME = 'estudios' THEN
+        PERFORM pg_notify('sesiones_invalidadas', 'estudio:' || fila.id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- TRIGGERS
+-- ══════════════════════════════════════════════════════════════════════════════
+DROP TRIGGER IF EXISTS trg_sesiones_revocada ON sesiones;
+CREATE TRIGGER trg_sesiones_revocada
+    AFTER UPDATE OF revocada ON sesiones
+    FOR EACH ROW
+    WHEN (NEW.revocada AND NOT OLD.revocada)
+    EXECUTE FUNCTION notificar_sesiones();
+
+DROP TRIGGER IF EXISTS trg_usuarios_activo ON usuarios;
+CREATE TRIGGER trg_usuarios_activo
+    AFTER UPDATE OF activo ON usuarios
+    FOR EACH ROW
+    WHEN (NEW.activo IS DISTINCT FROM OLD.activo)
+    EXECUTE FUNCTION notificar_sesiones();
+
+DROP TRIGGER IF EXISTS trg_usuarios_borrado ON usuarios;
+CREATE TRIGGER trg_usuarios_borrado
+    AFTER DELETE ON usuarios
+    FOR EACH ROW
+    EXECUTE FUNCTION notificar_sesiones();
+
+DROP TRIGGER IF EXISTS trg_estudios_activo ON estudios;
+CREATE TRIGGER trg_estudios_activo
+    AFTER UPDATE OF activo ON estudios
+    FOR EACH ROW
+    WHEN (NEW.activo IS DISTINCT FROM OLD.activo)
+    EXECUTE FUNCTION notificar_sesiones();
@@ -0,0 +1,41 @@
+-- migrations/013_clientes_busqueda.sql
+-- Búsqueda de clientes indexada (typeahead de /clientes/sugerencias y /buscar-cliente).
+--
+-- Cambios:
+--   1. clientes.cuit_digitos: columna generada con el CUIT solo dígitos. La
+--      búsqueda por CUIT compara contra esta columna en vez de
+--      REPLACE(REPLACE(cuit, ...)), que no podía usar idx_clientes_cuit.
+--   2. pg_trgm + índices GIN de trigramas sobre LOWER(apellido) y
+--      LOWER(nombres): LIKE '%texto%' usa índice en vez de recorrer todos los
+--      clientes del estudio, y similarity() ordena los resultados.
+--   3. Índices de prefijo (text_pattern_ops) para CUIT y documento: el
+--      typeahead busca mientras se escribe ('2032%').
+--
+-- Términos de 1-2 letras no alcanzan para trigramas: el typeahead los busca
+-- por prefijo de apellido (idx_clientes_apellido, 002).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- CUIT NORMALIZADO
+-- ══════════════════════════════════════════════════════════════════════════════
+ALTER TABLE clientes
+    ADD COLUMN IF NOT EXISTS cuit_digitos TEXT
+    GENERATED ALWAYS AS (NULLIF(regexp_replace(cuit, '[^0-9]', '', 'g'), '')) STORED;
+
+-- Igualdad y prefijo por estudio
+CREATE INDEX IF NOT EXISTS idx_clientes_cuit_digitos
+    ON clientes (estudio_id, cuit_digitos text_pattern_ops)
+    WHERE cuit_digitos IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_clientes_nro_doc_prefijo
+    ON clientes (estudio_id, nro_documento text_pattern_ops);
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- TRIGRAMAS (apellido / nombres)
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE INDEX IF NOT EXISTS idx_clientes_apellido_trgm
+    ON clientes USING GIN (LOWER(apellido) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_clientes_nombres_trgm
+    ON clientes USING GIN (LOWER(nombres) gin_trgm_ops);
@@ -0,0 +1,231 @@
+-- migrations/014_estudio_contadores.sql
+-- Contadores por estudio para los paneles de superadmin (/admin, /admin/estudios).
+--
+-- Cambios:
+--   1. estudio_contadores: una fila por estudio con usuarios activos y
+--      clientes. Reemplaza el LEFT JOIN usuarios × clientes con
+--      COUNT(DISTINCT ...) de superadmin_panel.
+--   2. estudio_consultas_mes: una fila por (estudio, mes) con la cantidad de
+--      consultas y de comprobantes de consultas_log. Reemplaza la subquery
+--      correlacionada por estudio y el COUNT(*) del dashboard.
+--   3. Triggers AFTER por fila sobre usuarios, clientes, consultas_log y
+--      estudios que suman/restan en la misma transacción del cambio: los
+--      contadores se confirman (o se descartan) junto con la fila.
+--   4. recalcular_contadores(): reconstruye todo desde las tablas base. La
+--      migración la usa para el backfill; sirve para verificar o corregir a
+--      mano (SELECT recalcular_contadores();).
+--
+-- El mes de una consulta se toma en hora de Argentina (no depende del
+-- TimeZone de cada sesión): DATE_TRUNC('month', created_at AT TIME ZONE
+-- 'America/Argentina/Buenos_Aires').
+--
+-- Los superadmin (estudio_id NULL) no pertenecen a ningún estudio y no se
+-- cuentan, igual que antes.
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- TABLAS
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE TABLE IF NOT EXISTS estudio_contadores (
+    estudio_id        INTEGER      PRIMARY KEY REFERENCES estudios(id) ON DELETE CASCADE,
+    usuarios_activos  INTEGER      NOT NULL DEFAULT 0,
+    clientes          INTEGER      NOT NULL DEFAULT 0,
+    updated_at        TIMESTAMPTZ  NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS estudio_consultas_mes (
+    estudio_id    INTEGER      NOT NULL REFERENCES estudios(id) ON DELETE CASCADE,
+    mes           DATE         NOT NULL,   -- primer día del mes (hora Argentina)
+    consultas     INTEGER      NOT NULL DEFAULT 0,
+    comprobantes  BIGINT       NOT NULL DEFAULT 0,   -- SUM(consultas_log.cantidad)
+    updated_at    TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (estudio_id, mes)
+);
+
+-- Dashboard: total de la plataforma en el mes actual
+CREATE INDEX IF NOT EXISTS idx_estudio_consultas_mes_mes
+    ON estudio_consultas_mes (mes);
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- HELPERS
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE OR REPLACE FUNCTION mes_consulta(ts TIMESTAMPTZ) RETURNS DATE AS $$
+    SELECT DATE_TRUNC('month', ts AT TIME ZONE 'America/Argentina/Buenos_Aires')::DATE;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION sumar_contadores(p_estudio_id INTEGER,
+                                            p_usuarios INTEGER,
+                                            p_clientes INTEGER) RETURNS VOID AS $$
+BEGIN
+    IF p_estudio_id IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO estudio_contadores (estudio_id, usuarios_activos, clientes)
+    VALUES (p_estudio_id, p_usuarios, p_clientes)
+    ON CONFLICT (estudio_id) DO UPDATE
+        SET usuarios_activos = estudio_contadores.usuarios_activos + EXCLUDED.usuarios_activos,
+            clientes         = estudio_contadores.clientes + EXCLUDED.clientes,
+            updated_at       = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sumar_consultas_mes(p_estudio_id INTEGER,
+                                               p_creada TIMESTAMPTZ,
+                                               p_consultas INTEGER,
+                                               p_comprobantes BIGINT) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO estudio_consultas_mes (estudio_id, mes, consultas, comprobantes)
+    VALUES (p_estudio_id, mes_consulta(p_creada), p_consultas, p_comprobantes)
+    ON CONFLICT (estudio_id, mes) DO UPDATE
+        SET consultas    = estudio_consultas_mes.consultas + EXCLUDED.consultas,
+            comprobantes = estudio_consultas_mes.comprobantes + EXCLUDED.comprobantes,
+            updated_at   = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- FUNCIONES DE TRIGGER
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE OR REPLACE FUNCTION contar_usuarios() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.activo THEN
+        PERFORM sumar_contadores(OLD.estudio_id, -1, 0);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.activo THEN
+        PERFORM sumar_contadores(NEW.estudio_id, 1, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION contar_clientes() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM sumar_contadores(OLD.estudio_id, 0, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM sumar_contadores(NEW.estudio_id, 0, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION contar_consultas() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM sumar_consultas_mes(OLD.estudio_id, OLD.created_at, -1, -OLD.cantidad);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM sumar_consultas_mes(NEW.estudio_id, NEW.created_at, 1, NEW.cantidad);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Estudio nuevo: fila en cero para que los paneles no dependan del LEFT JOIN
+CREATE OR REPLACE FUNCTION crear_contadores_estudio() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM sumar_contadores(NEW.id, 0, 0);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- TRIGGERS
+-- ══════════════════════════════════════════════════════════════════════════════
+DROP TRIGGER IF EXISTS trg_usuarios_contador ON usuarios;
+CREATE TRIGGER trg_usuarios_contador
+    AFTER INSERT OR DELETE ON usuarios
+    FOR EACH ROW
+    EXECUTE FUNCTION contar_usuarios();
+
+DROP TRIGGER IF EXISTS trg_usuarios_contador_upd ON usuarios;
+CREATE TRIGGER trg_usuarios_contador_upd
+    AFTER UPDATE OF activo, estudio_id ON usuarios
+    FOR EACH ROW
+    WHEN (NEW.activo IS DISTINCT FROM OLD.activo
+          OR NEW.estudio_id IS DISTINCT FROM OLD.estudio_id)
+    EXECUTE FUNCTION contar_usuarios();
+
+DROP TRIGGER IF EXISTS trg_clientes_contador ON clientes;
+CREATE TRIGGER trg_clientes_contador
+    AFTER INSERT OR DELETE ON clientes
+    FOR EACH ROW
+    EXECUTE FUNCTION contar_clientes();
+
+DROP TRIGGER IF EXISTS trg_clientes_contador_upd ON clientes;
+CREATE TRIGGER trg_clientes_contador_upd
+    AFTER UPDATE OF estudio_id ON clientes
+    FOR EACH ROW
+    WHEN (NEW.estudio_id IS DISTINCT FROM OLD.estudio_id)
+    EXECUTE FUNCTION contar_clientes();
+
+DROP TRIGGER IF EXISTS trg_consultas_log_contador ON consultas_log;
+CREATE TRIGGER trg_consultas_log_contador
+    AFTER INSERT OR DELETE ON consultas_log
+    FOR EACH ROW
+    EXECUTE FUNCTION contar_consultas();
+
+DROP TRIGGER IF EXISTS trg_consultas_log_contador_upd ON consultas_log;
+CREATE TRIGGER trg_consultas_log_contador_upd
+    AFTER UPDATE OF estudio_id, created_at, cantidad ON consultas_log
+    FOR EACH ROW
+    WHEN (NEW.estudio_id IS DISTINCT FROM OLD.estudio_id
+          OR NEW.created_at IS DISTINCT FROM OLD.created_at
+          OR NEW.cantidad IS DISTINCT FROM OLD.cantidad)
+    EXECUTE FUNCTION contar_consultas();
+
+DROP TRIGGER IF EXISTS trg_estudios_contador ON estudios;
+CREATE TRIGGER trg_estudios_contador
+    AFTER INSERT ON estudios
+    FOR EACH ROW
+    EXECUTE FUNCTION crear_contadores_estudio();
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- RECÁLCULO / BACKFILL
+-- ══════════════════════════════════════════════════════════════════════════════
+CREATE OR REPLACE FUNCTION recalcular_contadores() RETURNS VOID AS $$
+BEGIN
+    -- Bloquear escrituras mientras se recalcula: un INSERT concurrente
+    -- sumaría sobre una fila que se está reemplazando
+    LOCK TABLE estudios, usuarios, clientes, consultas_log IN SHARE MODE;
+
+    DELETE FROM estudio_contadores;
+    INSERT INTO estudio_contadores (estudio_id, usuarios_activos, clientes)
+    SELECT e.id,
+           (SELECT COUNT(*) FROM usuarios u WHERE u.estudio_id = e.id AND u.activo),
+           (SELECT COUNT(*) FROM clientes c WHERE c.estudio_id = e.id)
+    FROM estudios e;
+
+    DELETE FROM estudio_consultas_mes;
+    INSERT INTO estudio_consultas_mes (estudio_id, mes, consultas, comprobantes)
+    SELECT estudio_id, mes_consulta(created_at), COUNT(*), COALESCE(SUM(cantidad), 0)
+    FROM consultas_log
+    GROUP BY estudio_id, mes_consulta(created_at);
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT recalcular_contadores();
+
+-- ══════════════════════════════════════════════════════════════════════════════
+-- RLS
+-- ══════════════════════════════════════════════════════════════════════════════
+ALTER TABLE estudio_contadores ENABLE ROW LEVEL SECURITY;
+ALTER TABLE estudio_contadores FORCE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tenant_isolation_estudio_contadores ON estudio_contadores;
+CREATE POLICY tenant_isolation_estudio_contadores ON estudio_contadores
+    USING (
+        current_estudio_id() IS NULL
+        OR estudio_id = current_estudio_id()
+    );
+
+ALTER TABLE estudio_consultas_mes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE estudio_consultas_mes FORCE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS tenant_isolation_estudio_consultas_mes ON estudio_consultas_mes;
+CREATE POLICY tenant_isolation_estudio_consultas_mes ON estudio_consultas_mes
+    USING (
+        current_estudio_id() IS NULL
+        OR estudio_id = current_estudio_id()
+    );
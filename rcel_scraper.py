@@ -12,6 +12,7 @@ Uso como modulo:
 
 import time
 import os
+from html.parser import HTMLParser
 from pathlib import Path
 
 from selenium import webdriver
@@ -21,9 +22,75 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
     TimeoutException,
     NoSuchElementException,
+    StaleElementReferenceException,
     WebDriverException,
 )
 
+# Espera máxima a que cargue una página de RCEL (menú, formulario, resultados)
+TIMEOUT_CARGA = int(os.getenv('RCEL_TIMEOUT', '30'))
+
+# Tope de páginas de resultados por PV (protección contra paginación circular)
+MAX_PAGINAS = int(os.getenv('RCEL_MAX_PAGINAS', '200'))
+
+# XPath 1.0 no tiene lower-case(): translate() para comparar sin mayúsculas
+_MINUSCULAS = "translate(normalize-space(.), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+
+# Link "Siguiente" de la paginación (la misma búsqueda detecta y clickea)
+XPATH_SIGUIENTE = f"//a[contains({_MINUSCULAS}, 'siguiente')]"
+
+# Tabla de comprobantes: la que tiene encabezados de fecha/comprobante/CAE/importe
+# (mismo criterio que _extraer_tabla). Solo celdas sin tablas adentro: la
+# tabla de layout que la contiene no cuenta.
+XPATH_RESULTADOS = ("//table[(tr|thead/tr|tbody/tr)[1]/*[not(.//table)][" + " or ".join(
+    f"contains({_MINUSCULAS}, '{kw}')" for kw in ('fecha', 'comprobante', 'cae', 'importe')) + "]]")
+
+# Página de resultados sin comprobantes (no hay tabla que esperar)
+XPATH_SIN_RESULTADOS = (f"//*[not(self::script)][text()[contains({_MINUSCULAS}, 'no se encontraron') "
+                        f"or contains({_MINUSCULAS}, 'no existen comprobantes')]]")
+
+
+class _TablasHTML(HTMLParser):
+    """Parser local del HTML de resultados: tablas como listas de filas.
+
+    Se baja el page_source una vez y se parsea acá, en lugar de un
+    find_elements/.text por celda (un round-trip WebDriver cada uno).
+    Las tablas anidadas (layout de RCEL) quedan como tablas separadas.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tablas = []        # [{'filas': [[(tag, texto), ...], ...]}]
+        self._pila = []         # tablas abiertas (la última es la actual)
+
+    def handle_starttag(self, tag, attrs):
+        actual = self._pila[-1] if self._pila else None
+        if tag == 'table':
+            tabla = {'filas': [], 'celda': None, 'tag': None}
+            self.tablas.append(tabla)
+            self._pila.append(tabla)
+        elif tag == 'tr' and actual:
+            actual['filas'].append([])
+        elif tag in ('td', 'th') and actual:
+            if not actual['filas']:
+                actual['filas'].append([])
+            actual['celda'] = []
+            actual['tag'] = tag
+        elif tag == 'br' and actual and actual['celda'] is not None:
+            actual['celda'].append(' ')
+
+    def handle_endtag(self, tag):
+        actual = self._pila[-1] if self._pila else None
+        if tag in ('td', 'th') and actual and actual['celda'] is not None:
+            texto = ' '.join(''.join(actual['celda']).split())
+            actual['filas'][-1].append((actual['tag'], texto))
+            actual['celda'] = None
+        elif tag == 'table' and actual:
+            self._pila.pop()
+
+    def handle_data(self, data):
+        if self._pila and self._pila[-1]['celda'] is not None:
+            self._pila[-1]['celda'].append(data)
+
 
 class RCELScraper:
     """Scraper del portal RCEL de AFIP para comprobantes emitidos y recibidos."""
@@ -51,6 +118,35 @@ class RCELScraper:
     def _log(self, msg):
         print(f"[RCEL] {msg}", flush=True)
 
+    def _esperar_carga(self, driver, anterior, resultados=False):
+        """Esperar a que `anterior` (el <html>, o la tabla de resultados si la
+        página la reemplaza sola) quede stale y la página nueva termine de cargar.
+        En lugar de sleeps fijos.
+
+        resultados: además, esperar a que esté la tabla de comprobantes (o el
+        aviso de que no hay): readyState solo no alcanza si la tabla se arma
+        después de cargar el documento.
+        """
+        def _nueva_pagina(d):
+            try:
+                anterior.tag_name
+                return False
+            except StaleElementReferenceException:
+                pass
+            if d.execute_script('return document.readyState') != 'complete':
+                return False
+            if not resultados:
+                return True
+            return bool(d.find_elements(By.XPATH, XPATH_RESULTADOS)
+                        or d.find_elements(By.XPATH, XPATH_SIN_RESULTADOS))
+
+        try:
+            WebDriverWait(driver, TIMEOUT_CARGA, poll_frequency=0.2).until(_nueva_pagina)
+            return True
+        except TimeoutException:
+            self._log(f"Timeout esperando carga de pagina ({TIMEOUT_CARGA}s)")
+            return False
+
     # ── Login ─────────────────────────────────────────────────────────
 
     def _login(self, driver):
@@ -166,7 +262,6 @@ class RCELScraper:
             seccion: 'emitidos' (Comprobantes Generados) o 'recibidos' (Comprobantes Recibidos)
         """
         driver.get('https://fe.afip.gob.ar/rcel/jsp/menu_ppal.jsp')
-        time.sleep(2)
 
         if seccion == 'recibidos':
             keywords = ['filtrarComprobantesRecibidos', 'consultarComprobantesRecibidos',
@@ -177,18 +272,18 @@ class RCELScraper:
         for link in driver.find_elements(By.TAG_NAME, 'a'):
             href = link.get_attribute('href') or ''
             if any(kw in href for kw in keywords):
+                pagina = driver.find_element(By.TAG_NAME, 'html')
                 link.click()
-                time.sleep(3)
-                return True
+                return self._esperar_carga(driver, pagina)
 
         # Fallback: buscar por texto del link
         if seccion == 'recibidos':
             for link in driver.find_elements(By.TAG_NAME, 'a'):
                 text = (link.text or '').lower()
                 if 'recibido' in text and 'comprobante' in text:
+                    pagina = driver.find_element(By.TAG_NAME, 'html')
                     link.click()
-                    time.sleep(3)
-                    return True
+                    return self._esperar_carga(driver, pagina)
 
         self._log(f"No se encontro seccion '{seccion}' en el menu RCEL")
         return False
@@ -243,7 +338,8 @@ class RCELScraper:
             self._log(f"PV {punto_venta} no disponible")
             return []
 
-        # Buscar
+        # Buscar (la respuesta es una página nueva: esperar a que cargue)
+        pagina = driver.find_element(By.TAG_NAME, 'html')
         try:
             driver.execute_script("validarCampos();")
         except Exception:
@@ -251,25 +347,59 @@ class RCELScraper:
                 if 'buscar' in (btn.get_attribute('value') or '').lower():
                     btn.click()
                     break
-        time.sleep(5)
+        self._esperar_carga(driver, pagina, resultados=True)
 
-        # Extraer tabla de comprobantes
-        return self._extraer_tabla(driver, punto_venta)
-
-    def _extraer_tabla(self, driver, punto_venta):
-        """Extraer comprobantes de la tabla de resultados."""
+        # Extraer todas las páginas de resultados
         comprobantes = []
-        tables = driver.find_elements(By.TAG_NAME, 'table')
+        primera_fila_anterior = None
+        for n_pagina in range(1, MAX_PAGINAS + 1):
+            filas = self._extraer_tabla(driver.page_source, punto_venta)
+
+            # Si "Siguiente" devolvió la misma página, no hay más
+            if filas and filas[0] == primera_fila_anterior:
+                break
+            primera_fila_anterior = filas[0] if filas else None
+            comprobantes.extend(filas)
 
-        for table in tables:
-            rows = table.find_elements(By.TAG_NAME, 'tr')
+            if not self._ir_pagina_siguiente(driver):
+                break
+        else:
+            self._log(f"PV {punto_venta}: tope de {MAX_PAGINAS} paginas alcanzado")
+
+        self._log(f"PV {punto_venta}: {len(comprobantes)} comprobantes ({n_pagina} pagina(s))")
+        return comprobantes
+
+    def _ir_pagina_siguiente(self, driver):
+        """Click en "Siguiente" y esperar la página nueva.
+
+        False si no hay link (última página) o si la página no cargó.
+        """
+        links = driver.find_elements(By.XPATH, XPATH_SIGUIENTE)
+        if not links:
+            return False
+        # Stale de la tabla actual: sirve tanto si se recarga la página como
+        # si la paginación solo reemplaza la tabla
+        tablas = driver.find_elements(By.XPATH, XPATH_RESULTADOS)
+        anterior = tablas[0] if tablas else driver.find_element(By.TAG_NAME, 'html')
+        links[0].click()
+        return self._esperar_carga(driver, anterior, resultados=True)
+
+    def _extraer_tabla(self, html, punto_venta):
+        """Extraer comprobantes del HTML de una página de resultados.
+
+        Returns:
+            lista de dicts (la paginación la sigue _ir_pagina_siguiente)
+        """
+        parser = _TablasHTML()
+        parser.feed(html)
+        parser.close()
+
+        for tabla in parser.tablas:
+            rows = [r for r in tabla['filas'] if r]
             if len(rows) <= 1:
                 continue
 
-            header_cells = rows[0].find_elements(By.TAG_NAME, 'th')
-            if not header_cells:
-                header_cells = rows[0].find_elements(By.TAG_NAME, 'td')
-            headers = [h.text.strip() for h in header_cells]
+            headers = [t for tag, t in rows[0] if tag == 'th'] or [t for _, t in rows[0]]
 
             # Solo tabla de comprobantes
             headers_lower = ' '.join(headers).lower()
@@ -278,32 +408,27 @@ class RCELScraper:
 
             self._log(f"Tabla: {len(rows)-1} filas, headers={headers[:5]}")
 
+            comprobantes = []
             for row in rows[1:]:
-                cells = row.find_elements(By.TAG_NAME, 'td')
+                cells = [t for tag, t in row if tag == 'td']
                 if len(cells) < 3:
                     continue
                 registro = {}
                 for j, h in enumerate(headers):
                     if j < len(cells):
-                        registro[h] = cells[j].text.strip()
+                        registro[h] = cells[j]
                 registro['punto_venta_rcel'] = punto_venta
                 comprobantes.append(registro)
 
-            # Verificar paginacion
-            page_links = driver.find_elements(By.PARTIAL_LINK_TEXT, 'Siguiente')
-            if page_links:
-                self._log(f"Paginacion detectada — solo primera pagina extraida")
-
-            break  # Solo la primera tabla de comprobantes
+            return comprobantes  # Solo la primera tabla de comprobantes
 
-        self._log(f"PV {punto_venta}: {len(comprobantes)} comprobantes")
-        return comprobantes
+        return []
 
     # ── API publica ───────────────────────────────────────────────────
 
     def consultar(self, puntos_venta=None, fecha_desde='01/01/2020', fecha_hasta=None,
                   empresa=None, cuit_empresa=None, seccion='emitidos'):
-        """Consultar comprobantes RCEL.
+        """Consultar comprobantes RCEL de una sección.
 
         Args:
             puntos_venta: lista de PVs a consultar, o None para todos los disponibles
@@ -316,11 +441,29 @@ class RCELScraper:
         Returns:
             dict con 'comprobantes', 'pvs_consultados', 'empresa', 'error'
         """
+        return self.consultar_secciones([seccion], puntos_venta, fecha_desde, fecha_hasta,
+                                        empresa, cuit_empresa)[seccion]
+
+    def consultar_secciones(self, secciones=('emitidos', 'recibidos'), puntos_venta=None,
+                            fecha_desde='01/01/2020', fecha_hasta=None,
+                            empresa=None, cuit_empresa=None):
+        """Consultar varias secciones RCEL con un solo navegador y un solo login.
+
+        Chrome, el login con clave fiscal y la selección de empresa se hacen una
+        vez; después se recorre cada sección. Un error en una sección no corta
+        las siguientes.
+
+        Args: como consultar(); secciones: iterable de 'emitidos' / 'recibidos'
+
+        Returns:
+            dict seccion -> dict de resultado (mismo formato que consultar())
+        """
         from datetime import datetime
 
         if fecha_hasta is None:
             fecha_hasta = datetime.now().strftime('%d/%m/%Y')
 
+        secciones = list(secciones)
         driver = None
         try:
             driver = self._crear_driver()
@@ -331,19 +474,46 @@ class RCELScraper:
             empresa_nombre = self._seleccionar_empresa(driver, empresa, cuit_empresa)
 
             if not empresa_nombre:
-                return {'comprobantes': [], 'error': 'No se pudo seleccionar empresa en RCEL'}
+                return {s: {'comprobantes': [], 'seccion': s,
+                            'error': 'No se pudo seleccionar empresa en RCEL'}
+                        for s in secciones}
+
+            self._log(f"Sesion lista en {time.time() - inicio:.1f}s")
+            return {
+                s: self._consultar_seccion(driver, s, puntos_venta, fecha_desde,
+                                           fecha_hasta, empresa_nombre)
+                for s in secciones
+            }
+
+        except Exception as e:
+            self._log(f"ERROR [{', '.join(secciones)}]: {e}")
+            return {s: {'comprobantes': [], 'seccion': s, 'error': str(e)} for s in secciones}
 
+        finally:
+            if driver:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+
+    def _consultar_seccion(self, driver, seccion, puntos_venta, fecha_desde, fecha_hasta,
+                           empresa_nombre):
+        """Consultar todos los PVs de una sección con el driver ya logueado."""
+        inicio = time.time()
+        try:
             # Obtener PVs disponibles para la sección
             pvs_disponibles = self._obtener_pvs_disponibles(driver, seccion)
             self._log(f"PVs disponibles [{seccion}]: {pvs_disponibles}")
 
             if puntos_venta is None:
-                puntos_venta = [int(pv['value']) for pv in pvs_disponibles]
+                pvs = [int(pv['value']) for pv in pvs_disponibles]
+            else:
+                pvs = puntos_venta
 
             todos = []
             pvs_consultados = []
 
-            for pv in puntos_venta:
+            for pv in pvs:
                 pv_existe = any(p['value'] == str(pv) for p in pvs_disponibles)
                 if not pv_existe:
                     self._log(f"PV {pv} no existe en RCEL [{seccion}], saltando")
@@ -374,13 +544,6 @@ class RCELScraper:
                 'error': str(e),
             }
 
-        finally:
-            if driver:
-                try:
-                    driver.quit()
-                except Exception:
-                    pass
-
     # ── Normalizar a formato compatible con el sistema ────────────────
 
     @staticmethod
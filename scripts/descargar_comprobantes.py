@@ -28,6 +28,9 @@ sys.path.insert(0, str(ROOT))
 
 from wsfev1_client import WSFEv1Client
 
+# Comprobantes por tanda de consulta concurrente (el early stop se evalúa por tanda)
+TAMANO_TANDA = 50
+
 
 def descargar(cuit, fecha_desde=None, fecha_hasta=None, puntos_venta=None, tipos=None, output_dir=None):
     cert_path = ROOT / 'certs' / 'certificado.crt'
@@ -71,39 +74,53 @@ def descargar(cuit, fecha_desde=None, fecha_hasta=None, puntos_venta=None, tipos
             print(f"\n[{tipo_desc}] PV {pv}: {ultimo} comprobantes")
             descargados = 0
             saltados = 0
+            corte = False
 
-            for num in range(ultimo, 0, -1):
+            # Recorrer hacia atrás en tandas; cada tanda se consulta en paralelo
+            for tanda_fin in range(ultimo, 0, -TAMANO_TANDA):
+                numeros = list(range(tanda_fin, max(0, tanda_fin - TAMANO_TANDA), -1))
+                claves = [(tipo, pv, num) for num in numeros]
                 try:
-                    comp = client.consultar_comprobante(cuit, tipo, pv, num)
-                    if comp is None:
-                        continue
-
-                    fecha_cbte = comp.get('CbteFch') or ''
-
-                    # Early stop
-                    if fecha_desde and fecha_cbte < fecha_desde:
-                        print(f"  -> Early stop en #{num} (fecha {fecha_cbte} < {fecha_desde})")
-                        break
+                    resultados = client.consultar_comprobantes_lote(cuit, claves)
+                except Exception as e:
+                    print(f"  Error en #{numeros[-1]}-#{numeros[0]}: {e}")
+                    continue
 
-                    # Filtrar posterior
-                    if fecha_hasta and fecha_cbte > fecha_hasta:
-                        saltados += 1
+                for num, comp in zip(numeros, resultados):
+                    try:
+                        if comp is None:
+                            continue
+
+                        fecha_cbte = comp.get('CbteFch') or ''
+
+                        # Early stop
+                        if fecha_desde and fecha_cbte < fecha_desde:
+                            print(f"  -> Early stop en #{num} (fecha {fecha_cbte} < {fecha_desde})")
+                            corte = True
+                            break
+
+                        # Filtrar posterior
+                        if fecha_hasta and fecha_cbte > fecha_hasta:
+                            saltados += 1
+                            continue
+
+                        comp['CUIT'] = cuit
+                        comp['PtoVta'] = str(pv)
+                        comp['CbteTipo'] = str(tipo)
+                        comp['CbteTipoDesc'] = tipo_desc
+                        comp['CbteNro'] = str(num)
+                        todos.append(comp)
+                        descargados += 1
+
+                        if descargados % 50 == 0:
+                            print(f"  ... {descargados} descargados (actual: #{num}, fecha: {fecha_cbte})")
+
+                    except Exception as e:
+                        print(f"  Error en #{num}: {e}")
                         continue
 
-                    comp['CUIT'] = cuit
-                    comp['PtoVta'] = str(pv)
-                    comp['CbteTipo'] = str(tipo)
-                    comp['CbteTipoDesc'] = tipo_desc
-                    comp['CbteNro'] = str(num)
-                    todos.append(comp)
-                    descargados += 1
-
-                    if descargados % 50 == 0:
-                        print(f"  ... {descargados} descargados (actual: #{num}, fecha: {fecha_cbte})")
-
-                except Exception as e:
-                    print(f"  Error en #{num}: {e}")
-                    continue
+                if corte:
+                    break
 
             print(f"  Total: {descargados} descargados, {saltados} saltados")
 
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+scripts/worker_consultas.py
+Worker de la cola de consultas (tabla consulta_jobs, ver src/jobs.py).
+
+Levanta WORKER_PROCESOS procesos; cada uno toma jobs pendientes con
+SKIP LOCKED y los ejecuta con el handler de src.consultas.JOB_HANDLERS.
+Así varias consultas (de distintos estudios) corren en paralelo sin ocupar
+workers web.
+
+Ejecutar desde la raiz del proyecto (junto a la app web):
+    python scripts/worker_consultas.py
+    python scripts/worker_consultas.py --procesos 8
+
+Requisitos previos:
+    - Migraciones aplicadas (python migrations/run_migrations.py)
+    - .env con DATABASE_URL configurado
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+# Permitir imports desde la raiz del proyecto
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Segundos de espera cuando la cola está vacía
+ESPERA_COLA_VACIA = 2
+# Cada cuánto se renueva el heartbeat de un job en curso
+INTERVALO_HEARTBEAT = 60
+# Cada cuánto se buscan jobs huérfanos (worker caído)
+INTERVALO_HUERFANOS = 120
+
+
+def _heartbeat(job_id, fin):
+    """Renovar heartbeat_at mientras el job corre (fases largas sin progreso)."""
+    from src.jobs import renovar_heartbeat
+    while not fin.wait(INTERVALO_HEARTBEAT):
+        try:
+            renovar_heartbeat(job_id)
+        except Exception as e:
+            print(f"[WORKER] heartbeat job={job_id} fallo: {e}", flush=True)
+
+
+def ejecutar_job(job, handlers):
+    from src.jobs import EventosJob, actualizar_progreso, fallar_job, finalizar_job
+
+    job_id = job['id']
+    handler = handlers.get(job['tipo'])
+    if handler is None:
+        fallar_job(job_id, f"Tipo de job desconocido: {job['tipo']}")
+        return
+
+    fin = threading.Event()
+    hilo = threading.Thread(target=_heartbeat, args=(job_id, fin), daemon=True)
+    hilo.start()
+    # Resultados parciales para la UI (ruta /eventos); se vacían antes de cerrar el job
+    eventos = EventosJob(job_id, job['estudio_id'])
+    inicio = time.time()
+    try:
+        resultado = handler(job, lambda msg: actualizar_progreso(job_id, msg), eventos)
+        eventos.cerrar()
+        finalizar_job(job_id, resultado)
+        print(f"[WORKER] job={job_id} ok ({time.time() - inicio:.1f}s)", flush=True)
+    except Exception as e:
+        traceback.print_exc()
+        eventos.cerrar()
+        fallar_job(job_id, str(e))
+        print(f"[WORKER] job={job_id} error: {e}", flush=True)
+    finally:
+        fin.set()
+
+
+def proceso_worker(n, parar):
+    """Loop de un proceso: tomar job → ejecutar → repetir."""
+    # Se importa acá (post-spawn): cada proceso abre su propio pool PostgreSQL.
+    # src.consultas no tiene efectos al importar (src.app crearía la app Flask
+    # y arrancaría sus threads de fondo en cada proceso)
+    from src.consultas import JOB_HANDLERS
+    from src.db import init_pool
+    from src.jobs import recuperar_huerfanos, tomar_job
+
+    init_pool()
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    nombre = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"[WORKER {n}] iniciado ({nombre})", flush=True)
+
+    ultimo_barrido = 0.0
+    while not parar.is_set():
+        try:
+            if n == 0 and time.time() - ultimo_barrido > INTERVALO_HUERFANOS:
+                ultimo_barrido = time.time()
+                recuperados = recuperar_huerfanos()
+                if recuperados:
+                    print(f"[WORKER {n}] {recuperados} job(s) huérfanos reencolados", flush=True)
+
+            job = tomar_job(nombre)
+            if job is None:
+                parar.wait(ESPERA_COLA_VACIA)
+                continue
+
+            print(f"[WORKER {n}] job={job['id']} tipo={job['tipo']} estudio={job['estudio_id']}", flush=True)
+            ejecutar_job(job, JOB_HANDLERS)
+        except Exception as e:
+            print(f"[WORKER {n}] error en loop: {e}", flush=True)
+            parar.wait(ESPERA_COLA_VACIA)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Worker de consultas InfoFiscal')
+    parser.add_argument('--procesos', type=int,
+                        default=int(os.getenv('WORKER_PROCESOS', 4)),
+                        help='Procesos en paralelo (default: WORKER_PROCESOS o 4)')
+    args = parser.parse_args()
+
+    # spawn: el pool de conexiones no se hereda entre procesos
+    ctx = multiprocessing.get_context('spawn')
+    parar = ctx.Event()
+    procesos = [ctx.Process(target=proceso_worker, args=(n, parar), name=f'worker-{n}')
+                for n in range(args.procesos)]
+    for p in procesos:
+        p.start()
+
+    def _salir(signum, frame):
+        print("[WORKER] deteniendo (se terminan los jobs en curso)...", flush=True)
+        parar.set()
+
+    signal.signal(signal.SIGINT, _salir)
+    signal.signal(signal.SIGTERM, _salir)
+
+    for p in procesos:
+        p.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,28 @@
 #
 # Retrocompatible: si no hay registro en estudios_afip, usa los valores
 # de Config (.env) como fallback para no romper la instalación existente.
+#
+# Cache de credenciales por config (estudios_afip.id + updated_at):
+#   - cert/key en blob se escriben una vez por config y versión, en archivos
+#     0600 dentro de un directorio 0700 propio del proceso (cms_signer y los
+#     clientes SOAP necesitan paths). La password del portal se desencripta
+#     una vez.
+#   - Cada llamada hace una sola query liviana (id, updated_at, sin blobs);
+#     los blobs se leen solo cuando la config es nueva o cambió.
+#   - invalidar_credenciales(): /config/afip upload, toggle y delete (el
+#     toggle además mueve updated_at, que es lo que ven los demás workers).
+#     Solo descarta la entrada del cache: los archivos de la versión anterior
+#     pueden estar en uso (un loginCms o una consulta en curso con esos paths)
+#     y quedan hasta que termina el proceso. Son pocos: uno por versión subida.
+#   - Al terminar el proceso se borra el directorio (atexit).
 
 from __future__ import annotations
 
+import atexit
 import os
+import shutil
 import tempfile
+import threading
 from pathlib import Path
 
 from src.config import Config
@@ -44,8 +61,7 @@ def _load_from_db(estudio_id: int) -> dict | None:
     try:
         with get_cursor() as cur:
             cur.execute("""
-                SELECT solicitante_cuit, cert_path, cert_blob, key_path, key_blob,
-                       ambiente, portal_cuit, portal_password_enc
+                SELECT id, updated_at
                 FROM estudios_afip
                 WHERE estudio_id = %s AND activo = TRUE
                   AND ambiente = 'prod'
@@ -55,12 +71,62 @@ def _load_from_db(estudio_id: int) -> dict | None:
 
         if not row:
             return None
+        return credenciales_config(row['id'], row['updated_at'])
+
+    except Exception as e:
+        print(f"[AFIP_CREDS] Error cargando de DB para estudio {estudio_id}: {e}")
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Cache por config
+# ---------------------------------------------------------------------------
+
+# estudios_afip.id -> {'updated_at', 'estudio_id', 'creds', 'archivos'}
+_cache: dict[int, dict] = {}
+_cache_lock = threading.Lock()
+_directorio: str | None = None
+_directorio_pid: int | None = None
+
 
+def credenciales_config(config_id: int, updated_at) -> dict | None:
+    """Credenciales de una config de estudios_afip, materializadas una vez por versión.
+
+    updated_at: el de la fila vista por el llamador; si no coincide con el
+    cacheado se vuelve a leer la config (blobs incluidos) de la DB.
+    Retorna el dict de get_afip_credentials (copia) o None si la config ya no
+    existe o no tiene cert/key utilizables.
+    """
+    with _cache_lock:
+        _soltar_si_fork()
+        entrada = _cache.get(config_id)
+        if entrada and entrada['updated_at'] == updated_at:
+            return dict(entrada['creds'])
+
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT id, estudio_id, updated_at, solicitante_cuit, cert_path, cert_blob,
+                   key_path, key_blob, ambiente, portal_cuit, portal_password_enc
+            FROM estudios_afip
+            WHERE id = %s
+        """, (config_id,))
+        row = cur.fetchone()
+
+    with _cache_lock:
+        _soltar_si_fork()
+        # Los archivos de la versión anterior no se borran: pueden estar en uso
+        _cache.pop(config_id, None)
+        if not row:
+            return None
+
+        archivos = []
         # Resolver cert y key: blob tiene prioridad sobre path
-        cert_path = _resolve_cert(row['cert_blob'], row['cert_path'], 'cert')
-        key_path = _resolve_cert(row['key_blob'], row['key_path'], 'key')
+        cert_path = _resolve_cert(row['cert_blob'], row['cert_path'], 'cert', row, archivos)
+        key_path = _resolve_cert(row['key_blob'], row['key_path'], 'key', row, archivos)
 
         if not cert_path or not key_path:
+            # Nunca se entregaron: se pueden borrar ya
+            _borrar_archivos(archivos)
             return None
 
         # Desencriptar portal password si existe
@@ -68,7 +134,7 @@ def _load_from_db(estudio_id: int) -> dict | None:
         if row['portal_password_enc']:
             portal_password = _decrypt_portal_password(row['portal_password_enc'])
 
-        return {
+        creds = {
             'solicitante_cuit': row['solicitante_cuit'],
             'cert_path': cert_path,
             'key_path': key_path,
@@ -76,21 +142,89 @@ def _load_from_db(estudio_id: int) -> dict | None:
             'portal_cuit': row['portal_cuit'] or '',
             'portal_password': portal_password,
         }
+        _cache[config_id] = {
+            'updated_at': row['updated_at'],
+            'estudio_id': row['estudio_id'],
+            'creds': creds,
+            'archivos': archivos,
+        }
+        return dict(creds)
+
+
+def invalidar_credenciales(estudio_id: int | None = None, config_id: int | None = None) -> int:
+    """Descartar credenciales cacheadas de una config o de un estudio.
+
+    Los archivos no se borran (pueden estar en uso); los borra limpiar_credenciales.
+    Retorna cuántas configs se descartaron.
+    """
+    with _cache_lock:
+        _soltar_si_fork()
+        claves = [cid for cid, entrada in _cache.items()
+                  if (config_id is not None and cid == config_id)
+                  or (estudio_id is not None and entrada['estudio_id'] == estudio_id)]
+        for cid in claves:
+            del _cache[cid]
+    return len(claves)
+
+
+def limpiar_credenciales() -> None:
+    """Borrar todo lo materializado por este proceso (registrado con atexit)."""
+    global _directorio
+    with _cache_lock:
+        _soltar_si_fork()
+        _cache.clear()
+        if _directorio:
+            shutil.rmtree(_directorio, ignore_errors=True)
+            _directorio = None
 
-    except Exception as e:
-        print(f"[AFIP_CREDS] Error cargando de DB para estudio {estudio_id}: {e}")
-        return None
 
+def _soltar_si_fork() -> None:
+    """En un proceso hijo (fork) el cache y el directorio son del padre: olvidarlos sin borrar."""
+    global _directorio, _directorio_pid
+    if _directorio_pid is not None and _directorio_pid != os.getpid():
+        _cache.clear()
+        _directorio = None
+        _directorio_pid = None
 
-def _resolve_cert(blob: bytes | None, path: str | None, prefix: str) -> str | None:
-    """Resolver certificado: si hay blob, escribir a temp file. Si hay path, verificar."""
+
+def _directorio_proceso() -> str:
+    """Directorio 0700 de este proceso para cert/key materializados."""
+    global _directorio, _directorio_pid
+    if _directorio is None:
+        _directorio = tempfile.mkdtemp(prefix='infofiscal_afip_')
+        _directorio_pid = os.getpid()
+        atexit.register(limpiar_credenciales)
+    return _directorio
+
+
+def _escribir_privado(blob: bytes, row: dict, prefix: str) -> str:
+    version = int(row['updated_at'].timestamp() * 1_000_000) if row['updated_at'] else 0
+    path = os.path.join(_directorio_proceso(), f"{row['id']}_{version}_{prefix}.pem")
+    # Escribir aparte y renombrar: quien ya tiene abierto el path de esta
+    # versión (re-materializada tras invalidar) nunca lo ve a medio escribir
+    temporal = f"{path}.{threading.get_ident()}.tmp"
+    fd = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(blob)
+    os.replace(temporal, path)
+    return path
+
+
+def _borrar_archivos(archivos: list[str]) -> None:
+    for path in archivos:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _resolve_cert(blob: bytes | None, path: str | None, prefix: str,
+                  row: dict, archivos: list[str]) -> str | None:
+    """Resolver certificado: si hay blob, archivo privado de la config. Si hay path, verificar."""
     if blob:
-        tmp = tempfile.NamedTemporaryFile(
-            prefix=f'afip_{prefix}_', suffix='.pem', delete=False
-        )
-        tmp.write(blob)
-        tmp.close()
-        return tmp.name
+        archivo = _escribir_privado(bytes(blob), row, prefix)
+        archivos.append(archivo)
+        return archivo
 
     if path:
         # Path absoluto o relativo a la raíz del proyecto
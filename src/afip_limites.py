@@ -0,0 +1,99 @@
+# src/afip_limites.py
+# Presupuesto de requests SOAP a AFIP por CUIT solicitante y servicio (token bucket).
+#
+# Diseño:
+#   - Un bucket por (solicitante, servicio), compartido por todos los clientes
+#     y threads del proceso. Los límites de AFIP son por certificado y por web
+#     service, no por CUIT consultado: una ráfaga contra WSFEv1 no consume el
+#     presupuesto de WSMTXCA ni de WSAA.
+#   - AFIP_RPS: tokens por segundo (ritmo sostenido).
+#   - AFIP_BURST: capacidad del bucket (ráfaga permitida tras un rato ocioso).
+#   - AFIP_RPS_<SERVICIO> / AFIP_BURST_<SERVICIO> (p. ej. AFIP_RPS_WSMTXCA=2)
+#     pisan los valores generales para ese servicio.
+#   - Por proceso: con N workers Gunicorn el ritmo total es N × AFIP_RPS.
+#
+# Uso:
+#   bucket_solicitante(cuit, 'wsfe').adquirir()   # bloquea hasta que haya token
+#   await bucket_solicitante(cuit, 'wsfe').adquirir_async()   # clientes asyncio
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+
+AFIP_RPS = float(os.getenv("AFIP_RPS", 10))
+AFIP_BURST = int(os.getenv("AFIP_BURST", 20))
+
+
+class TokenBucket:
+    """Token bucket thread-safe: `tasa` tokens/s, hasta `capacidad` acumulados."""
+
+    def __init__(self, tasa: float, capacidad: int):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = float(capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _recargar(self) -> None:
+        ahora = time.monotonic()
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+    def _tomar(self, tokens: int) -> float:
+        """Tomar `tokens` si hay (0.0); si no, segundos hasta que alcancen."""
+        with self._lock:
+            self._recargar()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.tasa
+
+    def adquirir(self, tokens: int = 1, timeout: float | None = None) -> bool:
+        """Tomar `tokens`, esperando lo necesario. False si se venció el timeout."""
+        if self.tasa <= 0:
+            return True
+        limite = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            espera = self._tomar(tokens)
+            if not espera:
+                return True
+
+            if limite is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                espera = min(espera, restante)
+            time.sleep(espera)
+
+    async def adquirir_async(self, tokens: int = 1) -> None:
+        """Como adquirir(), sin bloquear el event loop mientras se espera."""
+        if self.tasa <= 0:
+            return
+        while True:
+            espera = self._tomar(tokens)
+            if not espera:
+                return
+            await asyncio.sleep(espera)
+
+
+_buckets: dict[tuple[str, str], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _limites_servicio(servicio: str) -> tuple[float, int]:
+    sufijo = servicio.upper()
+    return (float(os.getenv(f"AFIP_RPS_{sufijo}", AFIP_RPS)),
+            int(os.getenv(f"AFIP_BURST_{sufijo}", AFIP_BURST)))
+
+
+def bucket_solicitante(solicitante: str, servicio: str = 'wsfe') -> TokenBucket:
+    """Bucket compartido del solicitante en ese servicio (se crea al primer uso)."""
+    clave = (solicitante, servicio)
+    with _buckets_lock:
+        if clave not in _buckets:
+            _buckets[clave] = TokenBucket(*_limites_servicio(servicio))
+        return _buckets[clave]
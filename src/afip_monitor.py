@@ -0,0 +1,268 @@
+# src/afip_monitor.py
+# Monitor en background de los web services AFIP: estado cacheado + historial.
+#
+# Diseño:
+#   - Un thread daemon por proceso sondea los WSDL en paralelo cada
+#     AFIP_MONITOR_INTERVALO_S y deja el último estado en memoria:
+#     estado_servicios() lo lee sin red ni DB.
+#   - Con PostgreSQL (init_pool() llamado) cada sondeo queda en
+#     afip_health_checks (009_afip_health.sql). Con varios workers Gunicorn y
+#     el worker de consultas se sondea una vez por intervalo en total: si la DB
+#     ya tiene un sondeo reciente (de otro proceso) se toma ese estado.
+#   - El thread arranca con iniciar_monitor() o en la primera lectura del
+#     proceso (fork-safe: los threads no sobreviven al fork de Gunicorn).
+#   - Si el estado en memoria falta o quedó viejo (arranque, AFIP_MONITOR=0,
+#     thread trabado) la lectura sondea en el momento, en paralelo.
+#
+# Uso:
+#   from src.afip_monitor import estado_servicios
+#   estado_servicios()      # {'WSFEv1': True, 'WSMTXCA': False, 'WSFEXv1': True}
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from src.afip_transport import sesion_afip, url_afip
+from src.db import pool_disponible
+
+AFIP_MONITOR = os.getenv("AFIP_MONITOR", "1") == "1"
+AFIP_MONITOR_INTERVALO_S = float(os.getenv("AFIP_MONITOR_INTERVALO_S", 60))
+AFIP_MONITOR_TIMEOUT_S = float(os.getenv("AFIP_MONITOR_TIMEOUT_S", 4))
+AFIP_MONITOR_RETENCION_DIAS = int(os.getenv("AFIP_MONITOR_RETENCION_DIAS", 30))
+
+ENDPOINTS = {
+    'WSFEv1':  'https://servicios1.afip.gov.ar/wsfev1/service.asmx?WSDL',
+    'WSMTXCA': 'https://serviciosjava.afip.gov.ar/wsmtxca/services/MTXCAService?wsdl',
+    'WSFEXv1': 'https://servicios1.afip.gov.ar/wsfexv1/service.asmx?WSDL',
+}
+
+# Purga de historial cada tantos ciclos (~1 h con el intervalo default)
+_CICLOS_POR_PURGA = 60
+
+_estado: dict[str, dict] = {}
+_estado_lock = threading.Lock()
+_sondeo_lock = threading.Lock()
+_hilo: threading.Thread | None = None
+_hilo_pid: int | None = None
+
+
+# ---------------------------------------------------------------------------
+# Lectura
+# ---------------------------------------------------------------------------
+
+def estado_servicios() -> dict[str, bool]:
+    """{servicio: online} del último sondeo (sondea ahora si no hay uno vigente)."""
+    return {nombre: d['online'] for nombre, d in detalle_servicios().items()}
+
+
+def detalle_servicios() -> dict[str, dict]:
+    """{servicio: {online, status_http, latencia_ms, error, checked_at}} del último sondeo."""
+    iniciar_monitor()
+    if not _vigente():
+        with _sondeo_lock:
+            if not _vigente():      # otro thread pudo sondear mientras se esperaba
+                _actualizar(sondear())
+    with _estado_lock:
+        return {nombre: dict(d) for nombre, d in _estado.items()}
+
+
+def _vigente() -> bool:
+    with _estado_lock:
+        if len(_estado) < len(ENDPOINTS):
+            return False
+        mas_viejo = min(d['checked_at'] for d in _estado.values())
+    edad = (datetime.now(timezone.utc) - mas_viejo).total_seconds()
+    return edad < 2 * AFIP_MONITOR_INTERVALO_S
+
+
+def _actualizar(resultado: dict[str, dict]) -> None:
+    with _estado_lock:
+        _estado.update(resultado)
+
+
+# ---------------------------------------------------------------------------
+# Sondeo
+# ---------------------------------------------------------------------------
+
+def _sondear_servicio(nombre: str, url: str, timeout: float) -> dict:
+    inicio = time.perf_counter()
+    try:
+        r = sesion_afip().get(url_afip(url), timeout=timeout)
+        return {
+            'online': r.status_code == 200,
+            'status_http': r.status_code,
+            'latencia_ms': int((time.perf_counter() - inicio) * 1000),
+            'error': None if r.status_code == 200 else f'HTTP {r.status_code}',
+            'checked_at': datetime.now(timezone.utc),
+        }
+    except Exception as e:
+        return {
+            'online': False,
+            'status_http': None,
+            'latencia_ms': None,
+            'error': f'{type(e).__name__}: {e}'[:500],
+            'checked_at': datetime.now(timezone.utc),
+        }
+
+
+def sondear(timeout: float = AFIP_MONITOR_TIMEOUT_S) -> dict[str, dict]:
+    """GET a los WSDL de todos los servicios en paralelo (tarda lo que el más lento)."""
+    with ThreadPoolExecutor(max_workers=len(ENDPOINTS)) as pool:
+        futuros = {nombre: pool.submit(_sondear_servicio, nombre, url, timeout)
+                   for nombre, url in ENDPOINTS.items()}
+        return {nombre: f.result() for nombre, f in futuros.items()}
+
+
+# ---------------------------------------------------------------------------
+# Thread del monitor
+# ---------------------------------------------------------------------------
+
+def iniciar_monitor() -> None:
+    """Arrancar el thread del monitor en este proceso (idempotente)."""
+    global _hilo, _hilo_pid
+    if not AFIP_MONITOR:
+        return
+    pid = os.getpid()
+    if _hilo is not None and _hilo_pid == pid and _hilo.is_alive():
+        return
+    with _estado_lock:
+        if _hilo is not None and _hilo_pid == pid and _hilo.is_alive():
+            return
+        if _hilo_pid != pid:
+            _estado.clear()         # estado heredado del padre: no es de este proceso
+        _hilo = threading.Thread(target=_bucle, name='afip-monitor', daemon=True)
+        _hilo_pid = pid
+        _hilo.start()
+
+
+def _bucle() -> None:
+    ciclo = 0
+    while True:
+        try:
+            _ciclo(purgar=ciclo % _CICLOS_POR_PURGA == 0)
+        except Exception as e:
+            print(f"[MONITOR AFIP] error en el ciclo: {e}", flush=True)
+        ciclo += 1
+        time.sleep(AFIP_MONITOR_INTERVALO_S)
+
+
+def _ciclo(purgar: bool = False) -> None:
+    db = pool_disponible()
+    if db:
+        try:
+            reciente = _leer_reciente()
+        except Exception as e:
+            # Sin historial (p. ej. falta 009_afip_health.sql): el monitor sigue en memoria
+            print(f"[MONITOR AFIP] historial no disponible: {e}", flush=True)
+            db = False
+        else:
+            if len(reciente) == len(ENDPOINTS):
+                _actualizar(reciente)
+                return
+
+    with _sondeo_lock:
+        resultado = sondear()
+        _actualizar(resultado)
+
+    caidos = [nombre for nombre, d in resultado.items() if not d['online']]
+    if caidos:
+        print(f"[MONITOR AFIP] sin respuesta: {', '.join(caidos)}", flush=True)
+    if db:
+        try:
+            _guardar(resultado, purgar)
+        except Exception as e:
+            print(f"[MONITOR AFIP] no se pudo guardar el sondeo: {e}", flush=True)
+
+
+# ---------------------------------------------------------------------------
+# Historial (PostgreSQL)
+# ---------------------------------------------------------------------------
+
+def _leer_reciente() -> dict[str, dict]:
+    """Último sondeo por servicio si es de este intervalo (lo hizo otro proceso)."""
+    from src.db import get_cursor
+
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT DISTINCT ON (servicio)
+                   servicio, online, status_http, latencia_ms, error, checked_at
+            FROM afip_health_checks
+            WHERE checked_at > NOW() - make_interval(secs => %s)
+            ORDER BY servicio, checked_at DESC
+        """, (AFIP_MONITOR_INTERVALO_S * 0.8,))
+        return {r.pop('servicio'): r for r in cur.fetchall() if r['servicio'] in ENDPOINTS}
+
+
+def _guardar(resultado: dict[str, dict], purgar: bool) -> None:
+    from src.db import get_cursor
+
+    with get_cursor() as cur:
+        # Un solo registro por intervalo aunque dos procesos hayan sondeado a la vez
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('afip_health_checks'))")
+        cur.execute("""
+            SELECT 1 FROM afip_health_checks
+            WHERE checked_at > NOW() - make_interval(secs => %s)
+            LIMIT 1
+        """, (AFIP_MONITOR_INTERVALO_S * 0.8,))
+        if cur.fetchone() is None:
+            cur.executemany("""
+                INSERT INTO afip_health_checks
+                    (servicio, online, status_http, latencia_ms, error, checked_at)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, [(nombre, d['online'], d['status_http'], d['latencia_ms'], d['error'], d['checked_at'])
+                  for nombre, d in resultado.items()])
+        if purgar:
+            cur.execute("DELETE FROM afip_health_checks WHERE checked_at < NOW() - make_interval(days => %s)",
+                        (AFIP_MONITOR_RETENCION_DIAS,))
+
+
+def historial_servicios(horas: int = 24) -> dict[str, dict]:
+    """Uptime y latencia por servicio para /admin/health.
+
+    {servicio: {sondeos, uptime, uptime_7d, latencia_prom_ms, latencia_p95_ms,
+                horas: [{hora, uptime, latencia_ms}, ...]}}  ({} sin DB)
+    Todo sobre las últimas `horas` salvo uptime_7d. uptime en % (0-100);
+    latencias solo de los sondeos con respuesta.
+    """
+    if not pool_disponible():
+        return {}
+    from src.db import get_cursor
+
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT servicio,
+                   COUNT(*) FILTER (WHERE checked_at > NOW() - make_interval(hours => %(h)s)) AS sondeos,
+                   100 * AVG(online::int) FILTER (WHERE checked_at > NOW() - make_interval(hours => %(h)s))
+                       AS uptime,
+                   100 * AVG(online::int) AS uptime_7d,
+                   AVG(latencia_ms) FILTER (WHERE online AND checked_at > NOW() - make_interval(hours => %(h)s))
+                       AS latencia_prom_ms,
+                   percentile_cont(0.95) WITHIN GROUP (ORDER BY latencia_ms)
+                       FILTER (WHERE online AND checked_at > NOW() - make_interval(hours => %(h)s))
+                       AS latencia_p95_ms
+            FROM afip_health_checks
+            WHERE checked_at > NOW() - INTERVAL '7 days'
+            GROUP BY servicio
+        """, {'h': horas})
+        resumen = {r.pop('servicio'): {**r, 'horas': []} for r in cur.fetchall()}
+
+        cur.execute("""
+            SELECT servicio,
+                   date_trunc('hour', checked_at) AS hora,
+                   100 * AVG(online::int) AS uptime,
+                   AVG(latencia_ms) FILTER (WHERE online) AS latencia_ms
+            FROM afip_health_checks
+            WHERE checked_at > NOW() - make_interval(hours => %s)
+            GROUP BY servicio, hora
+            ORDER BY servicio, hora
+        """, (horas,))
+        for r in cur.fetchall():
+            if r['servicio'] in resumen:
+                resumen[r['servicio']]['horas'].append(
+                    {'hora': r['hora'], 'uptime': r['uptime'], 'latencia_ms': r['latencia_ms']})
+
+    return resumen
@@ -0,0 +1,165 @@
+# src/afip_parametros.py
+# Cache de tablas de parámetros AFIP (puntos de venta, tipos de comprobante,
+# monedas, alícuotas IVA) por (solicitante, cuit, ambiente).
+#
+# Niveles:
+#   1. Memoria del proceso, hasta AFIP_PARAMETROS_MEMORIA_S (con DB) o hasta
+#      AFIP_PARAMETROS_TTL_H (sin DB): evita ir a la DB en cada consulta.
+#   2. PostgreSQL (afip_parametros, 010_afip_parametros.sql) si init_pool() fue
+#      llamado: compartido entre workers Gunicorn, el worker de consultas y
+#      reinicios. Una fila vale AFIP_PARAMETROS_TTL_H desde que se bajó de AFIP.
+#
+# Solo se cachean respuestas válidas: si la carga levanta una excepción no
+# queda nada guardado y la próxima consulta vuelve a pedir a AFIP.
+#
+# Invalidación manual (un cliente habilitó un PV nuevo): invalidar_parametros().
+# Borra la DB y la memoria de este proceso; los demás procesos la ven al vencer
+# su copia en memoria (AFIP_PARAMETROS_MEMORIA_S).
+#
+# Uso:
+#   pvs = obtener_parametros(solicitante, cuit, 'prod', 'ptos_venta', lambda: pedir_a_afip())
+#   pvs = await obtener_parametros_async(solicitante, cuit, 'prod', 'ptos_venta', pedir_async)
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+from src.db import pool_disponible
+
+AFIP_PARAMETROS_TTL_H = float(os.getenv("AFIP_PARAMETROS_TTL_H", 24))
+AFIP_PARAMETROS_MEMORIA_S = float(os.getenv("AFIP_PARAMETROS_MEMORIA_S", 60))
+
+TABLAS = ('ptos_venta', 'tipos_cbte', 'monedas', 'alicuotas_iva')
+
+# clave -> (datos, vence en time.monotonic())
+_memoria: dict[tuple, tuple[Any, float]] = {}
+_locks: dict[tuple, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def obtener_parametros(solicitante: str, cuit: str, ambiente: str, tabla: str,
+                       cargar: Callable[[], Any]) -> Any:
+    """Tabla `tabla` cacheada; `cargar()` la pide a AFIP si no hay copia vigente.
+
+    cargar: función sin argumentos que retorna datos serializables a JSON y
+        levanta una excepción si AFIP no respondió bien.
+    """
+    clave = (str(solicitante), str(cuit), ambiente, tabla)
+    datos = _de_memoria(clave)
+    if datos is not None:
+        return datos
+
+    with _lock_clave(clave):
+        datos = _de_memoria(clave)
+        if datos is not None:
+            return datos
+
+        db = pool_disponible()
+        if db:
+            try:
+                datos = _db_leer(clave)
+            except Exception as e:
+                # p. ej. falta 010_afip_parametros.sql: se cachea solo en memoria
+                print(f"[PARAMETROS] cache en DB no disponible: {e}", flush=True)
+                db = False
+
+        if datos is None:
+            datos = cargar()
+            if db:
+                _db_guardar(clave, datos)
+            print(f"[PARAMETROS] {tabla} de {cuit} ({ambiente}) actualizado desde AFIP", flush=True)
+
+        vigencia = min(AFIP_PARAMETROS_MEMORIA_S, AFIP_PARAMETROS_TTL_H * 3600) if db \
+            else AFIP_PARAMETROS_TTL_H * 3600
+        _memoria[clave] = (datos, time.monotonic() + vigencia)
+        return datos
+
+
+async def obtener_parametros_async(solicitante: str, cuit: str, ambiente: str, tabla: str,
+                                   cargar: Callable[[], Awaitable[Any]]) -> Any:
+    """obtener_parametros para clientes asyncio: cargar es una corrutina."""
+    datos = _de_memoria((str(solicitante), str(cuit), ambiente, tabla))
+    if datos is not None:
+        return datos
+
+    from src.afip_transport_async import desde_hilo
+    return await asyncio.to_thread(obtener_parametros, solicitante, cuit, ambiente, tabla,
+                                   desde_hilo(cargar))
+
+
+def invalidar_parametros(solicitante: str | None = None, cuit: str | None = None,
+                         ambiente: str | None = None, tabla: str | None = None) -> int:
+    """Descartar las tablas cacheadas que coinciden con los filtros (None = todas).
+
+    Retorna la cantidad de entradas descartadas.
+    """
+    filtros = {'solicitante': solicitante, 'cuit': cuit, 'ambiente': ambiente, 'tabla': tabla}
+    filtros = {k: str(v) for k, v in filtros.items() if v is not None}
+
+    posiciones = {'solicitante': 0, 'cuit': 1, 'ambiente': 2, 'tabla': 3}
+    en_memoria = [clave for clave in list(_memoria)
+                  if all(clave[posiciones[k]] == v for k, v in filtros.items())]
+    for clave in en_memoria:
+        _memoria.pop(clave, None)
+
+    if not pool_disponible():
+        return len(en_memoria)
+
+    from src.db import get_cursor
+
+    where = " AND ".join(f"{k} = %({k})s" for k in filtros) or "TRUE"
+    with get_cursor() as cur:
+        cur.execute(f"DELETE FROM afip_parametros WHERE {where}", filtros)
+        return max(cur.rowcount, len(en_memoria))
+
+
+# ---------------------------------------------------------------------------
+# Internos
+# ---------------------------------------------------------------------------
+
+def _de_memoria(clave: tuple) -> Any:
+    entrada = _memoria.get(clave)
+    if entrada and entrada[1] > time.monotonic():
+        return entrada[0]
+    return None
+
+
+def _lock_clave(clave: tuple) -> threading.Lock:
+    with _locks_guard:
+        if clave not in _locks:
+            _locks[clave] = threading.Lock()
+        return _locks[clave]
+
+
+
+
+def _db_leer(clave: tuple) -> Any:
+    from src.db import get_cursor
+
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT datos
+            FROM afip_parametros
+            WHERE solicitante = %s AND cuit = %s AND ambiente = %s AND tabla = %s
+              AND actualizado_at > NOW() - make_interval(secs => %s)
+        """, (*clave, AFIP_PARAMETROS_TTL_H * 3600))
+        row = cur.fetchone()
+    return row['datos'] if row else None
+
+
+def _db_guardar(clave: tuple, datos: Any) -> None:
+    from src.db import get_cursor
+
+    with get_cursor() as cur:
+        cur.execute("""
+            INSERT INTO afip_parametros (solicitante, cuit, ambiente, tabla, datos, actualizado_at)
+            VALUES (%s, %s, %s, %s, %s::jsonb, NOW())
+            ON CONFLICT (solicitante, cuit, ambiente, tabla) DO UPDATE
+            SET datos = EXCLUDED.datos,
+                actualizado_at = NOW()
+        """, (*clave, json.dumps(datos, ensure_ascii=False)))
@@ -0,0 +1,259 @@
+# src/afip_resiliencia.py
+# Taxonomía de errores AFIP, política de reintentos y circuit breaker por servicio.
+#
+# Diseño:
+#   - clasificar_respuesta / clasificar_excepcion traducen lo que devuelve el
+#     transporte a una de las excepciones de abajo (o None si la respuesta es
+#     válida). Un 602 "no existe" es una respuesta válida: no se reintenta.
+#   - Reintentables: throttling (HTTP 429/503) y transitorios (timeouts,
+#     conexión caída, 5xx, SOAP Fault de servidor, errores internos 500-502
+#     de WSFEv1). Backoff exponencial con jitter completo: espera aleatoria en
+#     [0, min(AFIP_BACKOFF_MAX_S, AFIP_BACKOFF_BASE_S · 2^intento)], o el
+#     Retry-After de AFIP si viene y es menor al tope.
+#   - No reintentables: rechazos (4xx, SOAP Fault de cliente, WSAA coe.*).
+#   - Un circuito por servicio y host (WSFE prod ≠ WSFE homo), compartido por
+#     todos los threads del proceso. AFIP_CB_FALLAS llamadas seguidas que
+#     agotaron los reintentos lo abren; abierto falla rápido (CircuitoAbierto) durante
+#     AFIP_CB_ESPERA_S; después deja pasar una sola prueba (semiabierto):
+#     si responde se cierra, si falla vuelve a abrirse.
+#
+# Uso:
+#   circuito = circuito_servicio('wsfe', url)
+#   es_prueba = circuito.permitir()      # una vez por llamada; CircuitoAbierto si está abierto
+#   ... registrar_exito() / registrar_falla(error); la prueba sin resultado: soltar_prueba()
+#   error = clasificar_respuesta('wsfe', response)
+#   estado_circuitos()                   # para mostrar en la consulta unificada
+
+from __future__ import annotations
+
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+AFIP_REINTENTOS = int(os.getenv("AFIP_REINTENTOS", 3))
+AFIP_BACKOFF_BASE_S = float(os.getenv("AFIP_BACKOFF_BASE_S", 0.5))
+AFIP_BACKOFF_MAX_S = float(os.getenv("AFIP_BACKOFF_MAX_S", 8))
+AFIP_CB_FALLAS = int(os.getenv("AFIP_CB_FALLAS", 5))
+AFIP_CB_ESPERA_S = float(os.getenv("AFIP_CB_ESPERA_S", 30))
+
+STATUS_THROTTLING = {429, 503}
+
+# Errors/Err de WSFEv1 que son fallas internas de AFIP (no del request)
+_ERRORES_INTERNOS = {
+    'wsfe': re.compile(r'<Code>\s*(50[012])\s*</Code>'),
+}
+_FAULTCODE = re.compile(r'<(?:\w+:)?faultcode>([^<]*)</(?:\w+:)?faultcode>')
+_FAULTSTRING = re.compile(r'<(?:\w+:)?faultstring>([^<]*)</(?:\w+:)?faultstring>')
+
+
+# ---------------------------------------------------------------------------
+# Taxonomía
+# ---------------------------------------------------------------------------
+
+class ErrorAFIP(Exception):
+    """Falla de transporte o de servicio AFIP (no un "no existe")."""
+
+    reintentable = False
+
+    def __init__(self, servicio: str, mensaje: str, status: int | None = None):
+        super().__init__(f"{servicio}: {mensaje}")
+        self.servicio = servicio
+        self.status = status
+
+
+class Throttling(ErrorAFIP):
+    """AFIP pidió bajar el ritmo (HTTP 429/503)."""
+
+    reintentable = True
+
+    def __init__(self, servicio: str, mensaje: str, status: int | None = None,
+                 reintentar_en: float | None = None):
+        super().__init__(servicio, mensaje, status)
+        self.reintentar_en = reintentar_en
+
+
+class Transitorio(ErrorAFIP):
+    """Timeout, conexión caída o error interno del servicio."""
+
+    reintentable = True
+
+
+class Rechazo(ErrorAFIP):
+    """El servicio rechazó el request: reintentarlo da lo mismo."""
+
+
+class CircuitoAbierto(ErrorAFIP):
+    """El circuito del servicio está abierto: no se llamó a AFIP."""
+
+    def __init__(self, servicio: str, reabre_en: float):
+        super().__init__(servicio, f"servicio no disponible (circuito abierto, reintenta en {reabre_en:.0f}s)")
+        self.reabre_en = reabre_en
+
+
+def clasificar_excepcion(servicio: str, e: requests.RequestException) -> ErrorAFIP:
+    """Excepción de requests -> ErrorAFIP."""
+    if isinstance(e, (requests.Timeout, requests.ConnectionError)):
+        return Transitorio(servicio, f"{type(e).__name__}: {e}")
+    return Rechazo(servicio, f"{type(e).__name__}: {e}")
+
+
+def clasificar_respuesta(servicio: str, response: requests.Response) -> ErrorAFIP | None:
+    """None si la respuesta es válida (incluye 602 "no existe"); si no, el error."""
+    status = response.status_code
+    if status == 200:
+        patron = _ERRORES_INTERNOS.get(servicio)
+        if patron is not None and '<Errors>' in response.text:
+            m = patron.search(response.text)
+            if m:
+                return Transitorio(servicio, f"error interno AFIP {m.group(1)}", status)
+        return None
+
+    if status in STATUS_THROTTLING:
+        return Throttling(servicio, f"HTTP {status}", status, _retry_after(response))
+
+    texto = response.text if 'xml' in response.headers.get('Content-Type', '') else ''
+    m = _FAULTCODE.search(texto)
+    if m:
+        codigo = m.group(1)
+        detalle = _FAULTSTRING.search(texto)
+        mensaje = f"SOAP Fault {codigo}: {detalle.group(1) if detalle else ''}".rstrip(': ')
+        # Fault de cliente o de negocio WSAA (coe.alreadyAuthenticated, cms.*): no cambia al reintentar
+        if 'client' in codigo.lower() or 'coe.' in codigo or 'cms.' in codigo:
+            return Rechazo(servicio, mensaje, status)
+        return Transitorio(servicio, mensaje, status)
+
+    if status >= 500:
+        return Transitorio(servicio, f"HTTP {status}", status)
+    return Rechazo(servicio, f"HTTP {status}", status)
+
+
+def _retry_after(response: requests.Response) -> float | None:
+    valor = response.headers.get('Retry-After', '')
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        return None
+
+
+def espera_reintento(intento: int, error: ErrorAFIP) -> float:
+    """Segundos a esperar antes del reintento `intento` (0 = primer reintento)."""
+    tope = min(AFIP_BACKOFF_MAX_S, AFIP_BACKOFF_BASE_S * (2 ** intento))
+    pedido = getattr(error, 'reintentar_en', None)
+    if pedido is not None and pedido <= AFIP_BACKOFF_MAX_S:
+        return pedido
+    return random.uniform(0, tope)
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+
+CERRADO, ABIERTO, SEMIABIERTO = 'cerrado', 'abierto', 'semiabierto'
+
+
+class CircuitBreaker:
+    """Circuito thread-safe de un servicio AFIP."""
+
+    def __init__(self, servicio: str, fallas: int = AFIP_CB_FALLAS, espera: float = AFIP_CB_ESPERA_S):
+        self.servicio = servicio
+        self.fallas_para_abrir = fallas
+        self.espera = espera
+        self._estado = CERRADO
+        self._fallas = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._ultimo_error: str | None = None
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        """Levanta CircuitoAbierto si no se debe llamar al servicio ahora.
+
+        True si esta llamada es la prueba del circuito semiabierto: quien la
+        recibe tiene que registrar el resultado o soltar_prueba().
+        """
+        if self.fallas_para_abrir <= 0:
+            return False
+        with self._lock:
+            if self._estado == CERRADO:
+                return False
+            restante = self._abierto_desde + self.espera - time.monotonic()
+            if self._estado == ABIERTO and restante <= 0:
+                self._estado = SEMIABIERTO
+                self._prueba_en_curso = False
+            if self._estado == SEMIABIERTO and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+        raise CircuitoAbierto(self.servicio, max(restante, 0.0))
+
+    def soltar_prueba(self) -> None:
+        """La prueba terminó sin resultado (excepción ajena a AFIP): otra llamada puede probar."""
+        with self._lock:
+            if self._estado == SEMIABIERTO:
+                self._prueba_en_curso = False
+
+    def registrar_exito(self) -> None:
+        with self._lock:
+            if self._estado != CERRADO:
+                print(f"[AFIP] circuito {self.servicio} cerrado", flush=True)
+            self._estado = CERRADO
+            self._fallas = 0
+            self._prueba_en_curso = False
+
+    def registrar_falla(self, error: ErrorAFIP) -> None:
+        """Solo cuentan las fallas reintentables: un rechazo es el servicio respondiendo."""
+        if not error.reintentable:
+            self.registrar_exito()
+            return
+        if self.fallas_para_abrir <= 0:
+            return
+        with self._lock:
+            self._fallas += 1
+            self._ultimo_error = str(error)
+            if self._estado == SEMIABIERTO or self._fallas >= self.fallas_para_abrir:
+                if self._estado != ABIERTO:
+                    print(f"[AFIP] circuito {self.servicio} abierto por {self.espera:.0f}s "
+                          f"({self._fallas} fallas, ultima: {error})", flush=True)
+                self._estado = ABIERTO
+                self._abierto_desde = time.monotonic()
+                self._prueba_en_curso = False
+
+    def estado(self) -> dict:
+        with self._lock:
+            estado = self._estado
+            restante = self._abierto_desde + self.espera - time.monotonic()
+            if estado == ABIERTO and restante <= 0:
+                estado = SEMIABIERTO
+            return {
+                'estado': estado,
+                'fallas': self._fallas,
+                'reabre_en_s': round(max(restante, 0.0), 1) if estado == ABIERTO else 0,
+                'ultimo_error': self._ultimo_error,
+            }
+
+
+_circuitos: dict[str, CircuitBreaker] = {}
+_circuitos_lock = threading.Lock()
+
+
+def circuito_servicio(servicio: str, url: str) -> CircuitBreaker:
+    """Circuito compartido del servicio en ese host (se crea al primer uso)."""
+    clave = f"{servicio}@{urlsplit(url).netloc}"
+    with _circuitos_lock:
+        if clave not in _circuitos:
+            _circuitos[clave] = CircuitBreaker(clave)
+        return _circuitos[clave]
+
+
+def estado_circuitos(solo_problemas: bool = False) -> dict[str, dict]:
+    """{'wsfe@host': {'estado', 'fallas', 'reabre_en_s', 'ultimo_error'}} de los circuitos usados."""
+    with _circuitos_lock:
+        circuitos = list(_circuitos.items())
+    estados = {clave: c.estado() for clave, c in circuitos}
+    if solo_problemas:
+        estados = {clave: e for clave, e in estados.items() if e['estado'] != CERRADO}
+    return estados
@@ -0,0 +1,191 @@
+# src/afip_streams_vacios.py
+# Cache negativa de streams (tipo, PV) vacíos por CUIT consultado.
+#
+# La enumeración WSFEv1 pregunta FECompUltimoAutorizado para ~10 tipos × cada
+# PV, y la mayoría de los CUITs usa 1-3 combinaciones: el resto devuelve 0
+# siempre. Acá se recuerda qué combinaciones dieron 0 para no volver a
+# preguntar en cada consulta.
+#
+# Diseño:
+#   - Clave (cuit, ambiente, tipo, pv). Persistido en afip_streams_vacios
+#     (011_afip_streams_vacios.sql) si init_pool() fue llamado; si no, solo en
+#     memoria del proceso.
+#   - Memoria: el mapa de vacíos de un CUIT se lee de la DB de una vez (una
+#     query por CUIT, no por stream) y se relee cada AFIP_VACIOS_MEMORIA_S.
+#   - Un vacío de menos de AFIP_VACIOS_REFRESCO_MIN se da por bueno; entre eso
+#     y AFIP_VACIOS_TTL_MIN se da por bueno pero se re-verifica en background
+#     (la consulta no espera, una verificación por stream a la vez); más viejo
+#     se ignora y se pregunta a AFIP.
+#   - Apenas AFIP informa un número > 0 el stream sale del mapa. El primer
+#     comprobante de un stream marcado vacío se ve en la primera consulta
+#     después de la re-verificación: hasta AFIP_VACIOS_REFRESCO_MIN más una
+#     consulta de demora. Un PV nuevo nunca está en el mapa.
+#
+# Uso (WSFEv1Client.obtener_ultimo_comprobante):
+#   estado = consultar(cuit, ambiente, tipo, pv)      # None | VIGENTE | REFRESCAR
+#   registrar(cuit, ambiente, tipo, pv, ultimo)       # después de preguntar a AFIP
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from src.db import pool_disponible
+
+AFIP_VACIOS_TTL_MIN = float(os.getenv("AFIP_VACIOS_TTL_MIN", 360))
+AFIP_VACIOS_REFRESCO_MIN = float(os.getenv("AFIP_VACIOS_REFRESCO_MIN", 30))
+AFIP_VACIOS_MEMORIA_S = float(os.getenv("AFIP_VACIOS_MEMORIA_S", 60))
+
+VIGENTE = 'vigente'
+REFRESCAR = 'refrescar'
+
+# (cuit, ambiente) -> {'cargado': monotonic, 'vacios': {(tipo, pv): verificado_at}}
+_mapas: dict[tuple[str, str], dict] = {}
+_lock = threading.Lock()
+
+# Verificaciones en background (una por stream a la vez)
+_en_curso: set[tuple] = set()
+_pool: ThreadPoolExecutor | None = None
+_pool_pid: int | None = None
+
+# La tabla no existe (falta la migración): seguir solo en memoria
+_sin_tabla = False
+
+
+def consultar(cuit: str, ambiente: str, tipo: int, pv: int) -> str | None:
+    """VIGENTE / REFRESCAR si el stream se sabe vacío, None si hay que preguntar a AFIP."""
+    if AFIP_VACIOS_TTL_MIN <= 0:
+        return None
+    vacios = _mapa(cuit, ambiente)
+    with _lock:
+        verificado = vacios.get((int(tipo), int(pv)))
+    if verificado is None:
+        return None
+    edad = datetime.now(timezone.utc) - verificado
+    if edad > timedelta(minutes=AFIP_VACIOS_TTL_MIN):
+        return None
+    if edad > timedelta(minutes=AFIP_VACIOS_REFRESCO_MIN):
+        return REFRESCAR
+    return VIGENTE
+
+
+def registrar(cuit: str, ambiente: str, tipo: int, pv: int, ultimo: int) -> None:
+    """Guardar lo que respondió AFIP: 0 marca el stream vacío, > 0 lo saca del mapa."""
+    clave = (int(tipo), int(pv))
+    vacios = _mapa(cuit, ambiente)
+    with _lock:
+        if ultimo > 0:
+            if vacios.pop(clave, None) is None:
+                return          # no estaba marcado: nada que borrar
+        else:
+            vacios[clave] = datetime.now(timezone.utc)
+
+    if not _usar_store():
+        return
+    from src.db import get_cursor
+
+    try:
+        with get_cursor() as cur:
+            if ultimo > 0:
+                cur.execute("""
+                    DELETE FROM afip_streams_vacios
+                    WHERE cuit = %s AND ambiente = %s AND tipo = %s AND pv = %s
+                """, (cuit, ambiente, *clave))
+            else:
+                cur.execute("""
+                    INSERT INTO afip_streams_vacios (cuit, ambiente, tipo, pv, verificado_at)
+                    VALUES (%s, %s, %s, %s, NOW())
+                    ON CONFLICT (cuit, ambiente, tipo, pv) DO UPDATE
+                    SET verificado_at = NOW()
+                """, (cuit, ambiente, *clave))
+    except Exception as e:
+        _desactivar_db(e)
+
+
+def refrescar_en_background(cuit: str, ambiente: str, tipo: int, pv: int,
+                            verificar: Callable[[], object]) -> None:
+    """Re-verificar un vacío sin bloquear la consulta.
+
+    verificar: pregunta a AFIP y llama a registrar() con el resultado
+        (WSFEv1Client._ultimo_desde_afip).
+    """
+    global _pool, _pool_pid
+    clave = (cuit, ambiente, int(tipo), int(pv))
+    with _lock:
+        if clave in _en_curso:
+            return
+        _en_curso.add(clave)
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='afip-vacios')
+            _pool_pid = os.getpid()
+        pool = _pool
+
+    def _tarea():
+        try:
+            verificar()
+        except Exception as e:
+            print(f"[VACIOS] cuit={cuit} tipo={tipo} pv={pv} no se pudo re-verificar: {e}", flush=True)
+        finally:
+            with _lock:
+                _en_curso.discard(clave)
+
+    pool.submit(_tarea)
+
+
+# ---------------------------------------------------------------------------
+# Internos
+# ---------------------------------------------------------------------------
+
+def _mapa(cuit: str, ambiente: str) -> dict:
+    """Vacíos conocidos del CUIT (mismo dict mientras no haya que releer la DB)."""
+    clave = (cuit, ambiente)
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _mapas.get(clave)
+        if entrada and (not _usar_store() or ahora - entrada['cargado'] < AFIP_VACIOS_MEMORIA_S):
+            return entrada['vacios']
+
+    vacios = _db_leer(cuit, ambiente) if _usar_store() else None
+    with _lock:
+        entrada = _mapas.get(clave)
+        if vacios is None:
+            # Sin DB (o falló): conservar lo que había en memoria
+            vacios = entrada['vacios'] if entrada else {}
+        _mapas[clave] = {'cargado': ahora, 'vacios': vacios}
+        return vacios
+
+
+def _db_leer(cuit: str, ambiente: str) -> dict | None:
+    from src.db import get_cursor
+
+    try:
+        with get_cursor() as cur:
+            cur.execute("""
+                SELECT tipo, pv, verificado_at
+                FROM afip_streams_vacios
+                WHERE cuit = %s AND ambiente = %s
+                  AND verificado_at > NOW() - make_interval(mins => %s)
+            """, (cuit, ambiente, int(AFIP_VACIOS_TTL_MIN)))
+            return {(r['tipo'], r['pv']): r['verificado_at'] for r in cur.fetchall()}
+    except Exception as e:
+        _desactivar_db(e)
+        return None
+
+
+def _usar_store() -> bool:
+    """PostgreSQL disponible y con afip_streams_vacios migrada (011)."""
+    return not _sin_tabla and pool_disponible()
+
+
+def _desactivar_db(e: Exception) -> None:
+    global _sin_tabla
+    import psycopg
+    if isinstance(e, psycopg.errors.UndefinedTable):
+        _sin_tabla = True
+        print("[VACIOS] falta afip_streams_vacios (011_afip_streams_vacios.sql): cache solo en memoria", flush=True)
+    else:
+        print(f"[VACIOS] error de DB: {e}", flush=True)
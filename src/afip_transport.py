@@ -0,0 +1,133 @@
+# src/afip_transport.py
+# Transporte HTTPS compartido por todos los clientes SOAP de AFIP.
+#
+# Diseño:
+#   - Una sola requests.Session por proceso, montada con AFIPHTTPSAdapter
+#     (src/ssl_afip_config.py): conexiones keep-alive por host y reanudación
+#     de sesión TLS, en lugar de un handshake completo por request.
+#   - AFIP_POOL_HOSTS: hosts distintos con pool propio (WSAA, WSFE, WSMTXCA... × ambiente).
+#   - AFIP_CONEXIONES_POR_HOST: tope de conexiones simultáneas por host. Con el
+#     pool lleno los threads esperan una conexión libre (pool_block) en lugar
+#     de abrir conexiones extra que se descartan.
+#   - Fork-safe: si el proceso cambió (workers Gunicorn / multiprocessing) se
+#     crea una sesión nueva; los sockets del padre no se comparten.
+#   - AFIP_URL_BASE (p. ej. http://127.0.0.1:8085) redirige todas las URLs de
+#     AFIP a un servidor local con los mismos paths (tests_y_pruebas/simulador_afip.py).
+#     Vacía en producción.
+#   - post_afip: POST SOAP con la política de src/afip_resiliencia.py: circuito
+#     del servicio, token bucket del solicitante (src/afip_limites.py),
+#     clasificación del error y reintentos con backoff + jitter.
+#
+# Uso:
+#   from src.afip_transport import post_afip
+#   xml = post_afip('wsfe', url, soap, headers, solicitante=cuit)   # ErrorAFIP si falla
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.afip_limites import bucket_solicitante
+from src.afip_resiliencia import (AFIP_REINTENTOS, circuito_servicio, clasificar_excepcion,
+                                  clasificar_respuesta, espera_reintento)
+from src.ssl_afip_config import AFIPHTTPSAdapter
+
+AFIP_POOL_HOSTS = int(os.getenv("AFIP_POOL_HOSTS", 10))
+AFIP_CONEXIONES_POR_HOST = int(os.getenv("AFIP_CONEXIONES_POR_HOST", 16))
+# (conexión, lectura): un host caído corta en segundos, no a los 30 s de lectura
+AFIP_TIMEOUT = (float(os.getenv("AFIP_TIMEOUT_CONEXION_S", 5)), float(os.getenv("AFIP_TIMEOUT_LECTURA_S", 30)))
+
+_sesion: requests.Session | None = None
+_sesion_pid: int | None = None
+_lock = threading.Lock()
+
+
+def _crear_sesion() -> requests.Session:
+    sesion = requests.Session()
+    sesion.mount('https://', AFIPHTTPSAdapter(pool_connections=AFIP_POOL_HOSTS,
+                                              pool_maxsize=AFIP_CONEXIONES_POR_HOST,
+                                              pool_block=True))
+    # http:// solo se usa contra el simulador local (AFIP_URL_BASE)
+    sesion.mount('http://', HTTPAdapter(pool_connections=AFIP_POOL_HOSTS,
+                                        pool_maxsize=AFIP_CONEXIONES_POR_HOST,
+                                        pool_block=True))
+    sesion.verify = False
+    return sesion
+
+
+def sesion_afip() -> requests.Session:
+    """Sesión HTTPS compartida del proceso (thread-safe, no cerrar)."""
+    global _sesion, _sesion_pid
+    pid = os.getpid()
+    if _sesion is None or _sesion_pid != pid:
+        with _lock:
+            if _sesion is None or _sesion_pid != pid:
+                _sesion = _crear_sesion()
+                _sesion_pid = pid
+    return _sesion
+
+
+def url_afip(url: str) -> str:
+    """URL efectiva de un servicio AFIP: igual, o redirigida a AFIP_URL_BASE.
+
+    'https://servicios1.afip.gov.ar/wsfev1/service.asmx?WSDL' con
+    AFIP_URL_BASE=http://127.0.0.1:8085 -> 'http://127.0.0.1:8085/wsfev1/service.asmx?WSDL'
+    """
+    base = os.getenv("AFIP_URL_BASE", "").strip()
+    if not base:
+        return url
+    partes = urlsplit(url)
+    destino = base.rstrip("/") + partes.path
+    return f"{destino}?{partes.query}" if partes.query else destino
+
+
+def post_afip(servicio: str, url: str, data: str, headers: dict, solicitante: str | None = None,
+              timeout=AFIP_TIMEOUT, reintentos: int = AFIP_REINTENTOS) -> str:
+    """POST SOAP a un servicio AFIP ('wsaa', 'wsfe', 'wsfex', 'wsmtxca'). Retorna el XML.
+
+    Levanta ErrorAFIP (src/afip_resiliencia.py): CircuitoAbierto sin tocar la
+    red, Rechazo sin reintentar, Throttling/Transitorio tras agotar los
+    reintentos. Un 602 "no existe" vuelve como respuesta normal.
+    solicitante: CUIT del certificado para el token bucket (None = sin límite).
+    """
+    circuito = circuito_servicio(servicio, url)
+    # Una vez por llamada: si esta llamada es la prueba del circuito semiabierto,
+    # sus reintentos no deben chocar contra su propia prueba en curso
+    es_prueba = circuito.permitir()
+    registrado = False
+    intento = 0
+    try:
+        while True:
+            if solicitante:
+                bucket_solicitante(solicitante, servicio).adquirir()
+
+            try:
+                response = sesion_afip().post(url, data=data, headers=headers, timeout=timeout)
+                error = clasificar_respuesta(servicio, response)
+            except requests.RequestException as e:
+                error = clasificar_excepcion(servicio, e)
+
+            if error is None:
+                circuito.registrar_exito()
+                registrado = True
+                return response.text
+
+            # Al circuito llega el resultado de la llamada, no cada intento: una
+            # falla suelta que el reintento resuelve no acerca la apertura
+            if not error.reintentable or intento >= reintentos:
+                circuito.registrar_falla(error)
+                registrado = True
+                raise error
+            espera = espera_reintento(intento, error)
+            print(f"[AFIP] {error} - reintento {intento + 1}/{reintentos} en {espera:.2f}s", flush=True)
+            time.sleep(espera)
+            intento += 1
+    finally:
+        if es_prueba and not registrado:
+            # Excepción ajena a AFIP (bucket, cancelación, ...): liberar la prueba
+            circuito.soltar_prueba()
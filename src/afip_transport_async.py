@@ -0,0 +1,137 @@
+# src/afip_transport_async.py
+# Transporte asyncio (aiohttp) para los clientes SOAP async de AFIP.
+#
+# Misma política que src/afip_transport.py, sin un thread por llamada:
+#   - Una aiohttp.ClientSession por event loop, con el contexto SSL de
+#     src/ssl_afip_config.py (cifrados viejos, sin verificación) y keep-alive.
+#     AFIP_ASYNC_CONEXIONES / AFIP_ASYNC_CONEXIONES_POR_HOST acotan las
+#     conexiones abiertas; los requests de más esperan una libre.
+#   - post_afip_async: circuito del servicio, token bucket del solicitante,
+#     clasificación del error y reintentos con backoff + jitter
+#     (src/afip_resiliencia.py, src/afip_limites.py), compartidos con los
+#     clientes sync del mismo proceso.
+#   - AFIP_URL_BASE se respeta igual (los clientes usan url_afip()).
+#   - La sesión vive lo que el loop: cerrar con cerrar_transporte_async() antes
+#     de que termine (fin de asyncio.run, de una vista async de Flask, etc.).
+#
+# aiohttp es opcional (requirements.txt): solo lo necesitan los clientes async.
+#
+# Uso:
+#   from src.afip_transport_async import post_afip_async
+#   xml = await post_afip_async('wsfe', url, soap, headers, solicitante=cuit)
+
+from __future__ import annotations
+
+import asyncio
+import os
+import weakref
+from typing import Awaitable, Callable
+
+from src.afip_limites import bucket_solicitante
+from src.afip_resiliencia import (AFIP_REINTENTOS, ErrorAFIP, Rechazo, Transitorio,
+                                  circuito_servicio, clasificar_respuesta, espera_reintento)
+from src.afip_transport import AFIP_TIMEOUT
+
+AFIP_ASYNC_CONEXIONES = int(os.getenv("AFIP_ASYNC_CONEXIONES", 200))
+AFIP_ASYNC_CONEXIONES_POR_HOST = int(os.getenv("AFIP_ASYNC_CONEXIONES_POR_HOST", 100))
+
+# event loop -> ClientSession
+_sesiones: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+class _Respuesta:
+    """Respuesta ya leída, con la interfaz de requests.Response que usa clasificar_respuesta."""
+
+    def __init__(self, status_code: int, headers, text: str):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+
+def sesion_afip_async():
+    """ClientSession del event loop actual (se crea al primer uso, no cerrar a mano)."""
+    import aiohttp
+    from src.ssl_afip_config import crear_contexto_afip
+
+    loop = asyncio.get_running_loop()
+    sesion = _sesiones.get(loop)
+    if sesion is None or sesion.closed:
+        conector = aiohttp.TCPConnector(ssl=crear_contexto_afip(),
+                                        limit=AFIP_ASYNC_CONEXIONES,
+                                        limit_per_host=AFIP_ASYNC_CONEXIONES_POR_HOST)
+        conexion, lectura = AFIP_TIMEOUT
+        sesion = aiohttp.ClientSession(
+            connector=conector,
+            timeout=aiohttp.ClientTimeout(sock_connect=conexion, sock_read=lectura),
+        )
+        _sesiones[loop] = sesion
+    return sesion
+
+
+async def cerrar_transporte_async() -> None:
+    """Cerrar la sesión del event loop actual (si hay)."""
+    sesion = _sesiones.pop(asyncio.get_running_loop(), None)
+    if sesion is not None and not sesion.closed:
+        await sesion.close()
+
+
+def clasificar_excepcion_async(servicio: str, e: Exception) -> ErrorAFIP:
+    """Excepción de aiohttp -> ErrorAFIP (equivalente a clasificar_excepcion)."""
+    import aiohttp
+
+    if isinstance(e, (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+        return Transitorio(servicio, f"{type(e).__name__}: {e}")
+    return Rechazo(servicio, f"{type(e).__name__}: {e}")
+
+
+async def post_afip_async(servicio: str, url: str, data: str, headers: dict,
+                          solicitante: str | None = None, reintentos: int = AFIP_REINTENTOS) -> str:
+    """POST SOAP asyncio a un servicio AFIP. Mismo contrato que post_afip (ErrorAFIP si falla)."""
+    import aiohttp
+
+    circuito = circuito_servicio(servicio, url)
+    # Una vez por llamada: si esta llamada es la prueba del circuito semiabierto,
+    # sus reintentos no deben chocar contra su propia prueba en curso
+    es_prueba = circuito.permitir()
+    registrado = False
+    intento = 0
+    try:
+        while True:
+            if solicitante:
+                await bucket_solicitante(solicitante, servicio).adquirir_async()
+
+            try:
+                async with sesion_afip_async().post(url, data=data.encode('utf-8'), headers=headers) as r:
+                    response = _Respuesta(r.status, r.headers, await r.text())
+                error = clasificar_respuesta(servicio, response)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = clasificar_excepcion_async(servicio, e)
+
+            if error is None:
+                circuito.registrar_exito()
+                registrado = True
+                return response.text
+
+            if not error.reintentable or intento >= reintentos:
+                circuito.registrar_falla(error)
+                registrado = True
+                raise error
+            espera = espera_reintento(intento, error)
+            print(f"[AFIP] {error} - reintento {intento + 1}/{reintentos} en {espera:.2f}s", flush=True)
+            await asyncio.sleep(espera)
+            intento += 1
+    finally:
+        if es_prueba and not registrado:
+            # Excepción ajena a AFIP (bucket, cancelación, ...): liberar la prueba
+            circuito.soltar_prueba()
+
+
+def desde_hilo(corrutina: Callable[[], Awaitable]) -> Callable:
+    """Versión bloqueante de `corrutina` para código sync que corre en asyncio.to_thread.
+
+    Los caches compartidos (TA, parámetros) son sync y serializan la carga con
+    locks de proceso/DB; se les pasa esto como función de carga y la llamada a
+    AFIP corre igual en el event loop. Llamar desde el loop (lo captura).
+    """
+    loop = asyncio.get_running_loop()
+    return lambda: asyncio.run_coroutine_threadsafe(corrutina(), loop).result()
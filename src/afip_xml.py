@@ -0,0 +1,107 @@
+# src/afip_xml.py
+# Parser compartido de respuestas SOAP de AFIP (WSFEv1, WSFEXv1, WSMTXCA).
+#
+# Diseño:
+#   - Una sola pasada por el árbol: escalares, grupos repetidos (AlicIva,
+#     Tributo, item...) y tags múltiples (Pto_venta...) se extraen juntos, en
+#     lugar de un root.iter() por cada cosa que se busca.
+#   - Nombre local del tag (sin namespace) memoizado por tag completo: los
+#     schemas de AFIP tienen pocas decenas de tags, no se re-arma el string
+#     en cada elemento de cada respuesta.
+#   - Backend lxml si está instalado (parseo en C, ~3-5x más rápido), si no
+#     xml.etree.ElementTree. AFIP_XML_BACKEND=etree fuerza ElementTree.
+#     El parser lxml no resuelve entidades ni accede a la red.
+#
+# Uso:
+#   campos, listas = extraer(xml, grupos=('AlicIva', 'Tributo'))
+#   campos['CbteFch'], listas['AlicIva'] -> [{'Id': '5', 'BaseImp': ...}, ...]
+
+from __future__ import annotations
+
+import os
+import threading
+import xml.etree.ElementTree as ET
+
+try:
+    from lxml import etree as _lxml
+except ImportError:  # lxml es opcional
+    _lxml = None
+
+BACKEND = "lxml" if _lxml is not None and os.getenv("AFIP_XML_BACKEND", "auto") != "etree" else "etree"
+
+_locales: dict[str, str] = {}
+_parsers = threading.local()   # los XMLParser de lxml no son thread-safe
+
+
+def nombre_local(tag: str) -> str:
+    """'{ns}CbteFch' -> 'CbteFch' (memoizado)."""
+    local = _locales.get(tag)
+    if local is None:
+        local = tag.rsplit("}", 1)[-1]
+        _locales[tag] = local
+    return local
+
+
+def parsear(xml: str | bytes):
+    """Parsear el XML con el backend disponible. Retorna el elemento raíz."""
+    if BACKEND == "lxml":
+        parser = getattr(_parsers, "parser", None)
+        if parser is None:
+            parser = _lxml.XMLParser(resolve_entities=False, no_network=True,
+                                     remove_comments=True, remove_pis=True)
+            _parsers.parser = parser
+        if isinstance(xml, str):
+            # lxml rechaza str con declaración de encoding
+            xml = xml.encode("utf-8")
+        return _lxml.fromstring(xml, parser)
+    return ET.fromstring(xml)
+
+
+def extraer(xml, grupos=(), multiples=()) -> tuple[dict, dict]:
+    """Extraer todo lo necesario de una respuesta en una pasada.
+
+    Args:
+        xml: respuesta (str/bytes) o elemento raíz ya parseado.
+        grupos: tags repetidos cuyos hijos directos se devuelven como dict
+            (texto strip, '' si vacío), p. ej. ('AlicIva', 'Tributo').
+        multiples: tags cuyo texto se devuelve como lista de todas las apariciones.
+
+    Returns:
+        (campos, listas): campos = {tag_local: texto} de todo elemento con texto
+        no vacío (la última aparición gana); listas = {tag: [dict|str, ...]}
+        para cada tag de grupos/multiples (lista vacía si no aparece).
+    """
+    raiz = parsear(xml) if isinstance(xml, (str, bytes)) else xml
+    grupos = frozenset(grupos)
+    multiples = frozenset(multiples)
+    listas = {tag: [] for tag in grupos | multiples}
+    campos = {}
+
+    for elem in raiz.iter():
+        tag = elem.tag
+        if not isinstance(tag, str):
+            continue
+        tag = nombre_local(tag)
+        texto = elem.text
+        if texto:
+            texto = texto.strip()
+            if texto:
+                campos[tag] = texto
+                if tag in multiples:
+                    listas[tag].append(texto)
+        if tag in grupos:
+            item = {nombre_local(h.tag): (h.text or "").strip()
+                    for h in elem if isinstance(h.tag, str)}
+            if item:
+                listas[tag].append(item)
+
+    return campos, listas
+
+
+def primer_texto(xml, tag_buscado: str) -> str | None:
+    """Texto del primer elemento con ese tag local (corta al encontrarlo)."""
+    raiz = parsear(xml) if isinstance(xml, (str, bytes)) else xml
+    for elem in raiz.iter():
+        if isinstance(elem.tag, str) and nombre_local(elem.tag) == tag_buscado:
+            return elem.text
+    return None
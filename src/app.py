@@ -1,7 +1,7 @@
 ﻿# -*- coding: utf-8 -*-
 
 # --- IMPORTS ---
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file, flash, g
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file, flash, g, Response
 from pathlib import Path
 import os
 import requests as _requests
@@ -17,10 +17,17 @@ except ImportError:
 from flask_wtf.csrf import CSRFProtect
 
 from src.config import Config
-from src.db import init_pool, close_pool, health_check, get_cursor
+from src.db import init_pool, close_pool, health_check, get_cursor, estadisticas_pool, liberar_conexion_request
+from src.jobs import encolar_job, obtener_job, leer_eventos
 from src.auth import auth_bp
 from src.auth.decorators import login_required, role_required
-from src.ssl_afip_config import crear_session_afip
+from src.afip_resiliencia import Rechazo
+from src.afip_monitor import detalle_servicios, estado_servicios, historial_servicios, iniciar_monitor
+from src.wsaa_renovador import iniciar_renovador
+from src.auth.session_cache import iniciar_escucha_sesiones
+from src.exportacion import guardar_facturas as _guardar_facturas
+from src.consultas import (consultar_ambos_servicios, consultar_wsfev1_interno, consultar_wsmtxca_interno,
+                           determinar_web_service, ejecutar_consulta_unificada)
 
 # Configurar rutas absolutas para templates y static
 template_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
@@ -40,9 +47,21 @@ app.register_blueprint(auth_bp)
 # Inicializar pool PostgreSQL
 init_pool()
 
+# Monitor AFIP en background (estado cacheado para /admin/health y la consulta unificada)
+iniciar_monitor()
+
+# Tickets WSAA precalentados y renovados en background (ninguna consulta espera el loginCms)
+iniciar_renovador()
+
+# Cache de sesiones validadas: listener de invalidaciones (LISTEN/NOTIFY)
+iniciar_escucha_sesiones()
+
 import atexit
 atexit.register(close_pool)
 
+# Conexión por request (DB_CONEXION_POR_REQUEST=1): devolverla al pool al terminar
+app.teardown_appcontext(liberar_conexion_request)
+
 
 
 """Endpoint actualizado: descarga/enumeración estructurada de comprobantes AFIP
@@ -390,8 +409,7 @@ def buscar_cliente():
                     SELECT id, tipo_documento, nro_documento, cuit, apellido, nombres,
                            fecha_nacimiento, condicion_iva, categoria_monotributo
                     FROM clientes
-                    WHERE estudio_id = %s
-                      AND REPLACE(REPLACE(cuit, '-', ''), ' ', '') = %s
+                    WHERE estudio_id = %s AND cuit_digitos = %s
                 """, (estudio_id, busqueda))
             elif busqueda.isdigit():
                 cur.execute("""
@@ -412,23 +430,7 @@ def buscar_cliente():
             clientes = cur.fetchall()
 
         if clientes:
-            clientes_list = []
-            for c in clientes:
-                cliente_dict = {
-                    'id': c['id'],
-                    'tipoDocumento': c['tipo_documento'],
-                    'nroDocumento': c['nro_documento'],
-                    'cuit_dni': c['cuit'],
-                    'CUIT': c['cuit'],
-                    'apellido': c['apellido'],
-                    'nombres': c['nombres'],
-                    'nombre': f"{c['apellido']}, {c['nombres']}",
-                    'fechaNacimiento': str(c['fecha_nacimiento']) if c['fecha_nacimiento'] else None,
-                    'condicionIVA': c['condicion_iva'],
-                    'categoriaMonotriibuto': c['categoria_monotributo']
-                }
-                clientes_list.append(cliente_dict)
-            return jsonify({'clientes': clientes_list})
+            return jsonify({'clientes': [_cliente_json(c) for c in clientes]})
         else:
             return jsonify({
                 'clientes': [],
@@ -442,6 +444,46 @@ def buscar_cliente():
             'error': 'Error interno del servidor'
         }), 500
 
+
+@app.route('/clientes/sugerencias', methods=['GET'])
+@login_required
+@role_required('admin', 'contador')
+def clientes_sugerencias():
+    """Typeahead de clientes: ?q=texto&limite=10&pagina=1, ordenado por relevancia."""
+    from src.clientes_busqueda import LIMITE_DEFAULT, buscar_clientes
+
+    q = request.args.get('q', '')
+    limite = request.args.get('limite', LIMITE_DEFAULT, type=int)
+    pagina = max(1, request.args.get('pagina', 1, type=int))
+    try:
+        filas, hay_mas = buscar_clientes(g.user['estudio_id'], q, limite, pagina)
+    except Exception as e:
+        print(f"Error en clientes_sugerencias: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error interno del servidor'}), 500
+
+    return jsonify({
+        'clientes': [_cliente_json(c) for c in filas],
+        'pagina': pagina,
+        'hay_mas': hay_mas,
+    })
+
+
+def _cliente_json(c):
+    """Fila de clientes -> formato JSON de /buscar-cliente (lo usan app.js y consulta_unificada)."""
+    return {
+        'id': c['id'],
+        'tipoDocumento': c['tipo_documento'],
+        'nroDocumento': c['nro_documento'],
+        'cuit_dni': c['cuit'],
+        'CUIT': c['cuit'],
+        'apellido': c['apellido'],
+        'nombres': c['nombres'],
+        'nombre': f"{c['apellido']}, {c['nombres']}",
+        'fechaNacimiento': str(c['fecha_nacimiento']) if c['fecha_nacimiento'] else None,
+        'condicionIVA': c['condicion_iva'],
+        'categoriaMonotriibuto': c['categoria_monotributo']
+    }
+
 @app.route('/wsmtxca')
 @login_required
 @role_required('admin', 'contador')
@@ -735,7 +777,15 @@ def consultar_wsfev1():
         )
         
         return jsonify(resultado), 200
-        
+
+    except Rechazo as e:
+        # Error de AFIP distinto de 602 "no existe" (p. ej. CUIT no relacionado)
+        return jsonify({
+            'success': False,
+            'error': 'AFIP rechazó la consulta',
+            'detalle': str(e)
+        }), 502
+
     except Exception as e:
         print(f"❌ Error en consultar_wsfev1: {e}")
         import traceback
@@ -973,7 +1023,8 @@ def config_afip():
         """, (estudio_id,))
         configs = cur.fetchall()
 
-    return render_template('config_afip.html', configs=configs)
+    from src.afip_parametros import AFIP_PARAMETROS_TTL_H
+    return render_template('config_afip.html', configs=configs, parametros_ttl_h=AFIP_PARAMETROS_TTL_H)
 
 
 @app.route('/config/afip/upload', methods=['POST'])
@@ -981,7 +1032,7 @@ def config_afip():
 @role_required('admin', 'contador', 'superadmin')
 def config_afip_upload():
     """Subir certificado y clave AFIP."""
-    from src.afip_credentials import encrypt_portal_password
+    from src.afip_credentials import encrypt_portal_password, invalidar_credenciales
 
     estudio_id = g.user['estudio_id']
     if estudio_id is None:
@@ -1038,6 +1089,8 @@ def config_afip_upload():
             """, (estudio_id, solicitante_cuit, cert_blob, key_blob,
                   ambiente, portal_cuit, portal_password_enc))
 
+        # La config nueva reemplaza a las anteriores del estudio
+        invalidar_credenciales(estudio_id=estudio_id)
         flash('Configuracion AFIP guardada correctamente.', 'success')
     except Exception as e:
         flash(f'Error al guardar: {e}', 'error')
@@ -1050,6 +1103,8 @@ def config_afip_upload():
 @role_required('admin', 'contador', 'superadmin')
 def config_afip_toggle(config_id):
     """Activar/desactivar una configuracion AFIP."""
+    from src.afip_credentials import invalidar_credenciales
+
     estudio_id = g.user['estudio_id']
     with get_cursor() as cur:
         cur.execute(
@@ -1060,10 +1115,12 @@ def config_afip_toggle(config_id):
             flash('Configuracion no encontrada.', 'error')
             return redirect(url_for('config_afip'))
 
+        # updated_at: los demás workers ven el cambio en su cache de credenciales
         cur.execute(
-            "UPDATE estudios_afip SET activo = %s WHERE id = %s AND estudio_id = %s",
+            "UPDATE estudios_afip SET activo = %s, updated_at = NOW() WHERE id = %s AND estudio_id = %s",
             (not cfg['activo'], config_id, estudio_id))
 
+    invalidar_credenciales(config_id=config_id)
     flash('Estado actualizado.', 'success')
     return redirect(url_for('config_afip'))
 
@@ -1073,6 +1130,8 @@ def config_afip_toggle(config_id):
 @role_required('admin', 'contador', 'superadmin')
 def config_afip_delete(config_id):
     """Eliminar una configuracion AFIP."""
+    from src.afip_credentials import invalidar_credenciales
+
     estudio_id = g.user['estudio_id']
     with get_cursor() as cur:
         cur.execute(
@@ -1081,11 +1140,40 @@ def config_afip_delete(config_id):
         if cur.rowcount == 0:
             flash('Configuracion no encontrada.', 'error')
         else:
+            invalidar_credenciales(config_id=config_id)
             flash('Configuracion eliminada.', 'success')
 
     return redirect(url_for('config_afip'))
 
 
+@app.route('/config/afip/parametros/invalidar', methods=['POST'])
+@login_required
+@role_required('admin', 'contador', 'superadmin')
+def config_afip_invalidar_parametros():
+    """Descartar la cache de parametros AFIP (PVs, tipos, monedas, alicuotas).
+
+    Con cuit: solo ese cliente. Sin cuit: todo lo del certificado del estudio
+    (superadmin sin estudio: toda la cache).
+    """
+    from src.afip_credentials import get_afip_credentials
+    from src.afip_parametros import invalidar_parametros
+
+    cuit = request.form.get('cuit', '').replace('-', '').replace(' ', '') or None
+    if cuit and (not cuit.isdigit() or len(cuit) != 11):
+        flash('CUIT invalido: debe tener 11 digitos.', 'error')
+        return redirect(request.referrer or url_for('config_afip'))
+
+    estudio_id = g.user['estudio_id']
+    solicitante = None
+    if estudio_id is not None:
+        solicitante = get_afip_credentials(estudio_id)['solicitante_cuit']
+
+    descartadas = invalidar_parametros(solicitante=solicitante, cuit=cuit)
+    print(f"[PARAMETROS] invalidados estudio={estudio_id} cuit={cuit or 'todos'} -> {descartadas}", flush=True)
+    flash(f'Parametros AFIP descartados ({descartadas}). Se vuelven a pedir en la proxima consulta.', 'success')
+    return redirect(request.referrer or url_for('config_afip'))
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # SUPERADMIN — gestión de estudios y membresías
 # ══════════════════════════════════════════════════════════════════════════════
@@ -1101,27 +1189,20 @@ def superadmin_dashboard():
     limite_vencimiento = hoy + timedelta(days=15)
 
     with get_cursor() as cur:
-        # KPIs
-        cur.execute("SELECT COUNT(*) AS total FROM estudios")
-        total = cur.fetchone()['total']
-
-        cur.execute("SELECT COUNT(*) AS c FROM estudios WHERE activo = TRUE")
-        activos = cur.fetchone()['c']
-
+        # KPIs: estudios + contadores precalculados (014_estudio_contadores.sql)
         cur.execute("""
-            SELECT COUNT(*) AS c FROM estudios
-            WHERE membresia_hasta IS NOT NULL AND membresia_hasta < %s
+            SELECT COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE e.activo) AS activos,
+                   COUNT(*) FILTER (WHERE e.membresia_hasta IS NOT NULL
+                                      AND e.membresia_hasta < %s) AS vencidos,
+                   COALESCE(SUM(ec.usuarios_activos), 0) AS total_usuarios,
+                   COALESCE(SUM(cm.consultas), 0) AS consultas_mes
+            FROM estudios e
+            LEFT JOIN estudio_contadores ec ON ec.estudio_id = e.id
+            LEFT JOIN estudio_consultas_mes cm
+                   ON cm.estudio_id = e.id AND cm.mes = mes_consulta(NOW())
         """, (hoy,))
-        vencidos = cur.fetchone()['c']
-
-        cur.execute("SELECT COUNT(*) AS c FROM usuarios WHERE activo = TRUE AND rol != 'superadmin'")
-        total_usuarios = cur.fetchone()['c']
-
-        cur.execute("""
-            SELECT COUNT(*) AS c FROM consultas_log
-            WHERE created_at >= DATE_TRUNC('month', NOW())
-        """)
-        consultas_mes = cur.fetchone()['c']
+        kpis = cur.fetchone()
 
         # Distribucion por plan
         cur.execute("""
@@ -1144,14 +1225,6 @@ def superadmin_dashboard():
         """, (limite_vencimiento,))
         por_vencer = cur.fetchall()
 
-    kpis = {
-        'total': total,
-        'activos': activos,
-        'vencidos': vencidos,
-        'total_usuarios': total_usuarios,
-        'consultas_mes': consultas_mes,
-    }
-
     return render_template('superadmin_dashboard.html',
                          kpis=kpis,
                          planes=planes,
@@ -1169,15 +1242,13 @@ def superadmin_panel():
     with get_cursor() as cur:
         cur.execute("""
             SELECT e.*,
-                   COUNT(DISTINCT u.id) AS total_usuarios,
-                   COUNT(DISTINCT c.id) AS total_clientes,
-                   (SELECT COUNT(*) FROM consultas_log cl
-                    WHERE cl.estudio_id = e.id
-                      AND cl.created_at >= DATE_TRUNC('month', NOW())) AS consultas_este_mes
+                   COALESCE(ec.usuarios_activos, 0) AS total_usuarios,
+                   COALESCE(ec.clientes, 0) AS total_clientes,
+                   COALESCE(cm.consultas, 0) AS consultas_este_mes
             FROM estudios e
-            LEFT JOIN usuarios u ON u.estudio_id = e.id AND u.activo = TRUE
-            LEFT JOIN clientes c ON c.estudio_id = e.id
-            GROUP BY e.id
+            LEFT JOIN estudio_contadores ec ON ec.estudio_id = e.id
+            LEFT JOIN estudio_consultas_mes cm
+                   ON cm.estudio_id = e.id AND cm.mes = mes_consulta(NOW())
             ORDER BY e.created_at DESC
         """)
         estudios = cur.fetchall()
@@ -1324,7 +1395,9 @@ def superadmin_crear_estudio():
 @role_required('superadmin')
 def superadmin_health():
     """Estado de servicios AFIP y sesiones del sistema."""
-    estado_afip = _afip_health_check()
+    estado_afip = estado_servicios()
+    detalle_afip = detalle_servicios()
+    historial_afip = historial_servicios()
 
     with get_cursor() as cur:
         cur.execute("""
@@ -1341,11 +1414,22 @@ def superadmin_health():
 
     return render_template('superadmin_health.html',
                          estado_afip=estado_afip,
+                         detalle_afip=detalle_afip,
+                         historial_afip=historial_afip,
                          sesiones_activas=sesiones_activas,
                          sesiones_expiradas=sesiones_expiradas,
+                         pool_db=estadisticas_pool(),
                          active_page='health')
 
 
+@app.route('/admin/health/db', methods=['GET'])
+@login_required
+@role_required('superadmin')
+def superadmin_health_db():
+    """Estadisticas del pool PostgreSQL del worker que atiende (JSON, para monitoreo)."""
+    return jsonify(estadisticas_pool())
+
+
 @app.route('/admin/cleanup-sessions', methods=['POST'])
 @login_required
 @role_required('superadmin')
@@ -1375,8 +1459,9 @@ def superadmin_detalle_estudio(estudio_id):
         """, (estudio_id,))
         usuarios = cur.fetchall()
 
-        cur.execute("SELECT COUNT(*) AS total FROM clientes WHERE estudio_id = %s", (estudio_id,))
-        total_clientes = cur.fetchone()['total']
+        cur.execute("SELECT clientes FROM estudio_contadores WHERE estudio_id = %s", (estudio_id,))
+        contadores = cur.fetchone()
+        total_clientes = contadores['clientes'] if contadores else 0
 
         cur.execute("""
             SELECT * FROM estudios_afip
@@ -1388,7 +1473,10 @@ def superadmin_detalle_estudio(estudio_id):
             SELECT servicio, COUNT(*) AS total, SUM(cantidad) AS comprobantes,
                    MAX(created_at) AS ultima
             FROM consultas_log
-            WHERE estudio_id = %s AND created_at >= DATE_TRUNC('month', NOW())
+            WHERE estudio_id = %s
+              -- Mismo mes (hora Argentina) que estudio_consultas_mes
+              AND created_at >= mes_consulta(NOW())::TIMESTAMP
+                                AT TIME ZONE 'America/Argentina/Buenos_Aires'
             GROUP BY servicio
         """, (estudio_id,))
         uso_mes = cur.fetchall()
@@ -1402,28 +1490,6 @@ def superadmin_detalle_estudio(estudio_id):
                          active_page='estudios')
 
 
-# ============= HEALTH CHECK AFIP =============
-
-_AFIP_ENDPOINTS = {
-    'WSFEv1':  'https://servicios1.afip.gov.ar/wsfev1/service.asmx?WSDL',
-    'WSMTXCA': 'https://serviciosjava.afip.gov.ar/wsmtxca/services/MTXCAService?wsdl',
-    'WSFEXv1': 'https://servicios1.afip.gov.ar/wsfexv1/service.asmx?WSDL',
-}
-
-def _afip_health_check(timeout=4):
-    """Ping rapido a los WSDL de AFIP. Retorna dict {servicio: bool}."""
-    s = crear_session_afip()
-    estado = {}
-    for nombre, url in _AFIP_ENDPOINTS.items():
-        try:
-            r = s.get(url, timeout=timeout)
-            estado[nombre] = r.status_code == 200
-        except Exception:
-            estado[nombre] = False
-    s.close()
-    return estado
-
-
 # ============= RUTA UNIFICADA DE CONSULTA =============
 
 @app.route('/consulta_facturas_unificada')
@@ -1470,296 +1536,27 @@ def consultar_facturas_unificada():
                 'nro_documento': cliente['nro_documento']
             }
             
-            # EJECUTAR CONSULTA REAL DE FACTURAS
-            # cuit_cliente = CUIT del emisor consultado (sale de la DB)
-            # solicitante  = CUIT del estudio que posee el certificado (sale de Config)
-            cuit = cliente_dict['cuit']
             fecha_desde = request.args.get('fecha_desde', '')  # formato YYYY-MM-DD
             fecha_hasta = request.args.get('fecha_hasta', '')
-            # Convertir a YYYYMMDD que usa AFIP, validar formato
-            fecha_desde_afip = fecha_desde.replace('-', '') if fecha_desde else None
-            fecha_hasta_afip = fecha_hasta.replace('-', '') if fecha_hasta else None
-            # Validar que las fechas tengan 8 dígitos y empiecen con 19xx o 20xx
-            for f in [fecha_desde_afip, fecha_hasta_afip]:
+            # Validar que las fechas (YYYYMMDD para AFIP) tengan 8 dígitos y empiecen con 19xx o 20xx
+            for f in [fecha_desde.replace('-', ''), fecha_hasta.replace('-', '')]:
                 if f and (len(f) != 8 or not f.isdigit() or f[:2] not in ('19', '20')):
                     flash(f'Fecha invalida: {f}. Use formato DD/MM/AAAA con año completo.', 'error')
                     return redirect(url_for('consulta_facturas_unificada'))
-            print(f"[UNIFICADO] solicitante={Config.AFIP_SOLICITANTE_CUIT}  cliente={cuit}  razon_social={cliente_dict['razon_social']}  fecha_desde={fecha_desde_afip}  fecha_hasta={fecha_hasta_afip}")
-
-            # Pre-check: verificar que al menos un servicio AFIP responda
-            estado_afip = _afip_health_check(timeout=4)
-            print(f"[HEALTH CHECK] {estado_afip}")
-
-            if not any(estado_afip.values()):
-                caidos = ', '.join(estado_afip.keys())
-                return render_template('resultado_facturas_unificada.html',
-                    cliente=cliente_dict,
-                    facturas=[],
-                    web_service='Ninguno',
-                    mensaje=f'Los servicios de AFIP no estan disponibles en este momento ({caidos}). Intente nuevamente mas tarde.',
-                    total_facturas=0,
-                    afip_caido=True)
-
-            # Mensaje informativo segun filtro de fechas
-            modo_consulta = ''
-            if fecha_desde_afip and fecha_hasta_afip:
-                modo_consulta = f'Rango: {fecha_desde_afip[:4]}-{fecha_desde_afip[4:6]}-{fecha_desde_afip[6:]} a {fecha_hasta_afip[:4]}-{fecha_hasta_afip[4:6]}-{fecha_hasta_afip[6:]}'
-            else:
-                modo_consulta = 'Sin fechas: se muestran los ultimos 50 comprobantes por tipo/PV'
-
-            # WSFEv1 es el servicio principal — cubre todos los tipos (A,B,C,M)
-            # Cada servicio en su propio try/except para que uno no tire abajo a los demas
-            resultados_wsfev1 = {'facturas': []}
-            resultados_wsmtxca = {'facturas': []}
-            resultados_wsfexv1 = {'facturas': []}
-            errores_servicios = []
 
-            if estado_afip.get('WSFEv1'):
-                try:
-                    resultados_wsfev1 = consultar_wsfev1_interno(cuit, fecha_desde_afip, fecha_hasta_afip, estudio_id=g.user['estudio_id'])
-                except Exception as e:
-                    print(f"[UNIFICADO] WSFEv1 fallo: {e}", flush=True)
-                    errores_servicios.append(f"WSFEv1: {e}")
-
-            # WSMTXCA y WSFEXv1 solo si WSFEv1 falló completamente (error, no "0 resultados")
-            # WSFEv1 ya cubre Facturas A/B/C/M para mercado interno.
-            # WSMTXCA es lento (~30 llamadas SOAP) y redundante para monotributo.
-            # WSFEXv1 solo aplica a exportadores.
-            # Para PVs no-WS (Factura en Linea, Factuweb) el usuario tiene RCEL.
-            wsfev1_fallo = resultados_wsfev1.get('error') and not resultados_wsfev1.get('facturas')
-            if wsfev1_fallo:
-                print(f"[UNIFICADO] WSFEv1 fallo, intentando WSMTXCA/WSFEXv1...", flush=True)
-                if estado_afip.get('WSMTXCA'):
-                    try:
-                        resultados_wsmtxca = consultar_wsmtxca_interno(cuit, fecha_desde_afip, fecha_hasta_afip)
-                    except Exception as e:
-                        print(f"[UNIFICADO] WSMTXCA fallo: {e}", flush=True)
-                        errores_servicios.append(f"WSMTXCA: {e}")
-
-                if estado_afip.get('WSFEXv1'):
-                    try:
-                        resultados_wsfexv1 = consultar_wsfexv1_interno(cuit, fecha_desde_afip, fecha_hasta_afip)
-                    except Exception as e:
-                        print(f"[UNIFICADO] WSFEXv1 fallo: {e}", flush=True)
-                        errores_servicios.append(f"WSFEXv1: {e}")
-            else:
-                print(f"[UNIFICADO] WSFEv1 OK, saltando WSMTXCA/WSFEXv1", flush=True)
+            # Sin worker (desarrollo): ejecutar en el request, como antes
+            if not Config.CONSULTAS_ASYNC:
+                contexto = ejecutar_consulta_unificada(estudio_id, cliente_dict, fecha_desde, fecha_hasta)
+                return render_template('resultado_facturas_unificada.html', **contexto)
 
-            # Combinar resultados WS
-            facturas_ws = (
-                resultados_wsfev1.get('facturas', []) +
-                resultados_wsmtxca.get('facturas', []) +
-                resultados_wsfexv1.get('facturas', [])
-            )
-            print(f"[UNIFICADO] WS: {len(facturas_ws)} comprobantes", flush=True)
-
-            # ── RCEL (portal web) — emitidos + recibidos ──
-            facturas_rcel = []
-            facturas_recibidas = []
-            from src.afip_credentials import get_afip_credentials
-            _creds = get_afip_credentials(g.user['estudio_id'])
-            portal_cuit = _creds['portal_cuit']
-            portal_pass = _creds['portal_password']
-            cuit_clean = str(cuit).replace('-', '').replace(' ', '')
-
-            if portal_cuit and portal_pass:
-                import sys as _sys
-                _root = Path(__file__).parent.parent
-                if str(_root) not in _sys.path:
-                    _sys.path.insert(0, str(_root))
-                from rcel_scraper import RCELScraper
-
-                # Fechas YYYYMMDD -> dd/mm/yyyy
-                rcel_desde = '01/01/2020'
-                rcel_hasta = None
-                if fecha_desde_afip and len(fecha_desde_afip) == 8:
-                    rcel_desde = f"{fecha_desde_afip[6:]}/{fecha_desde_afip[4:6]}/{fecha_desde_afip[:4]}"
-                if fecha_hasta_afip and len(fecha_hasta_afip) == 8:
-                    rcel_hasta = f"{fecha_hasta_afip[6:]}/{fecha_hasta_afip[4:6]}/{fecha_hasta_afip[:4]}"
-
-                portal_cuit_clean = portal_cuit.replace('-', '').replace(' ', '')
-                if cuit_clean == portal_cuit_clean:
-                    empresa_nombre = None
-                    empresa_cuit = None
-                else:
-                    empresa_nombre = cliente_dict['razon_social']
-                    empresa_cuit = cuit_clean
-
-                rcel_kwargs = dict(puntos_venta=None, fecha_desde=rcel_desde,
-                                   fecha_hasta=rcel_hasta, empresa=empresa_nombre,
-                                   cuit_empresa=empresa_cuit)
-
-                # ── RCEL emitidos ──
-                try:
-                    print(f"[UNIFICADO] RCEL emitidos para {cuit_clean}...", flush=True)
-                    scraper = RCELScraper(cuit=portal_cuit, password=portal_pass, headless=True)
-                    res = scraper.consultar(**rcel_kwargs, seccion='emitidos')
-                    if res.get('comprobantes'):
-                        facturas_rcel = RCELScraper.normalizar_comprobantes(res['comprobantes'], 'emitidos')
-                        print(f"[UNIFICADO] RCEL emitidos: {len(facturas_rcel)}", flush=True)
-                    elif res.get('error'):
-                        print(f"[UNIFICADO] RCEL emitidos error: {res['error']}", flush=True)
-                        errores_servicios.append(f"RCEL emitidos: {res['error']}")
-                except Exception as e:
-                    print(f"[UNIFICADO] RCEL emitidos fallo: {e}", flush=True)
-                    errores_servicios.append(f"RCEL emitidos: {e}")
-
-                # ── RCEL recibidos ──
-                try:
-                    print(f"[UNIFICADO] RCEL recibidos para {cuit_clean}...", flush=True)
-                    scraper2 = RCELScraper(cuit=portal_cuit, password=portal_pass, headless=True)
-                    res2 = scraper2.consultar(**rcel_kwargs, seccion='recibidos')
-                    if res2.get('comprobantes'):
-                        facturas_recibidas = RCELScraper.normalizar_comprobantes(res2['comprobantes'], 'recibidos')
-                        print(f"[UNIFICADO] RCEL recibidos: {len(facturas_recibidas)}", flush=True)
-                    elif res2.get('error'):
-                        print(f"[UNIFICADO] RCEL recibidos error: {res2['error']}", flush=True)
-                        errores_servicios.append(f"RCEL recibidos: {res2['error']}")
-                except Exception as e:
-                    print(f"[UNIFICADO] RCEL recibidos fallo: {e}", flush=True)
-                    errores_servicios.append(f"RCEL recibidos: {e}")
-            else:
-                print(f"[UNIFICADO] RCEL: credenciales portal no configuradas", flush=True)
-
-            # ── Unificar emitidos ──
-            facturas_finales = facturas_ws + facturas_rcel
-
-            if facturas_finales or facturas_recibidas:
-                partes = []
-                if facturas_finales:
-                    partes.append(f"{len(facturas_finales)} emitidos")
-                if facturas_recibidas:
-                    partes.append(f"{len(facturas_recibidas)} recibidos")
-                mensaje = f"Se encontraron {' + '.join(partes)}. {modo_consulta}"
-                web_service_usado = f"{len(facturas_ws)} via WS + {len(facturas_rcel)} via Portal"
-            else:
-                web_service_usado = "Ninguno"
-                if errores_servicios:
-                    mensaje = f"Error en consulta: {'; '.join(errores_servicios)}"
-                else:
-                    mensaje = f"No se encontraron comprobantes. {modo_consulta}"
-
-            # Persistir resultados en disco — siempre 3 archivos: emitidos, recibidos, todos
-            _eid = g.user['estudio_id']
-            _gf_kwargs = dict(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta, estudio_id=_eid)
-            archivos_guardados = {
-                'emitidos':  _guardar_facturas(cuit, facturas_finales, web_service_usado, sufijo='emitidos', **_gf_kwargs),
-                'recibidos': _guardar_facturas(cuit, facturas_recibidas, 'RCEL recibidos', sufijo='recibidos', **_gf_kwargs),
-                'todos':     _guardar_facturas(cuit, facturas_finales + facturas_recibidas, web_service_usado, sufijo='todos', **_gf_kwargs),
-            }
-
-            # ── Resumen agrupado por tipo de comprobante ──
-            # Notas de Crédito (tipos 3/8/13/53) restan del total — se acumulan con signo negativo
-            _NC_CODIGOS = {'3', '8', '13', '53'}
-
-            def _es_nota_credito(d, c):
-                tipo_num = str(d.get('CbteTipo', '') or c.get('tipo', '') or '').strip()
-                if tipo_num in _NC_CODIGOS:
-                    return True
-                desc = str(c.get('tipo_descripcion', '') or d.get('CbteTipoDesc', '') or '').lower()
-                return 'crédito' in desc or 'credito' in desc
-
-            resumen_por_tipo = {}
-            resumen_impositivo = {'neto': 0.0, 'iva': 0.0, 'tributos': 0.0, 'exento': 0.0, 'total': 0.0,
-                                  'iva_por_alicuota': {}, 'tributos_por_tipo': {}}
-
-            for fac in facturas_finales:
-                d = fac.get('datos', fac) if isinstance(fac, dict) else fac
-                c = fac.get('consulta', {}) if isinstance(fac, dict) else {}
-                tipo = c.get('tipo_descripcion', '') or d.get('CbteTipoDesc', d.get('CbteTipo', d.get('tipo_comprobante', 'Otro')))
-                tipo = str(tipo)
-
-                def _float(val):
-                    try:
-                        return float(val or 0)
-                    except (ValueError, TypeError):
-                        return 0.0
-
-                signo = -1 if _es_nota_credito(d, c) else 1
-
-                imp_total = _float(d.get('ImpTotal', d.get('importe_total', 0))) * signo
-                imp_neto = _float(d.get('ImpNeto', 0)) * signo
-                imp_iva = _float(d.get('ImpIVA', 0)) * signo
-                imp_trib = _float(d.get('ImpTrib', 0)) * signo
-                imp_opex = _float(d.get('ImpOpEx', 0)) * signo
-
-                if tipo not in resumen_por_tipo:
-                    resumen_por_tipo[tipo] = {'cantidad': 0, 'importe': 0.0}
-                resumen_por_tipo[tipo]['cantidad'] += 1
-                resumen_por_tipo[tipo]['importe'] += imp_total
-
-                # Acumular totales impositivos
-                resumen_impositivo['neto'] += imp_neto
-                resumen_impositivo['iva'] += imp_iva
-                resumen_impositivo['tributos'] += imp_trib
-                resumen_impositivo['exento'] += imp_opex
-                resumen_impositivo['total'] += imp_total
-
-                # Desglose IVA por alícuota (solo disponible en WSFEv1)
-                for alic in d.get('IvaDetalle', []):
-                    alic_id = alic.get('Id', '?')
-                    alic_imp = _float(alic.get('Importe', 0)) * signo
-                    alic_base = _float(alic.get('BaseImp', 0)) * signo
-                    if alic_id not in resumen_impositivo['iva_por_alicuota']:
-                        resumen_impositivo['iva_por_alicuota'][alic_id] = {'base': 0.0, 'importe': 0.0}
-                    resumen_impositivo['iva_por_alicuota'][alic_id]['base'] += alic_base
-                    resumen_impositivo['iva_por_alicuota'][alic_id]['importe'] += alic_imp
-
-                # Desglose tributos por tipo (IIBB, municipal, etc.)
-                for trib in d.get('TributosDetalle', []):
-                    trib_desc = trib.get('Desc', f"Tributo {trib.get('Id', '?')}")
-                    trib_imp = _float(trib.get('Importe', 0)) * signo
-                    trib_base = _float(trib.get('BaseImp', 0)) * signo
-                    if trib_desc not in resumen_impositivo['tributos_por_tipo']:
-                        resumen_impositivo['tributos_por_tipo'][trib_desc] = {'base': 0.0, 'importe': 0.0}
-                    resumen_impositivo['tributos_por_tipo'][trib_desc]['base'] += trib_base
-                    resumen_impositivo['tributos_por_tipo'][trib_desc]['importe'] += trib_imp
-
-            resumen_ordenado = sorted(resumen_por_tipo.items(), key=lambda x: x[1]['cantidad'], reverse=True)
-
-            # Mapeo de alícuotas IVA AFIP
-            IVA_ALICUOTAS = {'3': '0%', '4': '10.5%', '5': '21%', '6': '27%', '8': '5%', '9': '2.5%'}
-            iva_detalle = []
-            for alic_id, datos in sorted(resumen_impositivo['iva_por_alicuota'].items()):
-                iva_detalle.append({
-                    'alicuota': IVA_ALICUOTAS.get(str(alic_id), f'{alic_id}%'),
-                    'base': datos['base'],
-                    'importe': datos['importe'],
-                })
-
-            tributos_detalle = []
-            for desc, datos in sorted(resumen_impositivo['tributos_por_tipo'].items()):
-                tributos_detalle.append({
-                    'descripcion': desc,
-                    'base': datos['base'],
-                    'importe': datos['importe'],
-                })
-
-            # Determinar si mostrar sección impositiva (solo si hay IVA o tributos > 0)
-            tiene_impuestos = resumen_impositivo['iva'] > 0 or resumen_impositivo['tributos'] > 0
-
-            # Marcar origen en cada comprobante para la grilla unificada
-            for fac in facturas_finales:
-                fac['_origen'] = 'Emitido'
-            for fac in facturas_recibidas:
-                fac['_origen'] = 'Recibido'
-            todos_comprobantes = facturas_finales + facturas_recibidas
-
-            return render_template('resultado_facturas_unificada.html',
-                                 cliente=cliente_dict,
-                                 todos_comprobantes=todos_comprobantes,
-                                 web_service=web_service_usado,
-                                 mensaje=mensaje,
-                                 total_facturas=len(facturas_finales),
-                                 total_recibidas=len(facturas_recibidas),
-                                 archivos=archivos_guardados,
-                                 fecha_desde=fecha_desde,
-                                 fecha_hasta=fecha_hasta,
-                                 resumen_por_tipo=resumen_ordenado,
-                                 resumen_impositivo=resumen_impositivo,
-                                 iva_detalle=iva_detalle,
-                                 tributos_detalle=tributos_detalle,
-                                 tiene_impuestos=tiene_impuestos)
+            # Encolar y devolver la página de progreso de inmediato
+            job_id = encolar_job(estudio_id, g.user['id'], 'consulta_unificada', {
+                'cliente': cliente_dict,
+                'fecha_desde': fecha_desde,
+                'fecha_hasta': fecha_hasta,
+            })
+            print(f"[UNIFICADO] job={job_id} encolado  cliente={cliente_dict['cuit']}", flush=True)
+            return redirect(url_for('consulta_job', job_id=job_id))
             
         except Exception as e:
             print(f"ERROR en consultar_facturas_unificada: {str(e)}")
@@ -1814,395 +1611,97 @@ def consultar_facturas_unificada():
     except Exception as e:
         return jsonify({'error': f'Error en consulta: {str(e)}'}), 500
 
-def _guardar_facturas(cuit_cliente, facturas, web_service, sufijo=None, fecha_desde=None, fecha_hasta=None, estudio_id=None):
-    """Guardar resultados de consulta AFIP en JSON y CSV.
 
-    Siempre genera archivos, incluso si facturas está vacía (genera archivos vacíos).
+# ============= JOBS DE CONSULTA (cola en PostgreSQL) =============
 
-    Args:
-        sufijo: 'emitidos', 'recibidos', 'todos' — se agrega al nombre del archivo.
-        fecha_desde: fecha inicio consulta (YYYYMMDD o YYYY-MM-DD) para nomenclatura.
-        fecha_hasta: fecha fin consulta para nomenclatura.
-        estudio_id: scoping multi-tenant — archivos van a facturas/{estudio_id}/{cuit}/
-    """
-    try:
-        from datetime import datetime
-        import json
-        import csv
-
-        root_dir = Path(__file__).parent.parent
-        if estudio_id:
-            out_dir = root_dir / 'facturas' / str(estudio_id) / cuit_cliente
-        else:
-            out_dir = root_dir / 'facturas' / cuit_cliente
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-        # Nomenclatura: facturas_{cuit}_{fechaDesde}_a_{fechaHasta}_{sufijo}
-        fd = (fecha_desde or '').replace('-', '')
-        fh = (fecha_hasta or '').replace('-', '')
-        rango = f"_{fd}_a_{fh}" if fd and fh else f"_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        tag = f"_{sufijo}" if sufijo else ""
-        base = f"facturas_{cuit_cliente}{rango}{tag}"
-
-        # ── Normalizar cada factura a dict plano ─────────────────────
-        columnas = ['origen', 'tipo', 'tipo_codigo', 'punto_venta', 'numero',
-                     'fecha', 'importe_total', 'importe_neto', 'importe_iva',
-                     'cae', 'cae_vto', 'doc_nro', 'moneda']
-
-        filas = []
-        for f in (facturas or []):
-            d = f.get('datos', f) if isinstance(f, dict) else f
-            c = f.get('consulta', {}) if isinstance(f, dict) else {}
-            filas.append({
-                'origen':         f.get('_origen', 'Emitido'),
-                'tipo':           c.get('tipo_descripcion', '') or d.get('CbteTipo', d.get('tipo_comprobante', '')),
-                'tipo_codigo':    c.get('tipo', d.get('CbteTipo', d.get('tipo_comprobante', ''))),
-                'punto_venta':    d.get('PtoVta', d.get('punto_venta', '')),
-                'numero':         d.get('CbteNro', d.get('numero_comprobante', d.get('numero', ''))),
-                'fecha':          d.get('CbteFch', d.get('fecha_emision', '')),
-                'importe_total':  d.get('ImpTotal', d.get('importe_total', '')),
-                'importe_neto':   d.get('ImpNeto', d.get('importe_gravado', '')),
-                'importe_iva':    d.get('ImpIVA', d.get('importe_iva', '')),
-                'cae':            d.get('CAE', d.get('cae', '')),
-                'cae_vto':        d.get('CAEFchVto', d.get('fecha_vencimiento_cae', d.get('fecha_vto_cae', ''))),
-                'doc_nro':        d.get('DocNro', d.get('receptor_nro_doc', d.get('receptor_numero_doc', ''))),
-                'moneda':         d.get('MonId', d.get('moneda', '')),
-            })
-
-        # ── JSON ─────────────────────────────────────────────────────
-        json_path = out_dir / f"{base}.json"
-        payload = {
-            'cuit_cliente': cuit_cliente,
-            'solicitante': Config.AFIP_SOLICITANTE_CUIT,
-            'fecha_consulta': datetime.now().isoformat(),
-            'fecha_desde': fecha_desde,
-            'fecha_hasta': fecha_hasta,
-            'web_service': web_service,
-            'tipo': sufijo or 'emitidos',
-            'total': len(filas),
-            'comprobantes': filas,
-        }
-        with open(json_path, 'w', encoding='utf-8') as fp:
-            json.dump(payload, fp, ensure_ascii=False, indent=2)
-
-        # ── CSV (compatible Excel: sep=; y BOM UTF-8) ────────────────
-        csv_path = out_dir / f"{base}.csv"
-        with open(csv_path, 'w', newline='', encoding='utf-8-sig') as fp:
-            writer = csv.DictWriter(fp, fieldnames=columnas, delimiter=';')
-            writer.writeheader()
-            writer.writerows(filas)
-
-        print(f"[GUARDAR] {len(filas)} facturas -> {json_path.name}, {csv_path.name}")
-        return {'json': str(json_path), 'csv': str(csv_path)}
-
-    except Exception as e:
-        print(f"[GUARDAR] ERROR: {e}")
-        return None
-
-
-def determinar_web_service(cliente, cuit):
-    """
-    L�gica inteligente para determinar qu� web service usar
-    """
-    try:
-        # Primero intentamos con WSFEV1 (m�s com�n)
-        # Si es un monotributista o empresa peque�a, probablemente use WSFEv1
-        
-        # Para simplificar, vamos a intentar primero WSFEv1
-        # Si no hay resultados, intentamos WSMTXCA
-        return 'AUTO'  # Modo autom�tico que prueba ambos
-        
-    except:
-        return 'AUTO'
-
-def consultar_wsfev1_interno(cuit_cliente, fecha_desde=None, fecha_hasta=None, estudio_id=None):
-    """Consultar facturas usando WSFEv1 — patron eficiente basado en script.
-
-    1. Obtiene PVs reales via FEParamGetPtosVenta (1 sola llamada SOAP)
-    2. Solo recorre tipos principales
-    3. Early stop por fecha
-    """
-    import sys, time
-    from pathlib import Path
-    from src.afip_credentials import get_afip_credentials
-
-    creds = get_afip_credentials(estudio_id)
-    solicitante = creds['solicitante_cuit']
-    cuit_clean = str(cuit_cliente).replace('-', '').replace(' ', '')
-    print(f"[WSFEv1] solicitante={solicitante}  cliente={cuit_clean}  desde={fecha_desde}  hasta={fecha_hasta}", flush=True)
-
-    try:
-        root_dir = Path(__file__).parent.parent
-        if str(root_dir) not in sys.path:
-            sys.path.insert(0, str(root_dir))
-
-        from wsfev1_client import WSFEv1Client
-
-        client = WSFEv1Client(creds['cert_path'], creds['key_path'], creds['ambiente'])
-
-        # Obtener PVs reales (1 sola llamada SOAP — evita recorrer PVs inexistentes)
-        pvs_reales = client.obtener_puntos_venta(cuit_clean)
-        if not pvs_reales:
-            pvs_reales = [1, 2, 3, 4, 5]
-        print(f"[WSFEv1] PVs detectados: {pvs_reales}", flush=True)
-
-        tipos = [1, 6, 11, 51, 2, 3, 7, 8, 12, 13]
-        facturas = []
-        inicio = time.time()
-
-        for tipo in tipos:
-            for pv in pvs_reales:
-                ultimo = client.obtener_ultimo_comprobante(cuit_clean, tipo, pv)
-                if not ultimo or ultimo <= 0:
-                    continue
-
-                print(f"[WSFEv1] tipo={tipo} pv={pv} ultimo={ultimo}", flush=True)
-
-                # Con fechas: búsqueda binaria para encontrar el rango exacto
-                if fecha_desde and fecha_hasta:
-                    rango = client.buscar_rango_por_fecha(cuit_clean, tipo, pv, ultimo, fecha_desde, fecha_hasta)
-                    if not rango:
-                        print(f"[WSFEv1] tipo={tipo} pv={pv} sin comprobantes en rango {fecha_desde}-{fecha_hasta}", flush=True)
-                        continue
-                    num_inicio, num_fin = rango
-                    print(f"[WSFEv1] tipo={tipo} pv={pv} rango encontrado: #{num_inicio}-#{num_fin} ({num_fin - num_inicio + 1} comprobantes)", flush=True)
-                else:
-                    num_fin = ultimo
-                    num_inicio = max(1, ultimo - 49)
-
-                for num in range(num_fin, num_inicio - 1, -1):
-                    try:
-                        comp = client.consultar_comprobante(cuit_clean, tipo, pv, num)
-                        if comp is None:
-                            continue
-
-                        # Safety net: validar fecha dentro del rango solicitado
-                        fecha_cbte = comp.get('CbteFch') or comp.get('fecha_emision') or ''
-                        if fecha_desde and fecha_cbte and fecha_cbte < fecha_desde:
-                            continue
-                        if fecha_hasta and fecha_cbte and fecha_cbte > fecha_hasta:
-                            continue
-
-                        comp['CUIT'] = cuit_clean
-                        comp['PtoVta'] = str(pv)
-                        comp['CbteTipo'] = str(tipo)
-                        comp['CbteTipoDesc'] = client.tipos_comprobante.get(tipo, f'Tipo {tipo}')
-                        comp['CbteNro'] = str(num)
-                        comp['consulta'] = {
-                            'cuit': cuit_clean,
-                            'tipo': tipo,
-                            'tipo_descripcion': client.tipos_comprobante.get(tipo, f'Tipo {tipo}'),
-                            'punto_venta': pv,
-                            'numero': num,
-                            'numero_formateado': f"{pv:04d}-{num:08d}"
-                        }
-                        facturas.append(comp)
-                    except Exception:
-                        continue
-
-        elapsed = time.time() - inicio
-        print(f"[WSFEv1] cliente={cuit_clean}  encontradas={len(facturas)}  tiempo={elapsed:.1f}s", flush=True)
-
-        return {
-            'web_service': 'WSFEv1 (Facturas Tradicionales)',
-            'facturas': facturas
-        }
-    except Exception as e:
-        print(f"[WSFEv1] ERROR cliente={cuit_clean}: {e}", flush=True)
-        return {
-            'web_service': 'WSFEv1 (Error)',
-            'facturas': [],
-            'error': str(e)
-        }
-
-def consultar_wsmtxca_interno(cuit_cliente, fecha_desde=None, fecha_hasta=None):
-    """Consultar facturas usando WSMTXCA.
-
-    Args:
-        cuit_cliente: CUIT del emisor consultado (el cliente del estudio).
-        fecha_desde: str YYYYMMDD o None
-        fecha_hasta: str YYYYMMDD o None
-    """
-    solicitante = Config.AFIP_SOLICITANTE_CUIT
-    print(f"[WSMTXCA] solicitante={solicitante}  cliente={cuit_cliente}")
-
-    try:
-        cuit_clean = cuit_cliente.replace('-', '').replace(' ', '')
-        if not cuit_clean.isdigit() or len(cuit_clean) != 11:
-            raise ValueError('CUIT debe tener 11 digitos numericos')
-
-        import sys
-        from pathlib import Path
-        root_dir = Path(__file__).parent.parent
-        if str(root_dir) not in sys.path:
-            sys.path.insert(0, str(root_dir))
-
-        from wsmtxca_client import WSMTXCAClient
-
-        cert_path = root_dir / 'certs' / 'certificado.crt'
-        key_path = root_dir / 'certs' / 'clave_privada.key'
-
-        cliente = WSMTXCAClient(str(cert_path), str(key_path))
-
-        tipos_principales = [11, 51, 1, 6]
-        puntos_venta = [1, 2, 3, 4, 5]
-
-        facturas = []
-        consultas_realizadas = 0
-        max_consultas = 30
-
-        for tipo in tipos_principales:
-            if consultas_realizadas >= max_consultas:
-                break
-            for pv in puntos_venta:
-                if consultas_realizadas >= max_consultas:
-                    break
-
-                no_encontrados = 0
-                for num in range(1, 6):
-                    if consultas_realizadas >= max_consultas or no_encontrados >= 2:
-                        break
-
-                    try:
-                        consultas_realizadas += 1
-                        resultado = cliente.consultar_comprobante(
-                            cuit=cuit_clean,
-                            tipo=tipo,
-                            punto_venta=pv,
-                            numero=num
-                        )
-
-                        if resultado and resultado.get('status') == 'encontrado':
-                            fecha_cbte = resultado.get('CbteFch') or resultado.get('fecha_emision') or ''
-                            if fecha_hasta and fecha_cbte > fecha_hasta:
-                                no_encontrados += 1
-                                continue
-                            if fecha_desde and fecha_cbte < fecha_desde:
-                                break
-                            facturas.append(resultado)
-                            no_encontrados = 0
-                        else:
-                            no_encontrados += 1
-
-                    except Exception:
-                        no_encontrados += 1
-
-        print(f"[WSMTXCA] cliente={cuit_clean}  encontrados={len(facturas)}")
-
-        return {
-            'web_service': 'WSMTXCA (Codigos MTX)',
-            'facturas': facturas or []
-        }
-    except Exception as e:
-        print(f"[WSMTXCA] ERROR cliente={cuit_cliente}: {e}")
-        return {
-            'web_service': 'WSMTXCA (Error)',
-            'facturas': [],
-            'error': str(e)
-        }
-
-def consultar_wsfexv1_interno(cuit_cliente, fecha_desde=None, fecha_hasta=None):
-    """Consultar facturas usando WSFEXv1 - Exportación.
-
-    Args:
-        cuit_cliente: CUIT del emisor consultado (el cliente del estudio).
-        fecha_desde: str YYYYMMDD o None
-        fecha_hasta: str YYYYMMDD o None
-    """
-    solicitante = Config.AFIP_SOLICITANTE_CUIT
-    print(f"[WSFEXv1] solicitante={solicitante}  cliente={cuit_cliente}")
-
-    try:
-        import sys
-        from pathlib import Path
-
-        root_dir = Path(__file__).parent.parent
-        if str(root_dir) not in sys.path:
-            sys.path.insert(0, str(root_dir))
-
-        from wsfexv1_client import WSFEXv1Client
-
-        cert_path = root_dir / 'certs' / 'certificado.crt'
-        key_path = root_dir / 'certs' / 'clave_privada.key'
-
-        client = WSFEXv1Client(
-            cert_path=str(cert_path),
-            key_path=str(key_path),
-            ambiente='prod'
-        )
-
-        # Tipos comunes de exportación
-        tipos_exportacion = [19, 20, 21]  # Facturas exportación A, B, C
-        puntos_venta = [1, 2, 3, 4, 5]
-
-        facturas = []
-
-        try:
-            if hasattr(client, 'buscar_comprobantes_rango'):
-                facturas = client.buscar_comprobantes_rango(
-                    cuit=cuit_cliente,
-                    tipos_comprobante=tipos_exportacion,
-                    puntos_venta=puntos_venta,
-                    limite_por_tipo=10,
-                    fecha_desde=fecha_desde,
-                    fecha_hasta=fecha_hasta
-                )
-        except Exception as inner_e:
-            print(f"[WSFEXv1] busqueda fallida cliente={cuit_cliente}: {inner_e}")
-
-        print(f"[WSFEXv1] cliente={cuit_cliente}  encontradas={len(facturas) if facturas else 0}")
-
-        return {
-            'web_service': 'WSFEXv1 (Exportación)',
-            'facturas': facturas or []
-        }
-    except Exception as e:
-        print(f"[WSFEXv1] ERROR cliente={cuit_cliente}: {e}")
-        return {
-            'web_service': 'WSFEXv1 (Error)',
-            'facturas': [],
-            'error': str(e)
-        }
+@app.route('/consultas/<int:job_id>')
+@login_required
+@role_required('admin', 'contador')
+def consulta_job(job_id):
+    """Consulta encolada en curso: la grilla se llena en vivo con /eventos."""
+    job = obtener_job(job_id, g.user['estudio_id'])
+    if not job:
+        flash('Consulta no encontrada', 'error')
+        return redirect(url_for('consulta_facturas_unificada'))
+
+    if job['estado'] == 'ok':
+        return redirect(url_for('consulta_job_resultado', job_id=job_id))
+
+    return render_template('resultado_facturas_unificada.html',
+                           job_en_curso=job,
+                           cliente=job['parametros'].get('cliente'))
+
+# Polling corto en formato text/event-stream (no es un stream abierto): cada
+# request entrega lo pendiente y cierra; EventSource vuelve a pedir solo a los
+# EVENTOS_POLL_MS con Last-Event-ID. Un worker web (y su conexión del pool)
+# queda ocupado milisegundos por pedido, no mientras dura el job. La demora de
+# una fila es hasta EVENTOS_INTERVALO_S (src/jobs.py) + EVENTOS_POLL_MS, a
+# cambio de dos queries cortas por página abierta cada EVENTOS_POLL_MS.
+EVENTOS_POLL_MS = 500
+EVENTOS_LOTE_LECTURA = 500
+
+def _sse(evento, datos, evento_id=None):
+    """Formatear un mensaje text/event-stream."""
+    import json
+    msg = f"event: {evento}\n"
+    if evento_id is not None:
+        msg += f"id: {evento_id}\n"
+    return msg + f"data: {json.dumps(datos, default=str)}\n\n"
+
+@app.route('/consultas/<int:job_id>/eventos')
+@login_required
+@role_required('admin', 'contador')
+def consulta_job_eventos(job_id):
+    """Eventos del job posteriores a Last-Event-ID (un pedido del polling):
+    'stream' y 'comprobante' publicados por el worker, 'progreso' con la fase
+    actual y 'fin' al terminar."""
+    estudio_id = g.user['estudio_id']
+    # El estado se lee antes que los eventos: si el job ya terminó, el worker
+    # publicó todos sus eventos antes de cerrarlo y la lectura los incluye
+    job = obtener_job(job_id, estudio_id)
+    if not job:
+        return jsonify({'error': 'Consulta no encontrada'}), 404
 
-def consultar_ambos_servicios(cuit_cliente):
-    """Consultar en los 3 servicios y combinar resultados."""
     try:
-        resultados_wsfev1 = consultar_wsfev1_interno(cuit_cliente)
-        resultados_wsmtxca = consultar_wsmtxca_interno(cuit_cliente)
-        resultados_wsfexv1 = consultar_wsfexv1_interno(cuit_cliente)
-        
-        facturas_combinadas = []
-        
-        # Agregar facturas de WSFEv1
-        if resultados_wsfev1['facturas']:
-            facturas_combinadas.extend(resultados_wsfev1['facturas'])
+        ultimo_id = int(request.headers.get('Last-Event-ID') or request.args.get('desde') or 0)
+    except ValueError:
+        ultimo_id = 0
+
+    mensajes = [f"retry: {EVENTOS_POLL_MS}\n\n"]
+    while True:
+        pendientes = leer_eventos(job_id, estudio_id, ultimo_id, limite=EVENTOS_LOTE_LECTURA)
+        for ev in pendientes:
+            ultimo_id = ev['id']
+            mensajes.append(_sse(ev['tipo'], ev['datos'], ev['id']))
+        if len(pendientes) < EVENTOS_LOTE_LECTURA:
+            break
+
+    if job['estado'] in ('ok', 'error'):
+        mensajes.append(_sse('fin', {
+            'estado': job['estado'],
+            'error': job['error'],
+            'resultado_url': url_for('consulta_job_resultado', job_id=job_id) if job['estado'] == 'ok' else None,
+        }))
+    elif job['progreso']:
+        mensajes.append(_sse('progreso', {'progreso': job['progreso']}))
+
+    return Response(''.join(mensajes), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+@app.route('/consultas/<int:job_id>/resultado')
+@login_required
+@role_required('admin', 'contador')
+def consulta_job_resultado(job_id):
+    """Resultado de una consulta terminada (renderizado desde el JSONB del job)."""
+    job = obtener_job(job_id, g.user['estudio_id'])
+    if not job:
+        flash('Consulta no encontrada', 'error')
+        return redirect(url_for('consulta_facturas_unificada'))
 
-        # Agregar facturas de WSMTXCA
-        if resultados_wsmtxca['facturas']:
-            facturas_combinadas.extend(resultados_wsmtxca['facturas'])
+    if job['estado'] != 'ok':
+        return redirect(url_for('consulta_job', job_id=job_id))
 
-        # Agregar facturas de WSFEXv1
-        if resultados_wsfexv1['facturas']:
-            facturas_combinadas.extend(resultados_wsfexv1['facturas'])
-        
-        # Determinar cu�l tuvo m�s �xito
-        if len(resultados_wsfev1['facturas']) > len(resultados_wsmtxca['facturas']):
-            servicio_principal = 'WSFEv1 (con respaldo WSMTXCA)'
-        elif len(resultados_wsmtxca['facturas']) > 0:
-            servicio_principal = 'WSMTXCA (con respaldo WSFEv1)'
-        else:
-            servicio_principal = 'Consulta autom�tica (ambos servicios)'
-        
-        return {
-            'web_service': servicio_principal,
-            'facturas': facturas_combinadas
-        }
-    except Exception as e:
-        return {
-            'web_service': 'Error en consulta autom�tica',
-            'facturas': [],
-            'error': str(e)
-        }
+    return render_template('resultado_facturas_unificada.html', **job['resultado'])
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -8,36 +8,17 @@ import os
 
 # Cache global para módulos y conexiones
 _modules_cache = {}
-_session_cache = None
 
 def get_module(module_name):
     """Cache universal para módulos con lazy loading"""
+    if module_name == 'requests':
+        # Transporte compartido del proceso (keep-alive + SSL permisivo para AFIP);
+        # no se cachea acá: sesion_afip() ya es única por proceso y fork-safe
+        from src.afip_transport import sesion_afip
+        return sesion_afip()
+
     if module_name not in _modules_cache:
-        if module_name == 'requests':
-            import requests
-            import urllib3
-            import ssl
-            from urllib3.util.ssl_ import create_urllib3_context
-            from requests.adapters import HTTPAdapter
-            
-            # Desactivar warnings SSL
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-            
-            class AFIPHTTPSAdapter(HTTPAdapter):
-                def init_poolmanager(self, *args, **pool_kwargs):
-                    context = create_urllib3_context()
-                    context.set_ciphers('DEFAULT@SECLEVEL=1')
-                    context.check_hostname = False
-                    context.verify_mode = ssl.CERT_NONE
-                    pool_kwargs['ssl_context'] = context
-                    return super().init_poolmanager(*args, **pool_kwargs)
-            
-            session = requests.Session()
-            session.mount('https://', AFIPHTTPSAdapter())
-            session.verify = False
-            _modules_cache[module_name] = session
-            
-        elif module_name == 'xml':
+        if module_name == 'xml':
             import xml.etree.ElementTree as ET
             _modules_cache[module_name] = ET
             
@@ -76,10 +57,7 @@ def verificar_certificados():
 
 def crear_session_afip():
     """Crear sesión requests optimizada para AFIP"""
-    global _session_cache
-    if _session_cache is None:
-        _session_cache = get_module('requests')
-    return _session_cache
+    return get_module('requests')
 
 def verificar_conexion_afip():
     """Verifica la conectividad básica con los servicios de AFIP"""
@@ -126,6 +104,11 @@ class ARCAServiceSimple:
         else:
             self.wsaa_url = 'https://wsaa.afip.gov.ar/ws/services/LoginCms'
             self.wsfe_url = 'https://servicios1.afip.gov.ar/wsfev1/service.asmx'
+
+        # AFIP_URL_BASE redirige al simulador local (src/afip_transport.py)
+        from src.afip_transport import url_afip
+        self.wsaa_url = url_afip(self.wsaa_url)
+        self.wsfe_url = url_afip(self.wsfe_url)
         
         # Cache de autenticación
         self._auth_cache = None
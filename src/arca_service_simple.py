@@ -8,36 +8,17 @@ import os
 
 # Cache global para módulos y conexiones
 _modules_cache = {}
-_session_cache = None
 
 def get_module(module_name):
     """Cache universal para módulos con lazy loading"""
+    if module_name == 'requests':
+        # Transporte compartido del proceso (keep-alive + SSL permisivo para AFIP);
+        # no se cachea acá: sesion_afip() ya es única por proceso y fork-safe
+        from src.afip_transport import sesion_afip
+        return sesion_afip()
+
     if module_name not in _modules_cache:
-        if module_name == 'requests':
-            import requests
-            import urllib3
-            import ssl
-            from urllib3.util.ssl_ import create_urllib3_context
-            from requests.adapters import HTTPAdapter
-            
-            # Desactivar warnings SSL
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-            
-            class AFIPHTTPSAdapter(HTTPAdapter):
-                def init_poolmanager(self, *args, **pool_kwargs):
-                    context = create_urllib3_context()
-                    context.set_ciphers('DEFAULT@SECLEVEL=1')
-                    context.check_hostname = False
-                    context.verify_mode = ssl.CERT_NONE
-                    pool_kwargs['ssl_context'] = context
-                    return super().init_poolmanager(*args, **pool_kwargs)
-            
-            session = requests.Session()
-            session.mount('https://', AFIPHTTPSAdapter())
-            session.verify = False
-            _modules_cache[module_name] = session
-            
-        elif module_name == 'xml':
+        if module_name == 'xml':
             import xml.etree.ElementTree as ET
             _modules_cache[module_name] = ET
             
@@ -76,10 +57,7 @@ def verificar_certificados():
 
 def crear_session_afip():
     """Crear sesión requests optimizada para AFIP"""
-    global _session_cache
-    if _session_cache is None:
-        _session_cache = get_module('requests')
-    return _session_cache
+    return get_module('requests')
 
 def verificar_conexion_afip():
     """Verifica la conectividad básica con los servicios de AFIP"""
@@ -126,53 +104,38 @@ class ARCAServiceSimple:
         else:
             self.wsaa_url = 'https://wsaa.afip.gov.ar/ws/services/LoginCms'
             self.wsfe_url = 'https://servicios1.afip.gov.ar/wsfev1/service.asmx'
+
+        # AFIP_URL_BASE redirige al simulador local (src/afip_transport.py)
+        from src.afip_transport import url_afip
+        self.wsaa_url = url_afip(self.wsaa_url)
+        self.wsfe_url = url_afip(self.wsfe_url)
         
-        # Cache de autenticación
-        self._auth_cache = None
-        self._cache_expires = None
-    
-    def _get_cached_auth(self):
-        """Obtener autenticación desde cache si es válida"""
-        if self._auth_cache and self._cache_expires:
-            dt = get_module('datetime')
-            if dt['datetime'].utcnow() < self._cache_expires:
-                return self._auth_cache
-        return None
-    
-    def _set_auth_cache(self, auth_data):
-        """Guardar autenticación en cache"""
-        dt = get_module('datetime')
-        self._auth_cache = auth_data
-        # Cache válido por 20 minutos
-        self._cache_expires = dt['datetime'].utcnow() + dt['timedelta'](minutes=20)
-    
     def autenticar(self):
-        """Autenticar con WSAA (con cache)"""
-        # Verificar cache primero
-        cached = self._get_cached_auth()
-        if cached:
-            return cached
-        
+        """Autenticar con WSAA (cache compartido: src/wsaa_ticket_cache.py)"""
         try:
-            # Crear TRA
-            tra_xml = self._crear_tra()
-            
-            # Firmar TRA
-            cms_data = self._firmar_tra(tra_xml)
-            if not cms_data:
-                return None
-            
-            # Autenticar con WSAA
-            auth_data = self._wsaa_login(cms_data)
-            if auth_data:
-                self._set_auth_cache(auth_data)
-            
-            return auth_data
+            from src.wsaa_ticket_cache import obtener_ticket
+            ambiente = 'homo' if self.testing else 'prod'
+            token, sign = obtener_ticket(self.cert_path, 'wsfe', ambiente,
+                                         self._login_wsaa, self.cuit)
+            return {'token': token, 'sign': sign}
             
         except Exception as e:
             print(f"Error en autenticación: {e}")
             return None
     
+    def _login_wsaa(self):
+        """Crear TRA, firmarlo y hacer loginCms. Lanza excepción si falla."""
+        tra_xml = self._crear_tra()
+        
+        cms_data = self._firmar_tra(tra_xml)
+        if not cms_data:
+            raise Exception("No se pudo firmar el TRA")
+        
+        auth_data = self._wsaa_login(cms_data)
+        if not auth_data:
+            raise Exception("WSAA no devolvió token/sign")
+        return auth_data
+    
     def _crear_tra(self):
         """Crear TRA (Ticket de Requerimiento de Acceso)"""
         dt = get_module('datetime')
@@ -197,40 +160,10 @@ class ARCAServiceSimple:
 </loginTicketRequest>'''
     
     def _firmar_tra(self, tra_xml):
-        """Firmar TRA con OpenSSL"""
+        """Firmar TRA (CMS en proceso, ver src/cms_signer.py)"""
         try:
-            subprocess = get_module('subprocess')
-            tempfile = get_module('tempfile')
-            
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.xml') as f:
-                f.write(tra_xml)
-                tra_path = f.name
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.cms') as f:
-                cms_path = f.name
-            
-            # Comando OpenSSL optimizado con ruta completa
-            openssl_path = r'C:\Program Files\Git\usr\bin\openssl.exe'
-            if not os.path.exists(openssl_path):
-                openssl_path = 'openssl'  # Fallback al PATH
-            
-            cmd = [
-                openssl_path, 'smime', '-sign', '-signer', self.cert_path,
-                '-inkey', self.key_path, '-outform', 'DER', '-nodetach'
-            ]
-            
-            with open(tra_path, 'rb') as infile, open(cms_path, 'wb') as outfile:
-                result = subprocess.run(cmd, stdin=infile, stdout=outfile, 
-                                     stderr=subprocess.PIPE, check=True)
-            
-            with open(cms_path, 'rb') as f:
-                cms_data = f.read()
-            
-            # Limpiar archivos temporales
-            os.unlink(tra_path)
-            os.unlink(cms_path)
-            
-            return cms_data
+            from src.cms_signer import firmar_cms
+            return firmar_cms(tra_xml, self.cert_path, self.key_path)
             
         except Exception as e:
             print(f"Error firmando TRA: {e}")
@@ -311,10 +244,13 @@ class ARCAServiceSimple:
                 token_match = re.search(r'<token>(.+?)</token>', xml_text, re.DOTALL | re.IGNORECASE)
                 sign_match = re.search(r'<sign>(.+?)</sign>', xml_text, re.DOTALL | re.IGNORECASE)
                 
+                exp_match = re.search(r'<expirationTime>(.+?)</expirationTime>', xml_text, re.DOTALL | re.IGNORECASE)
+                
                 if token_match and sign_match:
                     return {
                         'token': token_match.group(1).strip(),
-                        'sign': sign_match.group(1).strip()
+                        'sign': sign_match.group(1).strip(),
+                        'expirationTime': exp_match.group(1).strip() if exp_match else None
                     }
             
             return None
@@ -16,6 +16,12 @@ from datetime import datetime, timedelta, timezone
 
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from src.auth.session_cache import (
+    generacion_actual,
+    guardar_sesion,
+    invalidar_sesion,
+    sesion_cacheada,
+)
 from src.config import Config
 from src.db import get_cursor
 
@@ -172,21 +178,37 @@ def validate_session(token: str) -> dict | None:
     """
     Valida token de sesion contra la DB.
     Retorna dict con datos del usuario si es valida, None si no.
+
+    Las validaciones exitosas se cachean en el proceso (src/auth/session_cache.py);
+    logout, usuario desactivado o estudio desactivado las invalidan al instante.
     """
+    user = sesion_cacheada(token)
+    if user is not None:
+        return user
+
+    generacion = generacion_actual()
     with get_cursor() as cur:
         cur.execute(
             """
-            SELECT u.id, u.estudio_id, u.nombre, u.email, u.rol
+            SELECT u.id, u.estudio_id, u.nombre, u.email, u.rol, s.expires_at
             FROM sesiones s
             JOIN usuarios u ON u.id = s.usuario_id
+            LEFT JOIN estudios e ON e.id = u.estudio_id
             WHERE s.id = %s
               AND s.revocada = FALSE
               AND s.expires_at > NOW()
               AND u.activo = TRUE
+              AND (u.estudio_id IS NULL OR e.activo = TRUE)
             """,
             (token,),
         )
-        return cur.fetchone()
+        user = cur.fetchone()
+
+    if user is None:
+        return None
+    expires_at = user.pop("expires_at")
+    guardar_sesion(token, user, expires_at, generacion)
+    return user
 
 
 def revoke_session(token: str) -> None:
@@ -196,6 +218,8 @@ def revoke_session(token: str) -> None:
             "UPDATE sesiones SET revocada = TRUE WHERE id = %s",
             (token,),
         )
+    # Los demás procesos se enteran por NOTIFY (012_sesiones_notify.sql)
+    invalidar_sesion(token)
 
 
 def cleanup_expired_sessions() -> int:
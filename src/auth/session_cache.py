@@ -0,0 +1,184 @@
+"""
+src/auth/session_cache.py
+Cache en proceso de sesiones validadas, invalidado por LISTEN/NOTIFY.
+
+Sin esto cada request autenticado (incluido el polling AJAX) hace el join
+sesiones⋈usuarios y ocupa una conexión del pool.
+
+Diseño:
+  - token (hash sha256) -> usuario, por Config.SESSION_CACHE_SECONDS y nunca
+    más allá del expires_at de la sesión.
+  - Un thread daemon por proceso mantiene una conexión propia (fuera del pool)
+    con LISTEN sesiones_invalidadas. Los triggers de 012_sesiones_notify.sql
+    avisan al confirmarse un logout, la (des)activación o el borrado de un
+    usuario y la (des)activación de un estudio; se descartan las entradas
+    afectadas.
+  - El cache solo se usa mientras esa conexión está escuchando: si se cae
+    (o no hay DB) se vacía y cada request vuelve a validar contra PostgreSQL
+    hasta que se reconecta. Un aviso perdido nunca deja una sesión revocada
+    viva más allá de ese corte.
+  - Un aviso que llega mientras otro thread valida contra la DB impide que
+    ese resultado se guarde (contador de generación).
+  - El thread arranca con iniciar_escucha_sesiones() o en la primera
+    validación del proceso (fork-safe: los threads no sobreviven al fork).
+
+Uso (src/auth/service.py):
+    user = sesion_cacheada(token)
+    if user is None:
+        generacion = generacion_actual()
+        user = ...query...
+        guardar_sesion(token, user, expires_at, generacion)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from src.config import Config
+
+CANAL = "sesiones_invalidadas"
+
+# Tope de entradas: al pasarlo se purgan las vencidas y, si no alcanza, todo
+_MAX_ENTRADAS = 10_000
+
+# Espera entre reintentos de conexión del listener
+_ESPERA_RECONEXION_S = 5.0
+
+# Cada cuánto el listener verifica su conexión (una conexión caída sin aviso
+# dejaría de recibir invalidaciones: se detecta y se vacía el cache)
+_LATIDO_S = 15.0
+
+# hash del token -> {'user', 'expires_at', 'vence'}
+_cache: dict[str, dict] = {}
+_lock = threading.Lock()
+_generacion = 0
+_escuchando = False
+_hilo: threading.Thread | None = None
+_hilo_pid: int | None = None
+_hilo_lock = threading.Lock()
+
+
+def iniciar_escucha_sesiones() -> None:
+    """Arrancar el listener de invalidaciones en este proceso (idempotente)."""
+    global _hilo, _hilo_pid, _escuchando
+    if Config.SESSION_CACHE_SECONDS <= 0:
+        return
+    pid = os.getpid()
+    with _hilo_lock:
+        if _hilo is not None and _hilo_pid == pid and _hilo.is_alive():
+            return
+        if _hilo_pid != pid:
+            # Proceso hijo: el cache y el estado de escucha eran del padre
+            with _lock:
+                _cache.clear()
+                _escuchando = False
+        _hilo = threading.Thread(target=_escuchar, name="sesiones-listen", daemon=True)
+        _hilo_pid = pid
+        _hilo.start()
+
+
+def sesion_cacheada(token: str) -> dict | None:
+    """Usuario de la sesión si está en cache y vigente; None si hay que ir a la DB."""
+    iniciar_escucha_sesiones()
+    clave = _hash(token)
+    with _lock:
+        if not _escuchando:
+            return None
+        entrada = _cache.get(clave)
+        if entrada is None:
+            return None
+        if time.monotonic() >= entrada["vence"] or datetime.now(timezone.utc) >= entrada["expires_at"]:
+            del _cache[clave]
+            return None
+        return dict(entrada["user"])
+
+
+def generacion_actual() -> int:
+    """Tomar antes de validar contra la DB y pasar a guardar_sesion()."""
+    with _lock:
+        return _generacion
+
+
+def guardar_sesion(token: str, user: dict, expires_at: datetime, generacion: int) -> None:
+    """Guardar una validación exitosa (se ignora si llegó un aviso mientras tanto)."""
+    with _lock:
+        if not _escuchando or generacion != _generacion:
+            return
+        if len(_cache) >= _MAX_ENTRADAS:
+            _purgar()
+        _cache[_hash(token)] = {
+            "user": dict(user),
+            "expires_at": expires_at,
+            "vence": time.monotonic() + Config.SESSION_CACHE_SECONDS,
+        }
+
+
+def invalidar_sesion(token: str) -> None:
+    """Descartar una sesión de este proceso (logout: no esperar al aviso)."""
+    _aplicar_aviso("sesion:" + _hash(token))
+
+
+# ---------------------------------------------------------------------------
+# Internos
+# ---------------------------------------------------------------------------
+
+
+def _hash(token: str) -> str:
+    # Mismo hash que arma el trigger: encode(sha256(convert_to(id, 'UTF8')), 'hex')
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _purgar() -> None:
+    ahora = time.monotonic()
+    for clave in [c for c, e in _cache.items() if ahora >= e["vence"]]:
+        del _cache[clave]
+    if len(_cache) >= _MAX_ENTRADAS:
+        _cache.clear()
+
+
+def _aplicar_aviso(payload: str) -> None:
+    """'sesion:<hash>' | 'usuario:<id>' | 'estudio:<id>' -> descartar lo afectado."""
+    global _generacion
+    tipo, _, valor = payload.partition(":")
+    with _lock:
+        _generacion += 1
+        if tipo == "sesion":
+            _cache.pop(valor, None)
+            return
+        campo = {"usuario": "id", "estudio": "estudio_id"}.get(tipo)
+        if campo is None:
+            _cache.clear()      # aviso desconocido: no arriesgar
+            return
+        for clave in [c for c, e in _cache.items() if str(e["user"].get(campo)) == valor]:
+            del _cache[clave]
+
+
+def _marcar_escuchando(valor: bool) -> None:
+    global _escuchando, _generacion
+    with _lock:
+        _escuchando = valor
+        _generacion += 1
+        _cache.clear()
+
+
+def _escuchar() -> None:
+    import psycopg
+
+    while True:
+        try:
+            with psycopg.connect(Config.DATABASE_URL, autocommit=True) as conn:
+                conn.execute(f"LISTEN {CANAL}")
+                _marcar_escuchando(True)
+                while True:
+                    for aviso in conn.notifies(timeout=_LATIDO_S):
+                        _aplicar_aviso(aviso.payload)
+                    conn.execute("SELECT 1")
+        except Exception as e:
+            print(f"[SESIONES] listener desconectado: {e}", flush=True)
+        finally:
+            _marcar_escuchando(False)
+        time.sleep(_ESPERA_RECONEXION_S)
@@ -0,0 +1,95 @@
+# src/clientes_busqueda.py
+# Búsqueda de clientes para el typeahead (/clientes/sugerencias).
+#
+# Diseño (índices de 013_clientes_busqueda.sql):
+#   - Solo dígitos (se ignoran '-', '.', espacios): CUIT o documento.
+#     11 dígitos -> igualdad; menos -> prefijo ('2032%'), índices text_pattern_ops
+#     por estudio sobre cuit_digitos y nro_documento.
+#   - Texto: cada palabra tiene que aparecer en apellido o nombres
+#     (LIKE '%palabra%', índices GIN de trigramas). Si ninguna palabra llega a
+#     3 letras no hay trigramas útiles: prefijo de apellido.
+#   - Orden: coincidencia exacta / prefijo de apellido primero, después
+#     similarity() del nombre completo contra lo escrito, después alfabético.
+#   - Paginado por limite + pagina; se pide una fila de más para saber si hay
+#     otra página sin contar el total.
+#
+# Uso:
+#   filas, hay_mas = buscar_clientes(estudio_id, 'perez jua', limite=10, pagina=1)
+
+from __future__ import annotations
+
+import re
+
+from src.db import get_cursor
+
+LIMITE_DEFAULT = 10
+LIMITE_MAXIMO = 50
+
+# Palabras de texto que se usan como filtro (el resto solo afecta el orden)
+_MAX_PALABRAS = 5
+
+_COLUMNAS = """
+    id, tipo_documento, nro_documento, cuit, apellido, nombres,
+    fecha_nacimiento, condicion_iva, categoria_monotributo
+"""
+
+
+def buscar_clientes(estudio_id: int, texto: str, limite: int = LIMITE_DEFAULT,
+                    pagina: int = 1) -> tuple[list[dict], bool]:
+    """(clientes de la página, hay_mas). Texto vacío -> sin resultados."""
+    texto = (texto or '').strip()
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+    pagina = max(1, int(pagina))
+    if not texto:
+        return [], False
+
+    digitos = re.sub(r'[\s.\-]', '', texto)
+    if digitos.isdigit():
+        where, orden, params = _por_numero(digitos)
+    else:
+        where, orden, params = _por_nombre(texto.lower())
+
+    with get_cursor() as cur:
+        cur.execute(f"""
+            SELECT {_COLUMNAS}
+            FROM clientes
+            WHERE estudio_id = %(estudio_id)s AND ({where})
+            ORDER BY {orden}, apellido, nombres, id
+            LIMIT %(filas)s OFFSET %(offset)s
+        """, {**params, 'estudio_id': estudio_id,
+              'filas': limite + 1, 'offset': (pagina - 1) * limite})
+        filas = cur.fetchall()
+
+    return filas[:limite], len(filas) > limite
+
+
+def _por_numero(digitos: str) -> tuple[str, str, dict]:
+    params = {'numero': digitos, 'prefijo': _escapar_like(digitos) + '%'}
+    if len(digitos) == 11:
+        where = "cuit_digitos = %(numero)s OR nro_documento = %(numero)s"
+    else:
+        where = "cuit_digitos LIKE %(prefijo)s OR nro_documento LIKE %(prefijo)s"
+    orden = ("(cuit_digitos = %(numero)s OR nro_documento = %(numero)s) DESC, "
+             "cuit_digitos NULLS LAST")
+    return where, orden, params
+
+
+def _por_nombre(texto: str) -> tuple[str, str, dict]:
+    palabras = texto.split()[:_MAX_PALABRAS]
+    params = {'texto': texto, 'inicio': _escapar_like(palabras[0]) + '%'}
+    orden = ("(LOWER(apellido) LIKE %(inicio)s) DESC, "
+             "similarity(LOWER(apellido || ' ' || nombres), %(texto)s) DESC")
+
+    if all(len(p) < 3 for p in palabras):
+        return "LOWER(apellido) LIKE %(inicio)s", orden, params
+
+    condiciones = []
+    for i, palabra in enumerate(palabras):
+        params[f'p{i}'] = '%' + _escapar_like(palabra) + '%'
+        condiciones.append(f"(LOWER(apellido) LIKE %(p{i})s OR LOWER(nombres) LIKE %(p{i})s)")
+    return " AND ".join(condiciones), orden, params
+
+
+def _escapar_like(valor: str) -> str:
+    """Lo que escribe el usuario es literal en LIKE (escape default: backslash)."""
+    return valor.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
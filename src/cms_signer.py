@@ -0,0 +1,115 @@
+# src/cms_signer.py
+# Firma CMS (PKCS#7 SignedData) del TRA para el loginCms de WSAA, en proceso.
+#
+# Equivalente a:
+#   openssl smime -sign -signer cert -inkey key -outform DER -nodetach
+#
+# Diseño:
+#   - cert y key se cargan una vez por (cert_path, key_path) y se reutilizan
+#     mientras no cambie el mtime de los archivos (un par por estudio/tenant).
+#   - La firma se arma en memoria con cryptography: sin subprocess ni
+#     archivos temporales con material de la clave.
+#   - Si cryptography no está instalado se cae al binario openssl (comportamiento
+#     anterior), detectado una sola vez por proceso.
+
+from __future__ import annotations
+
+import os
+import subprocess
+import threading
+
+_cache: dict[tuple[str, str], tuple] = {}
+_cache_lock = threading.Lock()
+
+_openssl_cmd: str | None = None
+
+_OPENSSL_PATHS = [
+    'openssl',
+    'C:\\Program Files\\Git\\mingw64\\bin\\openssl.exe',
+    'C:\\Program Files\\Git\\usr\\bin\\openssl.exe',
+    'C:\\Program Files\\OpenSSL-Win64\\bin\\openssl.exe',
+    'C:\\OpenSSL-Win64\\bin\\openssl.exe',
+]
+
+
+def firmar_cms(tra_xml: str | bytes, cert_path: str, key_path: str) -> bytes:
+    """Firmar el TRA y devolver el CMS en DER (contenido incluido, no detached)."""
+    data = tra_xml.encode('utf-8') if isinstance(tra_xml, str) else tra_xml
+
+    try:
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.serialization import pkcs7
+    except ImportError:
+        return _firmar_openssl(data, cert_path, key_path)
+
+    cert, key = _cargar(str(cert_path), str(key_path))
+    return (
+        pkcs7.PKCS7SignatureBuilder()
+        .set_data(data)
+        .add_signer(cert, key, hashes.SHA256())
+        .sign(serialization.Encoding.DER, [])
+    )
+
+
+def _cargar(cert_path: str, key_path: str) -> tuple:
+    """(certificado, clave privada) cacheados por path + mtime."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+
+    clave = (cert_path, key_path)
+    mtimes = (os.path.getmtime(cert_path), os.path.getmtime(key_path))
+
+    with _cache_lock:
+        cacheado = _cache.get(clave)
+        if cacheado and cacheado[0] == mtimes:
+            return cacheado[1], cacheado[2]
+
+        with open(cert_path, 'rb') as f:
+            cert_bytes = f.read()
+        with open(key_path, 'rb') as f:
+            key_bytes = f.read()
+
+        if b'-----BEGIN' in cert_bytes:
+            cert = x509.load_pem_x509_certificate(cert_bytes)
+        else:
+            cert = x509.load_der_x509_certificate(cert_bytes)
+
+        if b'-----BEGIN' in key_bytes:
+            key = serialization.load_pem_private_key(key_bytes, password=None)
+        else:
+            key = serialization.load_der_private_key(key_bytes, password=None)
+
+        _cache[clave] = (mtimes, cert, key)
+        return cert, key
+
+
+def _detectar_openssl() -> str:
+    """Detectar OpenSSL disponible (una vez por proceso)."""
+    global _openssl_cmd
+    if _openssl_cmd:
+        return _openssl_cmd
+
+    for path in _OPENSSL_PATHS:
+        try:
+            result = subprocess.run([path, 'version'],
+                                    capture_output=True, text=True, timeout=5)
+            if result.returncode == 0:
+                _openssl_cmd = path
+                return path
+        except Exception:
+            continue
+
+    raise Exception("OpenSSL no encontrado (y cryptography no está instalado)")
+
+
+def _firmar_openssl(data: bytes, cert_path: str, key_path: str) -> bytes:
+    """Fallback: firmar con el binario openssl (TRA por stdin, CMS por stdout)."""
+    cmd = [
+        _detectar_openssl(), 'smime', '-sign',
+        '-outform', 'DER',
+        '-signer', str(cert_path),
+        '-inkey', str(key_path),
+        '-nodetach'
+    ]
+    result = subprocess.run(cmd, input=data, capture_output=True, check=True)
+    return result.stdout
@@ -0,0 +1,312 @@
+# src/comprobantes_store.py
+# Store persistente de comprobantes WSFEv1 en PostgreSQL + sync incremental.
+#
+# Tablas (005_comprobantes.sql):
+#   - comprobantes:      un registro por (estudio_id, cuit, tipo, pv, numero).
+#   - comprobantes_sync: rango de números ya descargado por stream (tipo, pv).
+#
+# Sync:
+#   - Por stream se pide FECompUltimoAutorizado y solo se descargan los números
+#     por encima de numero_hasta (lo nuevo desde el último sync).
+#   - Si se pide una fecha_desde anterior a la cubierta, se hace backfill hacia
+#     atrás (búsqueda por fecha + descarga del tramo faltante).
+#   - Streams sincronizados hace menos de SYNC_FRESCURA_MIN minutos no se
+#     consultan a AFIP: una consulta repetida sale directo de la DB.
+#
+# Los números fallidos cortan el rango cubierto: el próximo sync los reintenta.
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+
+from psycopg.types.json import Jsonb
+
+from src.db import get_cursor
+
+# Ventana en la que un stream recién sincronizado no se vuelve a consultar a AFIP
+SYNC_FRESCURA_MIN = int(os.getenv("SYNC_FRESCURA_MIN", 10))
+
+# Sin filtro de fechas: cuántos comprobantes por stream se descargan/muestran
+ULTIMOS_POR_STREAM = 50
+
+# Streams (tipo, PV) sincronizados en paralelo (mismo env que WSFEv1Client)
+STREAMS_CONCURRENTES = int(os.getenv("AFIP_STREAMS_CONCURRENTES", 6))
+
+# Cota superior para buscar_rango_por_fecha cuando solo interesa el inicio del rango
+_FECHA_MAX = "99991231"
+
+
+def _a_fecha(valor: str | None) -> date | None:
+    """'YYYYMMDD' (formato AFIP) -> date. None/'' o inválido -> None."""
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(str(valor).replace("-", "")[:8], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def enriquecer_comprobante(comp: dict, cuit: str, tipo: int, pv: int, num: int,
+                           tipo_desc: str) -> dict:
+    """Agregar al dict de consultar_comprobante los campos que usa la UI."""
+    comp['CUIT'] = cuit
+    comp['PtoVta'] = str(pv)
+    comp['CbteTipo'] = str(tipo)
+    comp['CbteTipoDesc'] = tipo_desc
+    comp['CbteNro'] = str(num)
+    comp['consulta'] = {
+        'cuit': cuit,
+        'tipo': tipo,
+        'tipo_descripcion': tipo_desc,
+        'punto_venta': pv,
+        'numero': num,
+        'numero_formateado': f"{pv:04d}-{num:08d}"
+    }
+    return comp
+
+
+# ---------------------------------------------------------------------------
+# Sync incremental
+# ---------------------------------------------------------------------------
+
+def sincronizar_wsfev1(client, estudio_id: int, cuit: str, puntos_venta: list[int],
+                       tipos: list[int], fecha_desde: str | None = None,
+                       al_avanzar=None) -> int:
+    """Traer de AFIP solo los comprobantes que faltan en el store.
+
+    Args:
+        client: WSFEv1Client ya inicializado con las credenciales del estudio.
+        fecha_desde: 'YYYYMMDD' — garantiza cobertura desde esa fecha (backfill).
+            Sin fecha se garantizan los últimos ULTIMOS_POR_STREAM por stream.
+        al_avanzar: callable(evento, datos) opcional — 'comprobante' por cada
+            descargado y 'stream' al terminar cada stream (ver
+            WSFEv1Client.consultar_streams).
+
+    Retorna la cantidad de comprobantes descargados de AFIP.
+    """
+    estados = _leer_estados(estudio_id, cuit)
+    limite_frescura = datetime.now(timezone.utc) - timedelta(minutes=SYNC_FRESCURA_MIN)
+    streams = [(tipo, pv) for tipo in tipos for pv in puntos_venta]
+    if not streams:
+        return 0
+
+    # Autenticar antes de abrir los hilos: todos reutilizan el mismo TA
+    client.autenticar_wsaa(cuit)
+
+    # Streams independientes en paralelo: cada uno baja su tramo apenas lo resuelve
+    descargados = 0
+    with ThreadPoolExecutor(max_workers=min(STREAMS_CONCURRENTES, len(streams))) as pool:
+        futuros = {
+            pool.submit(_sincronizar_stream, client, estudio_id, cuit, tipo, pv,
+                        estados.get((tipo, pv)), fecha_desde, limite_frescura, al_avanzar): (tipo, pv)
+            for tipo, pv in streams
+        }
+        for futuro in as_completed(futuros):
+            tipo, pv = futuros[futuro]
+            try:
+                cantidad = futuro.result()
+            except Exception as e:
+                # El estado del stream queda como estaba: se reintenta en el próximo sync
+                print(f"[STORE] tipo={tipo} pv={pv} error sincronizando: {e}", flush=True)
+                continue
+            descargados += cantidad
+            if al_avanzar:
+                al_avanzar('stream', {'tipo': tipo, 'pv': pv, 'cantidad': cantidad})
+
+    print(f"[STORE] cliente={cuit}  descargados={descargados}", flush=True)
+    return descargados
+
+
+def _sincronizar_stream(client, estudio_id: int, cuit: str, tipo: int, pv: int,
+                        estado: dict | None, fecha_desde: str | None,
+                        limite_frescura: datetime, al_avanzar=None) -> int:
+    """Sincronizar un stream (tipo, PV). Retorna la cantidad descargada."""
+    fd = _a_fecha(fecha_desde)
+    tipo_desc = client.tipos_comprobante.get(tipo, f'Tipo {tipo}')
+    backfill = _necesita_backfill(estado, fd)
+
+    if estado and not backfill and estado['sincronizado_at'] > limite_frescura:
+        return 0
+
+    ultimo = client.obtener_ultimo_comprobante(cuit, tipo, pv)
+    if ultimo is None:
+        # Error de AFIP: no tocar el estado, se reintenta en el próximo sync
+        return 0
+
+    adelante = None   # tramo nuevo (numero_hasta+1 .. ultimo)
+    atras = None      # tramo de backfill (inicio .. numero_desde-1)
+
+    if estado is None:
+        if ultimo <= 0:
+            _guardar_estado(estudio_id, cuit, tipo, pv, 1, 0, None)
+            return 0
+        if fd:
+            rango = client.buscar_rango_por_fecha(cuit, tipo, pv, ultimo, fecha_desde, _FECHA_MAX)
+            if not rango:
+                # Todo lo emitido es anterior a fecha_desde
+                _guardar_estado(estudio_id, cuit, tipo, pv, ultimo + 1, ultimo, fd)
+                return 0
+            adelante = (rango[0], ultimo)
+            cubierto = fd
+        else:
+            adelante = (max(1, ultimo - ULTIMOS_POR_STREAM + 1), ultimo)
+            cubierto = None
+        numero_desde, numero_hasta = adelante[0], adelante[0] - 1
+    else:
+        numero_desde = estado['numero_desde']
+        numero_hasta = estado['numero_hasta']
+        cubierto = estado['cubierto_desde']
+        if ultimo > numero_hasta:
+            adelante = (numero_hasta + 1, ultimo)
+        if backfill and fd:
+            rango = client.buscar_rango_por_fecha(cuit, tipo, pv, numero_desde - 1,
+                                                  fecha_desde, _FECHA_MAX)
+            if rango:
+                atras = (rango[0], numero_desde - 1)
+            else:
+                cubierto = fd
+        elif backfill:
+            # Sin fechas: completar hasta los últimos ULTIMOS_POR_STREAM
+            inicio = max(1, ultimo - ULTIMOS_POR_STREAM + 1)
+            if inicio < numero_desde:
+                atras = (inicio, numero_desde - 1)
+
+    claves = []
+    for tramo in (adelante, atras):
+        if tramo:
+            claves.extend((tipo, pv, n) for n in range(tramo[1], tramo[0] - 1, -1))
+    if not claves and estado is not None and cubierto == estado['cubierto_desde']:
+        _guardar_estado(estudio_id, cuit, tipo, pv, numero_desde, numero_hasta, cubierto)
+        return 0
+
+    resultados = dict(zip((n for _, _, n in claves),
+                          client.consultar_comprobantes_lote(cuit, claves, al_avanzar=al_avanzar)))
+    filas = [
+        enriquecer_comprobante(comp, cuit, tipo, pv, num, tipo_desc)
+        for num, comp in resultados.items() if comp is not None
+    ]
+    guardar_comprobantes(estudio_id, cuit, filas)
+
+    # Extender el rango cubierto hasta el primer hueco (se reintenta luego)
+    if adelante:
+        fallidos = [n for n in range(adelante[0], adelante[1] + 1) if resultados.get(n) is None]
+        numero_hasta = (min(fallidos) - 1) if fallidos else adelante[1]
+    if atras:
+        fallidos = [n for n in range(atras[0], atras[1] + 1) if resultados.get(n) is None]
+        if fallidos:
+            numero_desde = max(fallidos) + 1
+        else:
+            numero_desde = atras[0]
+            if fd:
+                cubierto = fd
+
+    _guardar_estado(estudio_id, cuit, tipo, pv, numero_desde, numero_hasta, cubierto)
+    return len(filas)
+
+
+def _necesita_backfill(estado: dict | None, fd: date | None) -> bool:
+    """True si el rango guardado no alcanza para lo pedido.
+
+    Con fecha: se pidió una fecha anterior a la cobertura guardada del stream.
+    Sin fecha: hay menos de ULTIMOS_POR_STREAM guardados.
+    """
+    if estado is None or estado['numero_desde'] <= 1:
+        return False
+    if fd is None:
+        return estado['numero_hasta'] - estado['numero_desde'] + 1 < ULTIMOS_POR_STREAM
+    return estado['cubierto_desde'] is None or fd < estado['cubierto_desde']
+
+
+# ---------------------------------------------------------------------------
+# Acceso a datos
+# ---------------------------------------------------------------------------
+
+def _leer_estados(estudio_id: int, cuit: str) -> dict:
+    with get_cursor(estudio_id=estudio_id) as cur:
+        cur.execute("""
+            SELECT tipo, pv, numero_desde, numero_hasta, cubierto_desde, sincronizado_at
+            FROM comprobantes_sync
+            WHERE estudio_id = %s AND cuit = %s
+        """, (estudio_id, cuit))
+        return {(r['tipo'], r['pv']): r for r in cur.fetchall()}
+
+
+def _guardar_estado(estudio_id: int, cuit: str, tipo: int, pv: int,
+                    numero_desde: int, numero_hasta: int, cubierto_desde: date | None) -> None:
+    with get_cursor(estudio_id=estudio_id) as cur:
+        cur.execute("""
+            INSERT INTO comprobantes_sync
+                (estudio_id, cuit, tipo, pv, numero_desde, numero_hasta, cubierto_desde, sincronizado_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+            ON CONFLICT (estudio_id, cuit, tipo, pv) DO UPDATE
+            SET numero_desde = EXCLUDED.numero_desde,
+                numero_hasta = EXCLUDED.numero_hasta,
+                cubierto_desde = EXCLUDED.cubierto_desde,
+                sincronizado_at = NOW()
+        """, (estudio_id, cuit, tipo, pv, numero_desde, numero_hasta, cubierto_desde))
+
+
+def guardar_comprobantes(estudio_id: int, cuit: str, comprobantes: list[dict]) -> None:
+    """Upsert de comprobantes ya enriquecidos (ver enriquecer_comprobante)."""
+    if not comprobantes:
+        return
+
+    filas = []
+    for comp in comprobantes:
+        c = comp['consulta']
+        try:
+            importe = float(comp.get('ImpTotal') or 0)
+        except (ValueError, TypeError):
+            importe = None
+        filas.append((
+            estudio_id, cuit, c['tipo'], c['punto_venta'], c['numero'],
+            _a_fecha(comp.get('CbteFch')), importe, comp.get('CAE'), Jsonb(comp),
+        ))
+
+    with get_cursor(estudio_id=estudio_id) as cur:
+        cur.executemany("""
+            INSERT INTO comprobantes
+                (estudio_id, cuit, tipo, pv, numero, fecha, importe_total, cae, datos)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (estudio_id, cuit, tipo, pv, numero) DO UPDATE
+            SET fecha = EXCLUDED.fecha,
+                importe_total = EXCLUDED.importe_total,
+                cae = EXCLUDED.cae,
+                datos = EXCLUDED.datos,
+                updated_at = NOW()
+        """, filas)
+
+
+def leer_comprobantes(estudio_id: int, cuit: str, tipos: list[int],
+                      fecha_desde: str | None = None, fecha_hasta: str | None = None) -> list[dict]:
+    """Leer comprobantes del store, en el mismo orden que la enumeración WSFEv1.
+
+    Con fechas: todos los del rango. Sin fechas: los últimos ULTIMOS_POR_STREAM por stream.
+    """
+    fd = _a_fecha(fecha_desde)
+    fh = _a_fecha(fecha_hasta)
+
+    with get_cursor(estudio_id=estudio_id) as cur:
+        if fd or fh:
+            cur.execute("""
+                SELECT datos FROM comprobantes
+                WHERE estudio_id = %s AND cuit = %s AND tipo = ANY(%s)
+                  AND (%s::date IS NULL OR fecha >= %s::date)
+                  AND (%s::date IS NULL OR fecha <= %s::date)
+                ORDER BY array_position(%s::int[], tipo), pv, numero DESC
+            """, (estudio_id, cuit, tipos, fd, fd, fh, fh, tipos))
+        else:
+            cur.execute("""
+                SELECT datos FROM (
+                    SELECT datos, tipo, pv, numero,
+                           ROW_NUMBER() OVER (PARTITION BY tipo, pv ORDER BY numero DESC) AS rn
+                    FROM comprobantes
+                    WHERE estudio_id = %s AND cuit = %s AND tipo = ANY(%s)
+                ) t
+                WHERE rn <= %s
+                ORDER BY array_position(%s::int[], tipo), pv, numero DESC
+            """, (estudio_id, cuit, tipos, ULTIMOS_POR_STREAM, tipos))
+
+        return [r['datos'] for r in cur.fetchall()]
@@ -8,6 +8,9 @@ class Config:
     DATABASE_URL = os.environ["DATABASE_URL"]
     SECRET_KEY = os.environ["SECRET_KEY"]
     SESSION_HOURS = int(os.getenv("SESSION_HOURS", 8))
+    # Segundos que una sesión validada se reusa sin ir a la DB (0 = sin cache).
+    # Logout y desactivaciones la invalidan al instante (LISTEN/NOTIFY).
+    SESSION_CACHE_SECONDS = int(os.getenv("SESSION_CACHE_SECONDS", 30))
     MAX_LOGIN_ATTEMPTS = int(os.getenv("MAX_LOGIN_ATTEMPTS", 5))
     LOCKOUT_MINUTES = int(os.getenv("LOCKOUT_MINUTES", 15))
 
@@ -24,4 +27,10 @@ class Config:
 
     # Portal AFIP (scraping RCEL — PVs no cubiertos por Web Services)
     AFIP_PORTAL_CUIT = os.getenv("AFIP_PORTAL_CUIT", "")
-    AFIP_PORTAL_PASSWORD = os.getenv("AFIP_PORTAL_PASSWORD", "")
\ No newline at end of file
+    AFIP_PORTAL_PASSWORD = os.getenv("AFIP_PORTAL_PASSWORD", "")
+
+    # ── Consultas en background ───────────────────────────────────────
+    # 1 = /consultar-facturas-unificada encola un job y responde al instante;
+    #     lo procesa scripts/worker_consultas.py (tiene que estar corriendo).
+    # 0 = se ejecuta dentro del request (desarrollo, sin worker).
+    CONSULTAS_ASYNC = os.getenv("CONSULTAS_ASYNC", "1") == "1"
\ No newline at end of file
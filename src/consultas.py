@@ -0,0 +1,607 @@
+# src/consultas.py
+# Consulta unificada de comprobantes (WS + portal RCEL) y handlers de la cola de jobs.
+#
+# Sin efectos al importar: no abre el pool, no arranca threads ni crea la app
+# Flask. Lo usan src/app.py (rutas e inline con CONSULTAS_ASYNC=0),
+# scripts/worker_consultas.py (JOB_HANDLERS) y benchmarks/.
+#
+# Uso:
+#   from src.consultas import JOB_HANDLERS, ejecutar_consulta_unificada
+#   contexto = ejecutar_consulta_unificada(estudio_id, cliente_dict, '2025-01-01', '2025-01-31')
+
+from pathlib import Path
+
+from src.afip_monitor import estado_servicios
+from src.afip_resiliencia import estado_circuitos
+from src.config import Config
+from src.exportacion import guardar_facturas as _guardar_facturas
+from src.resumen_fiscal import resumir_comprobantes
+
+
+def _fila_comprobante(fac, origen='Emitido'):
+    """Fila de la grilla de resultado_facturas_unificada.html para un evento del job."""
+    d = fac.get('datos', fac)
+    c = fac.get('consulta', {})
+    pv = d.get('PtoVta', d.get('punto_venta', '-'))
+    nro = d.get('CbteNro', d.get('numero_comprobante', d.get('numero', '-')))
+    tipo = c.get('tipo_descripcion', '') or d.get('CbteTipoDesc', d.get('CbteTipo', d.get('tipo_comprobante', '-')))
+    fecha = str(d.get('CbteFch', d.get('fecha_emision', '')) or '')
+    if len(fecha) == 8 and fecha.isdigit():
+        fecha = f"{fecha[:4]}-{fecha[4:6]}-{fecha[6:]}"
+    try:
+        importe = f"${float(d.get('ImpTotal', d.get('importe_total', ''))):.2f}"
+    except (ValueError, TypeError):
+        importe = '-'
+    if origen == 'Recibido':
+        extra = d.get('DenominacionEmisor', d.get('DocNro', '-'))
+    else:
+        extra = d.get('CAE', d.get('cae', '')) or '-'
+    return {
+        'clave': f"{origen}|{c.get('tipo', d.get('CbteTipo', tipo))}|{pv}|{nro}",
+        'origen': origen, 'tipo': str(tipo), 'pv': str(pv), 'numero': str(nro),
+        'fecha': fecha or '-', 'importe': importe, 'extra': str(extra),
+    }
+
+def _publicar_filas(eventos, facturas, origen='Emitido'):
+    """Publicar como eventos 'comprobante' resultados que llegan en bloque (RCEL, fallbacks)."""
+    if eventos:
+        for fac in facturas:
+            eventos('comprobante', _fila_comprobante(fac, origen))
+
+def ejecutar_consulta_unificada(estudio_id, cliente_dict, fecha_desde='', fecha_hasta='', progreso=None, eventos=None):
+    """Consulta unificada completa: health check, WS, RCEL, export y resumen.
+
+    Corre en el worker de jobs (scripts/worker_consultas.py) o inline si
+    CONSULTAS_ASYNC=0. No usa g/request: todo llega por parámetro.
+
+    Args:
+        cliente_dict: datos del cliente (id, cuit, razon_social, ...)
+        fecha_desde, fecha_hasta: 'YYYY-MM-DD' o '' (como vienen del form)
+        progreso: callable(str) opcional para informar el avance
+        eventos: callable(tipo, datos) opcional para resultados parciales
+            (src.jobs.EventosJob): filas de la grilla a medida que llegan
+
+    Retorna el contexto para resultado_facturas_unificada.html.
+    """
+    def _avance(msg):
+        if progreso:
+            progreso(msg)
+
+    cuit = cliente_dict['cuit']
+    fecha_desde_afip = fecha_desde.replace('-', '') if fecha_desde else None
+    fecha_hasta_afip = fecha_hasta.replace('-', '') if fecha_hasta else None
+    print(f"[UNIFICADO] estudio={estudio_id}  cliente={cuit}  razon_social={cliente_dict['razon_social']}  fecha_desde={fecha_desde_afip}  fecha_hasta={fecha_hasta_afip}")
+
+    # Pre-check: al menos un servicio AFIP tiene que responder (estado del
+    # monitor en background, src/afip_monitor.py: sin esperar a la red)
+    _avance('Verificando servicios AFIP')
+    estado_afip = estado_servicios()
+    print(f"[HEALTH CHECK] {estado_afip}")
+
+    if not any(estado_afip.values()):
+        caidos = ', '.join(estado_afip.keys())
+        return dict(
+            cliente=cliente_dict,
+            facturas=[],
+            web_service='Ninguno',
+            mensaje=f'Los servicios de AFIP no estan disponibles en este momento ({caidos}). Intente nuevamente mas tarde.',
+            total_facturas=0,
+            afip_caido=True)
+
+    # Mensaje informativo segun filtro de fechas
+    modo_consulta = ''
+    if fecha_desde_afip and fecha_hasta_afip:
+        modo_consulta = f'Rango: {fecha_desde_afip[:4]}-{fecha_desde_afip[4:6]}-{fecha_desde_afip[6:]} a {fecha_hasta_afip[:4]}-{fecha_hasta_afip[4:6]}-{fecha_hasta_afip[6:]}'
+    else:
+        modo_consulta = 'Sin fechas: se muestran los ultimos 50 comprobantes por tipo/PV'
+
+    # ── RCEL (portal web) — emitidos + recibidos ──
+    # Un solo navegador/login para ambas secciones, en un hilo aparte que
+    # corre en paralelo con la enumeración WS (no depende de sus resultados)
+    from src.afip_credentials import get_afip_credentials
+    _creds = get_afip_credentials(estudio_id)
+    portal_cuit = _creds['portal_cuit']
+    portal_pass = _creds['portal_password']
+    cuit_clean = str(cuit).replace('-', '').replace(' ', '')
+
+    def _consultar_rcel():
+        """Retorna (emitidos, recibidos, errores) normalizados."""
+        import sys as _sys
+        _root = Path(__file__).parent.parent
+        if str(_root) not in _sys.path:
+            _sys.path.insert(0, str(_root))
+        from rcel_scraper import RCELScraper
+
+        # Fechas YYYYMMDD -> dd/mm/yyyy
+        rcel_desde = '01/01/2020'
+        rcel_hasta = None
+        if fecha_desde_afip and len(fecha_desde_afip) == 8:
+            rcel_desde = f"{fecha_desde_afip[6:]}/{fecha_desde_afip[4:6]}/{fecha_desde_afip[:4]}"
+        if fecha_hasta_afip and len(fecha_hasta_afip) == 8:
+            rcel_hasta = f"{fecha_hasta_afip[6:]}/{fecha_hasta_afip[4:6]}/{fecha_hasta_afip[:4]}"
+
+        portal_cuit_clean = portal_cuit.replace('-', '').replace(' ', '')
+        if cuit_clean == portal_cuit_clean:
+            empresa_nombre = None
+            empresa_cuit = None
+        else:
+            empresa_nombre = cliente_dict['razon_social']
+            empresa_cuit = cuit_clean
+
+        emitidos, recibidos, errores = [], [], []
+        try:
+            print(f"[UNIFICADO] RCEL emitidos + recibidos para {cuit_clean}...", flush=True)
+            scraper = RCELScraper(cuit=portal_cuit, password=portal_pass, headless=True)
+            res = scraper.consultar_secciones(('emitidos', 'recibidos'), puntos_venta=None,
+                                              fecha_desde=rcel_desde, fecha_hasta=rcel_hasta,
+                                              empresa=empresa_nombre, cuit_empresa=empresa_cuit)
+        except Exception as e:
+            print(f"[UNIFICADO] RCEL fallo: {e}", flush=True)
+            return emitidos, recibidos, [f"RCEL: {e}"]
+
+        for seccion, origen in (('emitidos', 'Emitido'), ('recibidos', 'Recibido')):
+            r = res.get(seccion, {})
+            if r.get('comprobantes'):
+                filas = RCELScraper.normalizar_comprobantes(r['comprobantes'], seccion)
+                _publicar_filas(eventos, filas, origen)
+                (emitidos if seccion == 'emitidos' else recibidos).extend(filas)
+                print(f"[UNIFICADO] RCEL {seccion}: {len(filas)}", flush=True)
+            elif r.get('error'):
+                print(f"[UNIFICADO] RCEL {seccion} error: {r['error']}", flush=True)
+                errores.append(f"RCEL {seccion}: {r['error']}")
+        return emitidos, recibidos, errores
+
+    rcel_pool = rcel_futuro = None
+    if portal_cuit and portal_pass:
+        from concurrent.futures import ThreadPoolExecutor
+        rcel_pool = ThreadPoolExecutor(max_workers=1)
+        rcel_futuro = rcel_pool.submit(_consultar_rcel)
+    else:
+        print("[UNIFICADO] RCEL: credenciales portal no configuradas", flush=True)
+
+    # WSFEv1 es el servicio principal — cubre todos los tipos (A,B,C,M)
+    # Cada servicio en su propio try/except para que uno no tire abajo a los demas
+    resultados_wsfev1 = {'facturas': []}
+    resultados_wsmtxca = {'facturas': []}
+    resultados_wsfexv1 = {'facturas': []}
+    errores_servicios = []
+
+    if estado_afip.get('WSFEv1'):
+        _avance('Consultando WSFEv1' + (' y portal RCEL' if rcel_futuro else ''))
+        try:
+            resultados_wsfev1 = consultar_wsfev1_interno(cuit, fecha_desde_afip, fecha_hasta_afip,
+                                                         estudio_id=estudio_id, eventos=eventos)
+        except Exception as e:
+            print(f"[UNIFICADO] WSFEv1 fallo: {e}", flush=True)
+            errores_servicios.append(f"WSFEv1: {e}")
+
+    # WSMTXCA y WSFEXv1 solo si WSFEv1 falló completamente (error, no "0 resultados")
+    # WSFEv1 ya cubre Facturas A/B/C/M para mercado interno.
+    # WSMTXCA es lento (~30 llamadas SOAP) y redundante para monotributo.
+    # WSFEXv1 solo aplica a exportadores.
+    # Para PVs no-WS (Factura en Linea, Factuweb) el usuario tiene RCEL.
+    wsfev1_fallo = resultados_wsfev1.get('error') and not resultados_wsfev1.get('facturas')
+    if wsfev1_fallo:
+        print("[UNIFICADO] WSFEv1 fallo, intentando WSMTXCA/WSFEXv1...", flush=True)
+        if estado_afip.get('WSMTXCA'):
+            try:
+                resultados_wsmtxca = consultar_wsmtxca_interno(cuit, fecha_desde_afip, fecha_hasta_afip)
+                _publicar_filas(eventos, resultados_wsmtxca.get('facturas', []))
+            except Exception as e:
+                print(f"[UNIFICADO] WSMTXCA fallo: {e}", flush=True)
+                errores_servicios.append(f"WSMTXCA: {e}")
+
+        if estado_afip.get('WSFEXv1'):
+            try:
+                resultados_wsfexv1 = consultar_wsfexv1_interno(cuit, fecha_desde_afip, fecha_hasta_afip)
+                _publicar_filas(eventos, resultados_wsfexv1.get('facturas', []))
+            except Exception as e:
+                print(f"[UNIFICADO] WSFEXv1 fallo: {e}", flush=True)
+                errores_servicios.append(f"WSFEXv1: {e}")
+    else:
+        print("[UNIFICADO] WSFEv1 OK, saltando WSMTXCA/WSFEXv1", flush=True)
+
+    # Combinar resultados WS
+    facturas_ws = (
+        resultados_wsfev1.get('facturas', []) +
+        resultados_wsmtxca.get('facturas', []) +
+        resultados_wsfexv1.get('facturas', [])
+    )
+    print(f"[UNIFICADO] WS: {len(facturas_ws)} comprobantes", flush=True)
+    _avance(f'Web services: {len(facturas_ws)} comprobantes')
+
+    # Circuitos AFIP que quedaron abiertos (src/afip_resiliencia.py): la consulta
+    # puede estar incompleta aunque haya traído comprobantes
+    circuitos_afip = estado_circuitos(solo_problemas=True)
+    for servicio, estado in circuitos_afip.items():
+        print(f"[UNIFICADO] circuito {servicio} {estado['estado']}: {estado['ultimo_error']}", flush=True)
+        errores_servicios.append(f"AFIP {servicio}: servicio degradado ({estado['ultimo_error']})")
+
+    # ── RCEL: esperar el hilo lanzado antes de los WS ──
+    facturas_rcel = []
+    facturas_recibidas = []
+    if rcel_futuro is not None:
+        if not rcel_futuro.done():
+            _avance('Esperando portal RCEL')
+        facturas_rcel, facturas_recibidas, errores_rcel = rcel_futuro.result()
+        errores_servicios.extend(errores_rcel)
+        rcel_pool.shutdown(wait=False)
+
+    # ── Unificar emitidos ──
+    facturas_finales = facturas_ws + facturas_rcel
+
+    if facturas_finales or facturas_recibidas:
+        partes = []
+        if facturas_finales:
+            partes.append(f"{len(facturas_finales)} emitidos")
+        if facturas_recibidas:
+            partes.append(f"{len(facturas_recibidas)} recibidos")
+        mensaje = f"Se encontraron {' + '.join(partes)}. {modo_consulta}"
+        web_service_usado = f"{len(facturas_ws)} via WS + {len(facturas_rcel)} via Portal"
+    else:
+        web_service_usado = "Ninguno"
+        if errores_servicios:
+            mensaje = f"Error en consulta: {'; '.join(errores_servicios)}"
+        else:
+            mensaje = f"No se encontraron comprobantes. {modo_consulta}"
+
+    # Persistir resultados en disco — siempre 3 archivos: emitidos, recibidos, todos
+    _avance('Guardando archivos')
+    _gf_kwargs = dict(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta, estudio_id=estudio_id)
+    archivos_guardados = {
+        'emitidos':  _guardar_facturas(cuit, facturas_finales, web_service_usado, sufijo='emitidos', **_gf_kwargs),
+        'recibidos': _guardar_facturas(cuit, facturas_recibidas, 'RCEL recibidos', sufijo='recibidos', **_gf_kwargs),
+        'todos':     _guardar_facturas(cuit, facturas_finales + facturas_recibidas, web_service_usado, sufijo='todos', **_gf_kwargs),
+    }
+
+    # ── Resumen por tipo + impositivo (src/resumen_fiscal.py) ──
+    resumen = resumir_comprobantes(facturas_finales)
+
+    # Marcar origen en cada comprobante para la grilla unificada
+    for fac in facturas_finales:
+        fac['_origen'] = 'Emitido'
+    for fac in facturas_recibidas:
+        fac['_origen'] = 'Recibido'
+    todos_comprobantes = facturas_finales + facturas_recibidas
+
+    return dict(cliente=cliente_dict,
+                todos_comprobantes=todos_comprobantes,
+                web_service=web_service_usado,
+                mensaje=mensaje,
+                total_facturas=len(facturas_finales),
+                total_recibidas=len(facturas_recibidas),
+                archivos=archivos_guardados,
+                fecha_desde=fecha_desde,
+                fecha_hasta=fecha_hasta,
+                circuitos_afip=circuitos_afip,
+                **resumen)
+
+
+def determinar_web_service(cliente, cuit):
+    """
+    L�gica inteligente para determinar qu� web service usar
+    """
+    try:
+        # Primero intentamos con WSFEV1 (m�s com�n)
+        # Si es un monotributista o empresa peque�a, probablemente use WSFEv1
+        
+        # Para simplificar, vamos a intentar primero WSFEv1
+        # Si no hay resultados, intentamos WSMTXCA
+        return 'AUTO'  # Modo autom�tico que prueba ambos
+        
+    except:
+        return 'AUTO'
+
+def consultar_wsfev1_interno(cuit_cliente, fecha_desde=None, fecha_hasta=None, estudio_id=None, eventos=None):
+    """Consultar facturas usando WSFEv1 — patron eficiente basado en script.
+
+    1. Obtiene PVs reales via FEParamGetPtosVenta (1 sola llamada SOAP)
+    2. Solo recorre tipos principales
+    3. Early stop por fecha
+    4. Streams (tipo, PV) en paralelo + detalle concurrente (consultar_streams)
+    5. Con estudio_id: sync incremental al store (comprobantes) y lectura desde la DB
+    6. Con eventos: publica cada stream resuelto y cada comprobante apenas llega
+       (lo ya guardado en el store sale primero, sin esperar a AFIP)
+    """
+    import sys, time
+    from pathlib import Path
+    from src.afip_credentials import get_afip_credentials
+    from src.comprobantes_store import enriquecer_comprobante, leer_comprobantes, sincronizar_wsfev1
+
+    creds = get_afip_credentials(estudio_id)
+    solicitante = creds['solicitante_cuit']
+    cuit_clean = str(cuit_cliente).replace('-', '').replace(' ', '')
+    print(f"[WSFEv1] solicitante={solicitante}  cliente={cuit_clean}  desde={fecha_desde}  hasta={fecha_hasta}", flush=True)
+
+    try:
+        root_dir = Path(__file__).parent.parent
+        if str(root_dir) not in sys.path:
+            sys.path.insert(0, str(root_dir))
+
+        from wsfev1_client import WSFEv1Client
+
+        client = WSFEv1Client(creds['cert_path'], creds['key_path'], creds['ambiente'],
+                              solicitante_cuit=solicitante)
+
+        # Obtener PVs reales (1 sola llamada SOAP — evita recorrer PVs inexistentes)
+        pvs_reales = client.obtener_puntos_venta(cuit_clean)
+        if not pvs_reales:
+            pvs_reales = [1, 2, 3, 4, 5]
+        print(f"[WSFEv1] PVs detectados: {pvs_reales}", flush=True)
+
+        tipos = [1, 6, 11, 51, 2, 3, 7, 8, 12, 13]
+        facturas = []
+        inicio = time.time()
+
+        def _avance(evento, datos):
+            """Callback de consultar_streams / sincronizar_wsfev1 → eventos del job."""
+            tipo_desc = client.tipos_comprobante.get(datos['tipo'], f"Tipo {datos['tipo']}")
+            if evento == 'stream':
+                eventos('stream', {'tipo': datos['tipo'], 'pv': datos['pv'],
+                                   'tipo_descripcion': tipo_desc, 'cantidad': datos['cantidad']})
+                return
+            comp = datos['comp']
+            if comp is None:
+                return
+            fecha_cbte = comp.get('CbteFch') or comp.get('fecha_emision') or ''
+            if (fecha_desde and fecha_cbte and fecha_cbte < fecha_desde) or \
+                    (fecha_hasta and fecha_cbte and fecha_cbte > fecha_hasta):
+                return
+            fac = enriquecer_comprobante(dict(comp), cuit_clean, datos['tipo'], datos['pv'],
+                                         datos['numero'], tipo_desc)
+            eventos('comprobante', _fila_comprobante(fac))
+
+        al_avanzar = _avance if eventos else None
+
+        # Con estudio: sync incremental contra el store y lectura desde la DB
+        if estudio_id is not None:
+            if eventos:
+                _publicar_filas(eventos, leer_comprobantes(estudio_id, cuit_clean, tipos, fecha_desde, fecha_hasta))
+            sincronizar_wsfev1(client, estudio_id, cuit_clean, pvs_reales, tipos, fecha_desde,
+                               al_avanzar=al_avanzar)
+            facturas = leer_comprobantes(estudio_id, cuit_clean, tipos, fecha_desde, fecha_hasta)
+
+            elapsed = time.time() - inicio
+            print(f"[WSFEv1] cliente={cuit_clean}  encontradas={len(facturas)}  tiempo={elapsed:.1f}s (store)", flush=True)
+            return {
+                'web_service': 'WSFEv1 (Facturas Tradicionales)',
+                'facturas': facturas
+            }
+
+        # Streams (tipo, PV) en paralelo; el detalle arranca apenas cada stream
+        # resuelve su rango (resultados en orden tipo → PV → número desc)
+        comprobantes = client.consultar_streams(cuit_clean, tipos, pvs_reales, fecha_desde, fecha_hasta,
+                                                al_avanzar=al_avanzar)
+        print(f"[WSFEv1] {len(comprobantes)} comprobantes consultados", flush=True)
+
+        for tipo, pv, num, comp in comprobantes:
+            if comp is None:
+                continue
+
+            # Safety net: validar fecha dentro del rango solicitado
+            fecha_cbte = comp.get('CbteFch') or comp.get('fecha_emision') or ''
+            if fecha_desde and fecha_cbte and fecha_cbte < fecha_desde:
+                continue
+            if fecha_hasta and fecha_cbte and fecha_cbte > fecha_hasta:
+                continue
+
+            tipo_desc = client.tipos_comprobante.get(tipo, f'Tipo {tipo}')
+            facturas.append(enriquecer_comprobante(comp, cuit_clean, tipo, pv, num, tipo_desc))
+
+        elapsed = time.time() - inicio
+        print(f"[WSFEv1] cliente={cuit_clean}  encontradas={len(facturas)}  tiempo={elapsed:.1f}s", flush=True)
+
+        return {
+            'web_service': 'WSFEv1 (Facturas Tradicionales)',
+            'facturas': facturas
+        }
+    except Exception as e:
+        print(f"[WSFEv1] ERROR cliente={cuit_clean}: {e}", flush=True)
+        return {
+            'web_service': 'WSFEv1 (Error)',
+            'facturas': [],
+            'error': str(e)
+        }
+
+def consultar_wsmtxca_interno(cuit_cliente, fecha_desde=None, fecha_hasta=None):
+    """Consultar facturas usando WSMTXCA.
+
+    Args:
+        cuit_cliente: CUIT del emisor consultado (el cliente del estudio).
+        fecha_desde: str YYYYMMDD o None
+        fecha_hasta: str YYYYMMDD o None
+    """
+    solicitante = Config.AFIP_SOLICITANTE_CUIT
+    print(f"[WSMTXCA] solicitante={solicitante}  cliente={cuit_cliente}")
+
+    try:
+        cuit_clean = cuit_cliente.replace('-', '').replace(' ', '')
+        if not cuit_clean.isdigit() or len(cuit_clean) != 11:
+            raise ValueError('CUIT debe tener 11 digitos numericos')
+
+        import sys
+        from pathlib import Path
+        root_dir = Path(__file__).parent.parent
+        if str(root_dir) not in sys.path:
+            sys.path.insert(0, str(root_dir))
+
+        from wsmtxca_client import WSMTXCAClient
+
+        cert_path = root_dir / 'certs' / 'certificado.crt'
+        key_path = root_dir / 'certs' / 'clave_privada.key'
+
+        cliente = WSMTXCAClient(str(cert_path), str(key_path))
+
+        tipos_principales = [11, 51, 1, 6]
+        puntos_venta = [1, 2, 3, 4, 5]
+
+        facturas = []
+        consultas_realizadas = 0
+        max_consultas = 30
+
+        for tipo in tipos_principales:
+            if consultas_realizadas >= max_consultas:
+                break
+            for pv in puntos_venta:
+                if consultas_realizadas >= max_consultas:
+                    break
+
+                no_encontrados = 0
+                for num in range(1, 6):
+                    if consultas_realizadas >= max_consultas or no_encontrados >= 2:
+                        break
+
+                    try:
+                        consultas_realizadas += 1
+                        resultado = cliente.consultar_comprobante(
+                            cuit=cuit_clean,
+                            tipo=tipo,
+                            punto_venta=pv,
+                            numero=num
+                        )
+
+                        if resultado and resultado.get('status') == 'encontrado':
+                            fecha_cbte = resultado.get('CbteFch') or resultado.get('fecha_emision') or ''
+                            if fecha_hasta and fecha_cbte > fecha_hasta:
+                                no_encontrados += 1
+                                continue
+                            if fecha_desde and fecha_cbte < fecha_desde:
+                                break
+                            facturas.append(resultado)
+                            no_encontrados = 0
+                        else:
+                            no_encontrados += 1
+
+                    except Exception:
+                        no_encontrados += 1
+
+        print(f"[WSMTXCA] cliente={cuit_clean}  encontrados={len(facturas)}")
+
+        return {
+            'web_service': 'WSMTXCA (Codigos MTX)',
+            'facturas': facturas or []
+        }
+    except Exception as e:
+        print(f"[WSMTXCA] ERROR cliente={cuit_cliente}: {e}")
+        return {
+            'web_service': 'WSMTXCA (Error)',
+            'facturas': [],
+            'error': str(e)
+        }
+
+def consultar_wsfexv1_interno(cuit_cliente, fecha_desde=None, fecha_hasta=None):
+    """Consultar facturas usando WSFEXv1 - Exportación.
+
+    Args:
+        cuit_cliente: CUIT del emisor consultado (el cliente del estudio).
+        fecha_desde: str YYYYMMDD o None
+        fecha_hasta: str YYYYMMDD o None
+    """
+    solicitante = Config.AFIP_SOLICITANTE_CUIT
+    print(f"[WSFEXv1] solicitante={solicitante}  cliente={cuit_cliente}")
+
+    try:
+        import sys
+        from pathlib import Path
+
+        root_dir = Path(__file__).parent.parent
+        if str(root_dir) not in sys.path:
+            sys.path.insert(0, str(root_dir))
+
+        from wsfexv1_client import WSFEXv1Client
+
+        cert_path = root_dir / 'certs' / 'certificado.crt'
+        key_path = root_dir / 'certs' / 'clave_privada.key'
+
+        client = WSFEXv1Client(
+            cert_path=str(cert_path),
+            key_path=str(key_path),
+            ambiente='prod'
+        )
+
+        # Tipos comunes de exportación
+        tipos_exportacion = [19, 20, 21]  # Facturas exportación A, B, C
+        puntos_venta = [1, 2, 3, 4, 5]
+
+        facturas = []
+
+        try:
+            if hasattr(client, 'buscar_comprobantes_rango'):
+                facturas = client.buscar_comprobantes_rango(
+                    cuit=cuit_cliente,
+                    tipos_comprobante=tipos_exportacion,
+                    puntos_venta=puntos_venta,
+                    limite_por_tipo=10,
+                    fecha_desde=fecha_desde,
+                    fecha_hasta=fecha_hasta
+                )
+        except Exception as inner_e:
+            print(f"[WSFEXv1] busqueda fallida cliente={cuit_cliente}: {inner_e}")
+
+        print(f"[WSFEXv1] cliente={cuit_cliente}  encontradas={len(facturas) if facturas else 0}")
+
+        return {
+            'web_service': 'WSFEXv1 (Exportación)',
+            'facturas': facturas or []
+        }
+    except Exception as e:
+        print(f"[WSFEXv1] ERROR cliente={cuit_cliente}: {e}")
+        return {
+            'web_service': 'WSFEXv1 (Error)',
+            'facturas': [],
+            'error': str(e)
+        }
+
+def consultar_ambos_servicios(cuit_cliente):
+    """Consultar en los 3 servicios y combinar resultados."""
+    try:
+        resultados_wsfev1 = consultar_wsfev1_interno(cuit_cliente)
+        resultados_wsmtxca = consultar_wsmtxca_interno(cuit_cliente)
+        resultados_wsfexv1 = consultar_wsfexv1_interno(cuit_cliente)
+        
+        facturas_combinadas = []
+        
+        # Agregar facturas de WSFEv1
+        if resultados_wsfev1['facturas']:
+            facturas_combinadas.extend(resultados_wsfev1['facturas'])
+
+        # Agregar facturas de WSMTXCA
+        if resultados_wsmtxca['facturas']:
+            facturas_combinadas.extend(resultados_wsmtxca['facturas'])
+
+        # Agregar facturas de WSFEXv1
+        if resultados_wsfexv1['facturas']:
+            facturas_combinadas.extend(resultados_wsfexv1['facturas'])
+        
+        # Determinar cu�l tuvo m�s �xito
+        if len(resultados_wsfev1['facturas']) > len(resultados_wsmtxca['facturas']):
+            servicio_principal = 'WSFEv1 (con respaldo WSMTXCA)'
+        elif len(resultados_wsmtxca['facturas']) > 0:
+            servicio_principal = 'WSMTXCA (con respaldo WSFEv1)'
+        else:
+            servicio_principal = 'Consulta autom�tica (ambos servicios)'
+        
+        return {
+            'web_service': servicio_principal,
+            'facturas': facturas_combinadas
+        }
+    except Exception as e:
+        return {
+            'web_service': 'Error en consulta autom�tica',
+            'facturas': [],
+            'error': str(e)
+        }
+
+
+# ============= JOBS DE CONSULTA (cola en PostgreSQL) =============
+
+def _job_consulta_unificada(job, progreso, eventos):
+    p = job['parametros']
+    return ejecutar_consulta_unificada(job['estudio_id'], p['cliente'],
+                                       p.get('fecha_desde', ''), p.get('fecha_hasta', ''),
+                                       progreso=progreso, eventos=eventos)
+
+# tipo de job -> handler(job, progreso, eventos) que retorna el resultado (dict JSON-serializable)
+JOB_HANDLERS = {
+    'consulta_unificada': _job_consulta_unificada,
+}
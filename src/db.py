@@ -17,9 +17,26 @@
 #   - Por defecto se usa dict_row: cada fila es un dict {columna: valor}.
 #   - Más verboso pero elimina errores de índice numérico en queries complejas.
 #   - Se puede pasar row_factory=tuple_row si se prefiere tupla en algún caso.
+#
+# Conexión por request (DB_CONEXION_POR_REQUEST=1):
+#   - Dentro de un request Flask, el primer get_cursor() toma una conexión del
+#     pool y la deja en flask.g; los siguientes del mismo request la reusan.
+#     Se devuelve en el teardown (liberar_conexion_request, registrado en app.py).
+#   - Cada bloque sigue siendo su propia transacción: SET LOCAL app.estudio_id
+#     vale solo para ese bloque, igual que con una conexión por bloque.
+#   - Un get_cursor() anidado dentro de otro, o desde otro thread, usa una
+#     conexión aparte del pool (no puede compartir la transacción del de afuera).
+#   - Un request largo (consulta unificada sin worker, streams SSE) retiene la
+#     conexión hasta terminar: dimensionar DB_POOL_MAX en consecuencia.
+#
+# Estadísticas: estadisticas_pool() (por proceso) — checkouts, espera,
+# saturación y pico de conexiones en uso. Se ven en /admin/health.
 
 from __future__ import annotations
 
+import os
+import threading
+import time
 from contextlib import contextmanager
 from typing import Generator
 
@@ -27,11 +44,23 @@ import psycopg
 import psycopg.rows
 from psycopg_pool import ConnectionPool
 
-from src.config import Config
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 2))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_CONEXION_POR_REQUEST = os.getenv("DB_CONEXION_POR_REQUEST", "0") == "1"
 
 # Pool único por proceso. Se inicializa en init_pool().
 _pool: ConnectionPool | None = None
 
+# Contadores propios (los del pool están en _pool.get_stats())
+_stats = {
+    "checkouts": 0,             # conexiones pedidas al pool
+    "espera_max_ms": 0.0,       # peor espera de un checkout
+    "en_uso": 0,                # conexiones de get_cursor fuera del pool ahora
+    "en_uso_max": 0,            # pico de en_uso desde el arranque
+    "reusos_request": 0,        # get_cursor servidos con la conexión del request
+}
+_stats_lock = threading.Lock()
+
 
 def init_pool() -> None:
     """
@@ -40,11 +69,14 @@ def init_pool() -> None:
     Falla rápido con mensaje claro si la DB no está disponible.
     """
     global _pool
+    # Config se importa acá: los módulos que solo preguntan pool_disponible()
+    # (caches AFIP, clientes SOAP en scripts/benchmarks) importan src.db sin .env
+    from src.config import Config
 
     _pool = ConnectionPool(
         conninfo=Config.DATABASE_URL,
-        min_size=2,
-        max_size=10,
+        min_size=DB_POOL_MIN,
+        max_size=DB_POOL_MAX,
         # kwargs que se pasan a cada conexión del pool:
         kwargs={
             # row_factory global: todos los cursores devuelven dicts por defecto.
@@ -62,6 +94,8 @@ def init_pool() -> None:
         # Falla aquí si DATABASE_URL es incorrecta o PostgreSQL no está corriendo.
         _pool.wait(timeout=10)
     except Exception as e:
+        # wait() fallido cierra el pool: no dejarlo como si estuviera disponible
+        _pool = None
         raise RuntimeError(
             f"No se pudo conectar a PostgreSQL.\n"
             f"Verificá que el servicio esté corriendo (docker compose up -d).\n"
@@ -70,6 +104,15 @@ def init_pool() -> None:
         ) from e
 
 
+def pool_disponible() -> bool:
+    """True si init_pool() abrió el pool en este proceso (la app y el worker).
+
+    Los caches AFIP lo consultan para decidir si usan PostgreSQL o solo memoria
+    (scripts sueltos, benchmarks, simulador).
+    """
+    return _pool is not None
+
+
 def close_pool() -> None:
     """Cierra el pool al apagar la app. Registrar en app.py con teardown_appcontext."""
     if _pool is not None:
@@ -94,26 +137,126 @@ def get_cursor(
     - estudio_id: si se pasa, setea app.estudio_id en la sesión PostgreSQL
       para que las RLS policies filtren automáticamente por tenant.
       Si es None (superadmin o scripts), no se setea y RLS permite todo.
+    - Con DB_CONEXION_POR_REQUEST=1 reusa la conexión del request (ver arriba).
     """
     assert _pool is not None, "init_pool() no fue llamado antes de get_cursor()"
 
-    with _pool.connection() as conn:
-        if row_factory is not None:
-            conn.row_factory = row_factory
+    reservada = _conexion_request()
+    if reservada is not None:
+        reservada["en_uso"] = True
+        try:
+            yield from _transaccion(reservada["conn"], row_factory, estudio_id)
+        finally:
+            reservada["en_uso"] = False
+        return
+
+    with _checkout() as conn:
+        yield from _transaccion(conn, row_factory, estudio_id)
 
+
+def _transaccion(conn, row_factory, estudio_id):
+    # Dentro del try: si el SET falla, el rollback deja la conexión lista
+    # para volver al pool (o para el resto del request)
+    try:
         # RLS: setear contexto de tenant para esta transacción
         if estudio_id is not None:
             conn.execute(
                 "SET LOCAL app.estudio_id = %s", (str(estudio_id),)
             )
 
+        # row_factory en el cursor, no en la conexión: la conexión vuelve al
+        # pool (o sigue en el request) con el default
+        with conn.cursor(row_factory=row_factory) if row_factory is not None else conn.cursor() as cur:
+            yield cur
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+@contextmanager
+def _checkout():
+    """Conexión del pool, con contadores de espera y uso."""
+    inicio = time.perf_counter()
+    with _pool.connection() as conn:
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        with _stats_lock:
+            _stats["checkouts"] += 1
+            _stats["espera_max_ms"] = max(_stats["espera_max_ms"], espera_ms)
+            _stats["en_uso"] += 1
+            _stats["en_uso_max"] = max(_stats["en_uso_max"], _stats["en_uso"])
         try:
-            with conn.cursor() as cur:
-                yield cur
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
+            yield conn
+        finally:
+            with _stats_lock:
+                _stats["en_uso"] -= 1
+
+
+# ---------------------------------------------------------------------------
+# Conexión por request
+# ---------------------------------------------------------------------------
+
+def _conexion_request() -> dict | None:
+    """Conexión reservada del request actual, o None si este get_cursor no puede usarla."""
+    if not DB_CONEXION_POR_REQUEST:
+        return None
+    from flask import g, has_request_context
+
+    if not has_request_context():
+        return None
+
+    reservada = g.get("_db_conexion")
+    if reservada is None:
+        contexto = _checkout()
+        reservada = {
+            "conn": contexto.__enter__(),
+            "contexto": contexto,
+            "hilo": threading.get_ident(),
+            "en_uso": False,
+        }
+        g._db_conexion = reservada
+    elif reservada["en_uso"] or reservada["hilo"] != threading.get_ident():
+        return None
+
+    with _stats_lock:
+        _stats["reusos_request"] += 1
+    return reservada
+
+
+def liberar_conexion_request(error: BaseException | None = None) -> None:
+    """Devolver al pool la conexión del request (teardown_appcontext en app.py)."""
+    from flask import g
+
+    reservada = g.pop("_db_conexion", None)
+    if reservada is not None:
+        reservada["contexto"].__exit__(None, None, None)
+
+
+# ---------------------------------------------------------------------------
+# Estadísticas
+# ---------------------------------------------------------------------------
+
+def estadisticas_pool() -> dict:
+    """
+    Estado del pool de este proceso, para dimensionar DB_POOL_MAX.
+
+    Incluye los contadores de psycopg_pool (pool_size, pool_available,
+    requests_num, requests_queued, requests_wait_ms, ...) más:
+      checkouts, reusos_request, en_uso, en_uso_max, espera_max_ms,
+      espera_media_ms (de los checkouts que esperaron) y saturacion_pct
+      (% de checkouts que encontraron el pool sin conexiones libres).
+    """
+    if _pool is None:
+        return {}
+    stats = dict(_pool.get_stats())
+    with _stats_lock:
+        stats.update(_stats)
+    encolados = stats.get("requests_queued", 0)
+    pedidos = stats.get("requests_num", 0)
+    stats["espera_media_ms"] = stats.get("requests_wait_ms", 0) / encolados if encolados else 0.0
+    stats["saturacion_pct"] = 100.0 * encolados / pedidos if pedidos else 0.0
+    stats["pid"] = os.getpid()
+    return stats
 
 
 def health_check() -> dict:
@@ -0,0 +1,102 @@
+# src/exportacion.py
+# Exportación de resultados de consulta a disco (JSON + CSV compatible Excel).
+#
+# Layout: facturas/{estudio_id}/{cuit}/facturas_{cuit}_{desde}_a_{hasta}_{sufijo}.{json,csv}
+# (sin estudio_id: facturas/{cuit}/...). `directorio` reemplaza la carpeta
+# facturas/ del proyecto (benchmarks, scripts).
+
+from __future__ import annotations
+
+import csv
+import json
+from datetime import datetime
+from pathlib import Path
+
+from src.config import Config
+
+COLUMNAS = ['origen', 'tipo', 'tipo_codigo', 'punto_venta', 'numero',
+            'fecha', 'importe_total', 'importe_neto', 'importe_iva',
+            'cae', 'cae_vto', 'doc_nro', 'moneda']
+
+
+def guardar_facturas(cuit_cliente, facturas, web_service, sufijo=None, fecha_desde=None, fecha_hasta=None,
+                     estudio_id=None, directorio=None):
+    """Guardar resultados de consulta AFIP en JSON y CSV.
+
+    Siempre genera archivos, incluso si facturas está vacía (genera archivos vacíos).
+
+    Args:
+        sufijo: 'emitidos', 'recibidos', 'todos' — se agrega al nombre del archivo.
+        fecha_desde: fecha inicio consulta (YYYYMMDD o YYYY-MM-DD) para nomenclatura.
+        fecha_hasta: fecha fin consulta para nomenclatura.
+        estudio_id: scoping multi-tenant — archivos van a facturas/{estudio_id}/{cuit}/
+        directorio: raíz en lugar de facturas/ del proyecto.
+
+    Returns:
+        {'json': path, 'csv': path} o None si falló.
+    """
+    try:
+        raiz = Path(directorio) if directorio else Path(__file__).parent.parent / 'facturas'
+        if estudio_id:
+            out_dir = raiz / str(estudio_id) / cuit_cliente
+        else:
+            out_dir = raiz / cuit_cliente
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        # Nomenclatura: facturas_{cuit}_{fechaDesde}_a_{fechaHasta}_{sufijo}
+        fd = (fecha_desde or '').replace('-', '')
+        fh = (fecha_hasta or '').replace('-', '')
+        rango = f"_{fd}_a_{fh}" if fd and fh else f"_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        tag = f"_{sufijo}" if sufijo else ""
+        base = f"facturas_{cuit_cliente}{rango}{tag}"
+
+        # ── Normalizar cada factura a dict plano ─────────────────────
+        filas = []
+        for f in (facturas or []):
+            d = f.get('datos', f) if isinstance(f, dict) else f
+            c = f.get('consulta', {}) if isinstance(f, dict) else {}
+            filas.append({
+                'origen':         f.get('_origen', 'Emitido'),
+                'tipo':           c.get('tipo_descripcion', '') or d.get('CbteTipo', d.get('tipo_comprobante', '')),
+                'tipo_codigo':    c.get('tipo', d.get('CbteTipo', d.get('tipo_comprobante', ''))),
+                'punto_venta':    d.get('PtoVta', d.get('punto_venta', '')),
+                'numero':         d.get('CbteNro', d.get('numero_comprobante', d.get('numero', ''))),
+                'fecha':          d.get('CbteFch', d.get('fecha_emision', '')),
+                'importe_total':  d.get('ImpTotal', d.get('importe_total', '')),
+                'importe_neto':   d.get('ImpNeto', d.get('importe_gravado', '')),
+                'importe_iva':    d.get('ImpIVA', d.get('importe_iva', '')),
+                'cae':            d.get('CAE', d.get('cae', '')),
+                'cae_vto':        d.get('CAEFchVto', d.get('fecha_vencimiento_cae', d.get('fecha_vto_cae', ''))),
+                'doc_nro':        d.get('DocNro', d.get('receptor_nro_doc', d.get('receptor_numero_doc', ''))),
+                'moneda':         d.get('MonId', d.get('moneda', '')),
+            })
+
+        # ── JSON ─────────────────────────────────────────────────────
+        json_path = out_dir / f"{base}.json"
+        payload = {
+            'cuit_cliente': cuit_cliente,
+            'solicitante': Config.AFIP_SOLICITANTE_CUIT,
+            'fecha_consulta': datetime.now().isoformat(),
+            'fecha_desde': fecha_desde,
+            'fecha_hasta': fecha_hasta,
+            'web_service': web_service,
+            'tipo': sufijo or 'emitidos',
+            'total': len(filas),
+            'comprobantes': filas,
+        }
+        with open(json_path, 'w', encoding='utf-8') as fp:
+            json.dump(payload, fp, ensure_ascii=False, indent=2)
+
+        # ── CSV (compatible Excel: sep=; y BOM UTF-8) ────────────────
+        csv_path = out_dir / f"{base}.csv"
+        with open(csv_path, 'w', newline='', encoding='utf-8-sig') as fp:
+            writer = csv.DictWriter(fp, fieldnames=COLUMNAS, delimiter=';')
+            writer.writeheader()
+            writer.writerows(filas)
+
+        print(f"[GUARDAR] {len(filas)} facturas -> {json_path.name}, {csv_path.name}")
+        return {'json': str(json_path), 'csv': str(csv_path)}
+
+    except Exception as e:
+        print(f"[GUARDAR] ERROR: {e}")
+        return None
@@ -0,0 +1,226 @@
+# src/jobs.py
+# Cola de jobs en PostgreSQL (tabla consulta_jobs, 007_consulta_jobs.sql).
+#
+# Diseño:
+#   - La ruta web encola (encolar_job) y responde de inmediato con el id.
+#   - Los workers (scripts/worker_consultas.py) toman jobs con
+#     FOR UPDATE SKIP LOCKED: varios procesos compiten sin tomar dos veces el mismo.
+#   - Cada avance (actualizar_progreso) renueva heartbeat_at. Un job en_curso sin
+#     heartbeat en JOB_HEARTBEAT_MIN minutos se vuelve a encolar, hasta
+#     JOB_MAX_INTENTOS; después queda en error.
+#   - El resultado se guarda como JSONB: la página de resultado se renderiza
+#     desde ahí sin volver a consultar AFIP.
+#   - Mientras corre, el job publica eventos (EventosJob → consulta_job_eventos):
+#     streams resueltos y comprobantes a medida que llegan. La ruta /eventos
+#     los lee con leer_eventos (polling corto en formato text/event-stream) y
+#     la UI muestra filas antes de que termine la consulta.
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+from psycopg.types.json import Jsonb
+
+from src.db import get_cursor
+
+JOB_HEARTBEAT_MIN = int(os.getenv("JOB_HEARTBEAT_MIN", 10))
+JOB_MAX_INTENTOS = int(os.getenv("JOB_MAX_INTENTOS", 2))
+
+# Eventos: se agrupan hasta EVENTOS_LOTE o EVENTOS_INTERVALO_S antes de insertar
+EVENTOS_LOTE = 50
+EVENTOS_INTERVALO_S = 0.5
+
+
+def _jsonb(valor) -> Jsonb:
+    # default=str: fechas/Decimal que puedan venir en los comprobantes
+    return Jsonb(valor, dumps=lambda o: json.dumps(o, default=str))
+
+
+def encolar_job(estudio_id: int, usuario_id: int | None, tipo: str, parametros: dict) -> int:
+    """Insertar un job pendiente. Retorna el id."""
+    with get_cursor(estudio_id=estudio_id) as cur:
+        cur.execute("""
+            INSERT INTO consulta_jobs (estudio_id, usuario_id, tipo, parametros, progreso)
+            VALUES (%s, %s, %s, %s, 'En cola')
+            RETURNING id
+        """, (estudio_id, usuario_id, tipo, _jsonb(parametros)))
+        return cur.fetchone()["id"]
+
+
+def obtener_job(job_id: int, estudio_id: int) -> dict | None:
+    """Job del estudio (None si no existe o es de otro estudio)."""
+    with get_cursor(estudio_id=estudio_id) as cur:
+        cur.execute("""
+            SELECT id, estudio_id, usuario_id, tipo, parametros, estado, progreso,
+                   resultado, error, intentos, created_at, started_at, finished_at
+            FROM consulta_jobs
+            WHERE id = %s AND estudio_id = %s
+        """, (job_id, estudio_id))
+        return cur.fetchone()
+
+
+# ---------------------------------------------------------------------------
+# Lado worker
+# ---------------------------------------------------------------------------
+
+def tomar_job(worker: str) -> dict | None:
+    """Tomar el job pendiente más viejo y marcarlo en_curso. None si no hay."""
+    with get_cursor() as cur:
+        cur.execute("""
+            UPDATE consulta_jobs
+            SET estado = 'en_curso',
+                worker = %s,
+                intentos = intentos + 1,
+                started_at = NOW(),
+                heartbeat_at = NOW(),
+                progreso = 'Iniciando consulta'
+            WHERE id = (
+                SELECT id FROM consulta_jobs
+                WHERE estado = 'pendiente'
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id, estudio_id, usuario_id, tipo, parametros, intentos
+        """, (worker,))
+        return cur.fetchone()
+
+
+def actualizar_progreso(job_id: int, progreso: str) -> None:
+    """Guardar el mensaje de avance y renovar el heartbeat."""
+    with get_cursor() as cur:
+        cur.execute("""
+            UPDATE consulta_jobs
+            SET progreso = %s, heartbeat_at = NOW()
+            WHERE id = %s AND estado = 'en_curso'
+        """, (progreso, job_id))
+
+
+def renovar_heartbeat(job_id: int) -> None:
+    """Heartbeat sin cambiar el progreso (fases largas como el scraping RCEL)."""
+    with get_cursor() as cur:
+        cur.execute("""
+            UPDATE consulta_jobs SET heartbeat_at = NOW()
+            WHERE id = %s AND estado = 'en_curso'
+        """, (job_id,))
+
+
+def finalizar_job(job_id: int, resultado: dict) -> None:
+    with get_cursor() as cur:
+        cur.execute("""
+            UPDATE consulta_jobs
+            SET estado = 'ok', resultado = %s, progreso = 'Consulta finalizada',
+                finished_at = NOW(), heartbeat_at = NOW()
+            WHERE id = %s
+        """, (_jsonb(resultado), job_id))
+
+
+def fallar_job(job_id: int, error: str) -> None:
+    with get_cursor() as cur:
+        cur.execute("""
+            UPDATE consulta_jobs
+            SET estado = 'error', error = %s, finished_at = NOW(), heartbeat_at = NOW()
+            WHERE id = %s
+        """, (error, job_id))
+
+
+def recuperar_huerfanos() -> int:
+    """Re-encolar (o dar por fallidos) los jobs de workers caídos. Retorna cuántos."""
+    with get_cursor() as cur:
+        cur.execute("""
+            UPDATE consulta_jobs
+            SET estado = CASE WHEN intentos >= %s THEN 'error' ELSE 'pendiente' END,
+                error = CASE WHEN intentos >= %s THEN 'Worker interrumpido' ELSE error END,
+                finished_at = CASE WHEN intentos >= %s THEN NOW() ELSE NULL END,
+                progreso = 'Reintentando (worker interrumpido)'
+            WHERE estado = 'en_curso'
+              AND heartbeat_at < NOW() - make_interval(mins => %s)
+        """, (JOB_MAX_INTENTOS, JOB_MAX_INTENTOS, JOB_MAX_INTENTOS, JOB_HEARTBEAT_MIN))
+        return cur.rowcount
+
+
+# ---------------------------------------------------------------------------
+# Eventos (resultados parciales)
+# ---------------------------------------------------------------------------
+
+class EventosJob:
+    """Publicador de eventos de un job, thread-safe.
+
+    Se llama desde los hilos de la consulta (streams, detalle): solo encolan
+    en memoria. Un hilo propio inserta en lote: el primer evento sale
+    enseguida (time-to-first-result) y el resto a lo sumo EVENTOS_INTERVALO_S
+    después de llegar, o antes si se juntan EVENTOS_LOTE; no espera a que
+    llegue otro evento. Un solo hilo inserta, así los ids quedan en orden de
+    commit y un lector con Last-Event-ID no saltea filas. cerrar() vacía el
+    buffer y debe llamarse antes de finalizar el job.
+    """
+
+    def __init__(self, job_id: int, estudio_id: int):
+        self.job_id = job_id
+        self.estudio_id = estudio_id
+        self._buffer: list[tuple] = []
+        self._cerrado = False
+        self._hilo: threading.Thread | None = None
+        self._cond = threading.Condition()
+
+    def __call__(self, tipo: str, datos: dict) -> None:
+        fila = (self.job_id, self.estudio_id, tipo, _jsonb(datos))
+        with self._cond:
+            if self._cerrado:
+                return
+            self._buffer.append(fila)
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._publicar, daemon=True,
+                                              name=f'eventos-job-{self.job_id}')
+                self._hilo.start()
+            self._cond.notify()
+
+    def _publicar(self) -> None:
+        """Hilo de inserción: vacía el buffer, espera el intervalo y repite."""
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer or self._cerrado)
+                if not self._buffer:
+                    return
+                filas, self._buffer = self._buffer, []
+            self._insertar(filas)
+            # Próximo lote: pasado el intervalo, con EVENTOS_LOTE juntos o al cerrar
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._buffer) >= EVENTOS_LOTE or self._cerrado,
+                                    timeout=EVENTOS_INTERVALO_S)
+
+    def _insertar(self, filas: list[tuple]) -> None:
+        try:
+            with get_cursor(estudio_id=self.estudio_id) as cur:
+                cur.executemany("""
+                    INSERT INTO consulta_job_eventos (job_id, estudio_id, tipo, datos)
+                    VALUES (%s, %s, %s, %s)
+                """, filas)
+        except Exception as e:
+            # Los eventos son informativos: un fallo no corta la consulta
+            print(f"[JOBS] job={self.job_id} error publicando eventos: {e}", flush=True)
+
+    def cerrar(self) -> None:
+        """Insertar lo pendiente y terminar el hilo de inserción."""
+        with self._cond:
+            self._cerrado = True
+            hilo = self._hilo
+            self._cond.notify()
+        if hilo is not None:
+            hilo.join()
+
+
+def leer_eventos(job_id: int, estudio_id: int, despues_de: int = 0,
+                 limite: int = 500) -> list[dict]:
+    """Eventos del job con id > despues_de, en orden de publicación."""
+    with get_cursor(estudio_id=estudio_id) as cur:
+        cur.execute("""
+            SELECT id, tipo, datos
+            FROM consulta_job_eventos
+            WHERE job_id = %s AND estudio_id = %s AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (job_id, estudio_id, despues_de, limite))
+        return cur.fetchall()
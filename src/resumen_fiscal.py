@@ -0,0 +1,118 @@
+# src/resumen_fiscal.py
+# Resumen de una consulta de comprobantes: totales por tipo y desglose impositivo.
+#
+# Extraído de ejecutar_consulta_unificada para poder medirlo y reutilizarlo
+# sin levantar la app Flask (benchmarks/).
+#
+# Uso:
+#   resumen = resumir_comprobantes(facturas_finales)
+#   render_template(..., **resumen)
+
+from __future__ import annotations
+
+# Notas de Crédito (tipos 3/8/13/53) restan del total — se acumulan con signo negativo
+_NC_CODIGOS = {'3', '8', '13', '53'}
+
+# Mapeo de alícuotas IVA AFIP
+IVA_ALICUOTAS = {'3': '0%', '4': '10.5%', '5': '21%', '6': '27%', '8': '5%', '9': '2.5%'}
+
+
+def _float(val) -> float:
+    try:
+        return float(val or 0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _es_nota_credito(d: dict, c: dict) -> bool:
+    tipo_num = str(d.get('CbteTipo', '') or c.get('tipo', '') or '').strip()
+    if tipo_num in _NC_CODIGOS:
+        return True
+    desc = str(c.get('tipo_descripcion', '') or d.get('CbteTipoDesc', '') or '').lower()
+    return 'crédito' in desc or 'credito' in desc
+
+
+def resumir_comprobantes(facturas: list) -> dict:
+    """Agrupar por tipo de comprobante y acumular los totales impositivos.
+
+    Returns:
+        dict con resumen_por_tipo (lista ordenada por cantidad desc),
+        resumen_impositivo, iva_detalle, tributos_detalle y tiene_impuestos
+        (los nombres que espera resultado_facturas_unificada.html).
+    """
+    resumen_por_tipo = {}
+    resumen_impositivo = {'neto': 0.0, 'iva': 0.0, 'tributos': 0.0, 'exento': 0.0, 'total': 0.0,
+                          'iva_por_alicuota': {}, 'tributos_por_tipo': {}}
+
+    for fac in facturas:
+        d = fac.get('datos', fac) if isinstance(fac, dict) else fac
+        c = fac.get('consulta', {}) if isinstance(fac, dict) else {}
+        tipo = c.get('tipo_descripcion', '') or d.get('CbteTipoDesc', d.get('CbteTipo', d.get('tipo_comprobante', 'Otro')))
+        tipo = str(tipo)
+
+        signo = -1 if _es_nota_credito(d, c) else 1
+
+        imp_total = _float(d.get('ImpTotal', d.get('importe_total', 0))) * signo
+        imp_neto = _float(d.get('ImpNeto', 0)) * signo
+        imp_iva = _float(d.get('ImpIVA', 0)) * signo
+        imp_trib = _float(d.get('ImpTrib', 0)) * signo
+        imp_opex = _float(d.get('ImpOpEx', 0)) * signo
+
+        if tipo not in resumen_por_tipo:
+            resumen_por_tipo[tipo] = {'cantidad': 0, 'importe': 0.0}
+        resumen_por_tipo[tipo]['cantidad'] += 1
+        resumen_por_tipo[tipo]['importe'] += imp_total
+
+        # Acumular totales impositivos
+        resumen_impositivo['neto'] += imp_neto
+        resumen_impositivo['iva'] += imp_iva
+        resumen_impositivo['tributos'] += imp_trib
+        resumen_impositivo['exento'] += imp_opex
+        resumen_impositivo['total'] += imp_total
+
+        # Desglose IVA por alícuota (solo disponible en WSFEv1)
+        for alic in d.get('IvaDetalle', []):
+            alic_id = alic.get('Id', '?')
+            alic_imp = _float(alic.get('Importe', 0)) * signo
+            alic_base = _float(alic.get('BaseImp', 0)) * signo
+            if alic_id not in resumen_impositivo['iva_por_alicuota']:
+                resumen_impositivo['iva_por_alicuota'][alic_id] = {'base': 0.0, 'importe': 0.0}
+            resumen_impositivo['iva_por_alicuota'][alic_id]['base'] += alic_base
+            resumen_impositivo['iva_por_alicuota'][alic_id]['importe'] += alic_imp
+
+        # Desglose tributos por tipo (IIBB, municipal, etc.)
+        for trib in d.get('TributosDetalle', []):
+            trib_desc = trib.get('Desc', f"Tributo {trib.get('Id', '?')}")
+            trib_imp = _float(trib.get('Importe', 0)) * signo
+            trib_base = _float(trib.get('BaseImp', 0)) * signo
+            if trib_desc not in resumen_impositivo['tributos_por_tipo']:
+                resumen_impositivo['tributos_por_tipo'][trib_desc] = {'base': 0.0, 'importe': 0.0}
+            resumen_impositivo['tributos_por_tipo'][trib_desc]['base'] += trib_base
+            resumen_impositivo['tributos_por_tipo'][trib_desc]['importe'] += trib_imp
+
+    resumen_ordenado = sorted(resumen_por_tipo.items(), key=lambda x: x[1]['cantidad'], reverse=True)
+
+    iva_detalle = []
+    for alic_id, datos in sorted(resumen_impositivo['iva_por_alicuota'].items()):
+        iva_detalle.append({
+            'alicuota': IVA_ALICUOTAS.get(str(alic_id), f'{alic_id}%'),
+            'base': datos['base'],
+            'importe': datos['importe'],
+        })
+
+    tributos_detalle = []
+    for desc, datos in sorted(resumen_impositivo['tributos_por_tipo'].items()):
+        tributos_detalle.append({
+            'descripcion': desc,
+            'base': datos['base'],
+            'importe': datos['importe'],
+        })
+
+    # Determinar si mostrar sección impositiva (solo si hay IVA o tributos > 0)
+    tiene_impuestos = resumen_impositivo['iva'] > 0 or resumen_impositivo['tributos'] > 0
+
+    return dict(resumen_por_tipo=resumen_ordenado,
+                resumen_impositivo=resumen_impositivo,
+                iva_detalle=iva_detalle,
+                tributos_detalle=tributos_detalle,
+                tiene_impuestos=tiene_impuestos)
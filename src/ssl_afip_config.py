@@ -5,23 +5,102 @@ Soluciona el problema "DH_KEY_TOO_SMALL"
 """
 
 import ssl
+import threading
+import weakref
+
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.ssl_ import create_urllib3_context
+
+class _ContextoSSLReanudable(ssl.SSLContext):
+    """SSLContext que reanuda la sesión TLS por host.
+
+    urllib3 no pasa `session=` a wrap_socket: cada conexión nueva haría un
+    handshake completo (DH lento con SECLEVEL=1). Acá se guarda la última
+    sesión por host y la próxima conexión la ofrece (abbreviated handshake).
+    Solo API pública: `SSLSocket.session` de los sockets abiertos por este
+    contexto (None una vez cerrados) y `session=` de wrap_socket.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # El protocolo lo toma SSLContext.__new__
+        super().__init__()
+        self.sesiones = {}
+        self._sockets = {}      # host -> [weakref(SSLSocket)], del más viejo al más nuevo
+        self._lock_sesiones = threading.Lock()
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+        if session is None and server_hostname:
+            self.actualizar_sesiones()
+            session = self.sesiones.get(server_hostname)
+        ssl_sock = super().wrap_socket(sock, *args, server_hostname=server_hostname,
+                                       session=session, **kwargs)
+        if server_hostname:
+            with self._lock_sesiones:
+                self._sockets.setdefault(server_hostname, []).append(weakref.ref(ssl_sock))
+            self.actualizar_sesiones()
+        return ssl_sock
+
+    def actualizar_sesiones(self):
+        """Tomar la sesión más reciente de los sockets abiertos de cada host.
+
+        TLS 1.3 entrega el ticket después del handshake, con la primera
+        lectura: por eso se vuelve a mirar después de cada respuesta
+        (AFIPHTTPSAdapter.send) y no solo al abrir la conexión.
+        """
+        with self._lock_sesiones:
+            for host, refs in self._sockets.items():
+                vivos = [ref for ref in refs if ref() is not None]
+                self._sockets[host] = vivos
+                sesion = None
+                for ref in reversed(vivos):
+                    ssl_sock = ref()
+                    candidata = ssl_sock.session if ssl_sock is not None else None
+                    if candidata is not None and (sesion is None or candidata.has_ticket):
+                        sesion = candidata
+                        if sesion.has_ticket:
+                            break
+                if sesion is not None:
+                    self.sesiones[host] = sesion
+
+
+def crear_contexto_afip():
+    """Contexto SSL para AFIP (cifrados viejos, sin verificación) con reanudación de sesión."""
+    context = _ContextoSSLReanudable(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.set_ciphers('DEFAULT@SECLEVEL=1')  # Permitir cifrados más antiguos
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
 
 class AFIPHTTPSAdapter(HTTPAdapter):
-    """Adaptador HTTPS personalizado para AFIP"""
-    
+    """Adaptador HTTPS personalizado para AFIP.
+
+    Un solo contexto SSL por adaptador: todas sus conexiones comparten la
+    configuración y el cache de sesiones TLS.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._ssl_context = crear_contexto_afip()
+        super().__init__(*args, **kwargs)
+
     def init_poolmanager(self, *args, **pool_kwargs):
-        # Crear contexto SSL personalizado para AFIP
-        context = create_urllib3_context()
-        context.set_ciphers('DEFAULT@SECLEVEL=1')  # Permitir cifrados más antiguos
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-        
-        pool_kwargs['ssl_context'] = context
+        pool_kwargs['ssl_context'] = self._ssl_context
         return super().init_poolmanager(*args, **pool_kwargs)
 
+    def send(self, request, **kwargs):
+        # Sin verificación siempre: REQUESTS_CA_BUNDLE (trust_env) pisaría session.verify
+        kwargs['verify'] = False
+        respuesta = super().send(request, **kwargs)
+        # Con los headers leídos el ticket TLS 1.3 ya llegó: guardarlo mientras
+        # la conexión sigue abierta (cerrada, su sesión deja de ser accesible)
+        self._ssl_context.actualizar_sesiones()
+        return respuesta
+
+    def proxy_manager_for(self, *args, **proxy_kwargs):
+        proxy_kwargs['ssl_context'] = self._ssl_context
+        return super().proxy_manager_for(*args, **proxy_kwargs)
+
 def crear_session_afip():
     """Crear sesión requests configurada para AFIP"""
     session = requests.Session()
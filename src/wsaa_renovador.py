@@ -0,0 +1,245 @@
+# src/wsaa_renovador.py
+# Renovación de tickets WSAA en background y precalentamiento al arrancar.
+#
+# Sin esto el TA se renueva recién cuando una consulta lo necesita: la primera
+# consulta después del vencimiento paga la firma CMS + loginCms.
+#
+# Diseño:
+#   - Un thread daemon por proceso recorre las configs activas de
+#     estudios_afip (y la del .env si tiene certificado) y, para cada servicio
+#     de WSAA_RENOVADOR_SERVICIOS, llama a renovar_ticket()
+#     (src/wsaa_ticket_cache.py): carga el TA en la memoria del proceso y lo
+#     renueva si vence dentro de WSAA_RENOVAR_ANTES_MIN.
+#   - El primer ciclo corre al arrancar (precalentamiento): la primera
+#     consulta ya encuentra el TA en memoria.
+#   - Entre ciclos duerme WSAA_RENOVADOR_INTERVALO_S o hasta el próximo
+#     vencimiento a atender, lo que llegue antes.
+#   - Si WSAA no emite otro TA mientras el actual siga vigente
+#     (coe.alreadyAuthenticated) se sigue usando el actual y se renueva un
+#     segundo después de que venza. Es la única ventana (segundos cada ~12 h)
+#     en la que una consulta puede esperar a WSAA.
+#   - Un rechazo de WSAA (Rechazo: coe.notAuthorized, cms.*, certificado
+#     vencido...) no cambia reintentando: se anota en la config para ese
+#     servicio y no se vuelve a pedir hasta que cambie el updated_at de la
+#     config (cert nuevo, servicio autorizado y re-subido, toggle). La config
+#     del .env no tiene updated_at: hasta reiniciar el proceso.
+#   - Varios procesos (workers Gunicorn, worker de consultas) corren cada uno
+#     su renovador; el advisory lock de wsaa_tickets hace que uno solo haga
+#     el loginCms y los demás lean el TA nuevo.
+#
+# Uso:
+#   iniciar_renovador()     # en app.py, junto al monitor AFIP
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from src.afip_resiliencia import Rechazo
+from src.db import pool_disponible
+
+WSAA_RENOVADOR = os.getenv("WSAA_RENOVADOR", "1") == "1"
+WSAA_RENOVADOR_INTERVALO_S = float(os.getenv("WSAA_RENOVADOR_INTERVALO_S", 300))
+WSAA_RENOVAR_ANTES_MIN = float(os.getenv("WSAA_RENOVAR_ANTES_MIN", 30))
+WSAA_RENOVADOR_SERVICIOS = [s.strip() for s in
+                            os.getenv("WSAA_RENOVADOR_SERVICIOS", "wsfe,wsfex,wsmtxca").split(",")
+                            if s.strip()]
+
+# service WSAA -> (módulo, clase) del cliente que sabe hacer su loginCms
+CLIENTES = {
+    'wsfe': ('wsfev1_client', 'WSFEv1Client'),
+    'wsfex': ('wsfexv1_client', 'WSFEXv1Client'),
+    'wsmtxca': ('wsmtxca_client', 'WSMTXCAClient'),
+}
+
+# Espera mínima entre ciclos (errores, vencimientos ya pasados)
+_ESPERA_MINIMA_S = 1.0
+
+# id de estudios_afip (o 'env') -> config con cert/key ya resueltos y clientes
+_configs: dict[object, dict] = {}
+_hilo: threading.Thread | None = None
+_hilo_pid: int | None = None
+_hilo_lock = threading.Lock()
+
+
+def iniciar_renovador() -> None:
+    """Arrancar el thread del renovador en este proceso (idempotente)."""
+    global _hilo, _hilo_pid
+    if not WSAA_RENOVADOR:
+        return
+    pid = os.getpid()
+    with _hilo_lock:
+        if _hilo is not None and _hilo_pid == pid and _hilo.is_alive():
+            return
+        _hilo = threading.Thread(target=_bucle, name='wsaa-renovador', daemon=True)
+        _hilo_pid = pid
+        _hilo.start()
+
+
+def renovar_tickets() -> float:
+    """Un ciclo: cargar/renovar el TA de cada config activa y servicio.
+
+    Retorna los segundos hasta el próximo vencimiento a atender.
+    """
+    from src.wsaa_ticket_cache import renovar_ticket
+
+    anticipacion = timedelta(minutes=WSAA_RENOVAR_ANTES_MIN)
+    ahora = datetime.now(timezone.utc)
+    proximo = WSAA_RENOVADOR_INTERVALO_S
+
+    for config in _configs_activas():
+        for service in WSAA_RENOVADOR_SERVICIOS:
+            if service in config['rechazados']:
+                continue
+            try:
+                cliente = _cliente(config, service)
+                ticket = renovar_ticket(config['cert_path'], service, config['ambiente'],
+                                        cliente._login_wsaa, config['solicitante'], anticipacion)
+            except Rechazo as e:
+                if 'alreadyAuthenticated' in str(e):
+                    # TA emitido a otra instancia: se destraba solo cuando vence
+                    print(f"[WSAA RENOVADOR] {config['nombre']} {service}: {e}", flush=True)
+                    continue
+                # config['rechazados'] vive lo que la versión de la config (_config_estudio)
+                config['rechazados'][service] = str(e)
+                print(f"[WSAA RENOVADOR] {config['nombre']} {service}: {e} - "
+                      f"no se reintenta hasta que cambie la config", flush=True)
+                continue
+            except Exception as e:
+                print(f"[WSAA RENOVADOR] {config['nombre']} {service}: {e}", flush=True)
+                continue
+
+            if ticket['renovacion_rechazada']:
+                siguiente = ticket['expires'] + timedelta(seconds=1)
+            else:
+                siguiente = ticket['expires'] - anticipacion
+            proximo = min(proximo, (siguiente - ahora).total_seconds())
+
+    return max(_ESPERA_MINIMA_S, proximo)
+
+
+def _bucle() -> None:
+    while True:
+        try:
+            espera = renovar_tickets()
+        except Exception as e:
+            print(f"[WSAA RENOVADOR] error en el ciclo: {e}", flush=True)
+            espera = WSAA_RENOVADOR_INTERVALO_S
+        time.sleep(espera)
+
+
+# ---------------------------------------------------------------------------
+# Configs y clientes
+# ---------------------------------------------------------------------------
+
+
+
+def _configs_activas() -> list[dict]:
+    """Configs con certificado: estudios_afip activas + la del .env si existe."""
+    vistas = set()
+    configs = []
+
+    if pool_disponible():
+        from src.db import get_cursor
+        try:
+            # Sin estudio_id: el renovador ve las configs de todos los estudios
+            with get_cursor() as cur:
+                cur.execute("""
+                    SELECT id, estudio_id, solicitante_cuit, ambiente, updated_at
+                    FROM estudios_afip
+                    WHERE activo = TRUE
+                """)
+                rows = cur.fetchall()
+        except Exception as e:
+            print(f"[WSAA RENOVADOR] no se pudieron leer las configs: {e}", flush=True)
+            rows = []
+        for row in rows:
+            config = _config_estudio(row)
+            if config:
+                vistas.add(row['id'])
+                configs.append(config)
+
+    config = _config_env()
+    if config:
+        vistas.add('env')
+        configs.append(config)
+
+    # Configs borradas o desactivadas: soltar clientes y cert/key materializados
+    for clave in set(_configs) - vistas:
+        _configs.pop(clave)
+        if clave != 'env':
+            from src.afip_credentials import invalidar_credenciales
+            invalidar_credenciales(config_id=clave)
+    return configs
+
+
+def _config_estudio(row: dict) -> dict | None:
+    from src.afip_credentials import credenciales_config
+
+    actual = _configs.get(row['id'])
+    if actual and actual['updated_at'] == row['updated_at']:
+        return actual
+    _configs.pop(row['id'], None)
+
+    # cert/key del cache de credenciales (src/afip_credentials.py), una vez por versión
+    creds = credenciales_config(row['id'], row['updated_at'])
+    if not creds:
+        return None
+
+    config = {
+        'nombre': f"estudio {row['estudio_id']}",
+        'updated_at': row['updated_at'],
+        'solicitante': row['solicitante_cuit'],
+        'cert_path': creds['cert_path'],
+        'key_path': creds['key_path'],
+        'ambiente': row['ambiente'],
+        'clientes': {},
+        # service -> mensaje del Rechazo de WSAA para esta versión de la config
+        'rechazados': {},
+    }
+    _configs[row['id']] = config
+    return config
+
+
+def _config_env() -> dict | None:
+    """Fallback del .env (certs/ en la raíz), como get_afip_credentials(None)."""
+    actual = _configs.get('env')
+    if actual:
+        return actual
+
+    from src.afip_credentials import get_afip_credentials
+
+    creds = get_afip_credentials(None)
+    if not (os.path.exists(creds['cert_path']) and os.path.exists(creds['key_path'])):
+        return None
+    config = {
+        'nombre': '.env',
+        'updated_at': None,
+        'solicitante': creds['solicitante_cuit'] or None,
+        'cert_path': creds['cert_path'],
+        'key_path': creds['key_path'],
+        'ambiente': creds['ambiente'],
+        'clientes': {},
+        # service -> mensaje del Rechazo de WSAA para esta versión de la config
+        'rechazados': {},
+    }
+    _configs['env'] = config
+    return config
+
+
+def _cliente(config: dict, service: str):
+    """Cliente SOAP de la config (uno por servicio, se reutiliza entre ciclos)."""
+    if service not in config['clientes']:
+        raiz = str(Path(__file__).parent.parent)
+        if raiz not in sys.path:
+            sys.path.insert(0, raiz)
+        modulo, clase = CLIENTES[service]
+        cls = getattr(__import__(modulo), clase)
+        config['clientes'][service] = cls(config['cert_path'], config['key_path'],
+                                          config['ambiente'], config['solicitante'])
+    return config['clientes'][service]
+
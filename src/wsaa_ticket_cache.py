@@ -0,0 +1,370 @@
+# src/wsaa_ticket_cache.py
+# Cache compartido de tickets de acceso WSAA (TA).
+#
+# Clave: (solicitante, service, ambiente). El TA pertenece al certificado, no al
+# CUIT consultado ni a la instancia del cliente: todos los clientes SOAP
+# (WSFEv1Client, WSFEXv1Client, WSMTXCAClient, ARCAServiceSimple) comparten el
+# mismo ticket mientras esté vigente.
+#
+# Niveles:
+#   1. Memoria del proceso (dict) — evita ir al backend en cada request.
+#   2. Backend compartido entre workers Gunicorn y reinicios:
+#        - PostgreSQL (tabla wsaa_tickets, 006_wsaa_tickets.sql) si init_pool() fue llamado.
+#        - Si no (scripts sueltos), un archivo JSON por clave en WSAA_CACHE_DIR,
+#          protegido con lock de archivo (fcntl / msvcrt).
+#
+# Login:
+#   - Un único loginCms por clave a la vez: lock por clave en el proceso y
+#     pg_advisory_lock (conexión propia, fuera del pool) / lock de archivo
+#     entre procesos. El que espera relee el backend y reutiliza el ticket que
+#     obtuvo el otro.
+#   - Con PostgreSQL el login no retiene conexiones del pool ni transacciones:
+#     lectura corta, lock, relectura, loginCms, upsert corto.
+#
+# Renovación anticipada (renovar_ticket, la usa src/wsaa_renovador.py):
+#   - WSAA no emite un TA nuevo mientras el anterior siga vigente
+#     (coe.alreadyAuthenticated). Si rechaza la renovación, el TA actual se
+#     sigue entregando hasta MARGEN_MINIMO antes de vencer en vez de
+#     MARGEN_VENCIMIENTO, y se renueva apenas vence.
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from src.db import pool_disponible
+
+# Margen antes del vencimiento real en el que el TA ya no se entrega
+MARGEN_VENCIMIENTO = timedelta(minutes=10)
+
+# Margen con la renovación rechazada por WSAA (el TA actual es el único posible)
+MARGEN_MINIMO = timedelta(seconds=5)
+
+# Vigencia asumida si la respuesta de WSAA no trae expirationTime
+VIGENCIA_DEFAULT = timedelta(hours=11, minutes=50)
+
+WSAA_CACHE_DIR = Path(os.getenv(
+    "WSAA_CACHE_DIR", Path(tempfile.gettempdir()) / "infofiscal_wsaa"
+))
+
+_memoria: dict[tuple, dict] = {}
+_locks: dict[tuple, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+# cert_path -> (mtime, solicitante)
+_solicitantes: dict[str, tuple] = {}
+
+
+def solicitante_de_certificado(cert_path: str) -> str:
+    """CUIT del certificado (subject serialNumber 'CUIT 20XXXXXXXXX').
+
+    Si el certificado no se puede leer con cryptography, se usa un hash del
+    archivo: estable entre procesos, alcanza como clave de cache.
+    """
+    cert_path = str(cert_path)
+    mtime = os.path.getmtime(cert_path)
+    cacheado = _solicitantes.get(cert_path)
+    if cacheado and cacheado[0] == mtime:
+        return cacheado[1]
+
+    with open(cert_path, "rb") as f:
+        pem = f.read()
+
+    solicitante = None
+    try:
+        from cryptography import x509
+        from cryptography.x509.oid import NameOID
+
+        cert = x509.load_pem_x509_certificate(pem)
+        attrs = cert.subject.get_attributes_for_oid(NameOID.SERIAL_NUMBER)
+        if attrs:
+            digitos = "".join(c for c in attrs[0].value if c.isdigit())
+            solicitante = digitos or None
+    except Exception:
+        pass
+
+    if not solicitante:
+        solicitante = "cert-" + hashlib.sha256(pem).hexdigest()[:16]
+
+    _solicitantes[cert_path] = (mtime, solicitante)
+    return solicitante
+
+
+def obtener_ticket(cert_path: str, service: str, ambiente: str,
+                   login: Callable[[], dict], solicitante: str | None = None) -> tuple[str, str]:
+    """Devolver (token, sign) vigentes, haciendo loginCms solo si hace falta.
+
+    Args:
+        login: función sin argumentos que hace el loginCms y retorna
+            {'token', 'sign'} y opcionalmente 'expirationTime' (ISO 8601 de WSAA).
+        solicitante: CUIT del certificado. None = se lee del certificado.
+    """
+    clave = _clave(cert_path, service, ambiente, solicitante)
+
+    ticket = _vigente(_memoria.get(clave))
+    if ticket:
+        return ticket["token"], ticket["sign"]
+
+    with _lock_clave(clave):
+        ticket = _vigente(_memoria.get(clave))
+        if not ticket:
+            ticket = _backend_obtener(clave, login)
+            _memoria[clave] = ticket
+        return ticket["token"], ticket["sign"]
+
+
+async def obtener_ticket_async(cert_path: str, service: str, ambiente: str,
+                              login: Callable[[], Awaitable[dict]],
+                              solicitante: str | None = None) -> tuple[str, str]:
+    """obtener_ticket para clientes asyncio: login es una corrutina.
+
+    Con el TA en memoria no sale del loop. Si hay que ir al backend, corre en
+    un thread (locks y DB son sync) y el loginCms vuelve al loop.
+    """
+    clave = _clave(cert_path, service, ambiente, solicitante)
+    ticket = _vigente(_memoria.get(clave))
+    if ticket:
+        return ticket["token"], ticket["sign"]
+
+    from src.afip_transport_async import desde_hilo
+    return await asyncio.to_thread(obtener_ticket, cert_path, service, ambiente,
+                                   desde_hilo(login), clave[0])
+
+
+def renovar_ticket(cert_path: str, service: str, ambiente: str, login: Callable[[], dict],
+                   solicitante: str | None = None,
+                   anticipacion: timedelta = MARGEN_VENCIMIENTO) -> dict:
+    """Renovar el TA si vence dentro de `anticipacion` y dejarlo en memoria.
+
+    Para el renovador en background: sin TA (arranque) hace el login, con TA
+    vigente solo lo carga en memoria. Retorna {'expires', 'renovacion_rechazada'};
+    con la renovación rechazada hay que volver a intentar cuando venza.
+    """
+    clave = _clave(cert_path, service, ambiente, solicitante)
+    with _lock_clave(clave):
+        ticket = _memoria.get(clave)
+        rechazada = ticket and ticket.get("renovacion_rechazada") and _vigente(ticket, timedelta(0))
+        if not (rechazada or _vigente(ticket, anticipacion)):
+            ticket = _backend_obtener(clave, login, anticipacion)
+            _memoria[clave] = ticket
+        return {"expires": ticket["expires"],
+                "renovacion_rechazada": bool(ticket.get("renovacion_rechazada"))}
+
+
+def invalidar_ticket(solicitante: str, service: str, ambiente: str) -> None:
+    """Descartar el TA (p. ej. si AFIP lo rechaza con token inválido)."""
+    clave = (solicitante, service, ambiente)
+    with _lock_clave(clave):
+        _memoria.pop(clave, None)
+        if pool_disponible():
+            from src.db import get_cursor
+            with get_cursor() as cur:
+                cur.execute(
+                    "DELETE FROM wsaa_tickets WHERE solicitante = %s AND service = %s AND ambiente = %s",
+                    clave,
+                )
+        else:
+            _archivo(clave).unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------------------------
+# Internos
+# ---------------------------------------------------------------------------
+
+def _clave(cert_path: str, service: str, ambiente: str, solicitante: str | None) -> tuple:
+    if solicitante:
+        solicitante = str(solicitante).replace("-", "").replace(" ", "")
+    else:
+        solicitante = solicitante_de_certificado(cert_path)
+    return (solicitante, service, ambiente)
+
+
+def _vigente(ticket: dict | None, margen: timedelta | None = None) -> dict | None:
+    if not ticket:
+        return None
+    if margen is None:
+        margen = MARGEN_MINIMO if ticket.get("renovacion_rechazada") else MARGEN_VENCIMIENTO
+    if ticket["expires"] - margen > datetime.now(timezone.utc):
+        return ticket
+    return None
+
+
+def _lock_clave(clave: tuple) -> threading.Lock:
+    with _locks_guard:
+        if clave not in _locks:
+            _locks[clave] = threading.Lock()
+        return _locks[clave]
+
+
+def _nuevo_ticket(login: Callable[[], dict], actual: dict | None = None) -> dict:
+    """Hacer loginCms y normalizar el resultado a {'token', 'sign', 'expires'}.
+
+    Si WSAA rechaza el login porque `actual` sigue vigente, retorna `actual`
+    marcado con 'renovacion_rechazada'.
+    """
+    try:
+        credenciales = login()
+    except Exception as e:
+        if actual and "alreadyAuthenticated" in str(e) and _vigente(actual, timedelta(0)):
+            print(f"[WSAA] AFIP no emite otro TA hasta que venza el actual "
+                  f"({actual['expires'].isoformat(timespec='seconds')}): se sigue usando", flush=True)
+            return {**actual, "renovacion_rechazada": True}
+        raise
+    expires = None
+    if credenciales.get("expirationTime"):
+        try:
+            expires = datetime.fromisoformat(credenciales["expirationTime"].strip())
+            if expires.tzinfo is None:
+                expires = expires.replace(tzinfo=timezone.utc)
+        except ValueError:
+            expires = None
+    if expires is None:
+        expires = datetime.now(timezone.utc) + VIGENCIA_DEFAULT
+
+    return {"token": credenciales["token"], "sign": credenciales["sign"], "expires": expires}
+
+
+def _backend_obtener(clave: tuple, login: Callable[[], dict], margen: timedelta | None = None) -> dict:
+    if pool_disponible():
+        return _db_obtener(clave, login, margen)
+    return _archivo_obtener(clave, login, margen)
+
+
+def _db_obtener(clave: tuple, login: Callable[[], dict], margen: timedelta | None = None) -> dict:
+    actual = _db_leer(clave)
+    if _vigente(actual, margen):
+        return actual
+
+    # El loginCms (firma CMS + red + reintentos) corre sin conexión del pool ni
+    # transacción abierta: entre procesos lo serializa el lock de sesión
+    with _lock_db(clave):
+        actual = _db_leer(clave)        # otro proceso pudo loguearse mientras se esperaba
+        if _vigente(actual, margen):
+            return actual
+        ticket = _nuevo_ticket(login, actual)
+        if not ticket.get("renovacion_rechazada"):
+            _db_guardar(clave, ticket)
+        return ticket
+
+
+def _db_leer(clave: tuple) -> dict | None:
+    from src.db import get_cursor
+
+    with get_cursor() as cur:
+        cur.execute("""
+            SELECT token, sign, expires_at
+            FROM wsaa_tickets
+            WHERE solicitante = %s AND service = %s AND ambiente = %s
+        """, clave)
+        row = cur.fetchone()
+    if not row:
+        return None
+    return {"token": row["token"], "sign": row["sign"], "expires": row["expires_at"]}
+
+
+def _db_guardar(clave: tuple, ticket: dict) -> None:
+    from src.db import get_cursor
+
+    with get_cursor() as cur:
+        cur.execute("""
+            INSERT INTO wsaa_tickets (solicitante, service, ambiente, token, sign, expires_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (solicitante, service, ambiente) DO UPDATE
+            SET token = EXCLUDED.token,
+                sign = EXCLUDED.sign,
+                expires_at = EXCLUDED.expires_at,
+                created_at = NOW()
+        """, (*clave, ticket["token"], ticket["sign"], ticket["expires"]))
+
+
+@contextmanager
+def _lock_db(clave: tuple):
+    """pg_advisory_lock de sesión sobre una conexión propia (fuera del pool).
+
+    Quien espera el login de otro proceso no ocupa una conexión del pool; al
+    cerrarse la conexión el lock se libera aunque el proceso muera.
+    """
+    import psycopg
+    from src.config import Config
+
+    with psycopg.connect(Config.DATABASE_URL, autocommit=True) as conn:
+        llave = "wsaa:" + ":".join(clave)
+        conn.execute("SELECT pg_advisory_lock(hashtext(%s))", (llave,))
+        try:
+            yield
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(hashtext(%s))", (llave,))
+
+
+def _archivo(clave: tuple) -> Path:
+    return WSAA_CACHE_DIR / ("ta_" + "_".join(clave) + ".json")
+
+
+@contextmanager
+def _lock_archivo(path: Path):
+    """Lock exclusivo entre procesos sobre path (bloqueante)."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _archivo_obtener(clave: tuple, login: Callable[[], dict], margen: timedelta | None = None) -> dict:
+    WSAA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _archivo(clave)
+
+    with _lock_archivo(path.with_suffix(".lock")):
+        actual = None
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            actual = {
+                "token": data["token"],
+                "sign": data["sign"],
+                "expires": datetime.fromisoformat(data["expires"]),
+            }
+            if _vigente(actual, margen):
+                return actual
+        except (OSError, ValueError, KeyError):
+            pass
+
+        ticket = _nuevo_ticket(login, actual)
+        if ticket.get("renovacion_rechazada"):
+            return ticket
+
+        # Escritura atómica; el TA es una credencial: solo legible por el dueño
+        tmp = path.with_suffix(".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "token": ticket["token"],
+                "sign": ticket["sign"],
+                "expires": ticket["expires"].isoformat(),
+            }, f)
+        os.replace(tmp, path)
+        return ticket
@@ -0,0 +1,722 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Simulador local de los web services de AFIP a nivel protocolo (SOAP).
+
+Habla las mismas operaciones que usan los clientes, con los mismos paths:
+  - WSAA     /ws/services/LoginCms          loginCms
+  - WSFEv1   /wsfev1/service.asmx           FECompUltimoAutorizado, FECompConsultar,
+                                            FEParamGetPtosVenta, FEParamGetTiposCbte,
+                                            FEParamGetTiposMonedas, FEParamGetTiposIva
+  - WSFEXv1  /wsfexv1/service.asmx          FEXGetCMP, FEXGetLast_CMP, FEXGetPARAM_PtoVenta
+  - WSMTXCA  /wsmtxca/services/MTXCAService consultarComprobanteRequest
+
+Los comprobantes son sintéticos y deterministas (misma semilla -> mismos datos):
+por cada (servicio, CUIT, punto de venta, tipo) hay un stream numerado 1..N con
+fechas no decrecientes dentro de [fecha_desde, fecha_hasta].
+
+Fallas inyectables: latencia + jitter, error 602 aleatorio, throttling (HTTP 503
+por probabilidad o por exceso de requests simultáneos), errores 500 y el
+coe.alreadyAuthenticated de WSAA si se pide un TA estando vigente otro.
+
+Uso:
+    python tests_y_pruebas/simulador_afip.py --puerto 8085 --latencia-ms 60 --jitter-ms 40
+    AFIP_URL_BASE=http://127.0.0.1:8085 python src/app.py
+
+    # dataset / fallas desde JSON (mismas claves que CONFIG_DEFECTO)
+    python tests_y_pruebas/simulador_afip.py --config simulador.json
+
+    # en proceso (benchmarks)
+    sim = SimuladorAFIP({'cantidad_max': 300}).iniciar()
+    os.environ['AFIP_URL_BASE'] = sim.url
+    ...
+    sim.detener()
+
+Estado y contadores: GET /_simulador/estado
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+CONFIG_DEFECTO = {
+    # ── Dataset ──────────────────────────────────────────────────────────────
+    'semilla': 1,
+    'cuits': [],                      # vacío = cualquier CUIT es válido
+    'puntos_venta': [1, 2, 3],
+    'tipos': {
+        'wsfe': [1, 3, 6, 8, 11, 13],
+        'wsfex': [19, 21],
+        'wsmtxca': [1, 6],
+    },
+    'cantidad_min': 0,                # comprobantes por stream (aleatorio en el rango)
+    'cantidad_max': 200,
+    'prob_stream_vacio': 0.3,         # streams sin ningún comprobante
+    'fecha_desde': '2025-01-01',
+    'fecha_hasta': '2025-12-31',
+    'ta_minutos': 720,                # vigencia del TA emitido por loginCms
+
+    # ── Fallas ───────────────────────────────────────────────────────────────
+    'latencia_ms': 0,
+    'jitter_ms': 0,
+    'prob_602': 0.0,                  # "no existe" aunque el comprobante exista
+    'prob_throttle': 0.0,
+    'max_simultaneos': 0,             # 0 = sin límite; excedido -> throttling
+    'status_throttle': 503,
+    'prob_500': 0.0,
+    'ta_unico': True,                 # coe.alreadyAuthenticated si el TA sigue vigente
+}
+
+PATHS = {
+    'wsaa': '/ws/services/LoginCms',
+    'wsfe': '/wsfev1/service.asmx',
+    'wsfex': '/wsfexv1/service.asmx',
+    'wsmtxca': '/wsmtxca/services/MTXCAService',
+}
+
+TIPOS_SIN_IVA = {11, 12, 13, 15, 19, 20, 21}
+
+# Notas de débito/crédito WSFEv1 -> factura asociada (CbtesAsoc en FECompConsultar)
+FACTURA_DE_NOTA = {2: 1, 3: 1, 7: 6, 8: 6, 12: 11, 13: 11}
+
+DESCRIPCION_TIPOS = {
+    1: 'Factura A', 2: 'Nota de Débito A', 3: 'Nota de Crédito A',
+    6: 'Factura B', 7: 'Nota de Débito B', 8: 'Nota de Crédito B',
+    11: 'Factura C', 12: 'Nota de Débito C', 13: 'Nota de Crédito C',
+    19: 'Factura de Exportación E', 20: 'Nota de Débito de Exportación E',
+    21: 'Nota de Crédito de Exportación E', 51: 'Factura M',
+}
+
+MSG_602 = 'No existen datos en nuestros registros para los parametros ingresados.'
+
+
+class FallaSOAP(Exception):
+    """Respuesta de error a nivel HTTP (SOAP Fault o throttling)."""
+
+    def __init__(self, status, codigo, mensaje):
+        super().__init__(mensaje)
+        self.status = status
+        self.codigo = codigo
+        self.mensaje = mensaje
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Dataset sintético
+# ─────────────────────────────────────────────────────────────────────────────
+
+class Dataset:
+    """Comprobantes deterministas generados a demanda por stream."""
+
+    def __init__(self, config):
+        self.config = config
+        self.desde = date.fromisoformat(config['fecha_desde'])
+        self.dias = (date.fromisoformat(config['fecha_hasta']) - self.desde).days + 1
+        self.cuits = {str(c) for c in config['cuits']}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def cuit_valido(self, cuit):
+        return not self.cuits or str(cuit) in self.cuits
+
+    def puntos_venta(self):
+        return list(self.config['puntos_venta'])
+
+    def tipos(self, servicio):
+        return list(self.config['tipos'].get(servicio, []))
+
+    def _fechas(self, servicio, cuit, pv, tipo):
+        """Fechas (offset en días) de los comprobantes 1..N del stream."""
+        clave = (servicio, str(cuit), int(pv), int(tipo))
+        fechas = self._streams.get(clave)
+        if fechas is not None:
+            return fechas
+
+        if int(pv) not in self.config['puntos_venta'] or int(tipo) not in self.tipos(servicio):
+            fechas = []
+        else:
+            rng = random.Random(f"{self.config['semilla']}:{servicio}:{cuit}:{pv}:{tipo}")
+            if rng.random() < self.config['prob_stream_vacio']:
+                fechas = []
+            else:
+                n = rng.randint(self.config['cantidad_min'], self.config['cantidad_max'])
+                fechas = sorted(rng.randrange(self.dias) for _ in range(n))
+
+        with self._lock:
+            return self._streams.setdefault(clave, fechas)
+
+    def ultimo(self, servicio, cuit, pv, tipo):
+        return len(self._fechas(servicio, cuit, pv, tipo))
+
+    def comprobante(self, servicio, cuit, pv, tipo, numero):
+        """Dict con los datos del comprobante, o None si no existe."""
+        fechas = self._fechas(servicio, cuit, pv, tipo)
+        numero = int(numero)
+        if not 1 <= numero <= len(fechas):
+            return None
+
+        rng = random.Random(f"{self.config['semilla']}:{servicio}:{cuit}:{pv}:{tipo}:{numero}")
+        fecha = self.desde + timedelta(days=fechas[numero - 1])
+        neto = round(rng.uniform(1000, 500000), 2)
+        iva = 0.0 if int(tipo) in TIPOS_SIN_IVA else round(neto * 0.21, 2)
+        tributo = round(neto * 0.03, 2) if rng.random() < 0.3 else 0.0
+
+        return {
+            'tipo': int(tipo),
+            'pv': int(pv),
+            'numero': numero,
+            'fecha': fecha,
+            'neto': neto,
+            'iva': iva,
+            'tributo': tributo,
+            'total': round(neto + iva + tributo, 2),
+            'cae': str(rng.randrange(10 ** 13, 10 ** 14)),
+            'vto_cae': fecha + timedelta(days=10),
+            'doc_tipo': 80,
+            'doc_nro': str(rng.choice((20, 23, 27, 30, 33))) + str(rng.randrange(10 ** 8, 10 ** 9)),
+            'cantidad_items': rng.randint(1, 3),
+            'rng': rng,
+        }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Respuestas por operación
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _envelope(cuerpo):
+    return ('<?xml version="1.0" encoding="utf-8"?>'
+            '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+            f'<soap:Body>{cuerpo}</soap:Body></soap:Envelope>')
+
+
+def _fault(codigo, mensaje):
+    return _envelope(f'<soap:Fault><faultcode>{escape(codigo)}</faultcode>'
+                     f'<faultstring>{escape(mensaje)}</faultstring></soap:Fault>')
+
+
+def _iso(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.') + f'{dt.microsecond // 1000:03d}-03:00'
+
+
+class Operaciones:
+    """Arma la respuesta SOAP de cada operación a partir del Dataset."""
+
+    def __init__(self, simulador):
+        self.sim = simulador
+        self.dataset = simulador.dataset
+
+    # ── WSAA ─────────────────────────────────────────────────────────────────
+
+    def loginCms(self, campos, crudo):
+        try:
+            cms = base64.b64decode(campos.get('in0', ''))
+        except ValueError:
+            raise FallaSOAP(500, 'ns1:cms.bad', 'CMS invalido')
+        servicio = re.search(rb'<service>\s*([\w.]+)\s*</service>', cms)
+        if not servicio:
+            raise FallaSOAP(500, 'ns1:xml.bad', 'No se pudo leer el TRA del CMS')
+        servicio = servicio.group(1).decode()
+
+        # El TA es del certificado: la identidad es el primer certificado del CMS
+        firmante = _firmante_cms(cms)
+        ahora = datetime.now(timezone(timedelta(hours=-3)))
+        vencimiento = ahora + timedelta(minutes=self.sim.config['ta_minutos'])
+
+        with self.sim.lock:
+            vigente = self.sim.tickets.get((firmante, servicio))
+            if self.sim.config['ta_unico'] and vigente and vigente > ahora:
+                raise FallaSOAP(500, 'ns1:coe.alreadyAuthenticated',
+                                'El CEE ya posee un TA valido para el acceso al WSN solicitado')
+            self.sim.tickets[(firmante, servicio)] = vencimiento
+
+        token = base64.b64encode(os.urandom(480)).decode()
+        sign = base64.b64encode(os.urandom(96)).decode()
+        ticket = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                  '<loginTicketResponse version="1.0"><header>'
+                  f'<source>CN=wsaa, O=AFIP, C=AR, SERIALNUMBER=CUIT 33693450239</source>'
+                  f'<destination>{escape(firmante)}</destination>'
+                  f'<uniqueId>{random.randrange(10 ** 9)}</uniqueId>'
+                  f'<generationTime>{_iso(ahora)}</generationTime>'
+                  f'<expirationTime>{_iso(vencimiento)}</expirationTime>'
+                  '</header><credentials>'
+                  f'<token>{token}</token><sign>{sign}</sign>'
+                  '</credentials></loginTicketResponse>')
+        return _envelope('<loginCmsResponse xmlns="http://wsaa.view.sua.dvadac.desein.afip.gov">'
+                         f'<loginCmsReturn>{escape(ticket)}</loginCmsReturn></loginCmsResponse>')
+
+    # ── WSFEv1 ───────────────────────────────────────────────────────────────
+
+    def _fe(self, metodo, contenido, errores=None):
+        if errores:
+            contenido += '<Errors>' + ''.join(
+                f'<Err><Code>{c}</Code><Msg>{escape(m)}</Msg></Err>' for c, m in errores
+            ) + '</Errors>'
+        return _envelope(f'<{metodo}Response xmlns="http://ar.gov.afip.dif.FEV1/">'
+                         f'<{metodo}Result>{contenido}</{metodo}Result></{metodo}Response>')
+
+    def _fe_cuit(self, metodo, campos):
+        cuit = campos.get('Cuit', '')
+        if not self.dataset.cuit_valido(cuit):
+            return self._fe(metodo, '', [(600, f'ValidacionDeToken: No aparecio CUIT en lista de relaciones: {cuit}')])
+        return None
+
+    def FECompUltimoAutorizado(self, campos, crudo):
+        error = self._fe_cuit('FECompUltimoAutorizado', campos)
+        if error:
+            return error
+        pv, tipo = int(campos['PtoVta']), int(campos['CbteTipo'])
+        nro = self.dataset.ultimo('wsfe', campos['Cuit'], pv, tipo)
+        return self._fe('FECompUltimoAutorizado',
+                        f'<PtoVta>{pv}</PtoVta><CbteTipo>{tipo}</CbteTipo><CbteNro>{nro}</CbteNro>')
+
+    def FECompConsultar(self, campos, crudo):
+        error = self._fe_cuit('FECompConsultar', campos)
+        if error:
+            return error
+        c = self.dataset.comprobante('wsfe', campos['Cuit'], campos['PtoVta'],
+                                     campos['CbteTipo'], campos['CbteNro'])
+        if c is None or self.sim.sortear('prob_602'):
+            self.sim.contar('resultado:602')
+            return self._fe('FECompConsultar', '', [(602, MSG_602)])
+
+        iva = ''
+        if c['iva']:
+            iva = (f'<Iva><AlicIva><Id>5</Id><BaseImp>{c["neto"]:.2f}</BaseImp>'
+                   f'<Importe>{c["iva"]:.2f}</Importe></AlicIva></Iva>')
+        tributos = ''
+        if c['tributo']:
+            tributos = (f'<Tributos><Tributo><Id>2</Id><Desc>Percepcion IIBB</Desc>'
+                        f'<BaseImp>{c["neto"]:.2f}</BaseImp><Alic>3.00</Alic>'
+                        f'<Importe>{c["tributo"]:.2f}</Importe></Tributo></Tributos>')
+        # Como AFIP: la factura asociada trae su propio PtoVta/CbteFch dentro de CbtesAsoc
+        asociados = ''
+        if c['tipo'] in FACTURA_DE_NOTA:
+            asociados = (f'<CbtesAsoc><CbteAsoc><Tipo>{FACTURA_DE_NOTA[c["tipo"]]}</Tipo>'
+                         f'<PtoVta>{c["pv"]}</PtoVta><Nro>{c["numero"]}</Nro><Cuit>{campos["Cuit"]}</Cuit>'
+                         f'<CbteFch>{(c["fecha"] - timedelta(days=30)).strftime("%Y%m%d")}</CbteFch>'
+                         '</CbteAsoc></CbtesAsoc>')
+        fch = c['fecha'].strftime('%Y%m%d')
+        return self._fe('FECompConsultar', (
+            '<ResultGet>'
+            f'<Concepto>1</Concepto><DocTipo>{c["doc_tipo"]}</DocTipo><DocNro>{c["doc_nro"]}</DocNro>'
+            f'<CbteDesde>{c["numero"]}</CbteDesde><CbteHasta>{c["numero"]}</CbteHasta>'
+            f'<CbteFch>{fch}</CbteFch><ImpTotal>{c["total"]:.2f}</ImpTotal>'
+            f'<ImpTotConc>0.00</ImpTotConc><ImpNeto>{c["neto"]:.2f}</ImpNeto><ImpOpEx>0.00</ImpOpEx>'
+            f'<ImpTrib>{c["tributo"]:.2f}</ImpTrib><ImpIVA>{c["iva"]:.2f}</ImpIVA>'
+            '<FchServDesde/><FchServHasta/><FchVtoPago/>'
+            f'<MonId>PES</MonId><MonCotiz>1</MonCotiz>{asociados}{tributos}{iva}'
+            f'<Resultado>A</Resultado><CodAutorizacion>{c["cae"]}</CodAutorizacion>'
+            f'<EmisionTipo>CAE</EmisionTipo><FchVto>{c["vto_cae"].strftime("%Y%m%d")}</FchVto>'
+            f'<FchProceso>{fch}120000</FchProceso>'
+            f'<PtoVta>{c["pv"]}</PtoVta><CbteTipo>{c["tipo"]}</CbteTipo>'
+            '</ResultGet>'))
+
+    def FEParamGetPtosVenta(self, campos, crudo):
+        error = self._fe_cuit('FEParamGetPtosVenta', campos)
+        if error:
+            return error
+        pvs = ''.join(f'<PtoVenta><Nro>{pv}</Nro><EmisionTipo>CAE - Ws</EmisionTipo>'
+                      '<Bloqueado>N</Bloqueado><FchBaja>NULL</FchBaja></PtoVenta>'
+                      for pv in self.dataset.puntos_venta())
+        return self._fe('FEParamGetPtosVenta', f'<ResultGet>{pvs}</ResultGet>')
+
+    def FEParamGetTiposCbte(self, campos, crudo):
+        tipos = ''.join(f'<CbteTipo><Id>{t}</Id><Desc>{escape(DESCRIPCION_TIPOS.get(t, f"Tipo {t}"))}</Desc>'
+                        '<FchDesde>20100917</FchDesde><FchHasta>NULL</FchHasta></CbteTipo>'
+                        for t in self.dataset.tipos('wsfe'))
+        return self._fe('FEParamGetTiposCbte', f'<ResultGet>{tipos}</ResultGet>')
+
+    def FEParamGetTiposMonedas(self, campos, crudo):
+        monedas = ''.join(f'<Moneda><Id>{i}</Id><Desc>{escape(d)}</Desc><FchDesde>20090403</FchDesde>'
+                          '<FchHasta>NULL</FchHasta></Moneda>'
+                          for i, d in (('PES', 'Pesos Argentinos'), ('DOL', 'Dólar Estadounidense'),
+                                       ('060', 'Euro')))
+        return self._fe('FEParamGetTiposMonedas', f'<ResultGet>{monedas}</ResultGet>')
+
+    def FEParamGetTiposIva(self, campos, crudo):
+        alicuotas = ''.join(f'<IvaTipo><Id>{i}</Id><Desc>{d}</Desc><FchDesde>20090220</FchDesde>'
+                            '<FchHasta>NULL</FchHasta></IvaTipo>'
+                            for i, d in ((3, '0%'), (4, '10.5%'), (5, '21%'), (6, '27%'), (8, '5%'), (9, '2.5%')))
+        return self._fe('FEParamGetTiposIva', f'<ResultGet>{alicuotas}</ResultGet>')
+
+    # ── WSFEXv1 ──────────────────────────────────────────────────────────────
+
+    def _fex(self, metodo, contenido, error=None):
+        codigo, mensaje = error or (0, 'OK')
+        return _envelope(f'<{metodo}Response xmlns="http://ar.gov.afip.dif.fexv1/"><{metodo}Result>'
+                         f'{contenido}<FEXErr><ErrCode>{codigo}</ErrCode><ErrMsg>{escape(mensaje)}</ErrMsg></FEXErr>'
+                         '<FEXEvents><EventCode>0</EventCode><EventMsg>Ok</EventMsg></FEXEvents>'
+                         f'</{metodo}Result></{metodo}Response>')
+
+    def _fex_cuit(self, metodo, campos):
+        cuit = campos.get('Cuit', '')
+        if not self.dataset.cuit_valido(cuit):
+            return self._fex(metodo, '', (600, f'ValidacionDeToken: No aparecio CUIT en lista de relaciones: {cuit}'))
+        return None
+
+    def FEXGetCMP(self, campos, crudo):
+        error = self._fex_cuit('FEXGetCMP', campos)
+        if error:
+            return error
+        c = self.dataset.comprobante('wsfex', campos['Cuit'], campos['Punto_vta'],
+                                     campos['Cbte_tipo'], campos['Cbte_nro'])
+        if c is None or self.sim.sortear('prob_602'):
+            self.sim.contar('resultado:602')
+            return self._fex('FEXGetCMP', '', (602, MSG_602))
+
+        fch = c['fecha'].strftime('%Y%m%d')
+        items = ''.join(
+            f'<Item><Pro_codigo>P{i:03d}</Pro_codigo><Pro_ds>Producto {i}</Pro_ds><Pro_qty>1</Pro_qty>'
+            f'<Pro_umed>7</Pro_umed><Pro_precio_uni>{c["total"] / c["cantidad_items"]:.2f}</Pro_precio_uni>'
+            f'<Pro_bonificacion>0</Pro_bonificacion><Pro_total_item>{c["total"] / c["cantidad_items"]:.2f}</Pro_total_item></Item>'
+            for i in range(1, c['cantidad_items'] + 1))
+        return self._fex('FEXGetCMP', (
+            '<FEXResultGet>'
+            f'<Id>{c["numero"]}</Id><Fecha_cbte>{fch}</Fecha_cbte><Cbte_tipo>{c["tipo"]}</Cbte_tipo>'
+            f'<Punto_vta>{c["pv"]}</Punto_vta><Cbte_nro>{c["numero"]}</Cbte_nro><Tipo_expo>1</Tipo_expo>'
+            '<Permiso_existente>N</Permiso_existente><Dst_cmp>212</Dst_cmp>'
+            f'<Cliente>Cliente Exterior {c["numero"]}</Cliente><Cuit_pais_cliente>50000000016</Cuit_pais_cliente>'
+            '<Domicilio_cliente>Calle Falsa 123</Domicilio_cliente><Id_impositivo>EX-1</Id_impositivo>'
+            '<Moneda_Id>DOL</Moneda_Id><Moneda_ctz>1000.00</Moneda_ctz>'
+            f'<Imp_total>{c["total"]:.2f}</Imp_total><Forma_pago>Transferencia</Forma_pago>'
+            f'<Incoterms>FOB</Incoterms><Idioma_cbte>1</Idioma_cbte><Items>{items}</Items>'
+            f'<Fecha_cbte_cae>{fch}</Fecha_cbte_cae><Fch_venc_Cae>{c["vto_cae"].strftime("%Y%m%d")}</Fch_venc_Cae>'
+            f'<Cae>{c["cae"]}</Cae><Resultado>A</Resultado>'
+            '</FEXResultGet>'))
+
+    def FEXGetLast_CMP(self, campos, crudo):
+        error = self._fex_cuit('FEXGetLast_CMP', campos)
+        if error:
+            return error
+        pv = int(campos.get('Pto_venta', 0))
+        tipo = int(campos.get('Cbte_Tipo', campos.get('Cbte_tipo', 0)))
+        nro = self.dataset.ultimo('wsfex', campos['Cuit'], pv, tipo)
+        c = self.dataset.comprobante('wsfex', campos['Cuit'], pv, tipo, nro) if nro else None
+        fecha = c['fecha'].strftime('%Y%m%d') if c else ''
+        return self._fex('FEXGetLast_CMP',
+                         f'<FEXResult_LastCMP><Cbte_nro>{nro}</Cbte_nro>'
+                         f'<Cbte_fecha>{fecha}</Cbte_fecha></FEXResult_LastCMP>')
+
+    def FEXGetPARAM_PtoVenta(self, campos, crudo):
+        error = self._fex_cuit('FEXGetPARAM_PtoVenta', campos)
+        if error:
+            return error
+        pvs = ''.join(f'<ClsFEXResponse_PtoVenta><Pto_venta>{pv}</Pto_venta><Bloqueado>N</Bloqueado>'
+                      '<Baja_fecha>NULL</Baja_fecha></ClsFEXResponse_PtoVenta>'
+                      for pv in self.dataset.puntos_venta())
+        return self._fex('FEXGetPARAM_PtoVenta', f'<FEXResultGet>{pvs}</FEXResultGet>')
+
+    # ── WSMTXCA ──────────────────────────────────────────────────────────────
+
+    def _mtx(self, contenido):
+        return _envelope('<ns2:consultarComprobanteResponse xmlns:ns2="http://impl.service.wsmtxca.afip.gov.ar/service/">'
+                         f'{contenido}</ns2:consultarComprobanteResponse>')
+
+    def _mtx_error(self, codigo, mensaje):
+        return self._mtx(f'<arrayErrores><codigoDescripcion><codigo>{codigo}</codigo>'
+                         f'<descripcion>{escape(mensaje)}</descripcion></codigoDescripcion></arrayErrores>')
+
+    def consultarComprobanteRequest(self, campos, crudo):
+        cuit = campos.get('cuitRepresentada', '')
+        if not self.dataset.cuit_valido(cuit):
+            return self._mtx_error(600, f'No aparecio CUIT en lista de relaciones: {cuit}')
+        c = self.dataset.comprobante('wsmtxca', cuit, campos['numeroPuntoVenta'],
+                                     campos['codigoTipoComprobante'], campos['numeroComprobante'])
+        if c is None or self.sim.sortear('prob_602'):
+            self.sim.contar('resultado:602')
+            return self._mtx_error(602, MSG_602)
+
+        rng = c['rng']
+        base_item = c['neto'] / c['cantidad_items']
+        items = ''.join(
+            f'<item><unidadesMtx>1</unidadesMtx><codigoMtx>779{rng.randrange(10 ** 9, 10 ** 10)}</codigoMtx>'
+            f'<codigo>P{i:03d}</codigo><descripcion>Producto {i}</descripcion><cantidad>1</cantidad>'
+            f'<codigoUnidadMedida>7</codigoUnidadMedida><precioUnitario>{base_item:.2f}</precioUnitario>'
+            f'<codigoCondicionIVA>5</codigoCondicionIVA><importeIVA>{c["iva"] / c["cantidad_items"]:.2f}</importeIVA>'
+            f'<importeItem>{base_item + c["iva"] / c["cantidad_items"]:.2f}</importeItem></item>'
+            for i in range(1, c['cantidad_items'] + 1))
+        return self._mtx(
+            '<comprobante>'
+            f'<codigoTipoComprobante>{c["tipo"]}</codigoTipoComprobante>'
+            f'<numeroPuntoVenta>{c["pv"]}</numeroPuntoVenta><numeroComprobante>{c["numero"]}</numeroComprobante>'
+            f'<fechaEmision>{c["fecha"].isoformat()}</fechaEmision>'
+            f'<codigoTipoAutorizacion>E</codigoTipoAutorizacion><codigoAutorizacion>{c["cae"]}</codigoAutorizacion>'
+            f'<fechaVencimiento>{c["vto_cae"].isoformat()}</fechaVencimiento>'
+            f'<codigoTipoDocumento>{c["doc_tipo"]}</codigoTipoDocumento><numeroDocumento>{c["doc_nro"]}</numeroDocumento>'
+            f'<importeGravado>{c["neto"]:.2f}</importeGravado><importeNoGravado>0.00</importeNoGravado>'
+            f'<importeExento>0.00</importeExento><importeSubtotal>{c["neto"]:.2f}</importeSubtotal>'
+            f'<importeOtrosTributos>{c["tributo"]:.2f}</importeOtrosTributos><importeTotal>{c["total"]:.2f}</importeTotal>'
+            '<codigoMoneda>PES</codigoMoneda><cotizacionMoneda>1</cotizacionMoneda><codigoConcepto>1</codigoConcepto>'
+            f'<arrayItems>{items}</arrayItems>'
+            f'<arraySubtotalesIVA><subtotalIVA><codigo>5</codigo><importe>{c["iva"]:.2f}</importe></subtotalIVA></arraySubtotalesIVA>'
+            '</comprobante>')
+
+
+def _firmante_cms(cms):
+    """Subject del primer certificado del CMS (identidad del TA)."""
+    try:
+        from cryptography.hazmat.primitives.serialization import pkcs7
+        certs = pkcs7.load_der_pkcs7_certificates(cms)
+        if certs:
+            return certs[0].subject.rfc4514_string()
+    except Exception:
+        pass
+    return 'desconocido'
+
+
+def _campos_request(cuerpo):
+    """(operación, {tag_local: texto}) del primer elemento dentro de soap:Body."""
+    raiz = ET.fromstring(cuerpo)
+    body = next((e for e in raiz if e.tag.rsplit('}', 1)[-1] == 'Body'), None)
+    if body is None or not len(body):
+        raise FallaSOAP(500, 'soap:Client', 'Request SOAP sin Body')
+    operacion = body[0]
+    campos = {}
+    for elem in operacion.iter():
+        if elem.text and elem.text.strip():
+            campos[elem.tag.rsplit('}', 1)[-1]] = elem.text.strip()
+    return operacion.tag.rsplit('}', 1)[-1], campos
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Servidor HTTP
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, como AFIP
+    disable_nagle_algorithm = True  # headers y body salen en writes separados
+    server_version = 'SimuladorAFIP/1.0'
+
+    def log_message(self, formato, *args):
+        if self.server.simulador.verbose:
+            super().log_message(formato, *args)
+
+    def _responder(self, status, cuerpo, tipo='text/xml; charset=utf-8'):
+        datos = cuerpo.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        sim = self.server.simulador
+        path = self.path.split('?', 1)[0]
+        if path == '/_simulador/estado':
+            self._responder(200, json.dumps(sim.estado(), indent=2), 'application/json')
+        elif path in PATHS.values():
+            # Health checks piden ?WSDL; alcanza con un documento válido
+            self._responder(200, '<?xml version="1.0" encoding="utf-8"?>'
+                                 '<definitions xmlns="http://schemas.xmlsoap.org/wsdl/"/>')
+        else:
+            self._responder(404, 'Not Found', 'text/plain')
+
+    def do_POST(self):
+        sim = self.server.simulador
+        largo = int(self.headers.get('Content-Length', 0))
+        cuerpo = self.rfile.read(largo)
+        status, respuesta = sim.atender(self.path.split('?', 1)[0], cuerpo)
+        self._responder(status, respuesta)
+
+
+class SimuladorAFIP:
+    """Servidor SOAP local. iniciar() lo levanta en un thread; detener() lo baja."""
+
+    def __init__(self, config=None, host='127.0.0.1', puerto=0, tls=False, verbose=False):
+        self.config = {**CONFIG_DEFECTO, **(config or {})}
+        self.config['tipos'] = {**CONFIG_DEFECTO['tipos'], **self.config['tipos']}
+        self.host = host
+        self.puerto = puerto
+        self.tls = tls
+        self.verbose = verbose
+        self.dataset = Dataset(self.config)
+        self.operaciones = Operaciones(self)
+        self.lock = threading.Lock()
+        self.tickets = {}
+        self.contadores = Counter()
+        self.en_curso = 0
+        self.max_en_curso = 0
+        self._rng = random.Random()
+        self._servidor = None
+        self._thread = None
+
+    @property
+    def url(self):
+        esquema = 'https' if self.tls else 'http'
+        return f'{esquema}://{self.host}:{self.puerto}'
+
+    def sortear(self, clave):
+        prob = self.config[clave]
+        if prob <= 0:
+            return False
+        with self.lock:
+            return self._rng.random() < prob
+
+    def atender(self, path, cuerpo):
+        """(status HTTP, XML de respuesta) para un POST SOAP."""
+        with self.lock:
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+            en_curso = self.en_curso
+        try:
+            demora = self.config['latencia_ms'] + self._rng.uniform(0, self.config['jitter_ms'])
+            if demora > 0:
+                time.sleep(demora / 1000)
+
+            operacion, campos = _campos_request(cuerpo)
+            self.contar(f'op:{operacion}')
+
+            limite = self.config['max_simultaneos']
+            if (limite and en_curso > limite) or self.sortear('prob_throttle'):
+                raise FallaSOAP(self.config['status_throttle'], 'soap:Server',
+                                'Demasiadas solicitudes, reintente mas tarde')
+            if self.sortear('prob_500'):
+                raise FallaSOAP(500, 'soap:Server', 'Error interno del servidor (simulado)')
+
+            metodo = getattr(self.operaciones, operacion, None)
+            if metodo is None:
+                raise FallaSOAP(500, 'soap:Client', f'Operacion no soportada: {operacion}')
+            return 200, metodo(campos, cuerpo)
+
+        except FallaSOAP as e:
+            self.contar(f'falla:{e.status}:{e.codigo}')
+            return e.status, _fault(e.codigo, e.mensaje)
+        except (ET.ParseError, KeyError, ValueError) as e:
+            self.contar('falla:500:request_invalido')
+            return 500, _fault('soap:Client', f'Request invalido: {e}')
+        finally:
+            with self.lock:
+                self.en_curso -= 1
+
+    def contar(self, clave):
+        with self.lock:
+            self.contadores[clave] += 1
+
+    def estado(self):
+        with self.lock:
+            return {
+                'url': self.url,
+                'requests_en_curso': self.en_curso,
+                'max_en_curso': self.max_en_curso,
+                'tickets_emitidos': len(self.tickets),
+                'contadores': dict(self.contadores),
+                'config': self.config,
+            }
+
+    def iniciar(self):
+        servidor = ThreadingHTTPServer((self.host, self.puerto), _Handler)
+        servidor.daemon_threads = True
+        servidor.simulador = self
+        if self.tls:
+            servidor.socket = _contexto_tls().wrap_socket(servidor.socket, server_side=True)
+        self.puerto = servidor.server_address[1]
+        self._servidor = servidor
+        self._thread = threading.Thread(target=servidor.serve_forever, name='simulador-afip', daemon=True)
+        self._thread.start()
+        return self
+
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+
+def _contexto_tls():
+    """Contexto TLS de servidor con un certificado autofirmado efímero."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    clave = ec.generate_private_key(ec.SECP256R1())
+    nombre = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'simulador-afip')])
+    ahora = datetime.now(timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(nombre).issuer_name(nombre)
+            .public_key(clave.public_key()).serial_number(x509.random_serial_number())
+            .not_valid_before(ahora - timedelta(minutes=5)).not_valid_after(ahora + timedelta(days=1))
+            .sign(clave, hashes.SHA256()))
+
+    directorio = tempfile.mkdtemp(prefix='simulador_afip_')
+    cert_path = os.path.join(directorio, 'cert.pem')
+    key_path = os.path.join(directorio, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(clave.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()))
+
+    contexto = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    contexto.load_cert_chain(cert_path, key_path)
+    return contexto
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulador local de web services AFIP (SOAP)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8085)
+    parser.add_argument('--tls', action='store_true', help='HTTPS con certificado autofirmado')
+    parser.add_argument('--config', help='JSON con claves de CONFIG_DEFECTO')
+    parser.add_argument('--semilla', type=int)
+    parser.add_argument('--cuits', help='CUITs válidos separados por coma (vacío = todos)')
+    parser.add_argument('--puntos-venta', help='ej. 1,2,3')
+    parser.add_argument('--cantidad-max', type=int)
+    parser.add_argument('--fecha-desde')
+    parser.add_argument('--fecha-hasta')
+    parser.add_argument('--latencia-ms', type=float)
+    parser.add_argument('--jitter-ms', type=float)
+    parser.add_argument('--prob-602', type=float)
+    parser.add_argument('--prob-throttle', type=float)
+    parser.add_argument('--max-simultaneos', type=int)
+    parser.add_argument('--prob-500', type=float)
+    parser.add_argument('--ta-minutos', type=int)
+    parser.add_argument('--sin-ta-unico', action='store_true',
+                        help='Emitir TA nuevo aunque haya uno vigente')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            config.update(json.load(f))
+    for clave in ('semilla', 'cantidad_max', 'fecha_desde', 'fecha_hasta', 'latencia_ms',
+                  'jitter_ms', 'prob_602', 'prob_throttle', 'max_simultaneos', 'prob_500', 'ta_minutos'):
+        valor = getattr(args, clave)
+        if valor is not None:
+            config[clave] = valor
+    if args.cuits is not None:
+        config['cuits'] = [c.strip() for c in args.cuits.split(',') if c.strip()]
+    if args.puntos_venta:
+        config['puntos_venta'] = [int(pv) for pv in args.puntos_venta.split(',')]
+    if args.sin_ta_unico:
+        config['ta_unico'] = False
+
+    sim = SimuladorAFIP(config, host=args.host, puerto=args.puerto, tls=args.tls,
+                        verbose=args.verbose).iniciar()
+    print(f"🧪 Simulador AFIP escuchando en {sim.url}")
+    print(f"   AFIP_URL_BASE={sim.url}")
+    print(f"   Estado: {sim.url}/_simulador/estado")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n🛑 Deteniendo simulador")
+        sim.detener()
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Tests del circuit breaker, la política de reintentos y el token bucket
+(src/afip_resiliencia.py, src/afip_transport.py, src/afip_limites.py). No
+tocan la red: la sesión HTTP es un doble y el reloj del bucket es falso.
+
+    python -m pytest tests_y_pruebas/test_afip_resiliencia.py -q
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src import afip_limites, afip_transport
+from src.afip_limites import TokenBucket, bucket_solicitante
+from src.afip_resiliencia import (ABIERTO, CERRADO, SEMIABIERTO, CircuitBreaker, CircuitoAbierto,
+                                  Rechazo, Throttling, Transitorio, circuito_servicio,
+                                  clasificar_excepcion, clasificar_respuesta)
+
+
+class _Respuesta:
+    def __init__(self, status, text='<ok/>', headers=None):
+        self.status_code = status
+        self.text = text
+        self.headers = headers or {}
+
+
+class _Sesion:
+    """Devuelve (o levanta) los resultados en orden; cuenta los POST."""
+
+    def __init__(self, resultados):
+        self.resultados = list(resultados)
+        self.posts = 0
+
+    def post(self, *args, **kwargs):
+        self.posts += 1
+        resultado = self.resultados.pop(0)
+        if isinstance(resultado, BaseException):
+            raise resultado
+        return resultado
+
+
+@pytest.fixture
+def sesion(monkeypatch):
+    def instalar(resultados):
+        doble = _Sesion(resultados)
+        monkeypatch.setattr(afip_transport, 'sesion_afip', lambda: doble)
+        return doble
+    monkeypatch.setattr(afip_transport, 'espera_reintento', lambda intento, error: 0)
+    return instalar
+
+
+def _circuito_nuevo(url, fallas=2, espera=0.05):
+    circuito = circuito_servicio('wsfe', url)
+    circuito.fallas_para_abrir = fallas
+    circuito.espera = espera
+    return circuito
+
+
+# ---------------------------------------------------------------------------
+# CircuitBreaker
+# ---------------------------------------------------------------------------
+
+def test_circuito_abierto_semiabierto_prueba_fallida_reabre_y_cierra():
+    cb = CircuitBreaker('wsfe@test', fallas=2, espera=0.05)
+    falla = Transitorio('wsfe', 'HTTP 500', 500)
+
+    assert cb.permitir() is False
+    cb.registrar_falla(falla)
+    cb.registrar_falla(falla)
+    assert cb.estado()['estado'] == ABIERTO
+    with pytest.raises(CircuitoAbierto):
+        cb.permitir()
+
+    # Vence la espera: una sola prueba pasa, las demás siguen rechazadas
+    time.sleep(0.06)
+    assert cb.permitir() is True
+    with pytest.raises(CircuitoAbierto):
+        cb.permitir()
+
+    # La prueba falla: vuelve a abrirse por otra espera completa
+    cb.registrar_falla(falla)
+    assert cb.estado()['estado'] == ABIERTO
+    with pytest.raises(CircuitoAbierto):
+        cb.permitir()
+
+    # Segunda prueba exitosa: cierra y deja pasar todo
+    time.sleep(0.06)
+    assert cb.permitir() is True
+    cb.registrar_exito()
+    assert cb.estado()['estado'] == CERRADO
+    assert cb.permitir() is False
+    assert cb.permitir() is False
+
+
+def test_soltar_prueba_deja_probar_a_otra_llamada():
+    cb = CircuitBreaker('wsfe@test', fallas=1, espera=0)
+    cb.registrar_falla(Transitorio('wsfe', 'timeout'))
+    assert cb.permitir() is True
+    with pytest.raises(CircuitoAbierto):
+        cb.permitir()
+    cb.soltar_prueba()
+    assert cb.estado()['estado'] == SEMIABIERTO
+    assert cb.permitir() is True
+
+
+def test_rechazo_no_abre_el_circuito():
+    cb = CircuitBreaker('wsfe@test', fallas=1, espera=60)
+    cb.registrar_falla(Rechazo('wsfe', 'HTTP 400', 400))
+    assert cb.estado()['estado'] == CERRADO
+
+
+# ---------------------------------------------------------------------------
+# post_afip + circuito
+# ---------------------------------------------------------------------------
+
+def test_prueba_con_reintentos_no_queda_trabada(sesion):
+    url = 'https://prueba-trabada.afip.test/wsfev1/service.asmx'
+    circuito = _circuito_nuevo(url)
+    sesion([_Respuesta(500, 'error')] * 2)
+    for _ in range(2):
+        with pytest.raises(Transitorio):
+            afip_transport.post_afip('wsfe', url, '<x/>', {}, reintentos=0)
+    assert circuito.estado()['estado'] == ABIERTO
+
+    # La prueba recibe un 500 y se recupera en el reintento: el circuito cierra
+    time.sleep(0.06)
+    doble = sesion([_Respuesta(500, 'error'), _Respuesta(200)])
+    assert afip_transport.post_afip('wsfe', url, '<x/>', {}, reintentos=2) == '<ok/>'
+    assert doble.posts == 2
+    assert circuito.estado()['estado'] == CERRADO
+
+
+def test_prueba_que_agota_reintentos_reabre(sesion):
+    url = 'https://prueba-reabre.afip.test/wsfev1/service.asmx'
+    circuito = _circuito_nuevo(url, fallas=1)
+    sesion([requests.ConnectionError('caido')])
+    with pytest.raises(Transitorio):
+        afip_transport.post_afip('wsfe', url, '<x/>', {}, reintentos=0)
+
+    time.sleep(0.06)
+    sesion([requests.Timeout('lento')] * 3)
+    with pytest.raises(Transitorio):
+        afip_transport.post_afip('wsfe', url, '<x/>', {}, reintentos=2)
+    assert circuito.estado()['estado'] == ABIERTO
+    with pytest.raises(CircuitoAbierto):
+        afip_transport.post_afip('wsfe', url, '<x/>', {}, reintentos=0)
+
+
+def test_prueba_interrumpida_por_excepcion_ajena_se_libera(sesion):
+    url = 'https://prueba-excepcion.afip.test/wsfev1/service.asmx'
+    circuito = _circuito_nuevo(url, fallas=1)
+    sesion([_Respuesta(502, 'error')])
+    with pytest.raises(Transitorio):
+        afip_transport.post_afip('wsfe', url, '<x/>', {}, reintentos=0)
+
+    time.sleep(0.06)
+    sesion([ValueError('bug del llamador')])
+    with pytest.raises(ValueError):
+        afip_transport.post_afip('wsfe', url, '<x/>', {}, reintentos=0)
+    assert circuito.estado()['estado'] == SEMIABIERTO
+
+    sesion([_Respuesta(200)])
+    assert afip_transport.post_afip('wsfe', url, '<x/>', {}, reintentos=0) == '<ok/>'
+    assert circuito.estado()['estado'] == CERRADO
+
+
+# ---------------------------------------------------------------------------
+# Taxonomía
+# ---------------------------------------------------------------------------
+
+def test_clasificar_respuesta():
+    assert clasificar_respuesta('wsfe', _Respuesta(200, '<Errors><Err><Code>602</Code></Err></Errors>')) is None
+    assert isinstance(clasificar_respuesta('wsfe', _Respuesta(200, '<Errors><Err><Code>501</Code></Err></Errors>')),
+                      Transitorio)
+    throttling = clasificar_respuesta('wsfe', _Respuesta(429, '', {'Retry-After': '2'}))
+    assert isinstance(throttling, Throttling) and throttling.reintentar_en == 2.0
+    fault = ('<soap:Fault><faultcode>ns1:coe.notAuthorized</faultcode>'
+             '<faultstring>Computador no autorizado</faultstring></soap:Fault>')
+    assert isinstance(clasificar_respuesta('wsaa', _Respuesta(500, fault, {'Content-Type': 'text/xml'})), Rechazo)
+    assert isinstance(clasificar_respuesta('wsfe', _Respuesta(502, 'bad gateway')), Transitorio)
+    assert isinstance(clasificar_respuesta('wsfe', _Respuesta(404, 'not found')), Rechazo)
+
+
+def test_clasificar_excepcion():
+    assert isinstance(clasificar_excepcion('wsfe', requests.Timeout('t')), Transitorio)
+    assert isinstance(clasificar_excepcion('wsfe', requests.ConnectionError('c')), Transitorio)
+    assert isinstance(clasificar_excepcion('wsfe', requests.TooManyRedirects('r')), Rechazo)
+
+
+# ---------------------------------------------------------------------------
+# Token bucket
+# ---------------------------------------------------------------------------
+
+class _Reloj:
+    """time.monotonic/time.sleep de mentira: sleep avanza el reloj.
+
+    Como el real, un sleep dura al menos un poco (1 µs): con floats la espera
+    calculada puede quedar en ~1e-16 y no mover el reloj.
+    """
+
+    def __init__(self):
+        self.ahora = 1000.0
+        self.dormido = 0.0
+
+    def monotonic(self):
+        return self.ahora
+
+    def sleep(self, segundos):
+        segundos = max(segundos, 1e-6)
+        self.dormido += segundos
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    falso = _Reloj()
+    monkeypatch.setattr(afip_limites, 'time', falso)
+
+    async def dormir(segundos):
+        falso.sleep(segundos)
+    monkeypatch.setattr(afip_limites.asyncio, 'sleep', dormir)
+    return falso
+
+
+def test_bucket_rafaga_y_ritmo_sostenido(reloj):
+    bucket = TokenBucket(tasa=10, capacidad=3)
+    for _ in range(3):
+        assert bucket.adquirir() is True
+    assert reloj.dormido == 0
+
+    # Vacío: cada token más espera 1/tasa
+    for _ in range(5):
+        bucket.adquirir()
+    assert reloj.dormido == pytest.approx(0.5, abs=1e-4)
+
+    # Ocioso mucho tiempo: no acumula más que la capacidad
+    reloj.ahora += 60
+    antes = reloj.dormido
+    for _ in range(4):
+        bucket.adquirir()
+    assert reloj.dormido - antes == pytest.approx(0.1, abs=1e-4)
+
+
+def test_bucket_timeout(reloj):
+    bucket = TokenBucket(tasa=1, capacidad=1)
+    assert bucket.adquirir(timeout=0.5) is True
+    assert bucket.adquirir(timeout=0.5) is False
+    assert reloj.dormido == pytest.approx(0.5, abs=1e-4)
+    assert bucket.adquirir(timeout=0.5) is True     # ya pasó 1 s desde el primero
+
+
+def test_bucket_sin_limite_y_async(reloj):
+    assert all(TokenBucket(tasa=0, capacidad=0).adquirir() for _ in range(100))
+    assert reloj.dormido == 0
+
+    bucket = TokenBucket(tasa=4, capacidad=1)
+
+    async def tomar(n):
+        for _ in range(n):
+            await bucket.adquirir_async()
+    asyncio.run(tomar(3))
+    assert reloj.dormido == pytest.approx(0.5, abs=1e-4)
+
+
+def test_bucket_por_solicitante_y_servicio(monkeypatch):
+    monkeypatch.setenv('AFIP_RPS_WSMTXCA', '2')
+    a = bucket_solicitante('20-bucket-test', 'wsfe')
+    assert bucket_solicitante('20-bucket-test', 'wsfe') is a
+    assert bucket_solicitante('20-bucket-test', 'wsmtxca') is not a
+    assert bucket_solicitante('20-bucket-test', 'wsmtxca').tasa == 2
+    assert bucket_solicitante('27-bucket-test', 'wsfe') is not a
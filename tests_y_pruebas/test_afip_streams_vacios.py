@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests de la cache negativa de streams vacíos (src/afip_streams_vacios.py) y de
+su uso en WSFEv1Client.obtener_ultimo_comprobante. Sin DB ni red: la cache
+queda en memoria y el request a AFIP es un doble.
+
+    python -m pytest tests_y_pruebas/test_afip_streams_vacios.py -q
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src import afip_streams_vacios as vacios
+from wsfev1_client import WSFEv1Client
+
+CUIT = '20111111112'
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia(monkeypatch):
+    monkeypatch.setattr(vacios, '_mapas', {})
+    monkeypatch.setattr(vacios, 'pool_disponible', lambda: False)
+    monkeypatch.setattr(vacios, 'AFIP_VACIOS_TTL_MIN', 360)
+    monkeypatch.setattr(vacios, 'AFIP_VACIOS_REFRESCO_MIN', 30)
+
+
+def _envejecer(tipo, pv, minutos):
+    vacios._mapa(CUIT, 'homo')[(tipo, pv)] = datetime.now(timezone.utc) - timedelta(minutes=minutos)
+
+
+def _esperar_refrescos():
+    for _ in range(200):
+        with vacios._lock:
+            if not vacios._en_curso:
+                return
+        time.sleep(0.01)
+    raise AssertionError('la re-verificación en background no terminó')
+
+
+class _Cliente(WSFEv1Client):
+    """WSFEv1Client con FECompUltimoAutorizado de mentira; cuenta los requests."""
+
+    def __init__(self, ultimos):
+        super().__init__('cert', 'key', 'homo', solicitante_cuit=CUIT)
+        self.ultimos = ultimos
+        self.requests = 0
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def autenticar_wsaa(self, cuit_representada=None):
+        return 'token', 'sign'
+
+    def _wsfe_request(self, method, params, token, sign, cuit):
+        self.liberar.wait(5)
+        self.requests += 1
+        ultimo = self.ultimos[(params['tipo_comprobante'], params['punto_venta'])]
+        return f'<FECompUltimoAutorizadoResult><CbteNro>{ultimo}</CbteNro></FECompUltimoAutorizadoResult>'
+
+
+def test_registrar_vacio_y_con_comprobantes():
+    assert vacios.consultar(CUIT, 'homo', 6, 1) is None
+    vacios.registrar(CUIT, 'homo', 6, 1, 0)
+    assert vacios.consultar(CUIT, 'homo', 6, 1) == vacios.VIGENTE
+    assert vacios.consultar(CUIT, 'prod', 6, 1) is None
+    vacios.registrar(CUIT, 'homo', 6, 1, 3)
+    assert vacios.consultar(CUIT, 'homo', 6, 1) is None
+
+
+def test_estado_segun_la_edad():
+    _envejecer(6, 1, 29)
+    assert vacios.consultar(CUIT, 'homo', 6, 1) == vacios.VIGENTE
+    _envejecer(6, 1, 31)
+    assert vacios.consultar(CUIT, 'homo', 6, 1) == vacios.REFRESCAR
+    _envejecer(6, 1, 361)
+    assert vacios.consultar(CUIT, 'homo', 6, 1) is None
+
+
+def test_ttl_cero_desactiva_la_cache(monkeypatch):
+    monkeypatch.setattr(vacios, 'AFIP_VACIOS_TTL_MIN', 0)
+    vacios.registrar(CUIT, 'homo', 6, 1, 0)
+    assert vacios.consultar(CUIT, 'homo', 6, 1) is None
+
+
+def test_cliente_no_pregunta_por_vacio_vigente():
+    cliente = _Cliente({(6, 1): 0})
+    assert cliente.obtener_ultimo_comprobante(CUIT, 6, 1) == 0
+    assert cliente.obtener_ultimo_comprobante(CUIT, 6, 1) == 0
+    assert cliente.requests == 1
+
+
+def test_refresco_en_background_no_demora_la_consulta():
+    # El stream empezó a usarse después de cachearlo vacío: la consulta que lo
+    # encuentra para refrescar contesta 0 sin esperar, la siguiente ve el número
+    cliente = _Cliente({(6, 1): 0})
+    cliente.obtener_ultimo_comprobante(CUIT, 6, 1)
+    _envejecer(6, 1, 31)
+    cliente.ultimos[(6, 1)] = 12
+    cliente.liberar.clear()
+    assert cliente.obtener_ultimo_comprobante(CUIT, 6, 1) == 0
+    # Mientras se re-verifica, otra consulta no lanza una segunda verificación
+    assert cliente.obtener_ultimo_comprobante(CUIT, 6, 1) == 0
+    cliente.liberar.set()
+    _esperar_refrescos()
+    assert cliente.requests == 2
+    assert vacios.consultar(CUIT, 'homo', 6, 1) is None
+    assert cliente.obtener_ultimo_comprobante(CUIT, 6, 1) == 12
+
+
+def test_vencido_pregunta_antes_de_responder():
+    cliente = _Cliente({(6, 1): 0})
+    cliente.obtener_ultimo_comprobante(CUIT, 6, 1)
+    _envejecer(6, 1, 361)
+    cliente.ultimos[(6, 1)] = 12
+    assert cliente.obtener_ultimo_comprobante(CUIT, 6, 1) == 12
+    assert cliente.requests == 2
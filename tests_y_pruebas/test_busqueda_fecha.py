@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests de la búsqueda por fecha de WSFEv1 (wsfev1_client._busqueda_desde y
+WSFEv1Client.buscar_rango_por_fecha). Sin red: las fechas salen de listas
+armadas acá o del dataset del simulador (simulador_afip.py) en proceso.
+
+    python -m pytest tests_y_pruebas/test_busqueda_fecha.py -q
+"""
+
+import bisect
+import math
+import os
+import random
+import sys
+
+import pytest
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(AQUI, '..'))
+sys.path.insert(0, AQUI)
+
+from simulador_afip import SimuladorAFIP
+from wsfev1_client import WSFEv1Client, _busqueda_desde
+
+CUIT = '30222222223'
+
+
+def _buscar(fechas, objetivo, sondeos=None, faltante_es_mayor=False):
+    """Correr la búsqueda sobre `fechas` (ordinal del comprobante n en fechas[n-1]).
+
+    Retorna (resultado, números sondeados en esta búsqueda).
+    """
+    sondeos = {} if sondeos is None else sondeos
+    pedidos = []
+    busqueda = _busqueda_desde(len(fechas), objetivo, sondeos, faltante_es_mayor)
+    try:
+        num = next(busqueda)
+        while True:
+            assert 1 <= num <= len(fechas) and num not in pedidos
+            pedidos.append(num)
+            sondeos[num] = fechas[num - 1]
+            num = busqueda.send(fechas[num - 1])
+    except StopIteration as fin:
+        return fin.value, pedidos
+
+
+def _fechas_aleatorias(rng, n):
+    """n fechas no decrecientes: días vacíos, días normales y algún día con ráfaga."""
+    fechas, dia = [], 738000
+    while len(fechas) < n:
+        dia += rng.choice((0, 0, 1, 1, 2, 7))
+        fechas.extend([dia] * (rng.randint(200, 2000) if rng.random() < 0.02 else 1))
+    return fechas[:n]
+
+
+@pytest.mark.parametrize('semilla', range(40))
+def test_coincide_con_busqueda_binaria(semilla):
+    rng = random.Random(semilla)
+    fechas = _fechas_aleatorias(rng, rng.choice((1, 2, 10, 500, 20000)))
+    for objetivo in {fechas[0] - 1, fechas[0], fechas[-1], fechas[-1] + 1,
+                     rng.randint(fechas[0], fechas[-1]), rng.randint(fechas[0], fechas[-1])}:
+        esperado = bisect.bisect_left(fechas, objetivo) + 1
+        resultado, pedidos = _buscar(fechas, objetivo)
+        assert resultado == esperado
+        # Peor caso: extremos + ciclos de interpolación hasta el primero que
+        # falla, y de ahí bisección (no alterna interpolación y bisección)
+        assert len(pedidos) <= math.ceil(math.log2(len(fechas) + 1)) + 10
+
+
+def test_interpolacion_con_fechas_uniformes_sondea_poco():
+    # Un comprobante por día: los dos extremos, la interpolación y la acotación
+    fechas = [738000 + i for i in range(100_000)]
+    resultado, pedidos = _buscar(fechas, 738000 + 1234)
+    assert resultado == 1235
+    assert len(pedidos) <= 4
+
+    # 50 por día: la interpolación llega al día y adentro del día es bisección
+    # (log2(50) ~ 6). Los sondeos de los extremos no cuentan como ciclo fallido.
+    fechas = [738000 + i // 50 for i in range(100_000)]
+    resultado, pedidos = _buscar(fechas, 738000 + 1234)
+    assert resultado == 1234 * 50 + 1
+    assert len(pedidos) <= 11      # bisección pura: 17
+
+
+def test_reusa_los_sondeos_de_la_busqueda_anterior():
+    rng = random.Random(7)
+    fechas = _fechas_aleatorias(rng, 5000)
+    sondeos = {}
+    fin, _ = _buscar(fechas, fechas[3000] + 1, sondeos, faltante_es_mayor=True)
+    previos = set(sondeos)
+    inicio, pedidos = _buscar(fechas[:fin - 1], fechas[1000], sondeos)
+    assert inicio == bisect.bisect_left(fechas, fechas[1000]) + 1
+    # Ningún número ya sondeado se vuelve a pedir, y los previos acotan la búsqueda
+    assert not previos & set(pedidos)
+    assert len(pedidos) < len(_buscar(fechas[:fin - 1], fechas[1000])[1])
+
+
+def test_fecha_ilegible_segun_faltante_es_mayor():
+    fechas = [738000, 738001, None, 738003, 738004]
+    assert _buscar(fechas, 738002, faltante_es_mayor=True)[0] == 3
+    assert _buscar(fechas, 738002, faltante_es_mayor=False)[0] == 4
+
+
+# ---------------------------------------------------------------------------
+# buscar_rango_por_fecha contra el dataset del simulador
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def sim():
+    return SimuladorAFIP({'cuits': [CUIT], 'puntos_venta': [1], 'tipos': {'wsfe': [1]},
+                          'cantidad_min': 3000, 'cantidad_max': 3000, 'prob_stream_vacio': 0.0})
+
+
+@pytest.fixture
+def cliente(sim):
+    cliente = WSFEv1Client('cert', 'key', 'homo', solicitante_cuit=CUIT)
+    cliente.autenticar_wsaa = lambda cuit=None: ('token', 'sign')
+    cliente.consultas = 0
+
+    def _wsfe_request(method, params, token, sign, cuit):
+        cliente.consultas += 1
+        campos = {'Cuit': cuit, 'PtoVta': params['punto_venta'],
+                  'CbteTipo': params['tipo_comprobante'], 'CbteNro': params.get('numero', 0)}
+        return getattr(sim.operaciones, method)({k: str(v) for k, v in campos.items()}, None)
+
+    cliente._wsfe_request = _wsfe_request
+    return cliente
+
+
+def test_rango_por_fecha_contra_el_simulador(sim, cliente):
+    fechas = [sim.dataset.comprobante('wsfe', CUIT, 1, 1, n)['fecha'].strftime('%Y%m%d')
+              for n in range(1, 3001)]
+    for desde, hasta in (('20250301', '20250331'), ('20240101', '20250115'),
+                         ('20251220', '20261231'), (fechas[1500], fechas[1500])):
+        esperado_inicio = bisect.bisect_left(fechas, desde) + 1
+        esperado_fin = bisect.bisect_right(fechas, hasta)
+        cliente.consultas = 0
+        rango = cliente.buscar_rango_por_fecha(CUIT, 1, 1, 3000, desde, hasta)
+        if esperado_inicio > esperado_fin:
+            assert rango is None
+        else:
+            assert rango == (esperado_inicio, esperado_fin)
+        assert cliente.consultas <= 2 * (math.ceil(math.log2(3001)) + 4)
+
+    assert cliente.buscar_rango_por_fecha(CUIT, 1, 1, 3000, '20200101', '20201231') is None
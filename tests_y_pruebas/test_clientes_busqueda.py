@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests de la búsqueda de clientes del typeahead (src/clientes_busqueda.py): qué
+filtro y qué parámetros arma para cada entrada, y el paginado. Sin DB: el
+cursor es un doble que guarda la query.
+
+    python -m pytest tests_y_pruebas/test_clientes_busqueda.py -q
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src import clientes_busqueda
+from src.clientes_busqueda import _por_nombre, _por_numero, buscar_clientes
+
+
+class _Cursor:
+    def __init__(self, filas):
+        self.filas = filas
+        self.consultas = []
+
+    def execute(self, sql, params):
+        self.consultas.append((sql, params))
+
+    def fetchall(self):
+        return self.filas
+
+
+@pytest.fixture
+def cursor(monkeypatch):
+    doble = _Cursor([])
+
+    @contextmanager
+    def get_cursor():
+        yield doble
+
+    monkeypatch.setattr(clientes_busqueda, 'get_cursor', get_cursor)
+    return doble
+
+
+def test_por_numero_cuit_completo_es_igualdad():
+    where, _, params = _por_numero('20321518045')
+    assert 'LIKE' not in where
+    assert params['numero'] == '20321518045'
+
+
+def test_por_numero_parcial_es_prefijo():
+    where, _, params = _por_numero('2032')
+    assert 'LIKE %(prefijo)s' in where
+    assert params['prefijo'] == '2032%'
+
+
+def test_por_nombre_palabras_cortas_solo_prefijo_de_apellido():
+    where, _, params = _por_nombre('de la')
+    assert where == "LOWER(apellido) LIKE %(inicio)s"
+    assert params['inicio'] == 'de%'
+
+
+def test_por_nombre_cada_palabra_filtra():
+    where, _, params = _por_nombre('perez jua')
+    assert where.count(' AND ') == 1
+    assert params['p0'] == '%perez%' and params['p1'] == '%jua%'
+    assert params['texto'] == 'perez jua'
+
+    where, _, params = _por_nombre('uno dos tres cuatro cinco seis siete')
+    assert where.count(' AND ') == 4          # _MAX_PALABRAS
+
+
+def test_comodines_del_usuario_son_literales():
+    _, _, params = _por_nombre('100%_ok')
+    assert params['p0'] == '%100\\%\\_ok%'
+    assert params['inicio'] == '100\\%\\_ok%'
+
+
+def test_cuit_con_guiones_y_puntos_busca_por_numero(cursor):
+    buscar_clientes(1, ' 20-32.151804 5 ')
+    _, params = cursor.consultas[0]
+    assert params['numero'] == '20321518045' and params['estudio_id'] == 1
+
+
+def test_texto_se_busca_en_minusculas(cursor):
+    buscar_clientes(1, 'Pérez')
+    _, params = cursor.consultas[0]
+    assert params['p0'] == '%pérez%'
+
+
+def test_texto_vacio_no_consulta(cursor):
+    assert buscar_clientes(1, '   ') == ([], False)
+    assert cursor.consultas == []
+
+
+def test_paginado_pide_una_fila_de_mas(cursor):
+    cursor.filas = [{'id': i} for i in range(11)]
+    filas, hay_mas = buscar_clientes(1, 'perez', limite=10, pagina=3)
+    assert len(filas) == 10 and hay_mas is True
+    _, params = cursor.consultas[0]
+    assert params['filas'] == 11 and params['offset'] == 20
+
+    cursor.filas = [{'id': 1}]
+    assert buscar_clientes(1, 'perez', limite=1000, pagina=0) == ([{'id': 1}], False)
+    _, params = cursor.consultas[1]
+    assert params['filas'] == clientes_busqueda.LIMITE_MAXIMO + 1 and params['offset'] == 0
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests del publicador de eventos de jobs (src/jobs.py, EventosJob): inserción
+en lote por su propio hilo, vaciado por tiempo y cierre. Sin DB: el cursor es
+un doble que guarda los lotes.
+
+    python -m pytest tests_y_pruebas/test_jobs_eventos.py -q
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from src import jobs
+from src.jobs import EventosJob
+
+
+class _Cursor:
+    def __init__(self):
+        self.lotes = []
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def executemany(self, sql, filas):
+        self.liberar.wait(5)
+        self.lotes.append([tipo for _, _, tipo, _ in filas])
+
+
+@pytest.fixture
+def cursor(monkeypatch):
+    doble = _Cursor()
+
+    @contextmanager
+    def get_cursor(estudio_id=None):
+        yield doble
+
+    monkeypatch.setattr(jobs, 'get_cursor', get_cursor)
+    monkeypatch.setattr(jobs, 'EVENTOS_INTERVALO_S', 0.1)
+    return doble
+
+
+def _esperar(condicion, timeout=2.0):
+    limite = time.monotonic() + timeout
+    while not condicion():
+        assert time.monotonic() < limite, 'timeout'
+        time.sleep(0.005)
+
+
+def test_primer_evento_sale_enseguida_y_el_resto_por_tiempo(cursor):
+    eventos = EventosJob(1, 10)
+    eventos('stream', {'n': 1})
+    _esperar(lambda: cursor.lotes == [['stream']])
+
+    # Sin más eventos detrás, los pendientes salen solos pasado el intervalo
+    eventos('comprobante', {'n': 2})
+    eventos('comprobante', {'n': 3})
+    _esperar(lambda: len(cursor.lotes) == 2)
+    assert cursor.lotes[1] == ['comprobante', 'comprobante']
+    eventos.cerrar()
+
+
+def test_insert_lento_no_bloquea_a_quien_publica(cursor):
+    eventos = EventosJob(1, 10)
+    cursor.liberar.clear()
+    eventos('stream', {})
+    inicio = time.monotonic()
+    for i in range(200):
+        eventos('comprobante', {'n': i})
+    assert time.monotonic() - inicio < 1
+    cursor.liberar.set()
+    eventos.cerrar()
+    assert sum(len(lote) for lote in cursor.lotes) == 201
+
+
+def test_cerrar_vacia_el_buffer_y_ignora_lo_posterior(cursor, monkeypatch):
+    monkeypatch.setattr(jobs, 'EVENTOS_INTERVALO_S', 60)
+    eventos = EventosJob(1, 10)
+    eventos('stream', {})
+    _esperar(lambda: len(cursor.lotes) == 1)
+    eventos('comprobante', {})
+    eventos.cerrar()
+    assert cursor.lotes == [['stream'], ['comprobante']]
+    eventos('comprobante', {})
+    assert cursor.lotes == [['stream'], ['comprobante']]
+
+
+def test_cerrar_sin_eventos(cursor):
+    EventosJob(1, 10).cerrar()
+    assert cursor.lotes == []
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests del cache de sesiones validadas (src/auth/session_cache.py): vigencia,
+avisos de invalidación y el contador de generación. Sin DB: el listener no
+arranca y los avisos se aplican a mano.
+
+    python -m pytest tests_y_pruebas/test_session_cache.py -q
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('DATABASE_URL', 'postgresql://localhost/test')
+os.environ.setdefault('SECRET_KEY', 'test')
+
+from src.auth import session_cache as cache
+from src.config import Config
+
+
+@pytest.fixture(autouse=True)
+def escuchando(monkeypatch):
+    monkeypatch.setattr(cache, 'iniciar_escucha_sesiones', lambda: None)
+    monkeypatch.setattr(Config, 'SESSION_CACHE_SECONDS', 60)
+    cache._marcar_escuchando(True)
+    yield
+    cache._marcar_escuchando(False)
+
+
+def _vence(horas=1):
+    return datetime.now(timezone.utc) + timedelta(hours=horas)
+
+
+def _validar(token, user, expires_at=None):
+    """Lo que hace service.validate_session al no encontrar la sesión en cache."""
+    generacion = cache.generacion_actual()
+    cache.guardar_sesion(token, user, expires_at or _vence(), generacion)
+
+
+def test_guardar_y_leer_devuelve_copia():
+    _validar('tok', {'id': 1, 'estudio_id': 10})
+    user = cache.sesion_cacheada('tok')
+    assert user == {'id': 1, 'estudio_id': 10}
+    user['id'] = 99
+    assert cache.sesion_cacheada('tok')['id'] == 1
+    assert cache.sesion_cacheada('otro') is None
+
+
+def test_aviso_durante_la_validacion_no_se_guarda():
+    generacion = cache.generacion_actual()
+    # Otro thread recibe el aviso mientras esta validación consulta la DB
+    cache._aplicar_aviso('usuario:1')
+    cache.guardar_sesion('tok', {'id': 1, 'estudio_id': 10}, _vence(), generacion)
+    assert cache.sesion_cacheada('tok') is None
+
+
+def test_sin_listener_no_se_usa_ni_se_guarda():
+    _validar('tok', {'id': 1, 'estudio_id': 10})
+    generacion = cache.generacion_actual()
+    cache._marcar_escuchando(False)
+    assert cache.sesion_cacheada('tok') is None
+    cache.guardar_sesion('tok', {'id': 1, 'estudio_id': 10}, _vence(), generacion)
+
+    # Al reconectar el cache arranca vacío y una validación previa no entra
+    cache._marcar_escuchando(True)
+    cache.guardar_sesion('tok', {'id': 1, 'estudio_id': 10}, _vence(), generacion)
+    assert cache.sesion_cacheada('tok') is None
+
+
+def test_avisos_descartan_solo_lo_afectado():
+    _validar('a', {'id': 1, 'estudio_id': 10})
+    _validar('b', {'id': 2, 'estudio_id': 10})
+    _validar('c', {'id': 3, 'estudio_id': 20})
+    _validar('d', {'id': 4, 'estudio_id': 30})
+
+    cache.invalidar_sesion('a')
+    assert cache.sesion_cacheada('a') is None
+    assert cache.sesion_cacheada('b') is not None
+
+    cache._aplicar_aviso('usuario:2')
+    assert cache.sesion_cacheada('b') is None
+    assert cache.sesion_cacheada('c') is not None
+
+    cache._aplicar_aviso('estudio:20')
+    assert cache.sesion_cacheada('c') is None
+    assert cache.sesion_cacheada('d') is not None
+
+    cache._aplicar_aviso('desconocido:1')
+    assert cache.sesion_cacheada('d') is None
+
+
+def test_aviso_de_sesion_usa_el_hash_del_trigger():
+    import hashlib
+    _validar('tok', {'id': 1, 'estudio_id': 10})
+    cache._aplicar_aviso('sesion:' + hashlib.sha256(b'tok').hexdigest())
+    assert cache.sesion_cacheada('tok') is None
+
+
+def test_vencimientos(monkeypatch):
+    # expires_at de la sesión ya pasado
+    _validar('tok', {'id': 1, 'estudio_id': 10}, expires_at=_vence(-1))
+    assert cache.sesion_cacheada('tok') is None
+
+    # SESSION_CACHE_SECONDS cumplido aunque la sesión siga vigente
+    monkeypatch.setattr(Config, 'SESSION_CACHE_SECONDS', 0)
+    _validar('tok', {'id': 1, 'estudio_id': 10})
+    assert cache.sesion_cacheada('tok') is None
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests del parseo de FECompConsultar (WSFEv1Client._parsear_comprobante) contra
+el schema real de AFIP, con las respuestas del simulador (simulador_afip.py)
+armadas en proceso: sin HTTP ni WSAA.
+
+    python -m pytest tests_y_pruebas/test_wsfev1_consultar.py -q
+"""
+
+import os
+import sys
+
+import pytest
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(AQUI, '..'))
+sys.path.insert(0, AQUI)
+
+from simulador_afip import SimuladorAFIP
+from src.afip_resiliencia import Rechazo
+from wsfev1_client import WSFEv1Client
+
+CUIT = '30222222223'
+
+
+@pytest.fixture
+def sim():
+    return SimuladorAFIP({'cuits': [CUIT], 'puntos_venta': [1], 'tipos': {'wsfe': [1, 3]},
+                          'cantidad_min': 5, 'cantidad_max': 5, 'prob_stream_vacio': 0.0})
+
+
+@pytest.fixture
+def cliente(sim):
+    cliente = WSFEv1Client('cert', 'key', 'homo', solicitante_cuit=CUIT)
+    cliente.autenticar_wsaa = lambda cuit=None: ('token', 'sign')
+
+    def _wsfe_request(method, params, token, sign, cuit):
+        campos = {'Cuit': cuit, 'PtoVta': params['punto_venta'],
+                  'CbteTipo': params['tipo_comprobante'], 'CbteNro': params.get('numero', 0)}
+        return getattr(sim.operaciones, method)({k: str(v) for k, v in campos.items()}, None)
+
+    cliente._wsfe_request = _wsfe_request
+    return cliente
+
+
+def test_campos_del_schema_real(sim, cliente):
+    comp = cliente.consultar_comprobante(CUIT, 1, 1, 4)
+    esperado = sim.dataset.comprobante('wsfe', CUIT, 1, 1, 4)
+    assert comp['CbteNro'] == comp['numero'] == '4'
+    assert comp['CAE'] == comp['cae'] == esperado['cae']
+    assert comp['CAEFchVto'] == esperado['vto_cae'].strftime('%Y%m%d')
+    assert comp['CbteFch'] == esperado['fecha'].strftime('%Y%m%d')
+    assert comp['PtoVta'] == '1' and comp['CbteTipo'] == '1'
+    assert comp['IvaDetalle'] and comp['IvaDetalle'][0]['Id'] == '5'
+
+
+def test_comprobante_asociado_no_pisa_los_campos(sim, cliente):
+    # La nota de crédito trae en CbtesAsoc el PtoVta/CbteFch de la factura
+    comp = cliente.consultar_comprobante(CUIT, 3, 1, 2)
+    esperado = sim.dataset.comprobante('wsfe', CUIT, 1, 3, 2)
+    assert comp['CbteFch'] == esperado['fecha'].strftime('%Y%m%d')
+    assert comp['CbteTipo'] == '3'
+
+
+def test_inexistente_es_none(cliente):
+    assert cliente.consultar_comprobante(CUIT, 1, 1, 99) is None
+
+
+def test_error_distinto_de_602_falla(cliente):
+    with pytest.raises(Rechazo, match='600'):
+        cliente.consultar_comprobante('20111111112', 1, 1, 1)
+
+
+def test_respuesta_sin_resultget_falla(cliente):
+    xml = ('<FECompConsultarResponse><FECompConsultarResult><CbteNro>4</CbteNro><CAE>1</CAE>'
+           '</FECompConsultarResult></FECompConsultarResponse>')
+    with pytest.raises(Rechazo):
+        cliente._parsear_comprobante(xml)
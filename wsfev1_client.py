@@ -14,26 +14,143 @@ import ssl
 import time
 import html
 import base64
-import tempfile
+import threading
+import weakref
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime, timedelta
-import requests
-import subprocess
 import urllib3
-from requests.adapters import HTTPAdapter
+
+from src.afip_resiliencia import CircuitoAbierto, ErrorAFIP, Rechazo
 
 # Configuración SSL más permisiva para AFIP
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Tope de requests WSFEv1 simultáneos por CUIT consultado (FECompConsultar, pero
+# también FECompUltimoAutorizado y los sondeos de la búsqueda por fecha).
+# AFIP throttlea si se le pegan demasiadas consultas en paralelo para el mismo CUIT.
+# El semáforo es por proceso y lo comparten todas las instancias del cliente;
+# se toma solo en _wsfe_request (no es reentrante).
+MAX_CONCURRENCIA_POR_CUIT = int(os.getenv('AFIP_MAX_CONCURRENCIA', '4'))
+
+# Streams (tipo, PV) que se escanean en paralelo (FECompUltimoAutorizado + búsqueda por fecha).
+# Sus requests pasan igual por el semáforo del CUIT. El ritmo total de requests lo acota el token bucket por solicitante (src/afip_limites.py).
+MAX_STREAMS_CONCURRENTES = int(os.getenv('AFIP_STREAMS_CONCURRENTES', '6'))
+
+_semaforos_cuit = {}
+_semaforos_lock = threading.Lock()
+
+
+def _semaforo_cuit(cuit):
+    """Semáforo compartido que limita la concurrencia por CUIT."""
+    with _semaforos_lock:
+        if cuit not in _semaforos_cuit:
+            _semaforos_cuit[cuit] = threading.BoundedSemaphore(MAX_CONCURRENCIA_POR_CUIT)
+        return _semaforos_cuit[cuit]
+
+
+def _notificar(al_avanzar, evento, datos):
+    """Llamar al callback de avance sin dejar que un error corte la consulta."""
+    try:
+        al_avanzar(evento, datos)
+    except Exception as e:
+        print(f"[WSFEv1] error notificando avance ({evento}): {e}", flush=True)
+
+
+def _fecha_ordinal(fecha):
+    """'YYYYMMDD' -> ordinal de día (date.toordinal). None si está vacía o es inválida."""
+    if not fecha:
+        return None
+    try:
+        return datetime.strptime(str(fecha).replace('-', '')[:8], '%Y%m%d').toordinal()
+    except ValueError:
+        return None
+
+
+def _busqueda_desde(ultimo, objetivo, sondeos, faltante_es_mayor):
+    """Primer número en [1, ultimo] cuya fecha (ordinal) es >= objetivo; ultimo+1 si no hay.
+
+    Generador sin I/O (lo usan el cliente sync y el async): hace yield del
+    número a sondear, recibe su ordinal con send() (quien sondea lo guarda
+    en `sondeos`) y retorna el resultado en StopIteration.value.
+
+    Búsqueda por interpolación: los números crecen con la fecha, así que la
+    posición se estima proporcionalmente entre las fechas de los extremos.
+    Después de cada interpolación se sondea un punto a ~1 día de distancia
+    del otro lado del objetivo para acotar el intervalo a ese día.
+    Salvaguarda: si un ciclo de interpolación no reduce el intervalo a la
+    mitad, el resto de la búsqueda es bisección (días con muchos comprobantes
+    rompen la proporcionalidad; alternar costaría ~3 sondeos por mitad).
+
+    faltante_es_mayor: cómo tratar un comprobante sin fecha legible.
+    """
+    # Acotar con lo ya sondeado (la búsqueda anterior deja puntos útiles)
+    lo, hi = 0, ultimo + 1
+    for num, orden in sondeos.items():
+        if orden is None or num > ultimo:
+            continue
+        if orden < objetivo:
+            lo = max(lo, num)
+        else:
+            hi = min(hi, num)
+
+    interpolar = True
+    forzado = None      # sondeo de acotación tras una interpolación
+    ancho_ciclo = hi - lo
+    while hi - lo > 1:
+        orden_lo = sondeos.get(lo) if lo >= 1 else None
+        orden_hi = sondeos.get(hi) if hi <= ultimo else None
+        salto = None
+        extremo = False     # sondeo de un extremo: no es un ciclo de la búsqueda
+
+        if lo == 0 and 1 not in sondeos:
+            mid, extremo = 1, True
+        elif hi == ultimo + 1 and ultimo not in sondeos:
+            mid, extremo = ultimo, True
+        elif forzado is not None and lo < forzado < hi:
+            mid = forzado
+        elif interpolar and orden_lo is not None and orden_hi is not None and orden_hi > orden_lo:
+            ancho_ciclo = hi - lo
+            tasa = (hi - lo) / (orden_hi - orden_lo)    # comprobantes por día
+            # Cada extremo se ubica a mitad de su día: el objetivo es el borde del día
+            mid = lo + int((objetivo - orden_lo - 0.5) * tasa)
+            mid = min(max(mid, lo + 1), hi - 1)
+            salto = max(1, int(tasa))
+        else:
+            ancho_ciclo = hi - lo
+            mid = (lo + hi) // 2
+        forzado = None
+
+        orden = yield mid
+        if (faltante_es_mayor if orden is None else orden >= objetivo):
+            hi = mid
+            if salto:
+                forzado = mid - salto
+        else:
+            lo = mid
+            if salto:
+                forzado = mid + salto
+
+        # Fin de ciclo (interpolación + acotación, o bisección): si no redujo
+        # el intervalo a la mitad, de acá en adelante bisección
+        if extremo:
+            ancho_ciclo = hi - lo
+        elif salto is None and interpolar:
+            interpolar = (hi - lo) * 2 <= ancho_ciclo
+
+    return hi
+
 
 class WSFEv1Client:
     """Cliente para WSFEv1 (Factura Electrónica tradicional)"""
 
-    def __init__(self, cert_path, key_path, ambiente='prod'):
+    def __init__(self, cert_path, key_path, ambiente='prod', solicitante_cuit=None):
         self.cert_path = cert_path
         self.key_path = key_path
         self.ambiente = ambiente
+        # CUIT del certificado (clave del cache de TA); None = se lee del certificado
+        self.solicitante_cuit = solicitante_cuit
 
         # URLs de AFIP
         self.urls = {
@@ -47,12 +164,12 @@ class WSFEv1Client:
             }
         }
 
-        # Cache para tokens
-        self._token_cache = {}
-
-        # Configurar sesión con SSL permisivo (SECLEVEL=1 para AFIP)
-        from src.ssl_afip_config import crear_session_afip
-        self._session = crear_session_afip()
+        # Transporte compartido del proceso: keep-alive + SSL permisivo (src/afip_transport.py).
+        # AFIP_URL_BASE redirige las URLs al simulador local.
+        from src.afip_transport import sesion_afip, url_afip
+        self.urls = {amb: {svc: url_afip(url) for svc, url in urls.items()}
+                     for amb, urls in self.urls.items()}
+        self._session = sesion_afip()
 
         # Tipos de comprobante WSFEv1
         self.tipos_comprobante = {
@@ -77,25 +194,6 @@ class WSFEv1Client:
 
         print(f"Cliente WSFEv1 inicializado - Ambiente: {ambiente.upper()}")
 
-    def _detectar_openssl(self):
-        """Detectar OpenSSL disponible"""
-        paths = [
-            'openssl',
-            'C:\\Program Files\\Git\\usr\\bin\\openssl.exe',
-            'C:\\Program Files\\OpenSSL-Win64\\bin\\openssl.exe'
-        ]
-
-        for path in paths:
-            try:
-                result = subprocess.run([path, 'version'],
-                                        capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    return path
-            except Exception:
-                continue
-
-        raise Exception("OpenSSL no encontrado")
-
     def _crear_tra(self):
         """Crear TRA para WSFEv1"""
         now = datetime.now()
@@ -118,48 +216,32 @@ class WSFEv1Client:
 </loginTicketRequest>"""
 
     def _firmar_tra(self, tra_xml):
-        """Firmar TRA con OpenSSL"""
-        openssl_cmd = self._detectar_openssl()
-
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.xml', delete=False) as tmp_xml:
-            tmp_xml.write(tra_xml)
-            tra_file = tmp_xml.name
+        """Firmar TRA (CMS en proceso, ver src/cms_signer.py)"""
+        from src.cms_signer import firmar_cms
+        return firmar_cms(tra_xml, self.cert_path, self.key_path)
 
-        cms_file = tempfile.mktemp(suffix='.cms')
-
-        try:
-            cmd = [
-                openssl_cmd, 'smime', '-sign',
-                '-in', tra_file,
-                '-out', cms_file,
-                '-outform', 'DER',
-                '-signer', self.cert_path,
-                '-inkey', self.key_path,
-                '-nodetach'
-            ]
-
-            subprocess.run(cmd, capture_output=True, check=True)
-
-            with open(cms_file, 'rb') as f:
-                return f.read()
-
-        finally:
-            if os.path.exists(tra_file):
-                os.unlink(tra_file)
-            if os.path.exists(cms_file):
-                os.unlink(cms_file)
-
-    def autenticar_wsaa(self, cuit_representada):
-        """Autenticar con WSAA para WSFEv1"""
-        cuit_clean = str(cuit_representada).replace('-', '').replace(' ', '')
-
-        # Verificar cache
-        cache_key = f"wsfe_{cuit_clean}_{self.ambiente}"
-        if cache_key in self._token_cache:
-            cached = self._token_cache[cache_key]
-            if cached['expires'] > datetime.now():
-                return cached['token'], cached['sign']
+    def autenticar_wsaa(self, cuit_representada=None):
+        """Autenticar con WSAA para WSFEv1.
 
+        El TA es del certificado, no del CUIT consultado: se comparte entre
+        instancias, workers y reinicios (src/wsaa_ticket_cache.py).
+        """
+        from src.wsaa_ticket_cache import obtener_ticket
+        return obtener_ticket(self.cert_path, 'wsfe', self.ambiente,
+                              self._login_wsaa, self.solicitante_cuit)
+
+    def _login_wsaa(self):
+        """loginCms contra WSAA. Retorna {'token', 'sign', 'expirationTime'}."""
+        soap_request, headers = self._sobre_login()
+
+        # Circuito + reintentos del transporte (src/afip_transport.py)
+        from src.afip_transport import post_afip
+        respuesta = post_afip('wsaa', self.urls[self.ambiente]['wsaa'], soap_request, headers,
+                              solicitante=self._solicitante())
+        return self._credenciales_login(respuesta)
+
+    def _sobre_login(self):
+        """(soap, headers) del loginCms con el TRA ya firmado."""
         # Crear y firmar TRA
         tra_xml = self._crear_tra()
         signed_tra = self._firmar_tra(tra_xml)
@@ -179,18 +261,12 @@ class WSFEv1Client:
             'Content-Type': 'text/xml; charset=utf-8',
             'SOAPAction': ''
         }
+        return soap_request, headers
 
-        response = self._session.post(
-            self.urls[self.ambiente]['wsaa'],
-            data=soap_request,
-            headers=headers,
-            timeout=30
-        )
-
-        response.raise_for_status()
-
+    def _credenciales_login(self, respuesta):
+        """Respuesta de loginCms -> {'token', 'sign', 'expirationTime'}."""
         # Parsear respuesta
-        root = ET.fromstring(response.text)
+        root = ET.fromstring(respuesta)
         login_return = None
 
         for elem in root.iter():
@@ -207,24 +283,27 @@ class WSFEv1Client:
 
         credentials = {}
         for child in login_root.iter():
-            if child.tag in ['token', 'sign']:
+            if child.tag in ['token', 'sign', 'expirationTime']:
                 credentials[child.tag] = child.text
 
         if 'token' not in credentials or 'sign' not in credentials:
             raise Exception("Token/Sign no encontrados")
 
-        # Cachear
-        expires = datetime.now() + timedelta(hours=11, minutes=50)
-        self._token_cache[cache_key] = {
-            'token': credentials['token'],
-            'sign': credentials['sign'],
-            'expires': expires
-        }
-
-        return credentials['token'], credentials['sign']
+        return credentials
 
     def _wsfe_request(self, method, params, token, sign, cuit):
         """Realizar request a WSFEv1"""
+        soap_request, headers = self._sobre_wsfe(method, params, token, sign, cuit)
+
+        # Presupuesto por solicitante, circuito y reintentos (src/afip_transport.py);
+        # tope de concurrencia por CUIT para toda llamada, sondeos incluidos
+        from src.afip_transport import post_afip
+        with _semaforo_cuit(str(cuit)):
+            return post_afip('wsfe', self.urls[self.ambiente]['wsfe'], soap_request, headers,
+                             solicitante=self._solicitante())
+
+    def _sobre_wsfe(self, method, params, token, sign, cuit):
+        """(soap, headers) de un método WSFEv1"""
 
         # Construir parámetros Auth
         auth_params = f"""
@@ -260,7 +339,7 @@ class WSFEv1Client:
                 {auth_params}
             </{method}>"""
 
-        elif method == 'FEParamGetTiposCbte':
+        elif method in ('FEParamGetTiposCbte', 'FEParamGetTiposMonedas', 'FEParamGetTiposIva'):
             soap_body = f"""
             <{method} xmlns="http://ar.gov.afip.dif.FEV1/">
                 {auth_params}
@@ -280,76 +359,105 @@ class WSFEv1Client:
             'Content-Type': 'text/xml; charset=utf-8',
             'SOAPAction': f'"http://ar.gov.afip.dif.FEV1/{method}"'
         }
+        return soap_request, headers
 
-        response = self._session.post(
-            self.urls[self.ambiente]['wsfe'],
-            data=soap_request,
-            headers=headers,
-            timeout=30
-        )
-
-        response.raise_for_status()
-        return response.text
+    def _solicitante(self):
+        """CUIT del certificado (explícito o leído del certificado)."""
+        if not self.solicitante_cuit:
+            from src.wsaa_ticket_cache import solicitante_de_certificado
+            self.solicitante_cuit = solicitante_de_certificado(self.cert_path)
+        return self.solicitante_cuit
 
     def _fecha_comprobante(self, cuit, tipo, pv, num):
-        """Obtener solo la fecha de un comprobante (para búsqueda binaria)."""
+        """Obtener solo la fecha de un comprobante (para la búsqueda por fecha).
+
+        '' si no existe o no tiene fecha legible. Las fallas de AFIP (ErrorAFIP)
+        se propagan: tomarlas como "faltante" desviaría la búsqueda.
+        """
         try:
             comp = self.consultar_comprobante(cuit, tipo, pv, num)
             if comp:
                 return comp.get('CbteFch') or comp.get('fecha_emision') or ''
+        except ErrorAFIP:
+            raise
         except Exception:
             pass
         return ''
 
+    def _ordinal_comprobante(self, cuit, tipo, pv, num, sondeos):
+        """Fecha del comprobante como ordinal de día (None si no se pudo leer).
+
+        sondeos: cache {numero: ordinal} compartido por las búsquedas de un mismo rango.
+        """
+        if num not in sondeos:
+            sondeos[num] = _fecha_ordinal(self._fecha_comprobante(cuit, tipo, pv, num))
+        return sondeos[num]
+
+    def _primer_numero_desde(self, cuit, tipo, pv, ultimo, objetivo, sondeos, faltante_es_mayor):
+        """Primer número en [1, ultimo] cuya fecha (ordinal) es >= objetivo; ultimo+1 si no hay.
+
+        Ver _busqueda_desde; acá se sondea cada número que pide.
+        """
+        busqueda = _busqueda_desde(ultimo, objetivo, sondeos, faltante_es_mayor)
+        try:
+            mid = next(busqueda)
+            while True:
+                mid = busqueda.send(self._ordinal_comprobante(cuit, tipo, pv, mid, sondeos))
+        except StopIteration as fin:
+            return fin.value
+
     def buscar_rango_por_fecha(self, cuit, tipo, pv, ultimo, fecha_desde, fecha_hasta):
-        """Búsqueda binaria para encontrar el rango de números que caen en [fecha_desde, fecha_hasta].
+        """Encontrar el rango de números que caen en [fecha_desde, fecha_hasta].
 
         Retorna (num_inicio, num_fin) o None si no hay comprobantes en el rango.
-        Usa ~24 llamadas SOAP en vez de recorrer linealmente miles.
+        Búsqueda por interpolación con cache de sondeos compartido entre los dos
+        extremos: en PVs grandes son unas pocas llamadas SOAP en vez de ~2·log2(N).
         """
         cuit = str(cuit).replace('-', '').replace(' ', '')
+        desde = _fecha_ordinal(fecha_desde)
+        hasta = _fecha_ordinal(fecha_hasta)
+        if desde is None or hasta is None or not ultimo or ultimo <= 0:
+            return None
 
-        # Buscar num_fin: último comprobante con fecha <= fecha_hasta
-        lo, hi = 1, ultimo
-        num_fin = 0
-        while lo <= hi:
-            mid = (lo + hi) // 2
-            f = self._fecha_comprobante(cuit, tipo, pv, mid)
-            if not f:
-                hi = mid - 1
-                continue
-            if f <= fecha_hasta:
-                num_fin = mid
-                lo = mid + 1
-            else:
-                hi = mid - 1
-
-        if num_fin == 0:
+        sondeos = {}
+
+        # num_fin: último comprobante con fecha <= fecha_hasta
+        num_fin = self._primer_numero_desde(cuit, tipo, pv, ultimo, hasta + 1, sondeos,
+                                            faltante_es_mayor=True) - 1
+        if num_fin < 1:
             return None
 
-        # Buscar num_inicio: primer comprobante con fecha >= fecha_desde
-        lo, hi = 1, num_fin
-        num_inicio = None
-        while lo <= hi:
-            mid = (lo + hi) // 2
-            f = self._fecha_comprobante(cuit, tipo, pv, mid)
-            if not f:
-                lo = mid + 1
-                continue
-            if f >= fecha_desde:
-                num_inicio = mid
-                hi = mid - 1
-            else:
-                lo = mid + 1
-
-        if num_inicio is None:
+        # num_inicio: primer comprobante con fecha >= fecha_desde (reusa los sondeos)
+        num_inicio = self._primer_numero_desde(cuit, tipo, pv, num_fin, desde, sondeos,
+                                               faltante_es_mayor=False)
+        if num_inicio > num_fin:
             return None
 
+        print(f"[WSFEv1] tipo={tipo} pv={pv} rango #{num_inicio}-#{num_fin} "
+              f"({len(sondeos)} consultas de fecha)", flush=True)
         return (num_inicio, num_fin)
 
     def obtener_ultimo_comprobante(self, cuit, tipo_comprobante, punto_venta):
-        """Obtener el último número de comprobante autorizado"""
+        """Obtener el último número de comprobante autorizado (ErrorAFIP si AFIP falló).
+
+        Los streams (tipo, PV) que ya dieron 0 hace poco se contestan desde la
+        cache negativa (src/afip_streams_vacios.py) sin preguntar a AFIP; pasado
+        AFIP_VACIOS_REFRESCO_MIN se re-verifican en background.
+        """
+        from src import afip_streams_vacios as vacios
+
         cuit = str(cuit).replace('-', '').replace(' ', '')
+        estado = vacios.consultar(cuit, self.ambiente, tipo_comprobante, punto_venta)
+        if estado is not None:
+            if estado == vacios.REFRESCAR:
+                vacios.refrescar_en_background(
+                    cuit, self.ambiente, tipo_comprobante, punto_venta,
+                    lambda: self._ultimo_desde_afip(cuit, tipo_comprobante, punto_venta))
+            return 0
+        return self._ultimo_desde_afip(cuit, tipo_comprobante, punto_venta)
+
+    def _ultimo_desde_afip(self, cuit, tipo_comprobante, punto_venta):
+        """FECompUltimoAutorizado contra AFIP; actualiza la cache negativa."""
         try:
             token, sign = self.autenticar_wsaa(cuit)
 
@@ -366,22 +474,34 @@ class WSFEv1Client:
                 cuit
             )
 
-            # Parsear respuesta
-            root = ET.fromstring(xml_response)
-
-            # Buscar el número
-            for elem in root.iter():
-                if 'CbteNro' in elem.tag:
-                    return int(elem.text) if elem.text else 0
+            ultimo = self._parsear_ultimo(xml_response)
+            if ultimo is None:
+                return 0        # sin CbteNro no se sabe si está vacío: no se cachea
 
-            return 0
+            from src.afip_streams_vacios import registrar
+            registrar(cuit, self.ambiente, tipo_comprobante, punto_venta, ultimo)
+            return ultimo
 
+        except ErrorAFIP:
+            raise
         except Exception as e:
             print(f"Error obteniendo ultimo comprobante: {str(e)}")
             return None
 
+    @staticmethod
+    def _parsear_ultimo(xml_response):
+        """Respuesta de FECompUltimoAutorizado -> número (None si no trae CbteNro)."""
+        # Corta en el primer CbteNro
+        from src.afip_xml import primer_texto
+        nro = primer_texto(xml_response, 'CbteNro')
+        return int(nro) if nro is not None else None
+
     def consultar_comprobante(self, cuit, tipo_comprobante, punto_venta, numero):
-        """Consultar un comprobante específico"""
+        """Consultar un comprobante específico.
+
+        None si no existe (602). Las fallas de AFIP levantan ErrorAFIP
+        (src/afip_resiliencia.py), ya reintentadas por el transporte.
+        """
         cuit = str(cuit).replace('-', '').replace(' ', '')
         try:
             token, sign = self.autenticar_wsaa(cuit)
@@ -400,93 +520,228 @@ class WSFEv1Client:
                 cuit
             )
 
-            # Parsear respuesta
-            root = ET.fromstring(xml_response)
+            return self._parsear_comprobante(xml_response)
 
-            # Namespace helper: extrae tag sin namespace
-            def _tag(elem):
-                t = elem.tag
-                return t.split('}')[-1] if '}' in t else t
+        except ErrorAFIP:
+            raise
+        except Exception as e:
+            print(f"Error consultando comprobante: {str(e)}")
+            return None
 
-            # ── Extraer campos escalares ─────────────────────────────
-            comprobante = {}
-            for elem in root.iter():
-                tag = _tag(elem)
-                if elem.text and elem.text.strip():
-                    comprobante[tag] = elem.text.strip()
+    def _parsear_comprobante(self, xml_response):
+        """Respuesta de FECompConsultar -> dict del comprobante (None si no existe).
 
-            if not comprobante or ('CbteNro' not in comprobante and 'Cbte' not in str(comprobante)):
+        Los campos salen de los hijos directos de ResultGet: el número viene en
+        CbteDesde/CbteHasta y el CAE en CodAutorizacion/FchVto. Una respuesta
+        sin ResultGet que no sea el 602 "no existe" levanta Rechazo.
+        """
+        # Escalares de ResultGet + alícuotas IVA + tributos en una pasada. Solo
+        # los hijos directos: CbtesAsoc trae PtoVta/CbteFch de otro comprobante.
+        from src.afip_xml import extraer
+        _, listas = extraer(xml_response, grupos=('ResultGet', 'AlicIva', 'Tributo', 'Err'))
+
+        if not listas['ResultGet']:
+            errores = listas['Err']
+            if errores and all(e.get('Code') == '602' for e in errores):
                 return None
+            detalle = '; '.join(f"{e.get('Code')} {e.get('Msg')}" for e in errores) or 'respuesta sin ResultGet'
+            raise Rechazo('wsfe', f"FECompConsultar: {detalle}")
+
+        comprobante = listas['ResultGet'][0]
+        if not comprobante.get('CbteDesde'):
+            raise Rechazo('wsfe', "FECompConsultar: ResultGet sin CbteDesde")
+
+        iva_array = listas['AlicIva']
+        tributos_array = listas['Tributo']
+        numero = comprobante['CbteDesde']
+        cae = comprobante.get('CodAutorizacion') or None
+        vto_cae = comprobante.get('FchVto') or None
+
+        resultado = {
+            # Datos básicos
+            'CbteTipo': comprobante.get('CbteTipo'),
+            'CbteNro': numero,
+            'PtoVta': comprobante.get('PtoVta'),
+            'CbteFch': comprobante.get('CbteFch'),
+            'CAE': cae,
+            'CAEFchVto': vto_cae,
+            'EmisionTipo': comprobante.get('EmisionTipo'),
+            'Resultado': comprobante.get('Resultado'),
+
+            # Importes totales
+            'ImpTotal': comprobante.get('ImpTotal'),
+            'ImpNeto': comprobante.get('ImpNeto'),
+            'ImpIVA': comprobante.get('ImpIVA'),
+            'ImpTrib': comprobante.get('ImpTrib'),
+            'ImpOpEx': comprobante.get('ImpOpEx'),
+
+            # Desglose impositivo
+            'IvaDetalle': iva_array,       # [{Id, BaseImp, Importe}, ...]
+            'TributosDetalle': tributos_array,  # [{Id, Desc, BaseImp, Alic, Importe}, ...]
+
+            # Datos del receptor
+            'DocTipo': comprobante.get('DocTipo'),
+            'DocNro': comprobante.get('DocNro'),
+            'Concepto': comprobante.get('Concepto'),
+
+            # Moneda
+            'MonId': comprobante.get('MonId'),
+            'MonCotiz': comprobante.get('MonCotiz'),
+
+            # Aliases para la UI
+            'fecha_emision': comprobante.get('CbteFch'),
+            'cae': cae,
+            'fecha_vto_cae': vto_cae,
+            'importe_total': comprobante.get('ImpTotal'),
+            'punto_venta': comprobante.get('PtoVta'),
+            'numero': numero,
+            'receptor_tipo_doc': comprobante.get('DocTipo'),
+            'receptor_nro_doc': comprobante.get('DocNro'),
+            'concepto': comprobante.get('Concepto'),
+            'moneda': comprobante.get('MonId'),
+            'cotizacion': comprobante.get('MonCotiz'),
+        }
 
-            # ── Extraer array IVA (alícuotas) ────────────────────────
-            iva_array = []
-            for alic in root.iter():
-                if _tag(alic) == 'AlicIva':
-                    item = {}
-                    for child in alic:
-                        item[_tag(child)] = (child.text or '').strip()
-                    if item:
-                        iva_array.append(item)
-
-            # ── Extraer array Tributos (IIBB, municipal, etc.) ───────
-            tributos_array = []
-            for trib in root.iter():
-                if _tag(trib) == 'Tributo':
-                    item = {}
-                    for child in trib:
-                        item[_tag(child)] = (child.text or '').strip()
-                    if item:
-                        tributos_array.append(item)
-
-            resultado = {
-                # Datos básicos
-                'CbteTipo': comprobante.get('CbteTipo'),
-                'CbteNro': comprobante.get('CbteNro'),
-                'PtoVta': comprobante.get('PtoVta'),
-                'CbteFch': comprobante.get('CbteFch'),
-                'CAE': comprobante.get('CAE'),
-                'CAEFchVto': comprobante.get('CAEFchVto'),
-
-                # Importes totales
-                'ImpTotal': comprobante.get('ImpTotal'),
-                'ImpNeto': comprobante.get('ImpNeto'),
-                'ImpIVA': comprobante.get('ImpIVA'),
-                'ImpTrib': comprobante.get('ImpTrib'),
-                'ImpOpEx': comprobante.get('ImpOpEx'),
-
-                # Desglose impositivo
-                'IvaDetalle': iva_array,       # [{Id, BaseImp, Importe}, ...]
-                'TributosDetalle': tributos_array,  # [{Id, Desc, BaseImp, Alic, Importe}, ...]
-
-                # Datos del receptor
-                'DocTipo': comprobante.get('DocTipo'),
-                'DocNro': comprobante.get('DocNro'),
-                'Concepto': comprobante.get('Concepto'),
-
-                # Moneda
-                'MonId': comprobante.get('MonId'),
-                'MonCotiz': comprobante.get('MonCotiz'),
-
-                # Aliases para la UI
-                'fecha_emision': comprobante.get('CbteFch'),
-                'cae': comprobante.get('CAE'),
-                'fecha_vto_cae': comprobante.get('CAEFchVto'),
-                'importe_total': comprobante.get('ImpTotal'),
-                'punto_venta': comprobante.get('PtoVta'),
-                'numero': comprobante.get('CbteNro'),
-                'receptor_tipo_doc': comprobante.get('DocTipo'),
-                'receptor_nro_doc': comprobante.get('DocNro'),
-                'concepto': comprobante.get('Concepto'),
-                'moneda': comprobante.get('MonId'),
-                'cotizacion': comprobante.get('MonCotiz'),
-            }
+        return resultado
 
-            return resultado
+    def consultar_comprobantes_lote(self, cuit, claves, max_concurrencia=None, al_avanzar=None):
+        """Consultar muchos comprobantes en paralelo (fan-out de FECompConsultar).
 
-        except Exception as e:
-            print(f"Error consultando comprobante: {str(e)}")
+        Args:
+            claves: lista de tuplas (tipo_comprobante, punto_venta, numero)
+            max_concurrencia: hilos para este lote (default y tope: AFIP_MAX_CONCURRENCIA).
+                El tope por CUIT se respeta aunque haya varios lotes en paralelo.
+            al_avanzar: callable(evento, datos) opcional; recibe 'comprobante'
+                apenas llega cada uno (ver consultar_streams).
+
+        Retorna una lista del mismo largo y orden que `claves`, con el dict del
+        comprobante o None si no existe / falló la consulta.
+        """
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        claves = list(claves)
+        if not claves:
+            return []
+
+        # Autenticar antes del fan-out: los hilos reutilizan el token cacheado
+        self.autenticar_wsaa(cuit)
+
+        hilos = min(max_concurrencia or MAX_CONCURRENCIA_POR_CUIT, MAX_CONCURRENCIA_POR_CUIT, len(claves))
+
+        def _consultar(clave):
+            comp = self._consultar_limitado(cuit, *clave)
+            if al_avanzar:
+                tipo, pv, num = clave
+                _notificar(al_avanzar, 'comprobante', {'tipo': tipo, 'pv': pv, 'numero': num, 'comp': comp})
+            return comp
+
+        if hilos <= 1:
+            return [_consultar(clave) for clave in claves]
+
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            return list(pool.map(_consultar, claves))
+
+    def _consultar_limitado(self, cuit, tipo, pv, num):
+        """consultar_comprobante para el fan-out (el tope por CUIT lo pone _wsfe_request).
+
+        None si no existe o si AFIP falló (el fan-out sigue con el resto).
+        """
+        try:
+            return self.consultar_comprobante(cuit, tipo, pv, num)
+        except ErrorAFIP as e:
+            if not isinstance(e, CircuitoAbierto):   # abierto: ya se avisó al abrirse
+                print(f"[WSFEv1] tipo={tipo} pv={pv} #{num}: {e}", flush=True)
+            return None
+
+    def _rango_stream(self, cuit, tipo, pv, fecha_desde=None, fecha_hasta=None, ultimos=50):
+        """Rango (num_inicio, num_fin) a traer de un stream (tipo, PV), o None si no hay nada.
+
+        Con fechas: búsqueda por fecha. Sin fechas: los últimos `ultimos`.
+        """
+        ultimo = self.obtener_ultimo_comprobante(cuit, tipo, pv)
+        if not ultimo or ultimo <= 0:
             return None
 
+        print(f"[WSFEv1] tipo={tipo} pv={pv} ultimo={ultimo}", flush=True)
+
+        if fecha_desde and fecha_hasta:
+            rango = self.buscar_rango_por_fecha(cuit, tipo, pv, ultimo, fecha_desde, fecha_hasta)
+            if not rango:
+                print(f"[WSFEv1] tipo={tipo} pv={pv} sin comprobantes en rango {fecha_desde}-{fecha_hasta}", flush=True)
+            return rango
+
+        return (max(1, ultimo - ultimos + 1), ultimo)
+
+    def consultar_streams(self, cuit, tipos, puntos_venta, fecha_desde=None, fecha_hasta=None, ultimos=50,
+                          al_avanzar=None):
+        """Escanear todos los streams (tipo, PV) en paralelo y traer sus comprobantes.
+
+        Cada stream resuelve su rango de forma independiente (hasta
+        AFIP_STREAMS_CONCURRENTES a la vez) y, apenas lo encuentra, encola el
+        detalle de sus números: no se espera a terminar de escanear todos los
+        streams para empezar a bajar comprobantes.
+
+        al_avanzar: callable(evento, datos) opcional, llamado desde los hilos:
+            'stream'      {'tipo', 'pv', 'cantidad'} al resolver el rango de un stream
+            'comprobante' {'tipo', 'pv', 'numero', 'comp'} al llegar cada detalle
+
+        Retorna lista de (tipo, pv, numero, comp) en orden tipo → PV → número
+        descendente (mismo orden que la enumeración secuencial). comp es None si
+        la consulta falló.
+        """
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        streams = [(tipo, pv) for tipo in tipos for pv in puntos_venta]
+        if not streams:
+            return []
+
+        # Autenticar antes de abrir los hilos: todos reutilizan el mismo TA
+        self.autenticar_wsaa(cuit)
+
+        detalles = {}
+        with ThreadPoolExecutor(max_workers=min(MAX_STREAMS_CONCURRENTES, len(streams))) as pool_streams, \
+                ThreadPoolExecutor(max_workers=MAX_CONCURRENCIA_POR_CUIT) as pool_detalle:
+            futuros = {
+                pool_streams.submit(self._rango_stream, cuit, tipo, pv, fecha_desde, fecha_hasta, ultimos): (tipo, pv)
+                for tipo, pv in streams
+            }
+            for futuro in as_completed(futuros):
+                tipo, pv = futuros[futuro]
+                try:
+                    rango = futuro.result()
+                except Exception as e:
+                    print(f"[WSFEv1] tipo={tipo} pv={pv} error escaneando stream: {e}", flush=True)
+                    continue
+                if al_avanzar:
+                    cantidad = rango[1] - rango[0] + 1 if rango else 0
+                    _notificar(al_avanzar, 'stream', {'tipo': tipo, 'pv': pv, 'cantidad': cantidad})
+                if not rango:
+                    continue
+                num_inicio, num_fin = rango
+                detalles[(tipo, pv)] = []
+                for num in range(num_fin, num_inicio - 1, -1):
+                    f = pool_detalle.submit(self._consultar_limitado, cuit, tipo, pv, num)
+                    if al_avanzar:
+                        f.add_done_callback(self._avisar_comprobante(al_avanzar, tipo, pv, num))
+                    detalles[(tipo, pv)].append((num, f))
+
+            resultados = []
+            for tipo, pv in streams:
+                for num, futuro in detalles.get((tipo, pv), []):
+                    try:
+                        comp = futuro.result()
+                    except Exception:
+                        comp = None
+                    resultados.append((tipo, pv, num, comp))
+
+        return resultados
+
+    @staticmethod
+    def _avisar_comprobante(al_avanzar, tipo, pv, num):
+        """Callback de future → evento 'comprobante' (comp None si falló)."""
+        def _aviso(futuro):
+            comp = None if futuro.exception() else futuro.result()
+            _notificar(al_avanzar, 'comprobante', {'tipo': tipo, 'pv': pv, 'numero': num, 'comp': comp})
+        return _aviso
+
     def buscar_comprobantes_rango(self, cuit, tipos_comprobante=None, puntos_venta=None, limite_por_tipo=50, fecha_desde=None, fecha_hasta=None):
         """Buscar comprobantes en un rango para encontrar los existentes.
 
@@ -553,68 +808,361 @@ class WSFEv1Client:
 
         return resultados
 
-    def obtener_puntos_venta(self, cuit):
-        """Obtener puntos de venta usando FEParamGetPtosVenta"""
-        cuit = str(cuit).replace('-', '').replace(' ', '')
-        try:
-            token, sign = self.autenticar_wsaa(cuit)
+    # ------------------------------------------------------------------
+    # Tablas de parámetros (cacheadas por solicitante/CUIT/ambiente,
+    # src/afip_parametros.py: cambian muy de vez en cuando)
+    # ------------------------------------------------------------------
 
-            xml_response = self._wsfe_request(
-                'FEParamGetPtosVenta',
-                {},
-                token,
-                sign,
-                cuit
-            )
+    TABLAS_PARAMETROS = {
+        'ptos_venta':    ('FEParamGetPtosVenta', 'PtoVenta'),
+        'tipos_cbte':    ('FEParamGetTiposCbte', 'CbteTipo'),
+        'monedas':       ('FEParamGetTiposMonedas', 'Moneda'),
+        'alicuotas_iva': ('FEParamGetTiposIva', 'IvaTipo'),
+    }
+
+    def parametros(self, cuit, tabla):
+        """Filas de una tabla de parámetros de WSFEv1, tal como las devuelve AFIP.
 
-            root = ET.fromstring(xml_response)
-            puntos_venta = []
+        ptos_venta:    [{'Nro', 'EmisionTipo', 'Bloqueado' ('S'/'N'), 'FchBaja'}, ...]
+        tipos_cbte, monedas, alicuotas_iva: [{'Id', 'Desc', 'FchDesde', 'FchHasta'}, ...]
 
-            for elem in root.iter():
-                tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                if tag == 'Nro' and elem.text and elem.text.isdigit():
-                    puntos_venta.append(int(elem.text))
+        Levanta excepción si AFIP no respondió bien (no se cachea).
+        """
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        from src.afip_parametros import obtener_parametros
+        return obtener_parametros(self._solicitante(), cuit, self.ambiente, tabla,
+                                  lambda: self._pedir_parametros(cuit, tabla))
+
+    def _pedir_parametros(self, cuit, tabla):
+        metodo, grupo = self.TABLAS_PARAMETROS[tabla]
+        token, sign = self.autenticar_wsaa(cuit)
+        xml_response = self._wsfe_request(metodo, {}, token, sign, cuit)
+        return self._parsear_parametros(tabla, xml_response)
+
+    def _parsear_parametros(self, tabla, xml_response):
+        metodo, grupo = self.TABLAS_PARAMETROS[tabla]
+        from src.afip_xml import extraer
+        _, listas = extraer(xml_response, grupos=(grupo, 'Err'))
+        # 602 = sin resultados (p. ej. CUIT sin PVs habilitados): respuesta válida
+        errores = [e for e in listas['Err'] if e.get('Code') != '602']
+        if errores and not listas[grupo]:
+            raise Exception(f"{metodo}: {errores[0].get('Code')} {errores[0].get('Msg')}")
+        return listas[grupo]
 
-            return sorted(set(puntos_venta))
+    def obtener_puntos_venta(self, cuit):
+        """Números de PV de FEParamGetPtosVenta, bloqueados incluidos (tienen historial)"""
+        try:
+            return sorted({int(pv['Nro']) for pv in self.parametros(cuit, 'ptos_venta')
+                           if pv.get('Nro', '').isdigit()})
 
+        except ErrorAFIP:
+            raise
         except Exception as e:
             print(f"Error obteniendo puntos de venta: {e}")
             return []
 
+    def _tabla_id_descripcion(self, cuit, tabla, id_numerico=True):
+        """[{'id', 'descripcion'}] sin duplicados, ordenada por id."""
+        filas = {}
+        for fila in self.parametros(cuit, tabla):
+            id_ = fila.get('Id', '')
+            if id_numerico:
+                if not id_.isdigit():
+                    continue
+                id_ = int(id_)
+            if id_ != '' and id_ not in filas:
+                filas[id_] = {'id': id_, 'descripcion': fila.get('Desc', '')}
+        return sorted(filas.values(), key=lambda x: x['id'])
+
     def obtener_tipos_comprobante(self, cuit):
         """Obtener tipos de comprobante usando FEParamGetTiposCbte"""
         try:
-            token, sign = self.autenticar_wsaa(cuit)
+            return self._tabla_id_descripcion(cuit, 'tipos_cbte')
+        except Exception as e:
+            print(f"Error obteniendo tipos de comprobante: {e}")
+            return []
 
-            xml_response = self._wsfe_request(
-                'FEParamGetTiposCbte',
-                {},
-                token,
-                sign,
-                cuit
-            )
+    def obtener_monedas(self, cuit):
+        """Monedas de FEParamGetTiposMonedas: [{'id': 'DOL', 'descripcion': ...}, ...]"""
+        try:
+            return self._tabla_id_descripcion(cuit, 'monedas', id_numerico=False)
+        except Exception as e:
+            print(f"Error obteniendo monedas: {e}")
+            return []
+
+    def obtener_alicuotas_iva(self, cuit):
+        """Alícuotas de FEParamGetTiposIva: [{'id': 5, 'descripcion': '21%'}, ...]"""
+        try:
+            return self._tabla_id_descripcion(cuit, 'alicuotas_iva')
+        except Exception as e:
+            print(f"Error obteniendo alícuotas IVA: {e}")
+            return []
 
-            root = ET.fromstring(xml_response)
-            tipos = []
 
-            current_tipo = {}
-            for elem in root.iter():
-                tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                if tag == 'Id' and elem.text and elem.text.isdigit():
-                    current_tipo = {'id': int(elem.text)}
-                elif tag == 'Desc' and elem.text and current_tipo:
-                    current_tipo['descripcion'] = elem.text
-                    tipos.append(current_tipo)
-                    current_tipo = {}
+# ---------------------------------------------------------------------------
+# Cliente asyncio
+# ---------------------------------------------------------------------------
 
-            # Dedup
-            tipos_unicos = {}
-            for tipo in tipos:
-                if tipo['id'] not in tipos_unicos:
-                    tipos_unicos[tipo['id']] = tipo
+# event loop -> {cuit: asyncio.Semaphore}: el tope AFIP_MAX_CONCURRENCIA por CUIT
+# para los clientes async (los semáforos asyncio son de un solo loop)
+_semaforos_async = weakref.WeakKeyDictionary()
 
-            return sorted(tipos_unicos.values(), key=lambda x: x['id'])
 
+def _semaforo_cuit_async(cuit):
+    import asyncio
+    por_cuit = _semaforos_async.setdefault(asyncio.get_running_loop(), {})
+    if cuit not in por_cuit:
+        por_cuit[cuit] = asyncio.Semaphore(MAX_CONCURRENCIA_POR_CUIT)
+    return por_cuit[cuit]
+
+
+class WSFEv1AsyncClient:
+    """WSFEv1 sobre asyncio (aiohttp, src/afip_transport_async.py).
+
+    Mismas operaciones de consulta que WSFEv1Client, como corrutinas: sin un
+    thread por llamada en curso. Sobres SOAP, parseo, cache de TA, de
+    parámetros y de streams vacíos, circuito y token bucket son los del
+    cliente sync (compartidos con él en el proceso).
+
+    Uso:
+        cliente = WSFEv1AsyncClient(cert, key, solicitante_cuit=...)
+        comprobantes = await cliente.consultar_streams(cuit, tipos, pvs, desde, hasta)
+        await cerrar_transporte_async()     # antes de terminar el loop
+    """
+
+    def __init__(self, cert_path, key_path, ambiente='prod', solicitante_cuit=None):
+        self._sync = WSFEv1Client(cert_path, key_path, ambiente, solicitante_cuit)
+        self.ambiente = ambiente
+        self.urls = self._sync.urls
+        self.tipos_comprobante = self._sync.tipos_comprobante
+
+    # -- WSAA ---------------------------------------------------------------
+
+    async def autenticar_wsaa(self, cuit_representada=None):
+        """(token, sign) del cache compartido; loginCms async si hace falta."""
+        from src.wsaa_ticket_cache import obtener_ticket_async
+        return await obtener_ticket_async(self._sync.cert_path, 'wsfe', self.ambiente,
+                                          self._login_wsaa, self._sync.solicitante_cuit)
+
+    async def _login_wsaa(self):
+        import asyncio
+        from src.afip_transport_async import post_afip_async
+
+        # La firma CMS es CPU: fuera del loop
+        soap_request, headers = await asyncio.to_thread(self._sync._sobre_login)
+        respuesta = await post_afip_async('wsaa', self.urls[self.ambiente]['wsaa'], soap_request, headers,
+                                          solicitante=self._sync._solicitante())
+        return self._sync._credenciales_login(respuesta)
+
+    async def _wsfe_request(self, method, params, token, sign, cuit):
+        from src.afip_transport_async import post_afip_async
+
+        soap_request, headers = self._sync._sobre_wsfe(method, params, token, sign, cuit)
+        async with _semaforo_cuit_async(str(cuit)):
+            return await post_afip_async('wsfe', self.urls[self.ambiente]['wsfe'], soap_request, headers,
+                                         solicitante=self._sync._solicitante())
+
+    # -- Operaciones ----------------------------------------------------------
+
+    async def obtener_ultimo_comprobante(self, cuit, tipo_comprobante, punto_venta):
+        """Último número autorizado (ErrorAFIP si AFIP falló, cache de streams vacíos)."""
+        import asyncio
+        from src import afip_streams_vacios as vacios
+
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        estado = await asyncio.to_thread(vacios.consultar, cuit, self.ambiente, tipo_comprobante, punto_venta)
+        if estado is not None:
+            if estado == vacios.REFRESCAR:
+                vacios.refrescar_en_background(
+                    cuit, self.ambiente, tipo_comprobante, punto_venta,
+                    lambda: self._sync._ultimo_desde_afip(cuit, tipo_comprobante, punto_venta))
+            return 0
+
+        try:
+            token, sign = await self.autenticar_wsaa(cuit)
+            params = {'tipo_comprobante': tipo_comprobante, 'punto_venta': punto_venta}
+            xml_response = await self._wsfe_request('FECompUltimoAutorizado', params, token, sign, cuit)
+            ultimo = self._sync._parsear_ultimo(xml_response)
+            if ultimo is None:
+                return 0
+            await asyncio.to_thread(vacios.registrar, cuit, self.ambiente, tipo_comprobante, punto_venta, ultimo)
+            return ultimo
+
+        except ErrorAFIP:
+            raise
         except Exception as e:
-            print(f"Error obteniendo tipos de comprobante: {e}")
+            print(f"Error obteniendo ultimo comprobante: {str(e)}")
+            return None
+
+    async def consultar_comprobante(self, cuit, tipo_comprobante, punto_venta, numero):
+        """Un comprobante (None si no existe; ErrorAFIP si AFIP falló)."""
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        try:
+            token, sign = await self.autenticar_wsaa(cuit)
+            params = {'tipo_comprobante': tipo_comprobante, 'punto_venta': punto_venta, 'numero': numero}
+            xml_response = await self._wsfe_request('FECompConsultar', params, token, sign, cuit)
+            return self._sync._parsear_comprobante(xml_response)
+
+        except ErrorAFIP:
+            raise
+        except Exception as e:
+            print(f"Error consultando comprobante: {str(e)}")
+            return None
+
+    async def _consultar_limitado(self, cuit, tipo, pv, num):
+        try:
+            return await self.consultar_comprobante(cuit, tipo, pv, num)
+        except ErrorAFIP as e:
+            if not isinstance(e, CircuitoAbierto):
+                print(f"[WSFEv1] tipo={tipo} pv={pv} #{num}: {e}", flush=True)
+            return None
+
+    async def consultar_comprobantes_lote(self, cuit, claves, al_avanzar=None):
+        """Como WSFEv1Client.consultar_comprobantes_lote (tope AFIP_MAX_CONCURRENCIA por CUIT)."""
+        import asyncio
+
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        claves = list(claves)
+        if not claves:
+            return []
+        await self.autenticar_wsaa(cuit)
+
+        async def _consultar(clave):
+            comp = await self._consultar_limitado(cuit, *clave)
+            if al_avanzar:
+                tipo, pv, num = clave
+                _notificar(al_avanzar, 'comprobante', {'tipo': tipo, 'pv': pv, 'numero': num, 'comp': comp})
+            return comp
+
+        return list(await asyncio.gather(*(_consultar(clave) for clave in claves)))
+
+    async def _ordinal_comprobante(self, cuit, tipo, pv, num, sondeos):
+        if num not in sondeos:
+            comp = await self.consultar_comprobante(cuit, tipo, pv, num)
+            fecha = (comp.get('CbteFch') or comp.get('fecha_emision') or '') if comp else ''
+            sondeos[num] = _fecha_ordinal(fecha)
+        return sondeos[num]
+
+    async def _primer_numero_desde(self, cuit, tipo, pv, ultimo, objetivo, sondeos, faltante_es_mayor):
+        busqueda = _busqueda_desde(ultimo, objetivo, sondeos, faltante_es_mayor)
+        try:
+            mid = next(busqueda)
+            while True:
+                mid = busqueda.send(await self._ordinal_comprobante(cuit, tipo, pv, mid, sondeos))
+        except StopIteration as fin:
+            return fin.value
+
+    async def buscar_rango_por_fecha(self, cuit, tipo, pv, ultimo, fecha_desde, fecha_hasta):
+        """Como WSFEv1Client.buscar_rango_por_fecha: (num_inicio, num_fin) o None."""
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        desde = _fecha_ordinal(fecha_desde)
+        hasta = _fecha_ordinal(fecha_hasta)
+        if desde is None or hasta is None or not ultimo or ultimo <= 0:
+            return None
+
+        sondeos = {}
+        num_fin = await self._primer_numero_desde(cuit, tipo, pv, ultimo, hasta + 1, sondeos,
+                                                  faltante_es_mayor=True) - 1
+        if num_fin < 1:
+            return None
+        num_inicio = await self._primer_numero_desde(cuit, tipo, pv, num_fin, desde, sondeos,
+                                                     faltante_es_mayor=False)
+        if num_inicio > num_fin:
+            return None
+
+        print(f"[WSFEv1] tipo={tipo} pv={pv} rango #{num_inicio}-#{num_fin} "
+              f"({len(sondeos)} consultas de fecha)", flush=True)
+        return (num_inicio, num_fin)
+
+    async def _rango_stream(self, cuit, tipo, pv, fecha_desde=None, fecha_hasta=None, ultimos=50):
+        ultimo = await self.obtener_ultimo_comprobante(cuit, tipo, pv)
+        if not ultimo or ultimo <= 0:
+            return None
+
+        print(f"[WSFEv1] tipo={tipo} pv={pv} ultimo={ultimo}", flush=True)
+
+        if fecha_desde and fecha_hasta:
+            rango = await self.buscar_rango_por_fecha(cuit, tipo, pv, ultimo, fecha_desde, fecha_hasta)
+            if not rango:
+                print(f"[WSFEv1] tipo={tipo} pv={pv} sin comprobantes en rango {fecha_desde}-{fecha_hasta}", flush=True)
+            return rango
+
+        return (max(1, ultimo - ultimos + 1), ultimo)
+
+    async def consultar_streams(self, cuit, tipos, puntos_venta, fecha_desde=None, fecha_hasta=None, ultimos=50,
+                                al_avanzar=None):
+        """Como WSFEv1Client.consultar_streams, con tareas asyncio en vez de hilos.
+
+        Hasta AFIP_STREAMS_CONCURRENTES streams resolviendo su rango a la vez;
+        el detalle de cada stream arranca apenas se conoce su rango.
+        Retorna [(tipo, pv, numero, comp), ...] en el mismo orden.
+        """
+        import asyncio
+
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        streams = [(tipo, pv) for tipo in tipos for pv in puntos_venta]
+        if not streams:
+            return []
+
+        await self.autenticar_wsaa(cuit)
+
+        limite_streams = asyncio.Semaphore(MAX_STREAMS_CONCURRENTES)
+        detalles = {}
+
+        async def _detalle(tipo, pv, num):
+            comp = await self._consultar_limitado(cuit, tipo, pv, num)
+            if al_avanzar:
+                _notificar(al_avanzar, 'comprobante', {'tipo': tipo, 'pv': pv, 'numero': num, 'comp': comp})
+            return comp
+
+        async def _stream(tipo, pv):
+            try:
+                async with limite_streams:
+                    rango = await self._rango_stream(cuit, tipo, pv, fecha_desde, fecha_hasta, ultimos)
+            except Exception as e:
+                print(f"[WSFEv1] tipo={tipo} pv={pv} error escaneando stream: {e}", flush=True)
+                return
+            if al_avanzar:
+                cantidad = rango[1] - rango[0] + 1 if rango else 0
+                _notificar(al_avanzar, 'stream', {'tipo': tipo, 'pv': pv, 'cantidad': cantidad})
+            if rango:
+                num_inicio, num_fin = rango
+                detalles[(tipo, pv)] = [(num, asyncio.ensure_future(_detalle(tipo, pv, num)))
+                                        for num in range(num_fin, num_inicio - 1, -1)]
+
+        await asyncio.gather(*(_stream(tipo, pv) for tipo, pv in streams))
+
+        resultados = []
+        for tipo, pv in streams:
+            for num, tarea in detalles.get((tipo, pv), []):
+                try:
+                    comp = await tarea
+                except Exception:
+                    comp = None
+                resultados.append((tipo, pv, num, comp))
+        return resultados
+
+    async def parametros(self, cuit, tabla):
+        """Como WSFEv1Client.parametros (mismo cache)."""
+        from src.afip_parametros import obtener_parametros_async
+
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+
+        async def _pedir():
+            metodo, _ = WSFEv1Client.TABLAS_PARAMETROS[tabla]
+            token, sign = await self.autenticar_wsaa(cuit)
+            xml_response = await self._wsfe_request(metodo, {}, token, sign, cuit)
+            return self._sync._parsear_parametros(tabla, xml_response)
+
+        return await obtener_parametros_async(self._sync._solicitante(), cuit, self.ambiente, tabla, _pedir)
+
+    async def obtener_puntos_venta(self, cuit):
+        """Números de PV de FEParamGetPtosVenta, bloqueados incluidos."""
+        try:
+            return sorted({int(pv['Nro']) for pv in await self.parametros(cuit, 'ptos_venta')
+                           if pv.get('Nro', '').isdigit()})
+        except ErrorAFIP:
+            raise
+        except Exception as e:
+            print(f"Error obteniendo puntos de venta: {e}")
             return []
@@ -11,18 +11,13 @@ También consulta facturas de monotributo cuando están registradas aquí.
 
 import os
 import sys
-import ssl
 import time
 import html
 import base64
-import tempfile
 import xml.etree.ElementTree as ET
 from pathlib import Path
 from datetime import datetime, timedelta
-import requests
-import subprocess
 import urllib3
-from requests.adapters import HTTPAdapter
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -30,10 +25,12 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 class WSFEXv1Client:
     """Cliente para WSFEXv1 (Factura Electrónica de Exportación)"""
 
-    def __init__(self, cert_path, key_path, ambiente='prod'):
+    def __init__(self, cert_path, key_path, ambiente='prod', solicitante_cuit=None):
         self.cert_path = cert_path
         self.key_path = key_path
         self.ambiente = ambiente
+        # CUIT del certificado (clave del cache de TA); None = se lee del certificado
+        self.solicitante_cuit = solicitante_cuit
 
         # URLs de AFIP
         self.urls = {
@@ -47,12 +44,12 @@ class WSFEXv1Client:
             }
         }
 
-        # Cache para tokens
-        self._token_cache = {}
-
-        # Sesión HTTP con SSL permisivo (SECLEVEL=1 para AFIP)
-        from src.ssl_afip_config import crear_session_afip
-        self._session = crear_session_afip()
+        # Transporte compartido del proceso: keep-alive + SSL permisivo (src/afip_transport.py).
+        # AFIP_URL_BASE redirige las URLs al simulador local.
+        from src.afip_transport import sesion_afip, url_afip
+        self.urls = {amb: {svc: url_afip(url) for svc, url in urls.items()}
+                     for amb, urls in self.urls.items()}
+        self._session = sesion_afip()
 
         # Tipos de comprobante WSFEXv1
         self.tipos_comprobante = {
@@ -67,23 +64,6 @@ class WSFEXv1Client:
     # Autenticación WSAA
     # ------------------------------------------------------------------
 
-    def _detectar_openssl(self):
-        """Detectar OpenSSL disponible"""
-        paths = [
-            'openssl',
-            'C:\\Program Files\\Git\\usr\\bin\\openssl.exe',
-            'C:\\Program Files\\OpenSSL-Win64\\bin\\openssl.exe'
-        ]
-        for path in paths:
-            try:
-                result = subprocess.run([path, 'version'],
-                                        capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    return path
-            except Exception:
-                continue
-        raise Exception("OpenSSL no encontrado")
-
     def _crear_tra(self):
         """Crear TRA para WSFEXv1"""
         now = datetime.now()
@@ -105,43 +85,27 @@ class WSFEXv1Client:
 </loginTicketRequest>"""
 
     def _firmar_tra(self, tra_xml):
-        """Firmar TRA con OpenSSL"""
-        openssl_cmd = self._detectar_openssl()
-
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.xml', delete=False) as tmp_xml:
-            tmp_xml.write(tra_xml)
-            tra_file = tmp_xml.name
-
-        cms_file = tempfile.mktemp(suffix='.cms')
-
-        try:
-            cmd = [
-                openssl_cmd, 'smime', '-sign',
-                '-in', tra_file,
-                '-out', cms_file,
-                '-outform', 'DER',
-                '-signer', self.cert_path,
-                '-inkey', self.key_path,
-                '-nodetach'
-            ]
-            subprocess.run(cmd, capture_output=True, check=True)
-
-            with open(cms_file, 'rb') as f:
-                return f.read()
-        finally:
-            if os.path.exists(tra_file):
-                os.unlink(tra_file)
-            if os.path.exists(cms_file):
-                os.unlink(cms_file)
+        """Firmar TRA (CMS en proceso, ver src/cms_signer.py)"""
+        from src.cms_signer import firmar_cms
+        return firmar_cms(tra_xml, self.cert_path, self.key_path)
 
     def _obtener_token_wsaa(self):
-        """Obtener token WSAA (con cache)."""
-        cache_key = f"wsfex_{self.ambiente}"
-        if cache_key in self._token_cache:
-            cached = self._token_cache[cache_key]
-            if cached['expires'] > datetime.now():
-                return cached['token'], cached['sign']
-
+        """Obtener token WSAA (cache compartido: src/wsaa_ticket_cache.py)."""
+        from src.wsaa_ticket_cache import obtener_ticket
+        return obtener_ticket(self.cert_path, 'wsfex', self.ambiente,
+                              self._login_wsaa, self.solicitante_cuit)
+
+    def _login_wsaa(self):
+        """loginCms contra WSAA. Retorna {'token', 'sign', 'expirationTime'}."""
+        soap_request, headers = self._sobre_login()
+
+        from src.afip_transport import post_afip
+        respuesta = post_afip('wsaa', self.urls[self.ambiente]['wsaa'], soap_request, headers,
+                              solicitante=self.solicitante_cuit)
+        return self._credenciales_login(respuesta)
+
+    def _sobre_login(self):
+        """(soap, headers) del loginCms con el TRA ya firmado."""
         tra_xml = self._crear_tra()
         signed_tra = self._firmar_tra(tra_xml)
         tra_b64 = base64.b64encode(signed_tra).decode('utf-8')
@@ -159,16 +123,11 @@ class WSFEXv1Client:
             'Content-Type': 'text/xml; charset=utf-8',
             'SOAPAction': ''
         }
+        return soap_request, headers
 
-        response = self._session.post(
-            self.urls[self.ambiente]['wsaa'],
-            data=soap_request,
-            headers=headers,
-            timeout=30
-        )
-        response.raise_for_status()
-
-        root = ET.fromstring(response.text)
+    def _credenciales_login(self, respuesta):
+        """Respuesta de loginCms -> {'token', 'sign', 'expirationTime'}."""
+        root = ET.fromstring(respuesta)
         login_return = None
         for elem in root.iter():
             if 'loginCmsReturn' in elem.tag:
@@ -183,20 +142,13 @@ class WSFEXv1Client:
 
         credentials = {}
         for child in login_root.iter():
-            if child.tag in ['token', 'sign']:
+            if child.tag in ['token', 'sign', 'expirationTime']:
                 credentials[child.tag] = child.text
 
         if 'token' not in credentials or 'sign' not in credentials:
             raise Exception("Token/Sign no encontrados en respuesta WSAA")
 
-        expires = datetime.now() + timedelta(hours=11, minutes=50)
-        self._token_cache[cache_key] = {
-            'token': credentials['token'],
-            'sign': credentials['sign'],
-            'expires': expires
-        }
-
-        return credentials['token'], credentials['sign']
+        return credentials
 
     # ------------------------------------------------------------------
     # Requests WSFEXv1
@@ -204,6 +156,15 @@ class WSFEXv1Client:
 
     def _wsfex_request(self, method, soap_body):
         """Enviar request SOAP a WSFEXv1"""
+        soap_envelope, headers = self._sobre_wsfex(method, soap_body)
+
+        # Transporte compartido: keep-alive, circuito y reintentos (src/afip_transport.py)
+        from src.afip_transport import post_afip
+        return post_afip('wsfex', self.urls[self.ambiente]['wsfex'], soap_envelope, headers,
+                         solicitante=self.solicitante_cuit)
+
+    def _sobre_wsfex(self, method, soap_body):
+        """(soap, headers) de un método WSFEXv1"""
         soap_envelope = f"""<?xml version="1.0" encoding="utf-8"?>
 <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
 <soap:Body>
@@ -215,30 +176,112 @@ class WSFEXv1Client:
             'Content-Type': 'text/xml; charset=utf-8',
             'SOAPAction': f'"http://ar.gov.afip.dif.fexv1/{method}"'
         }
+        return soap_envelope, headers
 
-        session = requests.Session()
-
-        class _CustomHTTPAdapter(HTTPAdapter):
-            def init_poolmanager(self, *args, **kwargs):
-                ctx = ssl.create_default_context()
-                ctx.set_ciphers('DEFAULT@SECLEVEL=1')
-                ctx.check_hostname = False
-                ctx.verify_mode = ssl.CERT_NONE
-                kwargs['ssl_context'] = ctx
-                return super().init_poolmanager(*args, **kwargs)
-
-        session.mount('https://', _CustomHTTPAdapter())
-
-        response = session.post(
-            self.urls[self.ambiente]['wsfex'],
-            data=soap_envelope,
-            headers=headers,
-            timeout=30,
-            verify=False
-        )
+    def _cuerpo_consulta(self, token, sign, cuit, tipo_comprobante, punto_venta, numero):
+        """Body de FEXGetCMP"""
+        return f"""
+    <FEXGetCMP xmlns="http://ar.gov.afip.dif.fexv1/">
+        <Auth>
+            <Token>{token}</Token>
+            <Sign>{sign}</Sign>
+            <Cuit>{cuit}</Cuit>
+        </Auth>
+        <Cmp>
+            <Cbte_tipo>{tipo_comprobante}</Cbte_tipo>
+            <Punto_vta>{punto_venta}</Punto_vta>
+            <Cbte_nro>{numero}</Cbte_nro>
+        </Cmp>
+    </FEXGetCMP>"""
 
-        response.raise_for_status()
-        return response.text
+    def _cuerpo_ultimo(self, token, sign, cuit, punto_venta, tipo_comprobante):
+        """Body de FEXGetLast_CMP"""
+        return f"""
+    <FEXGetLast_CMP xmlns="http://ar.gov.afip.dif.fexv1/">
+        <Auth>
+            <Token>{token}</Token>
+            <Sign>{sign}</Sign>
+            <Cuit>{cuit}</Cuit>
+        </Auth>
+        <Pto_venta>{punto_venta}</Pto_venta>
+        <Cbte_Tipo>{tipo_comprobante}</Cbte_Tipo>
+    </FEXGetLast_CMP>"""
+
+    def _cuerpo_puntos_venta(self, token, sign, cuit):
+        """Body de FEXGetPARAM_PtoVenta"""
+        return f"""
+    <FEXGetPARAM_PtoVenta xmlns="http://ar.gov.afip.dif.fexv1/">
+        <Auth>
+            <Token>{token}</Token>
+            <Sign>{sign}</Sign>
+            <Cuit>{cuit}</Cuit>
+        </Auth>
+    </FEXGetPARAM_PtoVenta>"""
+
+    # ------------------------------------------------------------------
+    # Parseo de respuestas
+    # ------------------------------------------------------------------
+
+    def _parsear_comprobante(self, xml_response, tipo_comprobante, punto_venta, numero):
+        """Respuesta de FEXGetCMP -> dict del comprobante, o None si no existe."""
+        from src.afip_xml import extraer
+        campos, _ = extraer(xml_response)
+
+        # Verificar errores
+        err_code = campos.get('ErrCode', '')
+        if err_code and err_code != '0':
+            return None
+
+        # Verificar que hay datos
+        has_data = any(k in campos for k in [
+            'Cbte_nro', 'Fecha_cbte', 'Imp_total', 'Cae'
+        ])
+        if not has_data:
+            return None
+
+        return {
+            'tipo_comprobante': campos.get('Cbte_tipo', str(tipo_comprobante)),
+            'descripcion_tipo': self.tipos_comprobante.get(
+                int(campos.get('Cbte_tipo', tipo_comprobante)),
+                f'Tipo {tipo_comprobante}'
+            ),
+            'punto_venta': campos.get('Punto_vta', str(punto_venta)),
+            'numero': campos.get('Cbte_nro', str(numero)),
+            'fecha_emision': campos.get('Fecha_cbte', ''),
+            'importe_total': campos.get('Imp_total', '0'),
+            'moneda': campos.get('Mon_id', ''),
+            'cotizacion': campos.get('Mon_cotiz', '1'),
+            'cae': campos.get('Cae', ''),
+            'fecha_vto_cae': campos.get('Fch_venc_Cae', ''),
+            'pais_destino': campos.get('Dst_cmp', ''),
+            'id_impositivo_receptor': campos.get('Cuit_pais_cliente', ''),
+            'denominacion_receptor': campos.get('Cliente', ''),
+            'incoterms': campos.get('Incoterms', ''),
+            'idioma': campos.get('Idioma_cbte', ''),
+            'observaciones': campos.get('Obs', ''),
+            # Campos extra
+            **{k: v for k, v in campos.items() if k not in [
+                'Cbte_tipo', 'Punto_vta', 'Cbte_nro', 'Fecha_cbte',
+                'Imp_total', 'Mon_id', 'Mon_cotiz', 'Cae', 'Fch_venc_Cae',
+                'Dst_cmp', 'Cuit_pais_cliente', 'Cliente', 'Incoterms',
+                'Idioma_cbte', 'Obs', 'Token', 'Sign', 'Cuit',
+                'ErrCode', 'ErrMsg'
+            ]}
+        }
+
+    @staticmethod
+    def _parsear_ultimo(xml_response):
+        """Respuesta de FEXGetLast_CMP -> último número (0 si no hay)."""
+        from src.afip_xml import primer_texto
+        nro = primer_texto(xml_response, 'Cbte_nro')
+        return int(nro) if nro else 0
+
+    @staticmethod
+    def _parsear_puntos_venta(xml_response):
+        """Respuesta de FEXGetPARAM_PtoVenta -> números de PV ordenados."""
+        from src.afip_xml import extraer
+        _, listas = extraer(xml_response, multiples=('Pto_venta',))
+        return sorted({int(pv) for pv in listas['Pto_venta'] if pv.isdigit()})
 
     # ------------------------------------------------------------------
     # Operaciones
@@ -254,70 +297,9 @@ class WSFEXv1Client:
             token, sign = self._obtener_token_wsaa()
             cuit_clean = str(cuit).replace('-', '').replace(' ', '')
 
-            soap_body = f"""
-    <FEXGetCMP xmlns="http://ar.gov.afip.dif.fexv1/">
-        <Auth>
-            <Token>{token}</Token>
-            <Sign>{sign}</Sign>
-            <Cuit>{cuit_clean}</Cuit>
-        </Auth>
-        <Cmp>
-            <Cbte_tipo>{tipo_comprobante}</Cbte_tipo>
-            <Punto_vta>{punto_venta}</Punto_vta>
-            <Cbte_nro>{numero}</Cbte_nro>
-        </Cmp>
-    </FEXGetCMP>"""
-
+            soap_body = self._cuerpo_consulta(token, sign, cuit_clean, tipo_comprobante, punto_venta, numero)
             xml_response = self._wsfex_request('FEXGetCMP', soap_body)
-
-            root = ET.fromstring(xml_response)
-            campos = {}
-            for elem in root.iter():
-                tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                if elem.text and elem.text.strip():
-                    campos[tag] = elem.text.strip()
-
-            # Verificar errores
-            err_code = campos.get('ErrCode', '')
-            if err_code and err_code != '0':
-                return None
-
-            # Verificar que hay datos
-            has_data = any(k in campos for k in [
-                'Cbte_nro', 'Fecha_cbte', 'Imp_total', 'Cae'
-            ])
-            if not has_data:
-                return None
-
-            return {
-                'tipo_comprobante': campos.get('Cbte_tipo', str(tipo_comprobante)),
-                'descripcion_tipo': self.tipos_comprobante.get(
-                    int(campos.get('Cbte_tipo', tipo_comprobante)),
-                    f'Tipo {tipo_comprobante}'
-                ),
-                'punto_venta': campos.get('Punto_vta', str(punto_venta)),
-                'numero': campos.get('Cbte_nro', str(numero)),
-                'fecha_emision': campos.get('Fecha_cbte', ''),
-                'importe_total': campos.get('Imp_total', '0'),
-                'moneda': campos.get('Mon_id', ''),
-                'cotizacion': campos.get('Mon_cotiz', '1'),
-                'cae': campos.get('Cae', ''),
-                'fecha_vto_cae': campos.get('Fch_venc_Cae', ''),
-                'pais_destino': campos.get('Dst_cmp', ''),
-                'id_impositivo_receptor': campos.get('Cuit_pais_cliente', ''),
-                'denominacion_receptor': campos.get('Cliente', ''),
-                'incoterms': campos.get('Incoterms', ''),
-                'idioma': campos.get('Idioma_cbte', ''),
-                'observaciones': campos.get('Obs', ''),
-                # Campos extra
-                **{k: v for k, v in campos.items() if k not in [
-                    'Cbte_tipo', 'Punto_vta', 'Cbte_nro', 'Fecha_cbte',
-                    'Imp_total', 'Mon_id', 'Mon_cotiz', 'Cae', 'Fch_venc_Cae',
-                    'Dst_cmp', 'Cuit_pais_cliente', 'Cliente', 'Incoterms',
-                    'Idioma_cbte', 'Obs', 'Token', 'Sign', 'Cuit',
-                    'ErrCode', 'ErrMsg'
-                ]}
-            }
+            return self._parsear_comprobante(xml_response, tipo_comprobante, punto_venta, numero)
 
         except Exception as e:
             print(f"Error consultando comprobante WSFEXv1: {e}")
@@ -330,26 +312,9 @@ class WSFEXv1Client:
             token, sign = self._obtener_token_wsaa()
             cuit_clean = str(cuit).replace('-', '').replace(' ', '')
 
-            soap_body = f"""
-    <FEXGetLast_CMP xmlns="http://ar.gov.afip.dif.fexv1/">
-        <Auth>
-            <Token>{token}</Token>
-            <Sign>{sign}</Sign>
-            <Cuit>{cuit_clean}</Cuit>
-        </Auth>
-        <Pto_venta>{punto_venta}</Pto_venta>
-        <Cbte_Tipo>{tipo_comprobante}</Cbte_Tipo>
-    </FEXGetLast_CMP>"""
-
+            soap_body = self._cuerpo_ultimo(token, sign, cuit_clean, punto_venta, tipo_comprobante)
             xml_response = self._wsfex_request('FEXGetLast_CMP', soap_body)
-
-            root = ET.fromstring(xml_response)
-            for elem in root.iter():
-                tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                if tag == 'Cbte_nro' and elem.text:
-                    return int(elem.text)
-
-            return 0
+            return self._parsear_ultimo(xml_response)
 
         except Exception as e:
             print(f"Error obteniendo ultimo autorizado WSFEXv1: {e}")
@@ -362,25 +327,9 @@ class WSFEXv1Client:
             token, sign = self._obtener_token_wsaa()
             cuit_clean = str(cuit).replace('-', '').replace(' ', '')
 
-            soap_body = f"""
-    <FEXGetPARAM_PtoVenta xmlns="http://ar.gov.afip.dif.fexv1/">
-        <Auth>
-            <Token>{token}</Token>
-            <Sign>{sign}</Sign>
-            <Cuit>{cuit_clean}</Cuit>
-        </Auth>
-    </FEXGetPARAM_PtoVenta>"""
-
+            soap_body = self._cuerpo_puntos_venta(token, sign, cuit_clean)
             xml_response = self._wsfex_request('FEXGetPARAM_PtoVenta', soap_body)
-
-            root = ET.fromstring(xml_response)
-            puntos = []
-            for elem in root.iter():
-                tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                if tag == 'Pto_venta' and elem.text and elem.text.isdigit():
-                    puntos.append(int(elem.text))
-
-            return sorted(set(puntos))
+            return self._parsear_puntos_venta(xml_response)
 
         except Exception as e:
             print(f"Error obteniendo puntos de venta WSFEXv1: {e}")
@@ -502,6 +451,81 @@ class WSFEXv1Client:
         return resultados
 
 
+class WSFEXv1AsyncClient:
+    """WSFEXv1 sobre asyncio (aiohttp, src/afip_transport_async.py).
+
+    Mismas consultas que WSFEXv1Client, como corrutinas. Sobres, parseo y
+    cache de TA son los del cliente sync.
+    """
+
+    def __init__(self, cert_path, key_path, ambiente='prod', solicitante_cuit=None):
+        self._sync = WSFEXv1Client(cert_path, key_path, ambiente, solicitante_cuit)
+        self.ambiente = ambiente
+        self.urls = self._sync.urls
+        self.tipos_comprobante = self._sync.tipos_comprobante
+
+    async def _obtener_token_wsaa(self):
+        from src.wsaa_ticket_cache import obtener_ticket_async
+        return await obtener_ticket_async(self._sync.cert_path, 'wsfex', self.ambiente,
+                                          self._login_wsaa, self._sync.solicitante_cuit)
+
+    async def _login_wsaa(self):
+        import asyncio
+        from src.afip_transport_async import post_afip_async
+
+        # La firma CMS es CPU: fuera del loop
+        soap_request, headers = await asyncio.to_thread(self._sync._sobre_login)
+        respuesta = await post_afip_async('wsaa', self.urls[self.ambiente]['wsaa'], soap_request, headers,
+                                          solicitante=self._sync.solicitante_cuit)
+        return self._sync._credenciales_login(respuesta)
+
+    async def _wsfex_request(self, method, soap_body):
+        from src.afip_transport_async import post_afip_async
+
+        soap_envelope, headers = self._sync._sobre_wsfex(method, soap_body)
+        return await post_afip_async('wsfex', self.urls[self.ambiente]['wsfex'], soap_envelope, headers,
+                                     solicitante=self._sync.solicitante_cuit)
+
+    async def consultar_comprobante(self, cuit, tipo_comprobante, punto_venta, numero):
+        """Un comprobante, o None si no existe."""
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        try:
+            token, sign = await self._obtener_token_wsaa()
+            soap_body = self._sync._cuerpo_consulta(token, sign, cuit, tipo_comprobante, punto_venta, numero)
+            xml_response = await self._wsfex_request('FEXGetCMP', soap_body)
+            return self._sync._parsear_comprobante(xml_response, tipo_comprobante, punto_venta, numero)
+
+        except Exception as e:
+            print(f"Error consultando comprobante WSFEXv1: {e}")
+            return None
+
+    async def obtener_ultimo_autorizado(self, cuit, punto_venta, tipo_comprobante):
+        """Último comprobante autorizado (0 si no hay o falló)."""
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        try:
+            token, sign = await self._obtener_token_wsaa()
+            soap_body = self._sync._cuerpo_ultimo(token, sign, cuit, punto_venta, tipo_comprobante)
+            xml_response = await self._wsfex_request('FEXGetLast_CMP', soap_body)
+            return self._sync._parsear_ultimo(xml_response)
+
+        except Exception as e:
+            print(f"Error obteniendo ultimo autorizado WSFEXv1: {e}")
+            return 0
+
+    async def obtener_puntos_venta(self, cuit):
+        """Puntos de venta habilitados."""
+        cuit = str(cuit).replace('-', '').replace(' ', '')
+        try:
+            token, sign = await self._obtener_token_wsaa()
+            soap_body = self._sync._cuerpo_puntos_venta(token, sign, cuit)
+            xml_response = await self._wsfex_request('FEXGetPARAM_PtoVenta', soap_body)
+            return self._sync._parsear_puntos_venta(xml_response)
+
+        except Exception as e:
+            print(f"Error obteniendo puntos de venta WSFEXv1: {e}")
+            return []
+
+
 def crear_cliente_wsfexv1(ambiente='prod'):
     """Factory: crear un WSFEXv1Client auto-detectando certificados."""
     if os.path.basename(os.getcwd()) == 'src':
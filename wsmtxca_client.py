@@ -11,19 +11,14 @@ A diferencia de WSFEv1, este servicio devuelve el detalle de cada item facturado
 
 import os
 import sys
-import ssl
 import time
 import html
 import json
 import base64
-import tempfile
 import xml.etree.ElementTree as ET
 from pathlib import Path
 from datetime import datetime, timedelta
-import requests
-import subprocess
 import urllib3
-from requests.adapters import HTTPAdapter
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -37,10 +32,12 @@ class WSMTXCAClient:
                                                        punto_venta=..., numero_comprobante=...)
     """
 
-    def __init__(self, cert_path, key_path, ambiente='prod'):
+    def __init__(self, cert_path, key_path, ambiente='prod', solicitante_cuit=None):
         self.cert_path = cert_path
         self.key_path = key_path
         self.ambiente = ambiente
+        # CUIT del certificado (clave del cache de TA); None = se lee del certificado
+        self.solicitante_cuit = solicitante_cuit
 
         # URLs de AFIP
         self.urls = {
@@ -54,12 +51,12 @@ class WSMTXCAClient:
             }
         }
 
-        # Cache para tokens
-        self._token_cache = {}
-
-        # Sesión HTTP con SSL permisivo (SECLEVEL=1 para AFIP)
-        from src.ssl_afip_config import crear_session_afip
-        self._session = crear_session_afip()
+        # Transporte compartido del proceso: keep-alive + SSL permisivo (src/afip_transport.py).
+        # AFIP_URL_BASE redirige las URLs al simulador local.
+        from src.afip_transport import sesion_afip, url_afip
+        self.urls = {amb: {svc: url_afip(url) for svc, url in urls.items()}
+                     for amb, urls in self.urls.items()}
+        self._session = sesion_afip()
 
         # Tipos de comprobante (igual que WSFEv1 + FCE)
         self.tipos_comprobante = {
@@ -85,23 +82,6 @@ class WSMTXCAClient:
     # Autenticación WSAA
     # ------------------------------------------------------------------
 
-    def _detectar_openssl(self):
-        """Detectar OpenSSL disponible"""
-        paths = [
-            'openssl',
-            'C:\\Program Files\\Git\\usr\\bin\\openssl.exe',
-            'C:\\Program Files\\OpenSSL-Win64\\bin\\openssl.exe'
-        ]
-        for path in paths:
-            try:
-                result = subprocess.run([path, 'version'],
-                                        capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    return path
-            except Exception:
-                continue
-        raise Exception("OpenSSL no encontrado")
-
     def _validar_cuit(self, cuit):
         """Validar y limpiar CUIT"""
         cuit_clean = str(cuit).replace('-', '').replace(' ', '')
@@ -130,46 +110,30 @@ class WSMTXCAClient:
 </loginTicketRequest>"""
 
     def _firmar_tra(self, tra_xml):
-        """Firmar TRA con OpenSSL"""
-        openssl_cmd = self._detectar_openssl()
-
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.xml', delete=False) as tmp_xml:
-            tmp_xml.write(tra_xml)
-            tra_file = tmp_xml.name
-
-        cms_file = tempfile.mktemp(suffix='.cms')
-
-        try:
-            cmd = [
-                openssl_cmd, 'smime', '-sign',
-                '-in', tra_file,
-                '-out', cms_file,
-                '-outform', 'DER',
-                '-signer', self.cert_path,
-                '-inkey', self.key_path,
-                '-nodetach'
-            ]
-            subprocess.run(cmd, capture_output=True, check=True)
-
-            with open(cms_file, 'rb') as f:
-                return f.read()
-        finally:
-            if os.path.exists(tra_file):
-                os.unlink(tra_file)
-            if os.path.exists(cms_file):
-                os.unlink(cms_file)
+        """Firmar TRA (CMS en proceso, ver src/cms_signer.py)"""
+        from src.cms_signer import firmar_cms
+        return firmar_cms(tra_xml, self.cert_path, self.key_path)
 
     def autenticar_wsaa(self, cuit_representada=None):
         """Autenticar con WSAA para WSMTXCA.
 
-        Retorna (token, sign).
+        Retorna (token, sign). Cache compartido: src/wsaa_ticket_cache.py.
         """
-        cache_key = f"wsmtxca_{self.ambiente}"
-        if cache_key in self._token_cache:
-            cached = self._token_cache[cache_key]
-            if cached['expires'] > datetime.now():
-                return cached['token'], cached['sign']
+        from src.wsaa_ticket_cache import obtener_ticket
+        return obtener_ticket(self.cert_path, 'wsmtxca', self.ambiente,
+                              self._login_wsaa, self.solicitante_cuit)
+
+    def _login_wsaa(self):
+        """loginCms contra WSAA. Retorna {'token', 'sign', 'expirationTime'}."""
+        soap_request, headers = self._sobre_login()
 
+        from src.afip_transport import post_afip
+        respuesta = post_afip('wsaa', self.urls[self.ambiente]['wsaa'], soap_request, headers,
+                              solicitante=self.solicitante_cuit)
+        return self._credenciales_login(respuesta)
+
+    def _sobre_login(self):
+        """(soap, headers) del loginCms con el TRA ya firmado."""
         tra_xml = self._crear_tra()
         signed_tra = self._firmar_tra(tra_xml)
         tra_b64 = base64.b64encode(signed_tra).decode('utf-8')
@@ -187,16 +151,11 @@ class WSMTXCAClient:
             'Content-Type': 'text/xml; charset=utf-8',
             'SOAPAction': ''
         }
+        return soap_request, headers
 
-        response = self._session.post(
-            self.urls[self.ambiente]['wsaa'],
-            data=soap_request,
-            headers=headers,
-            timeout=30
-        )
-        response.raise_for_status()
-
-        root = ET.fromstring(response.text)
+    def _credenciales_login(self, respuesta):
+        """Respuesta de loginCms -> {'token', 'sign', 'expirationTime'}."""
+        root = ET.fromstring(respuesta)
         login_return = None
         for elem in root.iter():
             if 'loginCmsReturn' in elem.tag:
@@ -211,20 +170,13 @@ class WSMTXCAClient:
 
         credentials = {}
         for child in login_root.iter():
-            if child.tag in ['token', 'sign']:
+            if child.tag in ['token', 'sign', 'expirationTime']:
                 credentials[child.tag] = child.text
 
         if 'token' not in credentials or 'sign' not in credentials:
             raise Exception("Token/Sign no encontrados en respuesta WSAA")
 
-        expires = datetime.now() + timedelta(hours=11, minutes=50)
-        self._token_cache[cache_key] = {
-            'token': credentials['token'],
-            'sign': credentials['sign'],
-            'expires': expires
-        }
-
-        return credentials['token'], credentials['sign']
+        return credentials
 
     # ------------------------------------------------------------------
     # Requests WSMTXCA
@@ -232,6 +184,15 @@ class WSMTXCAClient:
 
     def _wsmtxca_request(self, soap_body):
         """Enviar request SOAP a WSMTXCA"""
+        soap_envelope, headers = self._sobre_wsmtxca(soap_body)
+
+        # Transporte compartido: keep-alive, circuito y reintentos (src/afip_transport.py)
+        from src.afip_transport import post_afip
+        return post_afip('wsmtxca', self.urls[self.ambiente]['wsmtxca'], soap_envelope, headers,
+                         solicitante=self.solicitante_cuit)
+
+    def _sobre_wsmtxca(self, soap_body):
+        """(soap, headers) de una operación WSMTXCA"""
         soap_envelope = f"""<?xml version="1.0" encoding="utf-8"?>
 <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
                   xmlns:ser="http://impl.service.wsmtxca.afip.gov.ar/">
@@ -244,30 +205,7 @@ class WSMTXCAClient:
             'Content-Type': 'text/xml; charset=utf-8',
             'SOAPAction': ''
         }
-
-        session = requests.Session()
-
-        class _CustomHTTPAdapter(HTTPAdapter):
-            def init_poolmanager(self, *args, **kwargs):
-                ctx = ssl.create_default_context()
-                ctx.set_ciphers('DEFAULT@SECLEVEL=1')
-                ctx.check_hostname = False
-                ctx.verify_mode = ssl.CERT_NONE
-                kwargs['ssl_context'] = ctx
-                return super().init_poolmanager(*args, **kwargs)
-
-        session.mount('https://', _CustomHTTPAdapter())
-
-        response = session.post(
-            self.urls[self.ambiente]['wsmtxca'],
-            data=soap_envelope,
-            headers=headers,
-            timeout=30,
-            verify=False
-        )
-
-        response.raise_for_status()
-        return response.text
+        return soap_envelope, headers
 
     # ------------------------------------------------------------------
     # Consulta de comprobantes
@@ -286,6 +224,21 @@ class WSMTXCAClient:
         Retorna dict con {'status': 'encontrado'|'no_encontrado', 'datos': {...}, 'items': [...]}
         o None si no se encontró y se llamó con estilo 2.
         """
+        _cuit, _tipo, _pv, _numero, keyword_style = self._normalizar_consulta(
+            cuit, tipo, punto_venta, numero, cuit_representada, tipo_comprobante, numero_comprobante)
+
+        try:
+            token, sign = self.autenticar_wsaa(_cuit)
+            soap_body = self._cuerpo_consulta(token, sign, _cuit, _tipo, _pv, _numero)
+            xml_response = self._wsmtxca_request(soap_body)
+            return self._parsear_consulta(xml_response, _tipo, _pv, _numero, keyword_style)
+
+        except Exception as e:
+            return self._error_consulta(e, keyword_style)
+
+    def _normalizar_consulta(self, cuit, tipo, punto_venta, numero,
+                             cuit_representada, tipo_comprobante, numero_comprobante):
+        """Argumentos de consultar_comprobante (ambos estilos) -> (cuit, tipo, pv, numero, keyword_style)."""
         # Normalizar parámetros: aceptar ambos estilos
         _cuit = cuit_representada or cuit
         _tipo = tipo_comprobante or tipo
@@ -295,138 +248,119 @@ class WSMTXCAClient:
         if not all([_cuit, _tipo is not None, _pv is not None, _numero is not None]):
             raise ValueError("Se requieren: cuit, tipo, punto_venta, numero")
 
-        _cuit = self._validar_cuit(_cuit)
-        _tipo = int(_tipo)
-        _pv = int(_pv)
-        _numero = int(_numero)
-
         # Determinar si la llamada vino con estilo 2 (keyword cuit_representada)
         keyword_style = cuit_representada is not None
 
-        try:
-            token, sign = self.autenticar_wsaa(_cuit)
+        return self._validar_cuit(_cuit), int(_tipo), int(_pv), int(_numero), keyword_style
 
-            soap_body = f"""
+    def _cuerpo_consulta(self, token, sign, cuit, tipo, punto_venta, numero):
+        """Body de consultarComprobanteRequest"""
+        return f"""
     <ser:consultarComprobanteRequest>
         <authRequest>
             <token>{token}</token>
             <sign>{sign}</sign>
-            <cuitRepresentada>{_cuit}</cuitRepresentada>
+            <cuitRepresentada>{cuit}</cuitRepresentada>
         </authRequest>
         <consultaComprobanteRequest>
-            <codigoTipoComprobante>{_tipo}</codigoTipoComprobante>
-            <numeroPuntoVenta>{_pv}</numeroPuntoVenta>
-            <numeroComprobante>{_numero}</numeroComprobante>
+            <codigoTipoComprobante>{tipo}</codigoTipoComprobante>
+            <numeroPuntoVenta>{punto_venta}</numeroPuntoVenta>
+            <numeroComprobante>{numero}</numeroComprobante>
         </consultaComprobanteRequest>
     </ser:consultarComprobanteRequest>"""
 
-            xml_response = self._wsmtxca_request(soap_body)
+    def _parsear_consulta(self, xml_response, _tipo, _pv, _numero, keyword_style):
+        """Respuesta de consultarComprobante -> resultado en el estilo de la llamada."""
+        # Parsear respuesta XML: campos, códigos de error e items en una pasada
+        from src.afip_xml import extraer
+        campos, listas = extraer(xml_response,
+                                 grupos=('item', 'arrayItems', 'codigoDescripcion'))
+
+        # Detectar errores AFIP (codigoDescripcion → codigo)
+        if any(e.get('codigo') in ('602', '603', '1502') for e in listas['codigoDescripcion']):
+            # Comprobante no existe
+            if keyword_style:
+                return None
+            return {'status': 'no_encontrado', 'datos': {}, 'items': []}
 
-            # Parsear respuesta XML
-            root = ET.fromstring(xml_response)
-            campos = {}
-            for elem in root.iter():
-                tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                if elem.text and elem.text.strip():
-                    campos[tag] = elem.text.strip()
-
-            # Detectar errores AFIP
-            if 'codigoDescripcion' in str(xml_response).lower():
-                for elem in root.iter():
-                    tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                    if tag == 'codigo' and elem.text:
-                        error_code = elem.text.strip()
-                        if error_code in ['602', '603', '1502']:
-                            # Comprobante no existe
-                            if keyword_style:
-                                return None
-                            return {'status': 'no_encontrado', 'datos': {}, 'items': []}
-
-            # Verificar que hay datos del comprobante
-            has_data = any(k in campos for k in [
-                'numeroComprobante', 'codigoTipoComprobante',
-                'fechaEmision', 'importeTotal'
-            ])
-
-            if not has_data:
-                if keyword_style:
-                    return None
-                return {'status': 'no_encontrado', 'datos': {}, 'items': []}
-
-            # Extraer items
-            items = self._extraer_items(root)
-
-            datos = {
-                'tipo_comprobante': campos.get('codigoTipoComprobante', str(_tipo)),
-                'punto_venta': campos.get('numeroPuntoVenta', str(_pv)),
-                'numero_comprobante': campos.get('numeroComprobante', str(_numero)),
-                'fecha_emision': campos.get('fechaEmision', ''),
-                'importe_total': campos.get('importeTotal', '0'),
-                'importe_gravado': campos.get('importeGravado',
-                                    campos.get('importeSubtotal', '0')),
-                'importe_iva': campos.get('importeOtrosTributos',
-                                campos.get('importeGravado', '0')),
-                'receptor_denominacion': campos.get('denominacionReceptor',
-                                          campos.get('razonSocial', '')),
-                'receptor_numero_doc': campos.get('numeroDocumento', ''),
-                'cae': campos.get('CAE', campos.get('cae', '')),
-                'fecha_vencimiento_cae': campos.get('fechaVencimientoCAE',
-                                          campos.get('CAEFchVto', '')),
-                'moneda': campos.get('codigoMoneda', 'PES'),
-                'cotizacion': campos.get('cotizacionMoneda', '1'),
-                'cantidad_items': len(items)
+        # Verificar que hay datos del comprobante
+        has_data = any(k in campos for k in [
+            'numeroComprobante', 'codigoTipoComprobante',
+            'fechaEmision', 'importeTotal'
+        ])
+
+        if not has_data:
+            if keyword_style:
+                return None
+            return {'status': 'no_encontrado', 'datos': {}, 'items': []}
+
+        # Extraer items
+        items = self._extraer_items(listas['item'] + listas['arrayItems'])
+
+        datos = {
+            'tipo_comprobante': campos.get('codigoTipoComprobante', str(_tipo)),
+            'punto_venta': campos.get('numeroPuntoVenta', str(_pv)),
+            'numero_comprobante': campos.get('numeroComprobante', str(_numero)),
+            'fecha_emision': campos.get('fechaEmision', ''),
+            'importe_total': campos.get('importeTotal', '0'),
+            'importe_gravado': campos.get('importeGravado',
+                                campos.get('importeSubtotal', '0')),
+            'importe_iva': campos.get('importeOtrosTributos',
+                            campos.get('importeGravado', '0')),
+            'receptor_denominacion': campos.get('denominacionReceptor',
+                                      campos.get('razonSocial', '')),
+            'receptor_numero_doc': campos.get('numeroDocumento', ''),
+            'cae': campos.get('CAE', campos.get('cae', '')),
+            'fecha_vencimiento_cae': campos.get('fechaVencimientoCAE',
+                                      campos.get('CAEFchVto', '')),
+            'moneda': campos.get('codigoMoneda', 'PES'),
+            'cotizacion': campos.get('cotizacionMoneda', '1'),
+            'cantidad_items': len(items)
+        }
+
+        if keyword_style:
+            # Estilo 2: retornar dict plano con datos + items
+            result = dict(datos)
+            result['items'] = items
+            return result
+        else:
+            # Estilo 1: retornar estructura con status
+            return {
+                'status': 'encontrado',
+                'datos': datos,
+                'items': items
             }
 
+    def _error_consulta(self, e, keyword_style):
+        """Error de la consulta: los códigos de "no existe" son un resultado, el resto se propaga."""
+        error_str = str(e)
+        if '602' in error_str or '603' in error_str or '1502' in error_str:
             if keyword_style:
-                # Estilo 2: retornar dict plano con datos + items
-                result = dict(datos)
-                result['items'] = items
-                return result
-            else:
-                # Estilo 1: retornar estructura con status
-                return {
-                    'status': 'encontrado',
-                    'datos': datos,
-                    'items': items
-                }
+                return None
+            return {'status': 'no_encontrado', 'datos': {}, 'items': []}
+        raise e
 
-        except Exception as e:
-            error_str = str(e)
-            if '602' in error_str or '603' in error_str or '1502' in error_str:
-                if keyword_style:
-                    return None
-                return {'status': 'no_encontrado', 'datos': {}, 'items': []}
-            raise
-
-    def _extraer_items(self, root):
-        """Extraer items/detalle de la respuesta XML"""
+    def _extraer_items(self, nodos):
+        """Extraer items/detalle de los nodos item/arrayItems (ver src/afip_xml.extraer)"""
         items = []
 
-        # Buscar nodos de items en la respuesta
-        for elem in root.iter():
-            tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-
-            if tag in ['item', 'arrayItems']:
-                item_data = {}
-                for child in elem:
-                    child_tag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if child.text and child.text.strip():
-                        item_data[child_tag] = child.text.strip()
-
-                if item_data:
-                    item = {
-                        'codigo_mtx': item_data.get('codigoMTX', item_data.get('codigo', '')),
-                        'codigo': item_data.get('codigo', ''),
-                        'descripcion': item_data.get('descripcion', ''),
-                        'cantidad': item_data.get('cantidad', '0'),
-                        'unidad_medida': item_data.get('codigoUnidadMedida', ''),
-                        'precio_unitario': item_data.get('precioUnitario', '0'),
-                        'importe_total': item_data.get('importeItem',
-                                          item_data.get('importeTotal', '0')),
-                        'iva_alicuota': item_data.get('codigoCondicionIVA',
-                                         item_data.get('importeIVA', '')),
-                    }
-                    items.append(item)
+        for nodo in nodos:
+            item_data = {k: v for k, v in nodo.items() if v}
+
+            if item_data:
+                item = {
+                    'codigo_mtx': item_data.get('codigoMTX', item_data.get('codigo', '')),
+                    'codigo': item_data.get('codigo', ''),
+                    'descripcion': item_data.get('descripcion', ''),
+                    'cantidad': item_data.get('cantidad', '0'),
+                    'unidad_medida': item_data.get('codigoUnidadMedida', ''),
+                    'precio_unitario': item_data.get('precioUnitario', '0'),
+                    'importe_total': item_data.get('importeItem',
+                                      item_data.get('importeTotal', '0')),
+                    'iva_alicuota': item_data.get('codigoCondicionIVA',
+                                     item_data.get('importeIVA', '')),
+                }
+                items.append(item)
 
         return items
 
@@ -511,6 +445,81 @@ class WSMTXCAClient:
         return str(file_path)
 
 
+class WSMTXCAAsyncClient:
+    """WSMTXCA sobre asyncio (aiohttp, src/afip_transport_async.py).
+
+    consultar_comprobante acepta los mismos dos estilos que WSMTXCAClient.
+    Sobres, parseo y cache de TA son los del cliente sync.
+    """
+
+    def __init__(self, cert_path, key_path, ambiente='prod', solicitante_cuit=None):
+        self._sync = WSMTXCAClient(cert_path, key_path, ambiente, solicitante_cuit)
+        self.ambiente = ambiente
+        self.urls = self._sync.urls
+        self.tipos_comprobante = self._sync.tipos_comprobante
+
+    async def autenticar_wsaa(self, cuit_representada=None):
+        """(token, sign) del cache compartido; loginCms async si hace falta."""
+        from src.wsaa_ticket_cache import obtener_ticket_async
+        return await obtener_ticket_async(self._sync.cert_path, 'wsmtxca', self.ambiente,
+                                          self._login_wsaa, self._sync.solicitante_cuit)
+
+    async def _login_wsaa(self):
+        import asyncio
+        from src.afip_transport_async import post_afip_async
+
+        # La firma CMS es CPU: fuera del loop
+        soap_request, headers = await asyncio.to_thread(self._sync._sobre_login)
+        respuesta = await post_afip_async('wsaa', self.urls[self.ambiente]['wsaa'], soap_request, headers,
+                                          solicitante=self._sync.solicitante_cuit)
+        return self._sync._credenciales_login(respuesta)
+
+    async def _wsmtxca_request(self, soap_body):
+        from src.afip_transport_async import post_afip_async
+
+        soap_envelope, headers = self._sync._sobre_wsmtxca(soap_body)
+        return await post_afip_async('wsmtxca', self.urls[self.ambiente]['wsmtxca'], soap_envelope, headers,
+                                     solicitante=self._sync.solicitante_cuit)
+
+    async def consultar_comprobante(self, cuit=None, tipo=None, punto_venta=None, numero=None,
+                                    *, cuit_representada=None, tipo_comprobante=None,
+                                    numero_comprobante=None):
+        """Como WSMTXCAClient.consultar_comprobante."""
+        _cuit, _tipo, _pv, _numero, keyword_style = self._sync._normalizar_consulta(
+            cuit, tipo, punto_venta, numero, cuit_representada, tipo_comprobante, numero_comprobante)
+
+        try:
+            token, sign = await self.autenticar_wsaa(_cuit)
+            soap_body = self._sync._cuerpo_consulta(token, sign, _cuit, _tipo, _pv, _numero)
+            xml_response = await self._wsmtxca_request(soap_body)
+            return self._sync._parsear_consulta(xml_response, _tipo, _pv, _numero, keyword_style)
+
+        except Exception as e:
+            return self._sync._error_consulta(e, keyword_style)
+
+    async def consultar_multiples_comprobantes(self, cuit, comprobantes):
+        """Como WSMTXCAClient.consultar_multiples_comprobantes, con las consultas en paralelo.
+
+        El transporte acota el ritmo (token bucket del solicitante) y las
+        conexiones abiertas; el orden del resultado es el de `comprobantes`.
+        """
+        import asyncio
+
+        async def _consultar(cbte):
+            try:
+                resultado = await self.consultar_comprobante(
+                    cuit_representada=cuit,
+                    tipo_comprobante=cbte['tipo'],
+                    punto_venta=cbte['punto_venta'],
+                    numero_comprobante=cbte['numero']
+                )
+                return {'comprobante': cbte, 'success': True, 'datos': resultado, 'error': None}
+            except Exception as e:
+                return {'comprobante': cbte, 'success': False, 'datos': None, 'error': str(e)}
+
+        return list(await asyncio.gather(*(_consultar(cbte) for cbte in comprobantes)))
+
+
 def crear_cliente_wsmtxca(ambiente='prod'):
     """Factory: crear un WSMTXCAClient auto-detectando certificados.
 